@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
-import os
+import sys
+
+from scaffold import Scaffold, load_services, print_report, template
 
 PROJECT_NAME = "dahlia-backend"
+SCAFFOLD = Scaffold(PROJECT_NAME)
 
 MAKEFILE = """
 .PHONY: help proto build test docker-build dev
@@ -26,7 +29,7 @@ test:
 \tcd services/kotlin && ./gradlew test
 \tcd services/python && pytest
 
-docker-build:
+docker-build: proto
 \t./scripts/build-all.sh
 
 dev:
@@ -106,11 +109,25 @@ protoc --kotlin_out=$KOTLIN_OUT \\
        --proto_path=$PROTO_DIR \\
        $PROTO_DIR/*.proto
 
-protoc --python_out=$PYTHON_OUT \\
+# grpcio-tools bundles protoc with the Python gRPC plugin.
+python3 -m grpc_tools.protoc --python_out=$PYTHON_OUT \\
+       --pyi_out=$PYTHON_OUT \\
        --grpc_python_out=$PYTHON_OUT \\
        --proto_path=$PROTO_DIR \\
        $PROTO_DIR/*.proto
 
+# Python services with the gRPC runtime (app/core/rpc.py) import the stubs
+# as app.proto.*, so they are generated there with that package path.
+for service in services/python/*/; do
+    if [[ -f "$service/app/core/rpc.py" ]]; then
+        python3 -m grpc_tools.protoc --python_out=$service \\
+               --pyi_out=$service \\
+               --grpc_python_out=$service \\
+               -Iapp/proto=$PROTO_DIR \\
+               $PROTO_DIR/*.proto
+    fi
+done
+
 echo "✅ Protobuf generation complete"
 """
 
@@ -118,17 +135,10 @@ BUILD_ALL = """#!/bin/bash
 set -e
 
 services=(
-    "api-gateway"
-    "auth-service"
-    "user-service"
-    "post-service"
-    "feed-service"
-    "media-service"
-    "notification-service"
-    "search-service"
+{}
 )
 
-for service in "${services[@]}"; do
+for service in "${{services[@]}}"; do
     if [[ -d "services/kotlin/$service" ]]; then
         docker build -t dahlia/$service:latest services/kotlin/$service
     elif [[ -d "services/python/$service" ]]; then
@@ -290,12 +300,7 @@ message LogoutResponse {
 
 KOTLIN_SETTINGS = """rootProject.name = "dahlia-services"
 
-include(":api-gateway")
-include(":auth-service")
-include(":user-service")
-include(":post-service")
-include(":feed-service")
-include(":notification-service")
+{}
 """
 
 KOTLIN_BUILD = """plugins {
@@ -377,27 +382,88 @@ EXPOSE {}
 ENTRYPOINT ["java", "-jar", "app.jar"]
 """
 
-PYTHON_REQUIREMENTS = """fastapi==0.109.0
-uvicorn[standard]==0.27.0
-pydantic==2.5.3
-pydantic-settings==2.1.0
-sqlalchemy==2.0.25
-asyncpg==0.29.0
-redis==5.0.1
-pillow==10.2.0
-opencv-python==4.9.0.80
-numpy==1.26.3
-tensorflow==2.15.0
-torch==2.1.2
-torchvision==0.16.2
-boto3==1.34.34
-celery==5.3.6
-grpcio==1.60.0
-grpcio-tools==1.60.0
-pyjwt==2.8.0
-python-multipart==0.0.6
-httpx==0.26.0
-"""
+# Pinned requirements by what a service does. A Python service installs
+# "base" plus the profiles listed for it in services.toml.
+# shared_requirements.txt has every profile, for tooling and local runs.
+PYTHON_PROFILES = {
+    "base": [
+        "fastapi==0.109.0",
+        "uvicorn[standard]==0.27.0",
+        "gunicorn==21.2.0",
+        "pydantic==2.5.3",
+        "pydantic-settings==2.1.0",
+    ],
+    "uploads": ["python-multipart==0.0.6"],
+    "http": ["httpx==0.26.0"],
+    "auth": ["pyjwt==2.8.0"],
+    "postgres": ["sqlalchemy==2.0.25", "asyncpg==0.29.0"],
+    "redis": ["redis==5.0.1"],
+    "storage": ["boto3==1.34.34"],
+    "tasks": ["celery==5.3.6"],
+    "grpc": ["grpcio==1.60.0", "protobuf==4.25.2"],
+    "rabbitmq": ["aio-pika==9.3.1"],
+    "numpy": ["numpy==1.26.3"],
+    "images": ["pillow==10.2.0", "numpy==1.26.3"],
+    # Headless OpenCV: the GUI build needs libGL, which python:3.11-slim lacks.
+    "opencv": ["numpy==1.26.3", "opencv-python-headless==4.9.0.80"],
+    # CPU wheels; the default Linux torch wheels pull in CUDA.
+    "torch": [
+        "--extra-index-url https://download.pytorch.org/whl/cpu",
+        "numpy==1.26.3",
+        "torch==2.1.2+cpu",
+    ],
+    "tensorflow": ["numpy==1.26.3", "tensorflow==2.15.0"],
+    "protoc": ["grpcio-tools==1.60.0"],
+}
+
+# Modules each profile adds that the app should import only where needed;
+# bench_imports fails if one is loaded at startup.
+PYTHON_LAZY_MODULES = {
+    "http": ["httpx"],
+    "postgres": ["sqlalchemy", "asyncpg"],
+    "redis": ["redis"],
+    "storage": ["boto3"],
+    "tasks": ["celery"],
+    "rabbitmq": ["aio_pika"],
+    "images": ["numpy", "PIL"],
+    "opencv": ["numpy", "cv2"],
+    "torch": ["numpy", "torch"],
+    "tensorflow": ["numpy", "tensorflow"],
+}
+
+# Modules a profile's users import at startup, so never lazy.
+PYTHON_EAGER_MODULES = {
+    "numpy": ["numpy"],
+}
+
+# Heavy frameworks that are lazy for every service, whether or not it uses
+# them: a stray import of one costs more than the rest of the app.
+PYTHON_HEAVY_MODULES = ["numpy", "PIL", "cv2", "torch", "tensorflow"]
+
+
+def resolve_profiles(profiles):
+    """Requirement lines for "base" plus ``profiles``, first occurrence kept."""
+    lines = []
+    for profile in ("base", *profiles):
+        if profile not in PYTHON_PROFILES:
+            raise ValueError(f"unknown Python dependency profile {profile!r}")
+        lines += [line for line in PYTHON_PROFILES[profile] if line not in lines]
+    return "\n".join(lines)
+
+
+def resolve_extra(profiles, extra):
+    """requirements-<extra>.txt: requirements.txt plus the lines ``extra`` adds to it."""
+    installed = resolve_profiles(profiles).split("\n")
+    added = [line for line in resolve_profiles((extra,)).split("\n") if line not in installed]
+    return "\n".join(["-r requirements.txt", *added])
+
+
+def lazy_modules(profiles):
+    """The LAZY tuple bench_imports checks for a service with ``profiles``."""
+    eager = {m for p in profiles for m in PYTHON_EAGER_MODULES.get(p, ())}
+    lazy = [m for p in profiles for m in PYTHON_LAZY_MODULES.get(p, ())] + PYTHON_HEAVY_MODULES
+    return [m for m in dict.fromkeys(lazy) if m not in eager]
+
 
 PYTHON_MAIN = """from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -426,63 +492,800 @@ WORKDIR /app
 COPY requirements.txt .
 RUN pip install --no-cache-dir -r requirements.txt
 COPY . .
-EXPOSE {}
-CMD ["python", "main.py"]
+EXPOSE {port}
+CMD ["gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+"""
+
+# Services with optional dependency sets ("extras") install one of their
+# requirements*.txt files, picked at build time.
+PYTHON_DOCKERFILE_EXTRAS = """FROM python:3.11-slim
+WORKDIR /app
+# {extras} add{s} optional dependencies: --build-arg REQUIREMENTS=<file>.
+ARG REQUIREMENTS=requirements.txt
+COPY requirements*.txt .
+RUN pip install --no-cache-dir -r ${{REQUIREMENTS}}
+COPY . .
+EXPOSE {port}
+CMD ["gunicorn", "-c", "gunicorn.conf.py", "main:app"]
 """
 
+PYTHON_WORKERS = """# One async worker per CPU of the pod's limit. os.cpu_count() would report
+# the node's CPUs, and extra workers only add context switches.
+workers = int(os.environ.get("WEB_CONCURRENCY", 0)) or max(1, math.ceil(cpu_limit()))"""
+
+# Services that keep state in the worker process (caches, indexes, disk
+# budgets, metrics) get a fixed count from services.toml instead.
+PYTHON_WORKERS_PINNED = """# Pinned: this service keeps its state in the worker process, and every extra
+# worker would hold its own diverging copy. WEB_CONCURRENCY is ignored; scale
+# with replicas.
+workers = {workers}"""
+
+PYTHON_GUNICORN_CONF = '''"""Production server settings.
+
+A gunicorn master imports the app and the modules in ``preload_modules``, then
+forks the workers. Each worker runs its own uvicorn event loop (uvloop,
+httptools) and its own lifespan, so connections and pools are opened after
+the fork, never shared. Every setting can be overridden from the environment.
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import gc
+import importlib
+import math
+import os
+
+
+def cpu_limit():
+    """CPUs this container may use: its cgroup CPU quota, else the CPUs it may run on."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{{os.environ.get('PORT', '{port}')}}"
+{workers}
+worker_class = "app.core.server.Worker"
+# The app and preload_modules are imported once and shared copy-on-write.
+preload_app = True
+preload_modules = [m for m in os.environ.get("PRELOAD_MODULES", "{preload}").split(",") if m]
+# Connections the kernel queues while every worker is busy, capped by
+# net.core.somaxconn.
+backlog = int(os.environ.get("BACKLOG", 2048))
+# Longer than the ingress's 60s upstream idle timeout, so a worker never
+# closes a connection the proxy is about to reuse.
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", 75))
+# On SIGTERM workers stop accepting and finish in-flight requests for up to
+# this long. Kubernetes sends SIGKILL after 30s.
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 25))
+timeout = int(os.environ.get("WORKER_TIMEOUT_SECONDS", 60))
+# Requests are logged at the ingress.
+accesslog = None
+
+
+def on_starting(server):
+    for module in preload_modules:
+        importlib.import_module(module)
+
+
+def when_ready(server):
+    # Keep the collector from writing to, and so copying, preloaded objects
+    # in every worker.
+    gc.freeze()
+'''
+
+PYTHON_SERVER = '''"""Gunicorn worker class; see gunicorn.conf.py."""
+
+from uvicorn.workers import UvicornWorker
+
+
+class Worker(UvicornWorker):
+    # Explicit rather than "auto", which silently falls back to asyncio and h11.
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+'''
+
+PYTHON_RPC = '''"""grpc.aio runtime for calling and serving the shared proto contracts.
+
+``scripts/generate-protos.sh`` generates the stubs into ``app/proto``.
+
+``RpcClient`` calls a service with its generated stub::
+
+    users = RpcClient("user-service:9090").stub(user_pb2_grpc.UserServiceStub)
+    user = await users.GetUser(user_pb2.GetUserRequest(user_id=user_id))
+
+- Calls are spread over ``pool_size`` channels. Each channel has its own
+  HTTP/2 connection, and so its own stream limit and, behind a ClusterIP
+  Service, its own pod.
+- Every unary call gets a deadline. It is the ``timeout`` passed in, else the
+  method's entry in ``DEADLINES``, else ``default_timeout``. Inside a
+  handler served by ``serve``, it is also capped by the time the caller has
+  left.
+- Idempotent reads (``HEDGED``) are hedged. When an attempt has no answer
+  after the method's recent p95 latency, or fails with UNAVAILABLE, another
+  attempt goes out on the next channel. The first answer wins and the others
+  are cancelled. Extra attempts are capped at ``hedge_ratio`` of calls, so a
+  slow backend is not sent double its load.
+- Unary calls return a coroutine rather than a ``grpc.aio`` call object,
+  so their metadata is not exposed.
+- A request of ``compress_min_bytes`` or more is sent gzip-compressed.
+  Responses are compressed only if the server chooses to, using an algorithm
+  this client advertised in ``grpc-accept-encoding``.
+- Keepalive pings go out every 5 minutes, only while calls are in flight.
+  That is grpc-java's ``permitKeepAliveTime``; pinging more often gets the
+  connection closed with ``too_many_pings``.
+
+``serve`` starts a ``grpc.aio`` server for generated servicers. It gzips
+unary responses of ``compress_min_bytes`` or more, and all streamed
+messages, for clients that accept gzip.
+It closes each connection after ``max_connection_age`` so clients reconnect
+and spread over new pods.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import grpc
+
+# Per-method deadlines in seconds; other methods get the client's default_timeout.
+DEADLINES: Dict[str, float] = {
+    "/user.UserService/GetUser": 0.3,
+    "/user.UserService/GetFollowers": 1.0,
+    "/post.PostService/GetPost": 0.3,
+    "/auth.AuthService/Login": 2.0,
+    "/auth.AuthService/Signup": 2.0,
+}
+# Reads that are safe to send twice.
+HEDGED = frozenset({"/user.UserService/GetUser", "/post.PostService/GetPost"})
+# Codes that mean the attempt never reached a handler and may go elsewhere.
+_RETRYABLE = frozenset({grpc.StatusCode.UNAVAILABLE})
+
+_CLIENT_OPTIONS = [
+    # Without this, channels with equal arguments share one connection.
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.keepalive_time_ms", 300_000),
+    ("grpc.keepalive_timeout_ms", 20_000),
+    ("grpc.keepalive_permit_without_calls", 0),
+    # Spreads calls over every address of a headless Service (dns:/// target).
+    ("grpc.service_config", json.dumps({"loadBalancingConfig": [{"round_robin": {}}]})),
+]
+
+# Absolute monotonic deadline of the RPC this task is serving, if any.
+_inbound_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("inbound_deadline", default=None)
+
+
+class _Latencies:
+    """Recent latencies of one method, for its hedging delay."""
+
+    def __init__(self, size: int = 256):
+        self._recent: deque = deque(maxlen=size)
+        self._sorted: list = []
+        self._stale = 0
+
+    def add(self, seconds: float) -> None:
+        self._recent.append(seconds)
+        self._stale += 1
+
+    def percentile(self, q: float, default: float) -> float:
+        if len(self._recent) < 20:
+            return default
+        if self._stale >= 16 or not self._sorted:
+            self._sorted = sorted(self._recent)
+            self._stale = 0
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class _HedgeBudget:
+    """Allows extra attempts up to ``ratio`` of calls, plus a small burst."""
+
+    def __init__(self, ratio: float, burst: int = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.calls = 0
+        self.extra = 0
+
+    def take(self) -> bool:
+        if self.extra >= self.calls * self.ratio + self.burst:
+            return False
+        self.extra += 1
+        return True
+
+
+class _UnaryUnary:
+    def __init__(self, client: "RpcClient", method: str, serializer, deserializer):
+        self._client = client
+        self._method = method
+        self._callables = [
+            channel.unary_unary(method, request_serializer=serializer, response_deserializer=deserializer)
+            for channel in client._channels
+        ]
+        self._latencies = _Latencies()
+
+    def __call__(self, request, *, timeout: Optional[float] = None, metadata=None, compression=None):
+        return self._call(request, timeout, metadata, compression)
+
+    async def _call(self, request, timeout, metadata, compression):
+        client = self._client
+        timeout = client.timeout_for(self._method, timeout)
+        if compression is None and request.ByteSize() >= client.compress_min_bytes:
+            compression = grpc.Compression.Gzip
+        started = time.monotonic()
+        try:
+            if self._method in client.hedged:
+                response = await self._hedged(request, started + timeout, metadata, compression)
+            else:
+                response = await client._next(self._callables)(
+                    request, timeout=timeout, metadata=metadata, compression=compression
+                )
+        except grpc.aio.AioRpcError as exc:
+            client.stats[f"error:{exc.code().name}"] += 1
+            raise
+        self._latencies.add(time.monotonic() - started)
+        client.stats["ok"] += 1
+        return response
+
+    async def _hedged(self, request, deadline: float, metadata, compression):
+        client = self._client
+        budget = client._budget
+        budget.calls += 1
+        delay = self._latencies.percentile(0.95, client.hedge_delay)
+        calls = set()
+
+        def launch():
+            call = client._next(self._callables)(
+                request, timeout=max(0.0, deadline - time.monotonic()), metadata=metadata, compression=compression
+            )
+            calls.add(asyncio.ensure_future(call))
+
+        launch()
+        error = None
+        try:
+            while calls:
+                can_hedge = len(calls) < client.hedge_attempts and time.monotonic() < deadline
+                done, _ = await asyncio.wait(
+                    calls, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if budget.take():
+                        client.stats["hedged"] += 1
+                        launch()
+                    else:
+                        client.stats["hedge_denied"] += 1
+                        delay = None
+                    continue
+                for task in done:
+                    calls.discard(task)
+                    try:
+                        return task.result()
+                    except grpc.aio.AioRpcError as exc:
+                        if exc.code() not in _RETRYABLE:
+                            raise
+                        error = exc
+                if not calls and time.monotonic() < deadline and budget.take():
+                    client.stats["retried"] += 1
+                    launch()
+            raise error
+        finally:
+            # Cancelling a task cancels its RPC; wait for both to unwind so no
+            # task outlives the call or logs an unretrieved exception.
+            for task in calls:
+                task.cancel()
+            await asyncio.gather(*calls, return_exceptions=True)
+
+
+class _PooledChannel:
+    """Stands in for a ``grpc.aio.Channel`` when building generated stubs."""
+
+    def __init__(self, client: "RpcClient"):
+        self._client = client
+
+    def unary_unary(self, method, request_serializer=None, response_deserializer=None, **kwargs):
+        return _UnaryUnary(self._client, method, request_serializer, response_deserializer)
+
+    def _streaming(self, kind: str, method, request_serializer=None, response_deserializer=None, **kwargs):
+        callables = [
+            getattr(channel, kind)(method, request_serializer=request_serializer, response_deserializer=response_deserializer)
+            for channel in self._client._channels
+        ]
+        client = self._client
+
+        def call(*args, timeout: Optional[float] = None, **kwargs):
+            return client._next(callables)(*args, timeout=client.timeout_for(method, timeout), **kwargs)
+
+        return call
+
+    def unary_stream(self, method, *args, **kwargs):
+        return self._streaming("unary_stream", method, *args, **kwargs)
+
+    def stream_unary(self, method, *args, **kwargs):
+        return self._streaming("stream_unary", method, *args, **kwargs)
+
+    def stream_stream(self, method, *args, **kwargs):
+        return self._streaming("stream_stream", method, *args, **kwargs)
+
+
+class RpcClient:
+    def __init__(
+        self,
+        target: str,
+        pool_size: int = 2,
+        default_timeout: float = 1.0,
+        deadlines: Optional[Dict[str, float]] = None,
+        hedged: Iterable[str] = HEDGED,
+        hedge_delay: float = 0.05,
+        hedge_attempts: int = 2,
+        hedge_ratio: float = 0.1,
+        compress_min_bytes: int = 1024,
+        options: Sequence[Tuple[str, object]] = (),
+    ):
+        self.target = target
+        self.default_timeout = default_timeout
+        self.deadlines = {**DEADLINES, **(deadlines or {})}
+        self.hedged = frozenset(hedged)
+        # Used until a method has enough latency samples for its p95.
+        self.hedge_delay = hedge_delay
+        self.hedge_attempts = hedge_attempts
+        self.compress_min_bytes = compress_min_bytes
+        self.stats: Counter = Counter()
+        self._budget = _HedgeBudget(hedge_ratio)
+        self._channels = [
+            grpc.aio.insecure_channel(target, options=[*_CLIENT_OPTIONS, *options]) for _ in range(pool_size)
+        ]
+        self._turn = itertools.count()
+
+    def _next(self, callables: list):
+        return callables[next(self._turn) % len(callables)]
+
+    def timeout_for(self, method: str, timeout: Optional[float] = None) -> float:
+        """Deadline of a call: its own or the method's, capped by the inbound call's remaining time."""
+        if timeout is None:
+            timeout = self.deadlines.get(method, self.default_timeout)
+        inbound = _inbound_deadline.get()
+        if inbound is not None:
+            timeout = min(timeout, max(0.0, inbound - time.monotonic()))
+        return timeout
+
+    def stub(self, stub_class: Callable):
+        """A generated ``*Stub`` bound to this client's channel pool."""
+        return stub_class(_PooledChannel(self))
+
+    async def wait_ready(self, timeout: float = 10.0) -> None:
+        await asyncio.wait_for(asyncio.gather(*(c.channel_ready() for c in self._channels)), timeout)
+
+    async def close(self, grace: Optional[float] = None) -> None:
+        await asyncio.gather(*(c.close(grace) for c in self._channels))
+
+
+class _ServerRuntime(grpc.aio.ServerInterceptor):
+    """Records the inbound deadline for outgoing calls and leaves small unary responses uncompressed."""
+
+    def __init__(self, compress_min_bytes: int):
+        self.compress_min_bytes = compress_min_bytes
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None:
+            return handler
+        behavior = handler.unary_unary
+        min_bytes = self.compress_min_bytes
+
+        async def unary_unary(request, context):
+            remaining = context.time_remaining()
+            token = _inbound_deadline.set(None if remaining is None else time.monotonic() + remaining)
+            try:
+                response = await behavior(request, context)
+            finally:
+                _inbound_deadline.reset(token)
+            if response is not None and response.ByteSize() < min_bytes:
+                context.disable_next_message_compression()
+            return response
+
+        return grpc.unary_unary_rpc_method_handler(
+            unary_unary,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+
+async def serve(
+    servicers: Sequence[Tuple[Callable, object]],
+    port: int,
+    max_concurrent_rpcs: Optional[int] = None,
+    compress_min_bytes: int = 1024,
+    max_connection_age: float = 1800.0,
+    options: Sequence[Tuple[str, object]] = (),
+) -> grpc.aio.Server:
+    """Start a server for ``(add_XServicer_to_server, servicer)`` pairs; stop it with ``await server.stop(grace)``."""
+    server = grpc.aio.server(
+        interceptors=[_ServerRuntime(compress_min_bytes)],
+        # Sent as identity to clients that do not list gzip in grpc-accept-encoding.
+        compression=grpc.Compression.Gzip,
+        maximum_concurrent_rpcs=max_concurrent_rpcs,
+        options=[
+            ("grpc.max_connection_age_ms", int(max_connection_age * 1000)),
+            ("grpc.max_connection_age_grace_ms", 30_000),
+            # Clients ping at most every 5 minutes, and only during calls.
+            ("grpc.http2.min_recv_ping_interval_without_data_ms", 300_000),
+            *options,
+        ],
+    )
+    for add, servicer in servicers:
+        add(servicer, server)
+    server.add_insecure_port(f"[::]:{port}")
+    await server.start()
+    return server
+'''
+
+PYTHON_BENCH_IMPORTS = '''"""Import time and resident memory of the app, checked against a budget.
+
+Starts fresh interpreters under ``python -X importtime`` that import
+``main``, which is the app and everything its routes pull in. It reports:
+
+- the median wall time of the import
+- RSS once it finishes
+- the packages that took longest, by self time
+- which of the ``LAZY`` modules were loaded
+
+The run fails if the import takes longer than ``BUDGET_MS``, if RSS exceeds
+``BUDGET_RSS_MIB``, or if a ``LAZY`` module was imported. ``LAZY`` lists heavy
+modules that must not load at startup: those the service imports only on the
+code paths that need them, and frameworks it does not use at all. The exit
+status is non-zero on failure, so CI can run this as a check.
+
+    cd services/python/{name}
+    python -m benchmarks.bench_imports --runs 5
+"""
+
+import argparse
+import collections
+import json
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = {budget_ms}
+BUDGET_RSS_MIB = {budget_rss_mib}
+LAZY = {lazy}
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+try:
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+except OSError:
+    pass
+print(json.dumps({{"import_ms": elapsed * 1000, "rss_mib": rss, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD], capture_output=True, text=True, check=True
+    )
+    self_us = collections.Counter()
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        self_us[name.strip().split(".")[0]] += int(own)
+    return json.loads(proc.stdout.splitlines()[-1]), self_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--budget-rss-mib", type=float, default=BUDGET_RSS_MIB)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r, _ in runs)
+    rss_mib = statistics.median(r["rss_mib"] for r, _ in runs)
+    self_us = sum((s for _, s in runs), collections.Counter())
+    loaded = [m for m in LAZY if m in runs[-1][0]["modules"]]
+
+    print(f"import main   {{import_ms:8.0f}} ms   (budget {{args.budget_ms:.0f}} ms)")
+    print(f"rss           {{rss_mib:8.1f}} MiB  (budget {{args.budget_rss_mib:.0f}} MiB)")
+    print("heaviest packages by self time:")
+    for name, us in self_us.most_common(args.top):
+        print(f"  {{name:<24}}{{us / len(runs) / 1000:8.1f}} ms")
+    print(f"lazy modules loaded at import: {{', '.join(loaded) or 'none'}}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {{import_ms:.0f}} ms")
+    if rss_mib > args.budget_rss_mib:
+        failures.append(f"RSS is {{rss_mib:.1f}} MiB")
+    if loaded:
+        failures.append(f"imported {{', '.join(loaded)}} at startup")
+    if failures:
+        sys.exit("over budget: " + "; ".join(failures))
+    print("within budget")
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+LOAD_TEST = '''#!/usr/bin/env python3
+"""Throughput of a Python service: production launcher against `python main.py`.
+
+Starts the service twice on a free local port:
+
+- baseline: uvicorn.run(app), as `python main.py` does
+- production: gunicorn -c gunicorn.conf.py main:app
+
+It then drives GET /health over --connections keep-alive connections, spread
+over --clients processes, for --duration seconds. Requests/s and latency
+percentiles are printed for each launcher. The client runs on the same
+machine, so give the server CPUs to spare, e.g. with --workers.
+
+    python scripts/load-test.py services/python/media-service --connections 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+REQUEST = b"GET /health HTTP/1.1\\r\\nHost: localhost\\r\\n\\r\\n"
+CONTENT_LENGTH = re.compile(rb"content-length:\\s*(\\d+)", re.I)
+
+BASELINE = "import uvicorn, main; uvicorn.run(main.app, host='127.0.0.1', port={port})"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(service, launcher, port, workers):
+    env = dict(os.environ, PORT=str(port))
+    if launcher == "baseline":
+        command = [sys.executable, "-c", BASELINE.format(port=port)]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "main:app"]
+        if workers:
+            env["WEB_CONCURRENCY"] = str(workers)
+    process = subprocess.Popen(command, cwd=service, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{launcher} server exited with {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(REQUEST)
+                if s.recv(12).startswith(b"HTTP/1.1 200"):
+                    return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    sys.exit(f"{launcher} server did not become ready")
+
+
+async def connection(port, deadline, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(REQUEST)
+        head = await reader.readuntil(b"\\r\\n\\r\\n")
+        await reader.readexactly(int(CONTENT_LENGTH.search(head).group(1)))
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+
+async def client(port, connections, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(connection(port, deadline, latencies) for _ in range(connections)))
+    return latencies
+
+
+def run_client(args):
+    port, connections, duration = args
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
+    return asyncio.run(client(port, connections, duration))
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(service, launcher, args):
+    port = free_port()
+    process = start(service, launcher, port, args.workers)
+    try:
+        per_client = [args.connections // args.clients + (i < args.connections % args.clients) for i in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as pool:
+            # Warm-up, then the measured run.
+            pool.map(run_client, [(port, n, 1.0) for n in per_client])
+            results = pool.map(run_client, [(port, n, args.duration) for n in per_client])
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    latencies = sorted(l for result in results for l in result)
+    return len(latencies) / args.duration, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", help="service directory, e.g. services/python/media-service")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=0, help="production workers (default: from the CPU limit)")
+    args = parser.parse_args()
+    args.clients = max(1, min(args.clients, args.connections))
+
+    print(f"{'launcher':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    baseline = None
+    for launcher in ("baseline", "production"):
+        rate, latencies = measure(args.service, launcher, args)
+        gain = f"  x{rate / baseline:.2f}" if baseline else ""
+        baseline = baseline or rate
+        print(
+            f"{launcher:<12}{rate:>10.0f}{percentile(latencies, 0.5) * 1000:>10.2f}"
+            f"{percentile(latencies, 0.99) * 1000:>10.2f}{gain}"
+        )
+
+
+if __name__ == "__main__":
+    main()
+'''
+
 K8S_DEPLOYMENT = """apiVersion: apps/v1
 kind: Deployment
 metadata:
-  name: {}
+  name: {name}
   namespace: dahlia
 spec:
-  replicas: 2
-  selector:
+  replicas: {replicas}
+{strategy_spec}  selector:
     matchLabels:
-      app: {}
+      app: {name}
   template:
     metadata:
       labels:
-        app: {}
+        app: {name}
     spec:
       containers:
-      - name: {}
-        image: dahlia/{}:latest
+      - name: {name}
+        image: dahlia/{name}:latest
         ports:
-        - containerPort: {}
+        - containerPort: {port}
         env:
         - name: ENV
           value: "production"
-        resources:
+{secret_env}{extra_env}{volume_mounts}        resources:
           requests:
-            memory: "256Mi"
-            cpu: "250m"
+            memory: "{memory_request}"
+            cpu: "{cpu_request}"
           limits:
-            memory: "512Mi"
-            cpu: "500m"
----
-apiVersion: v1
+            memory: "{memory_limit}"
+            cpu: "{cpu_limit}"
+{volumes}---
+{claim}apiVersion: v1
 kind: Service
 metadata:
-  name: {}
+  name: {name}
   namespace: dahlia
 spec:
   selector:
-    app: {}
+    app: {name}
   ports:
-  - port: {}
-    targetPort: {}
+  - port: {port}
+    targetPort: {port}
+"""
+
+# Cursors must verify on every replica, so their secret comes from the
+# service's Secret; the app refuses to start without it outside ENV=dev.
+K8S_CURSOR_SECRET = """        - name: {prefix}_CURSOR_SECRET
+          valueFrom:
+            secretKeyRef:
+              name: {name}
+              key: cursor-secret
+"""
+
+K8S_ENV = """        - name: {name}
+          value: "{value}"
 """
 
-def create_file(path, content):
-  dirpath = os.path.dirname(path)
-  if dirpath:
-    os.makedirs(dirpath, exist_ok=True)
-  with open(path, 'w') as f:
-    f.write(content.strip() + '\n')
+# A stateful service owns one ReadWriteOnce volume, so it runs with
+# `strategy = "Recreate"`: the old pod releases the volume before the new one
+# mounts it.
+K8S_STRATEGY = """  strategy:
+    type: {strategy}
+"""
+
+K8S_VOLUME_MOUNT = """        volumeMounts:
+        - name: {name}
+          mountPath: {mount_path}
+"""
+
+K8S_VOLUME = """      volumes:
+      - name: {name}
+        persistentVolumeClaim:
+          claimName: {service}-{name}
+"""
+
+K8S_CLAIM = """apiVersion: v1
+kind: PersistentVolumeClaim
+metadata:
+  name: {service}-{name}
+  namespace: dahlia
+spec:
+  accessModes:
+  - ReadWriteOnce
+  resources:
+    requests:
+      storage: {size}
+---
+"""
+
+K8S_HPA = """---
+apiVersion: autoscaling/v2
+kind: HorizontalPodAutoscaler
+metadata:
+  name: {name}
+  namespace: dahlia
+spec:
+  scaleTargetRef:
+    apiVersion: apps/v1
+    kind: Deployment
+    name: {name}
+  minReplicas: {min_replicas}
+  maxReplicas: {max_replicas}
+  metrics:
+  - type: Resource
+    resource:
+      name: cpu
+      target:
+        type: Utilization
+        averageUtilization: {cpu_utilization}
+"""
+
+def create_file(path, content, mode=None, once=False):
+  SCAFFOLD.create_file(path, content, mode, once)
 
 def create_dir(path):
-    os.makedirs(path, exist_ok=True)
+    SCAFFOLD.create_dir(path)
 
 def create_kotlin_service(name, port):
     base = f"services/kotlin/{name}"
@@ -505,9 +1308,10 @@ def create_kotlin_service(name, port):
     create_file(f"{base}/src/main/kotlin/com/dahlia/{service_name}/Application.kt", 
                 KOTLIN_MAIN.format(service_name, port))
     create_file(f"{base}/Dockerfile", KOTLIN_DOCKERFILE.format(f":{name}:build", name, port))
-    create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice")
+    create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice", once=True)
 
-def create_python_service(name, port):
+def create_python_service(service):
+    name, port, profiles = service.name, service.port, service.profiles
     base = f"services/python/{name}"
     
     dirs = [
@@ -523,28 +1327,75 @@ def create_python_service(name, port):
     for d in dirs:
         create_dir(d)
     
-    create_file(f"{base}/requirements.txt", PYTHON_REQUIREMENTS)
-    create_file(f"{base}/main.py", PYTHON_MAIN.format(name, port))
-    create_file(f"{base}/Dockerfile", PYTHON_DOCKERFILE.format(port))
-    create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice")
+    create_file(f"{base}/requirements.txt", resolve_profiles(profiles))
+    for extra in service.extras:
+        create_file(f"{base}/requirements-{extra}.txt", resolve_extra(profiles, extra))
+    # main.py and README.md are written by hand once scaffolded.
+    create_file(f"{base}/main.py", PYTHON_MAIN.format(name, port), once=True)
+    workers = PYTHON_WORKERS_PINNED.format(workers=service.workers) if service.workers else PYTHON_WORKERS
+    create_file(
+        f"{base}/gunicorn.conf.py",
+        PYTHON_GUNICORN_CONF.format(port=port, preload=",".join(service.preload), workers=workers),
+    )
+    if service.extras:
+        extras = " and ".join(f"requirements-{extra}.txt" for extra in service.extras)
+        dockerfile = PYTHON_DOCKERFILE_EXTRAS.format(port=port, extras=extras, s="" if len(service.extras) > 1 else "s")
+    else:
+        dockerfile = PYTHON_DOCKERFILE.format(port=port)
+    create_file(f"{base}/Dockerfile", dockerfile)
+    create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice", once=True)
     create_file(f"{base}/app/__init__.py", "")
     create_file(f"{base}/app/api/__init__.py", "")
     create_file(f"{base}/app/core/__init__.py", "")
+    create_file(f"{base}/app/core/server.py", PYTHON_SERVER)
+    if service.cursor:
+        create_file(f"{base}/app/core/cursor.py", template("cursor.py"))
+    if "grpc" in profiles:
+        create_file(f"{base}/app/core/rpc.py", PYTHON_RPC)
+        create_file(f"{base}/app/proto/__init__.py", "")
     create_file(f"{base}/app/models/__init__.py", "")
     create_file(f"{base}/app/services/__init__.py", "")
     create_file(f"{base}/tests/__init__.py", "")
-
-def create_k8s_manifest(name, port):
-    base = f"infra/k8s/services/{name}"
+    lazy = [f'"{m}"' for m in lazy_modules((*profiles, *service.extras))]
+    create_file(f"{base}/benchmarks/__init__.py", "")
+    create_file(
+        f"{base}/benchmarks/bench_imports.py",
+        PYTHON_BENCH_IMPORTS.format(
+            name=name,
+            budget_ms=1000,
+            budget_rss_mib=service.import_rss_mib,
+            lazy=f"({', '.join(lazy)}{',' if len(lazy) == 1 else ''})",
+        ),
+    )
+
+def create_k8s_manifest(service):
+    base = f"infra/k8s/services/{service.name}"
     create_dir(base)
-    create_file(f"{base}/deployment.yaml", 
-                K8S_DEPLOYMENT.format(name, name, name, name, name, port, name, name, port, port))
+    secret_env = ""
+    if service.cursor:
+        prefix = service.name.removesuffix("-service").replace("-", "_").upper()
+        secret_env = K8S_CURSOR_SECRET.format(name=service.name, prefix=prefix)
+    extra_env = "".join(K8S_ENV.format(name=key, value=value) for key, value in service.env)
+    volume = service.volume
+    manifest = K8S_DEPLOYMENT.format(
+        secret_env=secret_env,
+        extra_env=extra_env,
+        strategy_spec=K8S_STRATEGY.format(strategy=service.strategy) if service.strategy else "",
+        volume_mounts=K8S_VOLUME_MOUNT.format(**vars(volume)) if volume else "",
+        volumes=K8S_VOLUME.format(service=service.name, **vars(volume)) if volume else "",
+        claim=K8S_CLAIM.format(service=service.name, **vars(volume)) if volume else "",
+        **vars(service),
+    )
+    if service.autoscaling:
+        manifest += K8S_HPA.format(name=service.name, **vars(service.autoscaling))
+    create_file(f"{base}/deployment.yaml", manifest)
 
 def main():
     print("🌸 Scaffolding Dahlia Backend Monorepo...")
     
-    create_dir(PROJECT_NAME)
-    os.chdir(PROJECT_NAME)
+    services = load_services(PROJECT_NAME)
+    kotlin_services = [s for s in services if s.runtime == "kotlin"]
+    python_services = [s for s in services if s.runtime == "python"]
     
     base_dirs = [
         "services/kotlin",
@@ -566,12 +1417,19 @@ def main():
     
     create_file("Makefile", MAKEFILE)
     create_file("README.md", "# Dahlia Backend\n\nMicroservices backend for Dahlia")
-    create_file(".gitignore", "*.pyc\n__pycache__/\n.gradle/\nbuild/\ntarget/\n.idea/\n*.iml\nshared/proto-gen/")
+    create_file(
+        ".gitignore",
+        "*.pyc\n__pycache__/\n.gradle/\nbuild/\ntarget/\n.idea/\n*.iml\nshared/proto-gen/\n"
+        "services/python/*/app/proto/*_pb2*",
+    )
     
-    create_file("scripts/generate-protos.sh", GENERATE_PROTOS)
-    create_file("scripts/build-all.sh", BUILD_ALL)
-    os.chmod("scripts/generate-protos.sh", 0o755)
-    os.chmod("scripts/build-all.sh", 0o755)
+    create_file("scripts/generate-protos.sh", GENERATE_PROTOS, mode=0o755)
+    create_file("scripts/load-test.py", LOAD_TEST, mode=0o755)
+    create_file(
+        "scripts/build-all.sh",
+        BUILD_ALL.format("\n".join(f'    "{s.name}"' for s in services)),
+        mode=0o755,
+    )
     
     create_file("infra/docker-compose/docker-compose.yml", DOCKER_COMPOSE)
     
@@ -580,33 +1438,23 @@ def main():
     create_file("protos/auth.proto", AUTH_PROTO)
     create_file("protos/common.proto", 'syntax = "proto3";\n\npackage common;\n\nmessage Empty {}')
     
-    kotlin_services = [
-        ("api-gateway", 8080),
-        ("auth-service", 8081),
-        ("user-service", 8082),
-        ("post-service", 8083),
-        ("feed-service", 8084),
-        ("notification-service", 8085)
-    ]
-    
-    create_file("services/kotlin/settings.gradle.kts", KOTLIN_SETTINGS)
+    create_file(
+        "services/kotlin/settings.gradle.kts",
+        KOTLIN_SETTINGS.format("\n".join(f'include(":{s.name}")' for s in kotlin_services)),
+    )
     create_file("services/kotlin/build.gradle.kts", KOTLIN_BUILD)
     
-    for name, port in kotlin_services:
-        create_kotlin_service(name, port)
-        create_k8s_manifest(name, port)
+    SCAFFOLD.run_parallel(
+        [(create_kotlin_service, (s.name, s.port)) for s in kotlin_services]
+        + [(create_k8s_manifest, (s,)) for s in kotlin_services]
+    )
     
-    python_services = [
-        ("media-service", 9000),
-        ("search-service", 9001),
-        ("recommendation-service", 9002)
-    ]
+    SCAFFOLD.run_parallel(
+        [(create_python_service, (s,)) for s in python_services]
+        + [(create_k8s_manifest, (s,)) for s in python_services]
+    )
     
-    for name, port in python_services:
-        create_python_service(name, port)
-        create_k8s_manifest(name, port)
-    
-    create_file("services/python/shared_requirements.txt", PYTHON_REQUIREMENTS)
+    create_file("services/python/shared_requirements.txt", resolve_profiles(PYTHON_PROFILES))
     
     create_file("infra/k8s/base/namespace.yaml", """apiVersion: v1
 kind: Namespace
@@ -619,17 +1467,10 @@ metadata:
 ## Services
 
 ### Kotlin Services
-- **api-gateway** (8080): REST API gateway
-- **auth-service** (8081): Dahlia ID authentication
-- **user-service** (8082): User profiles and relationships
-- **post-service** (8083): Post CRUD operations
-- **feed-service** (8084): Timeline generation
-- **notification-service** (8085): Push notifications
+{}
 
 ### Python Services
-- **media-service** (9000): Image processing, compression
-- **search-service** (9001): Elasticsearch integration
-- **recommendation-service** (9002): ML-based recommendations
+{}
 
 ## Tech Stack
 - **Kotlin**: Ktor + Exposed + gRPC
@@ -637,7 +1478,10 @@ metadata:
 - **Databases**: PostgreSQL, Redis, Elasticsearch
 - **Storage**: MinIO (S3-compatible)
 - **Message Queue**: RabbitMQ
-""")
+""".format(
+        *("\n".join(f"- **{s.name}** ({s.port}): {s.description}" for s in group)
+          for group in (kotlin_services, python_services))
+    ))
     
     create_file("docs/api.md", """# Dahlia API Documentation
 
@@ -674,10 +1518,11 @@ Authorization: Bearer <access_token>
 - GET /feed/foryou
 """)
     
+    print_report(SCAFFOLD.write(force="--force" in sys.argv))
     print("✅ Dahlia backend scaffolded successfully!")
     print(f"📂 Navigate to {PROJECT_NAME}")
-    print("🏗️  Kotlin services: api-gateway, auth, user, post, feed, notification")
-    print("🐍 Python services: media, search, recommendation")
+    print(f"🏗️  Kotlin services: {', '.join(s.name.removesuffix('-service') for s in kotlin_services)}")
+    print(f"🐍 Python services: {', '.join(s.name.removesuffix('-service') for s in python_services)}")
     print("💾 Databases: PostgreSQL, Redis, Elasticsearch, MinIO")
     print("🔨 Run: make dev (start local environment)")
     print("📦 Run: make proto (generate protobuf code)")
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
-import os
+import sys
+
+from scaffold import Scaffold, print_report
 
 PROJECT_NAME = "dahlia-kmp"
+SCAFFOLD = Scaffold(PROJECT_NAME)
 PACKAGE = "com.dahlia"
 PACKAGE_PATH = "com/dahlia"
 
@@ -417,22 +420,15 @@ class MainActivity : ComponentActivity() {
 }
 """
 
-def create_file(path, content):
-    dirpath = os.path.dirname(path)
-    if dirpath:
-        os.makedirs(dirpath, exist_ok=True)
-    with open(path, 'w') as f:
-        f.write(content.strip() + '\n')
+def create_file(path, content, mode=None):
+    SCAFFOLD.create_file(path, content, mode)
 
 def create_dir(path):
-    os.makedirs(path, exist_ok=True)
+    SCAFFOLD.create_dir(path)
 
 def main():
     print("🌸 Scaffolding Dahlia KMP+CMP project...")
     
-    create_dir(PROJECT_NAME)
-    os.chdir(PROJECT_NAME)
-    
     create_file("settings.gradle.kts", SETTINGS_GRADLE)
     create_file("build.gradle.kts", ROOT_BUILD)
     create_file("gradle.properties", GRADLE_PROPERTIES)
@@ -530,6 +526,7 @@ Visual social platform with Dahlia ID authentication
 - **Backgrounds**: Black/White
 """)
     
+    print_report(SCAFFOLD.write(force="--force" in sys.argv))
     print("✅ Dahlia project scaffolded successfully!")
     print(f"📂 Navigate to {PROJECT_NAME}")
     print("🎨 Color scheme: Neon Yellow + Lime Green")
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-import os
 import sys
 
+from scaffold import Scaffold, print_report
+
 PROJECT_NAME = "sonet-kmp"
+SCAFFOLD = Scaffold(PROJECT_NAME)
 PACKAGE = "com.sonet"
 PACKAGE_PATH = "com/sonet"
 
@@ -257,22 +259,15 @@ fun main() {
 }
 """
 
-def create_file(path, content):
-    dirpath = os.path.dirname(path)
-    if dirpath:
-        os.makedirs(dirpath, exist_ok=True)
-    with open(path, 'w') as f:
-        f.write(content.strip() + '\n')
+def create_file(path, content, mode=None):
+    SCAFFOLD.create_file(path, content, mode)
 
 def create_dir(path):
-    os.makedirs(path, exist_ok=True)
+    SCAFFOLD.create_dir(path)
 
 def main():
     print("🚀 Scaffolding Sonet KMP + CMP project...")
     
-    create_dir(PROJECT_NAME)
-    os.chdir(PROJECT_NAME)
-    
     create_file("settings.gradle.kts", SETTINGS_GRADLE)
     create_file("build.gradle.kts", ROOT_BUILD_GRADLE)
     create_file("gradle.properties", GRADLE_PROPERTIES)
@@ -335,6 +330,7 @@ def main():
     create_file(f"composeApp/src/desktopMain/kotlin/{PACKAGE_PATH}/main.kt", DESKTOP_MAIN)
     create_file(f"composeApp/src/wasmJsMain/kotlin/{PACKAGE_PATH}/main.kt", WEB_MAIN)
     
+    print_report(SCAFFOLD.write(force="--force" in sys.argv))
     print("✅ Project scaffolded successfully!")
     print(f"📂 Navigate to {PROJECT_NAME}")
     print("🏗️  Run: ./gradlew build")
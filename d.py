@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-import os
 import sys
 
+from scaffold import Scaffold, print_report
+
 PROJECT_NAME = "Sonet-iOS"
+SCAFFOLD = Scaffold(PROJECT_NAME)
 BUNDLE_ID = "com.sonet.app"
 
 PACKAGE_SWIFT = """// swift-tools-version: 5.9
@@ -468,22 +470,15 @@ class KeychainManager {
 }
 """
 
-def create_file(path, content):
-    dirpath = os.path.dirname(path)
-    if dirpath:
-        os.makedirs(dirpath, exist_ok=True)
-    with open(path, 'w') as f:
-        f.write(content.strip() + '\n')
+def create_file(path, content, mode=None):
+    SCAFFOLD.create_file(path, content, mode)
 
 def create_dir(path):
-    os.makedirs(path, exist_ok=True)
+    SCAFFOLD.create_dir(path)
 
 def main():
     print("🚀 Scaffolding Sonet iOS project...")
     
-    create_dir(PROJECT_NAME)
-    os.chdir(PROJECT_NAME)
-    
     dirs = [
         f"{PROJECT_NAME}/App",
         f"{PROJECT_NAME}/Core/DependencyInjection",
@@ -596,6 +591,7 @@ struct {}UseCase {{
         content = use_case_template.format(name.replace("UseCase", ""), repo, repo, ret if ret != "Void" else "")
         create_file(f"{PROJECT_NAME}/Domain/UseCases/{repo}/{name}.swift", content)
     
+    print_report(SCAFFOLD.write(force="--force" in sys.argv))
     print("✅ Project scaffolded successfully!")
     print(f"📂 Navigate to {PROJECT_NAME}")
     print("🏗️  Open Sonet-iOS.xcodeproj in Xcode")
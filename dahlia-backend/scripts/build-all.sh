@@ -7,9 +7,11 @@ services=(
     "user-service"
     "post-service"
     "feed-service"
-    "media-service"
     "notification-service"
+    "media-service"
     "search-service"
+    "recommendation-service"
+    "graph-service"
 )
 
 for service in "${services[@]}"; do
@@ -12,9 +12,23 @@ protoc --kotlin_out=$KOTLIN_OUT \
        --proto_path=$PROTO_DIR \
        $PROTO_DIR/*.proto
 
-protoc --python_out=$PYTHON_OUT \
+# grpcio-tools bundles protoc with the Python gRPC plugin.
+python3 -m grpc_tools.protoc --python_out=$PYTHON_OUT \
+       --pyi_out=$PYTHON_OUT \
        --grpc_python_out=$PYTHON_OUT \
        --proto_path=$PROTO_DIR \
        $PROTO_DIR/*.proto
 
+# Python services with the gRPC runtime (app/core/rpc.py) import the stubs
+# as app.proto.*, so they are generated there with that package path.
+for service in services/python/*/; do
+    if [[ -f "$service/app/core/rpc.py" ]]; then
+        python3 -m grpc_tools.protoc --python_out=$service \
+               --pyi_out=$service \
+               --grpc_python_out=$service \
+               -Iapp/proto=$PROTO_DIR \
+               $PROTO_DIR/*.proto
+    fi
+done
+
 echo "✅ Protobuf generation complete"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Throughput of a Python service: production launcher against `python main.py`.
+
+Starts the service twice on a free local port:
+
+- baseline: uvicorn.run(app), as `python main.py` does
+- production: gunicorn -c gunicorn.conf.py main:app
+
+It then drives GET /health over --connections keep-alive connections, spread
+over --clients processes, for --duration seconds. Requests/s and latency
+percentiles are printed for each launcher. The client runs on the same
+machine, so give the server CPUs to spare, e.g. with --workers.
+
+    python scripts/load-test.py services/python/media-service --connections 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+REQUEST = b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n"
+CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.I)
+
+BASELINE = "import uvicorn, main; uvicorn.run(main.app, host='127.0.0.1', port={port})"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(service, launcher, port, workers):
+    env = dict(os.environ, PORT=str(port))
+    if launcher == "baseline":
+        command = [sys.executable, "-c", BASELINE.format(port=port)]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "main:app"]
+        if workers:
+            env["WEB_CONCURRENCY"] = str(workers)
+    process = subprocess.Popen(command, cwd=service, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{launcher} server exited with {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(REQUEST)
+                if s.recv(12).startswith(b"HTTP/1.1 200"):
+                    return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    sys.exit(f"{launcher} server did not become ready")
+
+
+async def connection(port, deadline, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(REQUEST)
+        head = await reader.readuntil(b"\r\n\r\n")
+        await reader.readexactly(int(CONTENT_LENGTH.search(head).group(1)))
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+
+async def client(port, connections, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(connection(port, deadline, latencies) for _ in range(connections)))
+    return latencies
+
+
+def run_client(args):
+    port, connections, duration = args
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
+    return asyncio.run(client(port, connections, duration))
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(service, launcher, args):
+    port = free_port()
+    process = start(service, launcher, port, args.workers)
+    try:
+        per_client = [args.connections // args.clients + (i < args.connections % args.clients) for i in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as pool:
+            # Warm-up, then the measured run.
+            pool.map(run_client, [(port, n, 1.0) for n in per_client])
+            results = pool.map(run_client, [(port, n, args.duration) for n in per_client])
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    latencies = sorted(l for result in results for l in result)
+    return len(latencies) / args.duration, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", help="service directory, e.g. services/python/media-service")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=0, help="production workers (default: from the CPU limit)")
+    args = parser.parse_args()
+    args.clients = max(1, min(args.clients, args.connections))
+
+    print(f"{'launcher':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    baseline = None
+    for launcher in ("baseline", "production"):
+        rate, latencies = measure(args.service, launcher, args)
+        gain = f"  x{rate / baseline:.2f}" if baseline else ""
+        baseline = baseline or rate
+        print(
+            f"{launcher:<12}{rate:>10.0f}{percentile(latencies, 0.5) * 1000:>10.2f}"
+            f"{percentile(latencies, 0.99) * 1000:>10.2f}{gain}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import get_settings
+from app.core.cursor import Cursor, CursorError
+from app.models.graph import CountsResponse, FollowedByResponse, FollowRequest, FollowResponse, UserListResponse
+
+router = APIRouter(prefix="/graph", tags=["graph"])
+
+
+@router.post("/follow", response_model=FollowResponse)
+async def follow(request: Request, body: FollowRequest):
+    """``UserService.FollowUser``; ``success`` is false if the edge already existed."""
+    try:
+        return FollowResponse(success=request.app.state.graph.follow(body.user_id, body.target_user_id))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/unfollow", response_model=FollowResponse)
+async def unfollow(request: Request, body: FollowRequest):
+    """``UserService.UnfollowUser``; ``success`` is false if there was no edge."""
+    return FollowResponse(success=request.app.state.graph.unfollow(body.user_id, body.target_user_id))
+
+
+def _page(request: Request, direction: str, user_id: str, limit: Optional[int], cursor: Optional[str]):
+    settings = get_settings()
+    limit = min(limit or settings.default_page_size, settings.max_page_size)
+    codec = request.app.state.cursors
+    after = None
+    if cursor:
+        try:
+            position = codec.decode(cursor)
+        except CursorError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if not isinstance(position.key, int):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        after = position.key
+    user_ids, last = request.app.state.graph.page(direction, user_id, after, limit)
+    next_cursor = codec.encode(Cursor(0, last)) if last is not None else None
+    return UserListResponse(user_ids=user_ids, next_cursor=next_cursor)
+
+
+@router.get("/followers", response_model=UserListResponse)
+async def followers(
+    request: Request, user_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None
+):
+    """``UserService.GetFollowers``, keyset-paginated."""
+    return _page(request, "followers", user_id, limit, cursor)
+
+
+@router.get("/following", response_model=UserListResponse)
+async def following(
+    request: Request, user_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None
+):
+    return _page(request, "following", user_id, limit, cursor)
+
+
+@router.get("/followers/batches")
+async def follower_batches(request: Request, user_id: str, batch_size: Optional[int] = Query(None, ge=1)):
+    """Every follower, as NDJSON lines of ``{"user_ids": [...]}``, for fan-out workers."""
+    size = batch_size or get_settings().fanout_batch_size
+    batches = request.app.state.graph.follower_batches(user_id, size)
+    lines = (json.dumps({"user_ids": batch}, separators=(",", ":")) + "\n" for batch in batches)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@router.get("/counts", response_model=CountsResponse)
+async def counts(request: Request, user_id: str):
+    follower_count, following_count = request.app.state.graph.counts(user_id)
+    return CountsResponse(user_id=user_id, follower_count=follower_count, following_count=following_count)
+
+
+@router.get("/followed-by", response_model=FollowedByResponse)
+async def followed_by(request: Request, viewer_id: str, user_id: str, limit: int = Query(3, ge=0, le=100)):
+    """"Followed by people you follow": accounts ``viewer_id`` follows that follow ``user_id``."""
+    count, user_ids = request.app.state.graph.followed_by_followees(viewer_id, user_id, limit)
+    return FollowedByResponse(user_id=user_id, count=count, user_ids=user_ids)
+
+
+@router.get("/stats")
+async def graph_stats(request: Request):
+    return request.app.state.graph.stats()
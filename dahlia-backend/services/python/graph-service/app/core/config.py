@@ -0,0 +1,42 @@
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from app.core.cursor import require_secret
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="GRAPH_")
+
+    # Follower lists at least this long are held as roaring bitmaps instead of
+    # delta-encoded arrays.
+    bitmap_min_degree: int = 10_000
+    # Edits are folded into the compressed lists once this many are pending,
+    # checked every compact_interval_seconds.
+    compact_min_pending: int = 100_000
+    compact_interval_seconds: float = 30.0
+    # Snapshot directory, loaded at startup and rewritten every interval;
+    # unset keeps the graph in memory only.
+    snapshot_path: Optional[str] = "/var/lib/graph/snapshots"
+    snapshot_interval_seconds: float = 300.0
+
+    default_page_size: int = 50
+    max_page_size: int = 1000
+    # Followers per batch in GET /graph/followers/batches.
+    fanout_batch_size: int = 1000
+    # Signs page cursors; every replica must share it. Required unless ENV is
+    # "dev", the default for local runs; the manifests set ENV=production.
+    cursor_secret: Optional[str] = None
+    env: str = Field("dev", validation_alias="ENV")
+
+    @model_validator(mode="after")
+    def _cursor_secret(self):
+        self.cursor_secret = require_secret(self.cursor_secret, self.env)
+        return self
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
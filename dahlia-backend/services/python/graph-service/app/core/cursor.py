@@ -0,0 +1,170 @@
+"""Signed keyset cursors for paginated reads.
+
+A cursor records where the previous page stopped: the sort ``score`` and
+tiebreak ``key`` of its last row, plus the ``shard`` it came from. The next
+page seeks strictly past that position (``WHERE (score, key) < ($1, $2)
+ORDER BY score DESC, key DESC LIMIT n``, ``ZREVRANGEBYSCORE ... LIMIT``), so
+page 1000 costs the same as page 1, and rows inserted above the cursor do not
+shift later pages the way ``OFFSET`` does.
+
+Tokens are opaque to clients: varint-packed, HMAC-signed and base64url
+encoded without padding. Before base64url a token is laid out as:
+
+    version  1 byte
+    kinds    1 byte     score kind (high nibble), key kind (low nibble)
+    score    zigzag varint (int) or 8-byte big-endian double (float)
+    key      zigzag varint (int) or varint length + bytes (str as UTF-8, bytes)
+    shard    varint
+    tag      first ``tag_bytes`` of HMAC-SHA256(secret, everything above)
+
+An ``(int, int)`` cursor with an 8-byte tag is about 24 characters. Every
+service decoding a cursor must share the issuing service's secret. Outside
+``ENV=dev`` there is no default secret; see ``require_secret``.
+
+Generated from ``templates/cursor.py`` into every service with ``cursor =
+true`` in ``services.toml``. Edit the template and re-run the generator.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+VERSION = 1
+# Signs cursors when ENV is "dev" and no secret is configured.
+DEV_SECRET = "dev-cursor-secret"
+_INT, _FLOAT, _STR, _BYTES = 0, 1, 2, 3
+_DOUBLE = struct.Struct(">d")
+
+
+class CursorError(ValueError):
+    """The token is malformed, from another version, or not signed with our secret."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    score: Union[int, float]
+    key: Union[int, str, bytes]
+    shard: int = 0
+
+
+def require_secret(secret: Optional[str], env: str) -> str:
+    """``secret``, else ``DEV_SECRET`` when ``env`` is "dev"; raises ``ValueError`` anywhere else."""
+    if secret:
+        return secret
+    if env == "dev":
+        return DEV_SECRET
+    raise ValueError(f"a cursor secret is required when ENV is {env!r}")
+
+
+def _varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise CursorError("truncated cursor")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    if not -(1 << 63) <= value < 1 << 63:
+        raise ValueError(f"{value} does not fit in 64 bits")
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+class CursorCodec:
+    def __init__(self, secret: Union[str, bytes], tag_bytes: int = 8):
+        if not secret:
+            raise ValueError("cursor secret must not be empty")
+        self._secret = secret.encode() if isinstance(secret, str) else bytes(secret)
+        self.tag_bytes = tag_bytes
+
+    def _tag(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[: self.tag_bytes]
+
+    def encode(self, cursor: Cursor) -> str:
+        out = bytearray((VERSION, 0))
+        score, key = cursor.score, cursor.key
+        if isinstance(score, float):
+            kinds = _FLOAT << 4
+            out += _DOUBLE.pack(score)
+        else:
+            kinds = _INT << 4
+            _varint(_zigzag(int(score)), out)
+        if isinstance(key, int):
+            kinds |= _INT
+            _varint(_zigzag(key), out)
+        else:
+            kinds |= _STR if isinstance(key, str) else _BYTES
+            raw = key.encode() if isinstance(key, str) else bytes(key)
+            _varint(len(raw), out)
+            out += raw
+        if cursor.shard < 0:
+            raise ValueError("shard must not be negative")
+        _varint(cursor.shard, out)
+        out[1] = kinds
+        out += self._tag(bytes(out))
+        return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode()
+
+    def decode(self, token: str) -> Cursor:
+        try:
+            data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            raise CursorError("cursor is not base64url")
+        if len(data) < 2 + self.tag_bytes:
+            raise CursorError("truncated cursor")
+        payload, tag = data[: -self.tag_bytes], data[-self.tag_bytes :]
+        if not hmac.compare_digest(tag, self._tag(payload)):
+            raise CursorError("cursor signature does not match")
+        if payload[0] != VERSION:
+            raise CursorError(f"unsupported cursor version {payload[0]}")
+        score_kind, key_kind = payload[1] >> 4, payload[1] & 0x0F
+        pos = 2
+        if score_kind == _FLOAT:
+            if pos + _DOUBLE.size > len(payload):
+                raise CursorError("truncated cursor")
+            (score,) = _DOUBLE.unpack_from(payload, pos)
+            pos += _DOUBLE.size
+        elif score_kind == _INT:
+            raw, pos = _read_varint(payload, pos)
+            score = _unzigzag(raw)
+        else:
+            raise CursorError("unknown score kind")
+        if key_kind == _INT:
+            raw, pos = _read_varint(payload, pos)
+            key = _unzigzag(raw)
+        elif key_kind in (_STR, _BYTES):
+            length, pos = _read_varint(payload, pos)
+            if pos + length > len(payload):
+                raise CursorError("truncated cursor")
+            key = payload[pos : pos + length]
+            pos += length
+            if key_kind == _STR:
+                try:
+                    key = key.decode()
+                except UnicodeDecodeError:
+                    raise CursorError("cursor key is not UTF-8")
+        else:
+            raise CursorError("unknown key kind")
+        shard, pos = _read_varint(payload, pos)
+        if pos != len(payload):
+            raise CursorError("trailing bytes in cursor")
+        return Cursor(score, key, shard)
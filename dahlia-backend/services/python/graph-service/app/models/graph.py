@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class FollowRequest(BaseModel):
+    """Mirrors ``user.FollowRequest``."""
+
+    user_id: str
+    target_user_id: str
+
+
+class FollowResponse(BaseModel):
+    success: bool
+
+
+class UserListResponse(BaseModel):
+    """``FollowerListResponse`` with ids only; profiles come from the user service."""
+
+    user_ids: List[str]
+    # Pass back as ``cursor`` for the next page; absent on the last one.
+    next_cursor: Optional[str] = None
+
+
+class CountsResponse(BaseModel):
+    user_id: str
+    follower_count: int
+    following_count: int
+
+
+class FollowedByResponse(BaseModel):
+    """Accounts the viewer follows that also follow ``user_id``."""
+
+    user_id: str
+    count: int
+    user_ids: List[str]
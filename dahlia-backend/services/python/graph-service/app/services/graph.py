@@ -0,0 +1,284 @@
+"""Follow graph behind ``UserService.FollowUser`` and ``GetFollowers``.
+
+User ids are mapped to dense ``uint32`` ids in order of first appearance. Two
+``Adjacency`` directions are kept in step: ``followers`` (followee ->
+followers) and ``following`` (follower -> followees). Lists are ordered by
+dense id, so a follower page seeks past its cursor's id.
+
+Edits land in each direction's overlay, which ``compact`` folds into a new
+CSR. ``snapshot`` compacts, then writes ``{path}/snap-{ms}/`` (one ``.npy``
+per array plus the id list) and swaps ``CURRENT`` to it. ``load``
+memory-maps the CSR arrays, so a pod serves from a snapshot without decoding
+it first.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.metrics import Gauge, Histogram
+from app.services.adjacency import CSR, Adjacency
+from app.services.roaring import RoaringSet
+
+users_gauge = Gauge("graph_users", "Users known to the follow graph")
+edges_gauge = Gauge("graph_edges", "Follow edges")
+pending_gauge = Gauge("graph_pending_edits", "Edits not yet compacted into the CSR")
+compaction_seconds = Histogram("graph_compaction_seconds", "Compaction latency", (0.1, 0.5, 1, 2, 5, 10, 30))
+
+DIRECTIONS = ("followers", "following")
+_CSR_ARRAYS = ("edge_offsets", "data_offsets", "control", "data")
+
+
+class FollowerGraph:
+    def __init__(self, bitmap_min_degree: int = 10_000, path: Optional[str] = None):
+        self.bitmap_min_degree = bitmap_min_degree
+        self.path = path
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.followers = Adjacency(bitmap_min_degree=bitmap_min_degree)
+        self.following = Adjacency(bitmap_min_degree=bitmap_min_degree)
+        self._lock = threading.RLock()
+        # Edits made while a compaction builds, as (follows, user, target).
+        self._journal: Optional[List[Tuple[bool, int, int]]] = None
+
+    @classmethod
+    def from_edges(
+        cls, user_ids: Sequence[str], follower: np.ndarray, followee: np.ndarray, **options
+    ) -> "FollowerGraph":
+        """Bulk load: ``follower[i]`` follows ``followee[i]``, both indexes into ``user_ids``."""
+        graph = cls(**options)
+        graph._ids = list(user_ids)
+        graph._index = {user_id: i for i, user_id in enumerate(graph._ids)}
+        keep = follower != followee
+        follower, followee = follower[keep], followee[keep]
+        size = len(graph._ids)
+        graph.followers = Adjacency.build(followee, follower, size, graph.bitmap_min_degree)
+        graph.following = Adjacency.build(follower, followee, size, graph.bitmap_min_degree)
+        graph._observe()
+        return graph
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def edges(self) -> int:
+        return self.following.edges
+
+    @property
+    def pending(self) -> int:
+        return self.followers.pending + self.following.pending
+
+    def _observe(self) -> None:
+        users_gauge.set(len(self._ids))
+        edges_gauge.set(self.edges)
+        pending_gauge.set(self.pending)
+
+    def _dense(self, user_id: str, create: bool = False) -> Optional[int]:
+        dense = self._index.get(user_id)
+        if dense is None and create:
+            if not user_id or "\n" in user_id:
+                raise ValueError(f"invalid user id {user_id!r}")
+            dense = self._index[user_id] = len(self._ids)
+            self._ids.append(user_id)
+        return dense
+
+    def _external(self, dense: np.ndarray) -> List[str]:
+        ids = self._ids
+        return [ids[i] for i in dense.tolist()]
+
+    def follow(self, user_id: str, target_user_id: str) -> bool:
+        """Returns False if ``user_id`` already follows the target."""
+        if user_id == target_user_id:
+            raise ValueError("users cannot follow themselves")
+        with self._lock:
+            user, target = self._dense(user_id, True), self._dense(target_user_id, True)
+            if not self.following.add(user, target):
+                return False
+            self.followers.add(target, user)
+            if self._journal is not None:
+                self._journal.append((True, user, target))
+            self._observe()
+            return True
+
+    def unfollow(self, user_id: str, target_user_id: str) -> bool:
+        """Returns False if ``user_id`` did not follow the target."""
+        with self._lock:
+            user, target = self._dense(user_id), self._dense(target_user_id)
+            if user is None or target is None or not self.following.discard(user, target):
+                return False
+            self.followers.discard(target, user)
+            if self._journal is not None:
+                self._journal.append((False, user, target))
+            self._observe()
+            return True
+
+    def is_following(self, user_id: str, target_user_id: str) -> bool:
+        with self._lock:
+            user, target = self._dense(user_id), self._dense(target_user_id)
+            return user is not None and target is not None and (user, target) in self.following
+
+    def counts(self, user_id: str) -> Tuple[int, int]:
+        """``(follower_count, following_count)``."""
+        with self._lock:
+            user = self._dense(user_id)
+            if user is None:
+                return 0, 0
+            return self.followers.degree(user), self.following.degree(user)
+
+    def page(self, direction: str, user_id: str, after: Optional[int], limit: int) -> Tuple[List[str], Optional[int]]:
+        """Up to ``limit`` of ``user_id``'s followers or followees after dense id ``after``.
+
+        Returns the user ids and the dense id to resume after, or None on the last page.
+        """
+        with self._lock:
+            user = self._dense(user_id)
+            if user is None:
+                return [], None
+            dense = getattr(self, direction).page(user, after, limit + 1)
+            more = len(dense) > limit
+            dense = dense[:limit]
+            return self._external(dense), int(dense[-1]) if more else None
+
+    def followed_by_followees(self, viewer_id: str, user_id: str, limit: int) -> Tuple[int, List[str]]:
+        """Accounts ``viewer_id`` follows that follow ``user_id``: their count and up to ``limit`` of them."""
+        with self._lock:
+            viewer, user = self._dense(viewer_id), self._dense(user_id)
+            if viewer is None or user is None:
+                return 0, []
+            # The viewer's followees are usually the short side: test them
+            # against the target's followers, a bitmap for mega-accounts.
+            common = self.followers.intersect(user, self.following.get(viewer))
+            return len(common), self._external(common[:limit])
+
+    def follower_batches(self, user_id: str, size: int) -> List[List[str]]:
+        """Every follower of ``user_id`` in lists of ``size``, for fan-out."""
+        with self._lock:
+            user = self._dense(user_id)
+            dense = self.followers.get(user) if user is not None else np.empty(0, np.uint32)
+        ids = self._ids
+        return [[ids[i] for i in dense[start : start + size].tolist()] for start in range(0, len(dense), size)]
+
+    def compact(self) -> None:
+        """Fold pending edits into new CSRs.
+
+        The CSRs are built outside the lock. Edits made meanwhile are recorded
+        and replayed onto the new structures before they are swapped in.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._journal is not None or not self.pending:
+                return
+            size = len(self._ids)
+            pending = {direction: getattr(self, direction).pending_edits() for direction in DIRECTIONS}
+            self._journal = []
+        try:
+            built = {d: Adjacency.fold(pending[d], size, self.bitmap_min_degree) for d in DIRECTIONS}
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            journal, self._journal = self._journal, None
+            self.followers, self.following = built["followers"], built["following"]
+            # Replay is idempotent: edits to shared bitmaps are already there.
+            for follows, user, target in journal:
+                if follows:
+                    self.following.add(user, target)
+                    self.followers.add(target, user)
+                else:
+                    self.following.discard(user, target)
+                    self.followers.discard(target, user)
+            for direction in DIRECTIONS:
+                getattr(self, direction).recount()
+            self._observe()
+        compaction_seconds.observe(time.perf_counter() - started)
+
+    def _current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def snapshot(self) -> None:
+        """Compact, then persist the graph and make it CURRENT."""
+        if not self.path:
+            return
+        self.compact()
+        with self._lock:
+            # CSR arrays are replaced, never modified, so they can be written
+            # after the lock is released; bitmaps and ids are copied.
+            ids = "\n".join(self._ids).encode()
+            parts = {}
+            for direction in DIRECTIONS:
+                adjacency = getattr(self, direction)
+                for name in _CSR_ARRAYS:
+                    parts[f"{direction}.{name}"] = getattr(adjacency.csr, name)
+                keys = sorted(adjacency.bitmaps)
+                members = [adjacency.bitmaps[k].to_array() for k in keys]
+                parts[f"{direction}.bitmap_keys"] = np.array(keys, np.uint32)
+                parts[f"{direction}.bitmap_sizes"] = np.array([len(m) for m in members], np.int64)
+                parts[f"{direction}.bitmap_members"] = np.concatenate(members) if members else np.empty(0, np.uint32)
+            meta = {"users": len(self._ids), "edges": self.edges, "saved_at": int(time.time() * 1000)}
+
+        os.makedirs(self.path, exist_ok=True)
+        name = f"snap-{meta['saved_at']}"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for part, array in parts.items():
+            np.save(os.path.join(staging, f"{part}.npy"), array)
+        with open(os.path.join(staging, "ids.txt"), "wb") as f:
+            f.write(ids)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        previous = self._current()
+        os.replace(staging, os.path.join(self.path, name))
+        tmp = os.path.join(self.path, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.path, "CURRENT"))
+        if previous and previous != os.path.join(self.path, name):
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def load(self) -> bool:
+        """Replace the graph with the CURRENT snapshot; returns False if there is none."""
+        current = self._current() if self.path else None
+        if current is None:
+            return False
+        with open(os.path.join(current, "ids.txt"), "rb") as f:
+            blob = f.read().decode()
+        ids = blob.split("\n") if blob else []
+        directions = {}
+        for direction in DIRECTIONS:
+            arrays = [np.load(os.path.join(current, f"{direction}.{name}.npy"), mmap_mode="r") for name in _CSR_ARRAYS]
+            adjacency = Adjacency(CSR(*arrays), self.bitmap_min_degree)
+            keys = np.load(os.path.join(current, f"{direction}.bitmap_keys.npy"))
+            sizes = np.load(os.path.join(current, f"{direction}.bitmap_sizes.npy"))
+            members = np.load(os.path.join(current, f"{direction}.bitmap_members.npy"))
+            bounds = np.r_[0, np.cumsum(sizes)]
+            for i, key in enumerate(keys.tolist()):
+                adjacency.bitmaps[key] = RoaringSet.from_sorted(members[bounds[i] : bounds[i + 1]])
+            adjacency.recount()
+            directions[direction] = adjacency
+        with self._lock:
+            self._ids = ids
+            self._index = {user_id: i for i, user_id in enumerate(ids)}
+            self.followers, self.following = directions["followers"], directions["following"]
+            self._observe()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._ids),
+                "edges": self.edges,
+                "pending_edits": self.pending,
+                "bitmap_users": len(self.followers.bitmaps),
+                "bytes": {direction: getattr(self, direction).nbytes for direction in DIRECTIONS},
+            }
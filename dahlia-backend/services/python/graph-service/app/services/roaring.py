@@ -0,0 +1,181 @@
+"""Roaring-style compressed bitmap of uint32 ids, for mega-account follower sets.
+
+Ids are split on their high 16 bits into chunks of 65 536. A chunk with at
+most ``ARRAY_MAX`` members is a sorted ``uint16`` array. A denser chunk is a
+65 536-bit bitmap of 8 KiB. Each representation is the smaller one for its
+density, so a set costs at most about 2 bytes per member and never more than
+8 KiB per chunk. Membership of a batch of ids is one vectorised bit test per
+chunk they touch. This makes "which of these 300 accounts follow @celebrity"
+independent of the celebrity's follower count.
+"""
+
+from bisect import bisect_left
+from typing import List, Optional
+
+import numpy as np
+
+ARRAY_MAX = 4096
+CHUNK_BITS = 16
+_LOW = (1 << CHUNK_BITS) - 1
+
+
+def _bitmap(low: np.ndarray) -> np.ndarray:
+    bits = np.zeros(1 << CHUNK_BITS, bool)
+    bits[low] = True
+    return np.packbits(bits, bitorder="little")
+
+
+def _members(container: np.ndarray) -> np.ndarray:
+    """Sorted low 16 bits held by a container."""
+    if container.dtype == np.uint16:
+        return container
+    return np.flatnonzero(np.unpackbits(container, bitorder="little")).astype(np.uint16)
+
+
+class RoaringSet:
+    __slots__ = ("_keys", "_containers", "_sizes")
+
+    def __init__(self):
+        self._keys: List[int] = []
+        # uint16 arrays or uint8 bitmaps of 8192 bytes.
+        self._containers: List[np.ndarray] = []
+        self._sizes: List[int] = []
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray) -> "RoaringSet":
+        """Build from sorted, distinct uint32 ids."""
+        out = cls()
+        values = np.asarray(values, np.uint32)
+        if not len(values):
+            return out
+        high = values >> CHUNK_BITS
+        bounds = np.flatnonzero(np.diff(high)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(values)]):
+            low = (values[start:end] & _LOW).astype(np.uint16)
+            out._keys.append(int(high[start]))
+            out._containers.append(low.copy() if len(low) <= ARRAY_MAX else _bitmap(low))
+            out._sizes.append(len(low))
+        return out
+
+    def __len__(self) -> int:
+        return sum(self._sizes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self._containers) + 16 * len(self._keys)
+
+    def _find(self, high: int) -> int:
+        i = bisect_left(self._keys, high)
+        return i if i < len(self._keys) and self._keys[i] == high else -1
+
+    def __contains__(self, value: int) -> bool:
+        i = self._find(value >> CHUNK_BITS)
+        if i < 0:
+            return False
+        low = value & _LOW
+        container = self._containers[i]
+        if container.dtype == np.uint16:
+            j = int(np.searchsorted(container, low))
+            return j < len(container) and container[j] == low
+        return bool((container[low >> 3] >> (low & 7)) & 1)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Membership mask for a uint32 array (sorted input is grouped fastest)."""
+        values = np.asarray(values, np.uint32)
+        mask = np.zeros(len(values), bool)
+        if not len(values) or not self._keys:
+            return mask
+        high = values >> CHUNK_BITS
+        low = (values & _LOW).astype(np.int64)
+        for key in np.unique(high):
+            i = self._find(int(key))
+            if i < 0:
+                continue
+            rows = np.flatnonzero(high == key)
+            container = self._containers[i]
+            if container.dtype == np.uint16:
+                j = np.searchsorted(container, low[rows])
+                hit = j < len(container)
+                hit[hit] = container[j[hit]] == low[rows][hit]
+            else:
+                bits = low[rows]
+                hit = ((container[bits >> 3] >> (bits & 7)) & 1).astype(bool)
+            mask[rows] = hit
+        return mask
+
+    def intersect(self, values: np.ndarray) -> np.ndarray:
+        """The members of ``values`` (uint32) that are in the set, in their given order."""
+        values = np.asarray(values, np.uint32)
+        return values[self.contains(values)]
+
+    def add(self, value: int) -> bool:
+        high, low = value >> CHUNK_BITS, value & _LOW
+        i = self._find(high)
+        if i < 0:
+            i = bisect_left(self._keys, high)
+            self._keys.insert(i, high)
+            self._containers.insert(i, np.array([low], np.uint16))
+            self._sizes.insert(i, 1)
+            return True
+        container = self._containers[i]
+        if container.dtype == np.uint16:
+            j = int(np.searchsorted(container, low))
+            if j < len(container) and container[j] == low:
+                return False
+            container = np.insert(container, j, low)
+            self._containers[i] = container if len(container) <= ARRAY_MAX else _bitmap(container)
+        else:
+            if (container[low >> 3] >> (low & 7)) & 1:
+                return False
+            container[low >> 3] |= np.uint8(1 << (low & 7))
+        self._sizes[i] += 1
+        return True
+
+    def discard(self, value: int) -> bool:
+        high, low = value >> CHUNK_BITS, value & _LOW
+        i = self._find(high)
+        if i < 0:
+            return False
+        container = self._containers[i]
+        if container.dtype == np.uint16:
+            j = int(np.searchsorted(container, low))
+            if j >= len(container) or container[j] != low:
+                return False
+            container = np.delete(container, j)
+        else:
+            if not (container[low >> 3] >> (low & 7)) & 1:
+                return False
+            container[low >> 3] &= np.uint8(~(1 << (low & 7)) & 0xFF)
+            if self._sizes[i] - 1 <= ARRAY_MAX:
+                container = _members(container)
+        self._sizes[i] -= 1
+        if not self._sizes[i]:
+            del self._keys[i], self._containers[i], self._sizes[i]
+        else:
+            self._containers[i] = container
+        return True
+
+    def to_array(self) -> np.ndarray:
+        """Every member, ascending, as uint32."""
+        parts = [
+            (np.uint32(key) << np.uint32(CHUNK_BITS)) | _members(c).astype(np.uint32)
+            for key, c in zip(self._keys, self._containers)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, np.uint32)
+
+    def page(self, after: Optional[int], limit: int) -> np.ndarray:
+        """Up to ``limit`` members greater than ``after``, ascending; touches only the chunks returned."""
+        out: List[np.ndarray] = []
+        taken = 0
+        start = 0 if after is None else bisect_left(self._keys, after >> CHUNK_BITS)
+        for i in range(start, len(self._keys)):
+            members = (np.uint32(self._keys[i]) << np.uint32(CHUNK_BITS)) | _members(self._containers[i]).astype(
+                np.uint32
+            )
+            if after is not None and self._keys[i] == after >> CHUNK_BITS:
+                members = members[np.searchsorted(members, after, "right") :]
+            out.append(members[: limit - taken])
+            taken += len(out[-1])
+            if taken >= limit:
+                break
+        return np.concatenate(out) if out else np.empty(0, np.uint32)
@@ -0,0 +1,147 @@
+"""Memory footprint and intersect throughput of the follow graph.
+
+Builds a synthetic graph of ``--edges`` follows among ``--users`` accounts.
+Followees are drawn from a Zipf-like popularity curve, so a few accounts have
+hundreds of thousands of followers, and followers are drawn uniformly. The
+benchmark reports:
+
+- bytes per edge against raw ``uint32`` CSR and Python sets, the latter
+  measured on a sample and extrapolated;
+- "followed by people you follow" intersections per second for mega,
+  mid-sized and small targets;
+- follower enumeration in fan-out batches;
+- compaction after a burst of follows, and snapshot write and reload.
+
+    cd services/python/graph-service
+    python -m benchmarks.bench_graph --users 1000000 --edges 10000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.graph import FollowerGraph
+
+
+def synthetic(users: int, edges: int, seed: int):
+    rng = np.random.default_rng(seed)
+    follower = rng.integers(0, users, edges)
+    # Rank ~ users ** u is a 1/r popularity curve over followees.
+    followee = (users ** rng.random(edges)).astype(np.int64) - 1
+    followee = rng.permutation(users)[followee]
+    return follower, followee
+
+
+def python_set_bytes(graph: FollowerGraph, sample: int, seed: int) -> float:
+    """Bytes per edge of ``{user: set(followers)}``, from a sample of users."""
+    rng = np.random.default_rng(seed)
+    total = edges = 0
+    for user in rng.choice(len(graph), sample, replace=False).tolist():
+        members = set(graph.followers.get(user).tolist())
+        total += sys.getsizeof(members) + sum(sys.getsizeof(m) for m in members)
+        edges += len(members)
+    return total / max(edges, 1)
+
+
+def rate(fn, seconds: float = 1.0) -> float:
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def run(args) -> None:
+    follower, followee = synthetic(args.users, args.edges, args.seed)
+    ids = [f"u{i}" for i in range(args.users)]
+    started = time.perf_counter()
+    graph = FollowerGraph.from_edges(ids, follower, followee, bitmap_min_degree=args.bitmap_min_degree)
+    build_s = time.perf_counter() - started
+    edges = graph.edges
+    sizes = {d: getattr(graph, d).nbytes for d in ("followers", "following")}
+    print(f"{len(graph):,} users, {edges:,} edges, built in {build_s:.1f}s")
+    for direction, size in sizes.items():
+        adjacency = getattr(graph, direction)
+        print(
+            f"  {direction:>9}: {size / 2**20:7.1f} MiB, {size / edges:.2f} B/edge"
+            f" ({len(adjacency.bitmaps)} bitmap lists)"
+        )
+    print(f"  raw uint32 CSR: {(edges * 4 + (args.users + 1) * 8) / edges:.2f} B/edge per direction")
+    print(f"  python sets:   ~{python_set_bytes(graph, 2000, args.seed):.0f} B/edge per direction")
+
+    degree = np.array([graph.followers.degree(u) for u in range(args.users)])
+    following = np.array([graph.following.degree(u) for u in range(args.users)])
+    by_degree = np.argsort(-degree)
+    rng = np.random.default_rng(args.seed + 1)
+    viewers = rng.choice(np.flatnonzero(following), 500)
+    tiers = {
+        "mega": by_degree[: min(len(graph.followers.bitmaps), 50)],
+        "mid": np.flatnonzero((degree >= 100) & (degree < args.bitmap_min_degree))[:500],
+        "small": np.flatnonzero((degree > 0) & (degree < 100))[:500],
+    }
+    print(f"{'target':>8} {'followers':>10} {'intersects/s':>13}")
+    for tier, targets in tiers.items():
+        if not len(targets):
+            continue
+        pairs = [(ids[v], ids[t]) for v, t in zip(viewers.tolist(), np.resize(targets, len(viewers)).tolist())]
+        i = [0]
+
+        def one():
+            viewer, target = pairs[i[0] % len(pairs)]
+            i[0] += 1
+            graph.followed_by_followees(viewer, target, 3)
+
+        print(f"{tier:>8} {int(np.median(degree[targets])):>10,} {rate(one):>13,.0f}")
+
+    top = ids[int(by_degree[0])]
+    started = time.perf_counter()
+    batches = graph.follower_batches(top, 1000)
+    took = time.perf_counter() - started
+    enumerated = sum(len(b) for b in batches)
+    print(f"enumerated {enumerated:,} followers of the top account in batches of 1000: {enumerated / took:,.0f}/s")
+
+    burst = rng.integers(0, args.users, (args.burst, 2))
+    started = time.perf_counter()
+    for a, b in burst.tolist():
+        if a != b:
+            graph.follow(ids[a], ids[b])
+    follow_s = time.perf_counter() - started
+    started = time.perf_counter()
+    graph.compact()
+    print(
+        f"{args.burst:,} follows in {follow_s:.1f}s ({args.burst / follow_s:,.0f}/s),"
+        f" compaction {time.perf_counter() - started:.1f}s"
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        graph.path = path
+        started = time.perf_counter()
+        graph.snapshot()
+        written = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(path) for f in fs)
+        restored = FollowerGraph(args.bitmap_min_degree, path)
+        started = time.perf_counter()
+        restored.load()
+        print(
+            f"snapshot {size / 2**20:.0f} MiB written in {written:.1f}s,"
+            f" loaded in {time.perf_counter() - started:.1f}s"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--edges", type=int, default=10_000_000)
+    parser.add_argument("--bitmap-min-degree", type=int, default=10_000)
+    parser.add_argument("--burst", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
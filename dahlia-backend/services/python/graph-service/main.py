@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import graph
+from app.core.config import get_settings
+from app.core.cursor import CursorCodec
+from app.core.metrics import render_latest
+from app.services.graph import FollowerGraph
+
+
+async def maintain(graph: FollowerGraph, settings) -> None:
+    """Compact once enough edits are pending; snapshot on its own interval."""
+    loop = asyncio.get_running_loop()
+    last_snapshot = time.monotonic()
+    while True:
+        await asyncio.sleep(settings.compact_interval_seconds)
+        if settings.snapshot_path and time.monotonic() - last_snapshot >= settings.snapshot_interval_seconds:
+            last_snapshot = time.monotonic()
+            await loop.run_in_executor(None, graph.snapshot)
+        elif graph.pending >= settings.compact_min_pending:
+            await loop.run_in_executor(None, graph.compact)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if settings.snapshot_path:
+        os.makedirs(settings.snapshot_path, exist_ok=True)
+    graph_store = FollowerGraph(settings.bitmap_min_degree, settings.snapshot_path)
+    await asyncio.get_running_loop().run_in_executor(None, graph_store.load)
+    app.state.graph = graph_store
+    app.state.cursors = CursorCodec(settings.cursor_secret)
+    maintenance = asyncio.create_task(maintain(graph_store, settings))
+    yield
+    maintenance.cancel()
+    await asyncio.get_running_loop().run_in_executor(None, graph_store.snapshot)
+
+
+app = FastAPI(title="graph-service", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(graph.router)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=9003)
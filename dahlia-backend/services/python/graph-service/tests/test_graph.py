@@ -0,0 +1,104 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.adjacency import CSR, Adjacency, sorted_edges
+from app.services.graph import FollowerGraph
+
+
+def _edges(rng, users: int, count: int):
+    follower = np.array([rng.randrange(users) for _ in range(count)], np.int64)
+    # A few accounts draw most of the follows.
+    followee = np.array([int(users * rng.random() ** 4) for _ in range(count)], np.int64)
+    return follower, followee
+
+
+def test_csr_round_trips_lists_of_every_gap_width():
+    rng = random.Random(1)
+    keys, values = [], []
+    for key in range(50):
+        for value in sorted(rng.sample(range(1 << 31), rng.randint(0, 40))):
+            keys.append(key)
+            values.append(value)
+    keys, values = sorted_edges(np.array(keys), np.array(values))
+    csr = CSR.from_sorted(keys, values, 60)
+    assert csr.edges == len(keys)
+    for key in range(60):
+        assert csr.get(key).tolist() == values[keys == key].tolist()
+    all_keys, all_values = csr.all_edges()
+    assert all_keys.tolist() == keys.tolist()
+    assert all_values.tolist() == values.tolist()
+
+
+@pytest.mark.parametrize("threshold", [8, 10_000])
+def test_graph_matches_a_set_model_across_compactions(threshold):
+    rng = random.Random(threshold)
+    users = 60
+    follower, followee = _edges(rng, users, 600)
+    ids = [f"u{i}" for i in range(users)]
+    graph = FollowerGraph.from_edges(ids, follower, followee, bitmap_min_degree=threshold)
+    model = {(f"u{a}", f"u{b}") for a, b in zip(follower.tolist(), followee.tolist()) if a != b}
+
+    for step in range(3000):
+        a, b = f"u{rng.randrange(users + 5)}", f"u{int((users + 5) * rng.random() ** 3)}"
+        if a != b:
+            if rng.random() < 0.5:
+                assert graph.follow(a, b) == ((a, b) not in model)
+                model.add((a, b))
+            else:
+                assert graph.unfollow(a, b) == ((a, b) in model)
+                model.discard((a, b))
+        if step % 400 == 399:
+            graph.compact()
+
+        if step % 250 == 0 or step == 2999:
+            assert graph.edges == len(model)
+            for i in range(users + 5):
+                user = f"u{i}"
+                followers = sorted(a for a, b in model if b == user)
+                following = sorted(b for a, b in model if a == user)
+                assert graph.counts(user) == (len(followers), len(following))
+                got = sorted(x for batch in graph.follower_batches(user, 7) for x in batch)
+                assert got == followers
+
+
+def test_demoted_list_drops_its_stale_csr_rows():
+    threshold = 100
+    ids = ["celeb"] + [f"u{i}" for i in range(1, 100)]
+    follower = np.arange(1, 100)
+    followee = np.zeros(99, np.int64)
+    graph = FollowerGraph.from_edges(ids, follower, followee, bitmap_min_degree=threshold)
+    graph.compact()
+    assert graph.counts("celeb") == (99, 0)
+
+    # The 100th follower promotes the list to a bitmap; its 99 CSR rows stay.
+    graph.follow("u100", "celeb")
+    assert graph.counts("celeb")[0] == 100
+    for i in range(1, 60):
+        graph.unfollow(f"u{i}", "celeb")
+    # 41 followers is under half the threshold, so the next compaction demotes.
+    graph.compact()
+    assert 0 not in graph.followers.bitmaps
+    assert graph.counts("celeb")[0] == 41
+    assert graph.followers.edges == graph.edges == 41
+    assert sorted(x for batch in graph.follower_batches("celeb", 50) for x in batch) == sorted(
+        ["u100"] + [f"u{i}" for i in range(60, 100)]
+    )
+    assert not graph.is_following("u1", "celeb")
+
+
+def test_page_walks_every_follower_once():
+    rng = random.Random(5)
+    follower, followee = _edges(rng, 500, 5000)
+    graph = FollowerGraph.from_edges([f"u{i}" for i in range(500)], follower, followee, bitmap_min_degree=50)
+    for user in ("u0", "u1", "u250"):
+        expected = sorted(x for batch in graph.follower_batches(user, 1000) for x in batch)
+        seen, after = [], None
+        while True:
+            ids, after = graph.page("followers", user, after, 13)
+            seen += ids
+            if after is None:
+                break
+        assert sorted(seen) == expected
+        assert len(seen) == len(set(seen))
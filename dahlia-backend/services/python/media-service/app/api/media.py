@@ -0,0 +1,239 @@
+import asyncio
+import re
+from typing import Optional, Sequence
+
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.streaming import MappedFileResponse, bytes_range, parse_range, range_headers, stream_range
+from app.core.config import get_settings
+from app.models.media import ImageUploadResponse, RenditionInfo, StageTimings
+from app.services.cache import RenditionKey, RenditionMeta
+from app.services.renditions import (
+    CONTENT_TYPES,
+    DEFAULT_RENDITIONS,
+    DuplicateLookup,
+    ImageDecodeError,
+    PipelineResult,
+    RenditionSpec,
+    process_image,
+)
+from app.services.storage import LocalObjectStore, ObjectNotFound, original_key
+from app.services.workers import PoolClosed, PoolSaturated, WorkerCrashed
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+_READ_CHUNK = 1024 * 1024
+_SOURCE_HASH = re.compile(r"^[0-9a-f]{64}$")
+# Content-addressed responses never change.
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def default_quality(width: int, fmt: str, crop: bool, box: bool) -> int:
+    """Quality of the upload rendition with this geometry, so a GET without ``q`` hits what the upload cached."""
+    for spec in DEFAULT_RENDITIONS:
+        key = RenditionKey.for_spec("", spec)
+        if key is not None and (key.width, key.format, key.crop, key.box) == (width, fmt, crop, box):
+            return spec.quality
+    return RenditionSpec("", width).quality
+
+
+async def read_upload(upload: UploadFile, limit: int) -> bytearray:
+    buf = bytearray()
+    while chunk := await upload.read(_READ_CHUNK):
+        buf += chunk
+        if len(buf) > limit:
+            raise HTTPException(status_code=413, detail="upload too large")
+    if not buf:
+        raise HTTPException(status_code=400, detail="empty upload")
+    return buf
+
+
+def duplicate_lookup(request: Request) -> Optional[DuplicateLookup]:
+    index = request.app.state.dedup_index
+    if index is None:
+        return None
+    settings = get_settings()
+
+    def lookup(phash: int, dhash: int) -> Optional[str]:
+        matches = index.query(phash, dhash, settings.dedup_phash_radius, settings.dedup_dhash_radius)
+        return matches[0].source_hash if matches else None
+
+    return lookup
+
+
+async def run_pipeline(
+    request: Request,
+    data: bytes,
+    specs: Sequence[RenditionSpec],
+    lookup: Optional[DuplicateLookup] = None,
+) -> PipelineResult:
+    pool = request.app.state.image_pool
+    try:
+        if pool is None:
+            return await run_in_threadpool(
+                process_image, data, specs, None, get_settings().encode_threads, lookup
+            )
+        return await pool.process(data, specs, lookup)
+    except ImageDecodeError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except PoolSaturated as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        )
+    except (PoolClosed, WorkerCrashed) as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+@router.post("/images", response_model=ImageUploadResponse)
+async def upload_image(
+    request: Request,
+    user_id: str = Form(...),
+    caption: str = Form(""),
+    location: Optional[str] = Form(None),
+    image: UploadFile = File(...),
+):
+    settings = get_settings()
+    data = await read_upload(image, settings.max_upload_bytes)
+    result = await run_pipeline(request, data, DEFAULT_RENDITIONS, duplicate_lookup(request))
+
+    if result.duplicate_of is None:
+        cache = request.app.state.rendition_cache
+        await request.app.state.objects.put(original_key(result.source_hash), data, image.content_type)
+        for r in result.renditions:
+            key = RenditionKey.for_spec(result.source_hash, r.spec)
+            if key is not None:
+                meta = RenditionMeta(r.width, r.height, r.content_type, len(r.data))
+                await cache.put(key, meta, r.data)
+        index = request.app.state.dedup_index
+        if index is not None:
+            index.add(result.source_hash, result.phash, result.dhash)
+            if index.needs_compaction():
+                asyncio.get_running_loop().run_in_executor(None, index.compact)
+
+    return ImageUploadResponse(
+        user_id=user_id,
+        caption=caption,
+        location=location,
+        source_hash=result.source_hash,
+        source_width=result.source_size[0],
+        source_height=result.source_size[1],
+        decoded_width=result.decoded_size[0],
+        decoded_height=result.decoded_size[1],
+        renditions=[
+            RenditionInfo(
+                name=r.spec.name,
+                width=r.width,
+                height=r.height,
+                format=r.spec.format,
+                content_type=r.content_type,
+                size_bytes=len(r.data),
+            )
+            for r in result.renditions
+        ],
+        timings=StageTimings(**result.timings),
+        phash=f"{result.phash:016x}",
+        duplicate_of=result.duplicate_of,
+    )
+
+
+@router.api_route("/images/{source_hash}", methods=["GET", "HEAD"])
+async def get_rendition(
+    request: Request,
+    source_hash: str,
+    w: int = Query(...),
+    fmt: str = Query("JPEG"),
+    q: Optional[int] = Query(None, ge=40, le=95),
+    crop: bool = Query(False),
+    box: bool = Query(False),
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+):
+    fmt = fmt.upper()
+    if not _SOURCE_HASH.match(source_hash):
+        raise HTTPException(status_code=404, detail="unknown image")
+    if w not in get_settings().rendition_widths:
+        raise HTTPException(status_code=400, detail=f"unsupported width {w}")
+    if fmt not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"unsupported format {fmt}")
+    if crop and box:
+        raise HTTPException(status_code=400, detail="crop and box are exclusive")
+    if q is None:
+        q = default_quality(w, fmt, crop, box)
+
+    key = RenditionKey(source_hash, w, fmt, q, crop=crop, box=box)
+    etag = f'"{key.digest}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _IMMUTABLE})
+
+    headers = {"ETag": etag, "Cache-Control": _IMMUTABLE}
+    cache = request.app.state.rendition_cache
+    located = cache.locate(key)
+    if located is not None:
+        location, meta = located
+        return MappedFileResponse(
+            location.path,
+            location.offset,
+            location.size,
+            parse_range(range_header, location.size),
+            meta.content_type,
+            get_settings().stream_chunk_bytes,
+            headers=headers,
+            send_body=request.method != "HEAD",
+        )
+    if request.method == "HEAD":
+        # Another pod may have rendered it; its metadata answers without a render.
+        meta = await cache.describe(key)
+        if meta is not None:
+            status, head_headers = range_headers(parse_range(range_header, meta.size_bytes), meta.size_bytes, headers)
+            return Response(status_code=status, headers=head_headers, media_type=meta.content_type)
+
+    async def produce():
+        try:
+            data = await request.app.state.objects.get(original_key(source_hash))
+        except ObjectNotFound:
+            raise HTTPException(status_code=404, detail="unknown image")
+        rendition = (await run_pipeline(request, data, [key.spec()])).renditions[0]
+        meta = RenditionMeta(rendition.width, rendition.height, rendition.content_type, len(rendition.data))
+        return meta, rendition.data
+
+    cached = await cache.get_or_create(key, produce)
+    return bytes_range(cached.data, parse_range(range_header, len(cached.data)), cached.meta.content_type, headers)
+
+
+@router.api_route("/objects/{key:path}", methods=["GET", "HEAD"])
+async def get_object(
+    request: Request,
+    key: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+):
+    """Stream a stored object (originals, video, anything in the bucket) with Range support."""
+    store = request.app.state.objects
+    try:
+        stat = await store.stat(key)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="object not found")
+    byte_range = parse_range(range_header, stat.size)
+    headers = {"ETag": f'"{stat.etag}"'} if stat.etag else {}
+    send_body = request.method != "HEAD"
+
+    if isinstance(store, LocalObjectStore):
+        location = store.locate(key)
+        return MappedFileResponse(
+            location.path,
+            location.offset,
+            location.size,
+            byte_range,
+            stat.content_type,
+            store.chunk_size,
+            headers=headers,
+            send_body=send_body,
+        )
+    return stream_range(
+        lambda start, end: store.iter_range(key, start, end),
+        stat.size,
+        byte_range,
+        stat.content_type,
+        headers=headers,
+        send_body=send_body,
+    )
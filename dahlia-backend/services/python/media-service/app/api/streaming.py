@@ -0,0 +1,134 @@
+"""HTTP Range responses that never hold a whole object in memory."""
+
+import mmap
+import re
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive ``(start, end)`` of a single-range header, or None for the whole object.
+
+    Multi-range and malformed headers are ignored (the full object is served),
+    as RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        # An empty object has no last bytes to serve.
+        if length == 0 or size == 0:
+            raise _unsatisfiable(size)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise _unsatisfiable(size)
+    return start, end
+
+
+def _unsatisfiable(size: int) -> HTTPException:
+    return HTTPException(status_code=416, detail="range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+
+def range_headers(
+    byte_range: Optional[Tuple[int, int]], size: int, extra: Optional[Dict[str, str]] = None
+) -> Tuple[int, Dict[str, str]]:
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(max(0, end - start + 1))}
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers.update(extra or {})
+    return (206 if byte_range is not None else 200), headers
+
+
+class MappedFileResponse(Response):
+    """Serve a byte range of a local file without copying it through Python.
+
+    Sends ``memoryview`` slices of an ``mmap``, so the kernel page cache is the
+    only buffer and the process never holds more than the mapping. (uvicorn
+    offers no ASGI extension to ``sendfile`` a range.)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        size: int,
+        byte_range: Optional[Tuple[int, int]],
+        media_type: str,
+        chunk_size: int,
+        headers: Optional[Dict[str, str]] = None,
+        send_body: bool = True,
+    ):
+        status, all_headers = range_headers(byte_range, size, headers)
+        super().__init__(status_code=status, headers=all_headers, media_type=media_type)
+        start, end = byte_range if byte_range is not None else (0, size - 1)
+        self.path = path
+        self.start = offset + start
+        self.count = max(0, end - start + 1)
+        self.chunk_size = chunk_size
+        self.send_body = send_body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            # Evicted after the lookup; once open, a later unlink can't affect us.
+            await Response(status_code=404)(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.count == 0:
+            f.close()
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with f:
+            # mmap offsets must be page aligned; map from the enclosing page.
+            aligned = self.start - self.start % mmap.ALLOCATIONGRANULARITY
+            mapped = mmap.mmap(f.fileno(), self.start - aligned + self.count, offset=aligned, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[self.start - aligned :]
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        # Chunks keep the mapping alive until the transport has written them.
+        for position in range(0, self.count, self.chunk_size):
+            more = position + self.chunk_size < self.count
+            await send({"type": "http.response.body", "body": view[position : position + self.chunk_size], "more_body": more})
+        del view, mapped
+
+
+def stream_range(
+    open_range: Callable[[int, int], AsyncIterator[bytes]],
+    size: int,
+    byte_range: Optional[Tuple[int, int]],
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+    send_body: bool = True,
+) -> Response:
+    status, all_headers = range_headers(byte_range, size, headers)
+    if not send_body or size == 0:
+        return Response(status_code=status, headers=all_headers, media_type=media_type)
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    return StreamingResponse(open_range(start, end), status_code=status, headers=all_headers, media_type=media_type)
+
+
+def bytes_range(
+    data: bytes,
+    byte_range: Optional[Tuple[int, int]],
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    status, all_headers = range_headers(byte_range, len(data), headers)
+    start, end = byte_range if byte_range is not None else (0, len(data) - 1)
+    return Response(content=bytes(data[start : end + 1]), status_code=status, headers=all_headers, media_type=media_type)
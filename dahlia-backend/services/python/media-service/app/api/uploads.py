@@ -0,0 +1,98 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+
+from app.models.media import (
+    UploadCompleteRequest,
+    UploadCompleteResponse,
+    UploadCreateRequest,
+    UploadPartResponse,
+    UploadSessionResponse,
+)
+from app.services.uploads import (
+    UploadBusy,
+    UploadCorrupted,
+    UploadManager,
+    UploadNotFound,
+    UploadRejected,
+    UploadSession,
+)
+
+router = APIRouter(prefix="/media/uploads", tags=["uploads"])
+
+
+def _manager(request: Request) -> UploadManager:
+    return request.app.state.uploads
+
+
+def _session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        key=session.key,
+        size=session.size,
+        part_size=session.part_size,
+        part_count=session.part_count,
+        received_parts=sorted(session.parts),
+        missing_parts=session.missing(),
+        expires_at=session.expires_at,
+        completed=session.etag is not None,
+    )
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=201)
+async def create_upload(request: Request, body: UploadCreateRequest):
+    try:
+        session = await _manager(request).create(body.size, body.content_type, body.filename, body.part_size)
+    except UploadRejected as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _session_response(session)
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(request: Request, upload_id: str):
+    """Received and missing parts, for resuming after a dropped connection."""
+    try:
+        session = await _manager(request).status(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="unknown upload")
+    return _session_response(session)
+
+
+@router.put("/{upload_id}/parts/{number}", response_model=UploadPartResponse)
+async def put_part(
+    request: Request,
+    upload_id: str,
+    number: int,
+    content_sha256: Optional[str] = Header(None, alias="X-Content-SHA256"),
+):
+    try:
+        part = await _manager(request).put_part(upload_id, number, request.stream(), content_sha256)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="unknown upload")
+    except UploadRejected as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except UploadBusy as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"})
+    return UploadPartResponse(number=part.number, size=part.size, etag=part.etag, sha256=part.sha256)
+
+
+@router.post("/{upload_id}/complete", response_model=UploadCompleteResponse)
+async def complete_upload(request: Request, upload_id: str, body: Optional[UploadCompleteRequest] = None):
+    try:
+        done = await _manager(request).complete(upload_id, body.checksum if body else None)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="unknown upload")
+    except UploadRejected as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except UploadCorrupted as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+    return UploadCompleteResponse(key=done.key, size=done.size, etag=done.etag, checksum=done.checksum)
+
+
+@router.delete("/{upload_id}", status_code=204)
+async def abort_upload(request: Request, upload_id: str):
+    try:
+        await _manager(request).abort(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="unknown upload")
+    return Response(status_code=204)
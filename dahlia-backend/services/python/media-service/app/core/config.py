@@ -0,0 +1,97 @@
+import math
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+def cpu_limit() -> float:
+    """CPUs this container may use: its cgroup CPU quota, else the CPUs it may run on."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="MEDIA_")
+
+    # Uploads larger than this are rejected before decoding.
+    max_upload_bytes: int = 50 * 1024 * 1024
+    # Pillow's decompression-bomb guard; 80 MP leaves headroom over 40 MP sensors.
+    max_image_pixels: int = 80_000_000
+    # Threads used to encode renditions in parallel (Pillow releases the GIL).
+    encode_threads: int = 4
+    # Worker processes for decode/resize/encode, one per CPU of the pod's
+    # limit (os.cpu_count() reports the node's); 0 runs the pipeline in-process.
+    worker_processes: int = Field(default_factory=lambda: max(1, math.ceil(cpu_limit())))
+    # Jobs admitted (running + queued) before uploads get 429 + Retry-After.
+    max_pending_jobs: int = 16
+    # How long SIGTERM waits for in-flight jobs; keep below terminationGracePeriodSeconds.
+    drain_timeout_seconds: float = 25.0
+
+    # Object storage for originals and other media: "local" or "s3" (MinIO).
+    storage_backend: str = "local"
+    storage_dir: str = "/var/lib/media/objects"
+    s3_endpoint_url: Optional[str] = None
+    s3_bucket: str = "media"
+    s3_access_key: Optional[str] = None
+    s3_secret_key: Optional[str] = None
+    # Bytes per read when streaming objects; bounds per-request memory.
+    stream_chunk_bytes: int = 256 * 1024
+    # Local rendition cache tier and its byte budget (LRU beyond it).
+    cache_dir: str = "/var/cache/media/renditions"
+    cache_max_bytes: int = 1024 * 1024 * 1024
+    # Redis for shared rendition metadata; unset disables the tier.
+    redis_url: Optional[str] = None
+    redis_meta_ttl_seconds: int = 7 * 24 * 3600
+    # Widths served on demand; anything else is rejected to keep the key space bounded.
+    rendition_widths: List[int] = [150, 320, 640, 1080, 1440, 2048]
+
+    # Near-duplicate detection on upload; unset path keeps the index in memory only.
+    dedup_enabled: bool = True
+    phash_index_path: Optional[str] = "/var/lib/media/phash.idx"
+    # Max differing bits (of 64) for pHash and, as a second check, dHash.
+    dedup_phash_radius: int = 6
+    dedup_dhash_radius: int = 10
+    # Log entries after which the index is folded into a new base file.
+    phash_compact_after: int = 50_000
+
+    # Resumable uploads: parts go straight to the object store's multipart API.
+    upload_part_size: int = 8 * 1024 * 1024
+    upload_max_part_size: int = 64 * 1024 * 1024
+    upload_max_bytes: int = 10 * 1024 * 1024 * 1024
+    upload_session_ttl_seconds: int = 24 * 3600
+    # Parts one session may receive at once, and parts and their bytes across
+    # all sessions (429 beyond). Parts are held in memory until stored.
+    upload_parts_per_session: int = 1
+    upload_max_parts_in_flight: int = 32
+    upload_max_bytes_in_flight: int = 256 * 1024 * 1024
+    # Receive buffer per part. With upload_spool_dir set, a part beyond one
+    # buffer spills to a temp file there instead of staying in memory.
+    upload_buffer_bytes: int = 1024 * 1024
+    upload_spool_dir: Optional[str] = None
+    # How often multipart uploads of expired sessions are aborted.
+    upload_sweep_interval_seconds: float = 600.0
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
@@ -0,0 +1,76 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class RenditionInfo(BaseModel):
+    name: str
+    width: int
+    height: int
+    format: str
+    content_type: str
+    size_bytes: int
+
+
+class StageTimings(BaseModel):
+    queue_ms: float = 0.0
+    decode_ms: float
+    resize_ms: float
+    encode_ms: float
+    total_ms: float
+
+
+class ImageUploadResponse(BaseModel):
+    user_id: str
+    caption: str
+    location: Optional[str] = None
+    source_hash: str
+    source_width: int
+    source_height: int
+    decoded_width: int
+    decoded_height: int
+    renditions: List[RenditionInfo]
+    timings: StageTimings
+    phash: str
+    # Source hash of the stored near-duplicate this upload resolved to; when set,
+    # nothing new was stored and ``renditions`` is empty.
+    duplicate_of: Optional[str] = None
+
+
+class UploadCreateRequest(BaseModel):
+    size: int
+    content_type: str = "application/octet-stream"
+    filename: Optional[str] = None
+    # Defaults to the server's part size; raised automatically past 10k parts.
+    part_size: Optional[int] = None
+
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    key: str
+    size: int
+    part_size: int
+    part_count: int
+    received_parts: List[int]
+    missing_parts: List[int]
+    expires_at: float
+    completed: bool
+
+
+class UploadPartResponse(BaseModel):
+    number: int
+    size: int
+    etag: str
+    sha256: str
+
+
+class UploadCompleteRequest(BaseModel):
+    # SHA-256 over the concatenated part SHA-256 digests, in part order.
+    checksum: Optional[str] = None
+
+
+class UploadCompleteResponse(BaseModel):
+    key: str
+    size: int
+    etag: str
+    checksum: str
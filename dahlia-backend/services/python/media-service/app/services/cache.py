@@ -0,0 +1,284 @@
+"""Content-addressed rendition cache.
+
+A rendition is identified by ``(source hash, width, format, quality, shape)`` and is
+immutable, so the cache never needs invalidation — only eviction. Bytes live
+on local disk under a byte budget with LRU eviction; rendition metadata is
+mirrored to Redis so any pod can describe a rendition without holding it.
+Concurrent misses for the same key share a single transform.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.metrics import Counter, Gauge
+from app.services.renditions import RenditionSpec
+from app.services.storage import FileLocation
+
+cache_requests = Counter("media_rendition_cache_requests_total", "Rendition cache lookups by result.")
+cache_evictions = Counter("media_rendition_cache_evictions_total", "Renditions evicted from the disk tier.")
+cache_bytes = Gauge("media_rendition_cache_bytes", "Bytes held by the disk tier.")
+cache_entries = Gauge("media_rendition_cache_entries", "Renditions held by the disk tier.")
+
+
+@dataclass(frozen=True)
+class RenditionKey:
+    source_hash: str
+    width: int
+    format: str
+    quality: int
+    # Square center crop (width x width) instead of fit-to-width.
+    crop: bool = False
+    # Fit inside a width x width box (the ``full`` rendition) instead of fit-to-width.
+    box: bool = False
+
+    @property
+    def digest(self) -> str:
+        raw = f"{self.source_hash}:{self.width}:{self.format}:{self.quality}"
+        if self.crop:
+            raw += ":crop"
+        if self.box:
+            raw += ":box"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @classmethod
+    def for_spec(cls, source_hash: str, spec: RenditionSpec) -> Optional["RenditionKey"]:
+        """Key for ``spec`` if its geometry is addressable by width alone."""
+        if spec.height == spec.width:
+            return cls(source_hash, spec.width, spec.format, spec.quality, crop=spec.crop, box=not spec.crop)
+        if not spec.crop and spec.height is None:
+            return cls(source_hash, spec.width, spec.format, spec.quality)
+        return None
+
+    def spec(self) -> RenditionSpec:
+        if self.crop or self.box:
+            return RenditionSpec(
+                f"{'c' if self.crop else 'b'}{self.width}",
+                self.width,
+                self.width,
+                crop=self.crop,
+                format=self.format,
+                quality=self.quality,
+            )
+        return RenditionSpec(f"w{self.width}", self.width, format=self.format, quality=self.quality)
+
+
+@dataclass
+class RenditionMeta:
+    width: int
+    height: int
+    content_type: str
+    size_bytes: int
+
+
+@dataclass
+class CachedRendition:
+    key: RenditionKey
+    meta: RenditionMeta
+    data: bytes
+
+
+class DiskTier:
+    """Byte-budgeted LRU over files named by key digest.
+
+    Each file starts with one JSON line of ``RenditionMeta`` so the index can be
+    rebuilt from disk alone after a restart.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        # digest -> (file size, payload offset, meta)
+        self._entries: "OrderedDict[str, Tuple[int, int, RenditionMeta]]" = OrderedDict()
+        self._bytes = 0
+        # get/put run on worker threads; the index is shared between them.
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def load(self) -> None:
+        """Rebuild the index, oldest-modified first so LRU order survives restarts."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.startswith("."):
+                    os.unlink(path)  # interrupted write
+                    continue
+                found.append((os.stat(path).st_mtime, name, path))
+        for _, digest, path in sorted(found):
+            try:
+                with open(path, "rb") as f:
+                    header = f.readline()
+                meta = RenditionMeta(**json.loads(header))
+            except (ValueError, TypeError):
+                os.unlink(path)
+                continue
+            size = os.path.getsize(path)
+            self._entries[digest] = (size, len(header), meta)
+            self._bytes += size
+        self._evict()
+
+    def meta(self, digest: str) -> Optional[RenditionMeta]:
+        entry = self._entries.get(digest)
+        return entry[2] if entry is not None else None
+
+    def locate(self, digest: str) -> Optional[Tuple[FileLocation, RenditionMeta]]:
+        """File and payload offset of a cached rendition, for serving from an ``mmap``."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+        size, offset, meta = entry
+        return FileLocation(path=self._path(digest), offset=offset, size=size - offset), meta
+
+    def get(self, digest: str) -> Optional[Tuple[RenditionMeta, bytes]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+        try:
+            with open(self._path(digest), "rb") as f:
+                f.seek(entry[1])
+                data = f.read()
+        except FileNotFoundError:
+            # Evicted between the index lookup and the read.
+            return None
+        return entry[2], data
+
+    def put(self, digest: str, meta: RenditionMeta, data: bytes) -> None:
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        header = json.dumps(asdict(meta)).encode() + b"\n"
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(data)
+            size = f.tell()
+        os.replace(tmp, path)
+        with self._lock:
+            previous = self._entries.pop(digest, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[digest] = (size, len(header), meta)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            digest, (size, _, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.unlink(self._path(digest))
+            except FileNotFoundError:
+                pass
+            cache_evictions.inc()
+        cache_bytes.set(self._bytes)
+        cache_entries.set(len(self._entries))
+
+
+class RedisMetaTier:
+    """Rendition metadata in Redis hashes, shared across pods."""
+
+    prefix = "media:rendition:"
+
+    def __init__(self, redis, ttl_seconds: int):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, digest: str) -> Optional[RenditionMeta]:
+        raw = await self.redis.hgetall(self.prefix + digest)
+        if not raw:
+            return None
+        fields = {_text(k): _text(v) for k, v in raw.items()}
+        return RenditionMeta(
+            width=int(fields["width"]),
+            height=int(fields["height"]),
+            content_type=fields["content_type"],
+            size_bytes=int(fields["size_bytes"]),
+        )
+
+    async def put(self, digest: str, meta: RenditionMeta) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self.prefix + digest, mapping=asdict(meta))
+            pipe.expire(self.prefix + digest, self.ttl_seconds)
+            await pipe.execute()
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+Producer = Callable[[], Awaitable[Tuple[RenditionMeta, bytes]]]
+
+
+class RenditionCache:
+    def __init__(self, disk: DiskTier, meta: Optional[RedisMetaTier] = None):
+        self.disk = disk
+        self.meta = meta
+        self._inflight: Dict[str, "asyncio.Task[CachedRendition]"] = {}
+
+    async def get(self, key: RenditionKey) -> Optional[CachedRendition]:
+        found = await asyncio.to_thread(self.disk.get, key.digest)
+        if found is None:
+            return None
+        return CachedRendition(key=key, meta=found[0], data=found[1])
+
+    async def put(self, key: RenditionKey, meta: RenditionMeta, data: bytes) -> None:
+        await asyncio.to_thread(self.disk.put, key.digest, meta, data)
+        if self.meta is not None:
+            await self.meta.put(key.digest, meta)
+
+    def locate(self, key: RenditionKey) -> Optional[Tuple[FileLocation, RenditionMeta]]:
+        found = self.disk.locate(key.digest)
+        if found is not None:
+            cache_requests.inc(result="hit")
+        return found
+
+    async def describe(self, key: RenditionKey) -> Optional[RenditionMeta]:
+        meta = self.disk.meta(key.digest)
+        if meta is None and self.meta is not None:
+            meta = await self.meta.get(key.digest)
+        return meta
+
+    async def get_or_create(self, key: RenditionKey, produce: Producer) -> CachedRendition:
+        digest = key.digest
+        task = self._inflight.get(digest)
+        if task is None:
+            cached = await self.get(key)
+            if cached is not None:
+                cache_requests.inc(result="hit")
+                return cached
+            task = self._inflight.get(digest)
+        if task is not None:
+            cache_requests.inc(result="coalesced")
+        else:
+            cache_requests.inc(result="miss")
+            # Detached from the caller so one client disconnecting doesn't
+            # cancel the transform the other waiters are sharing.
+            task = asyncio.ensure_future(self._fill(key, produce))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: RenditionKey, produce: Producer) -> CachedRendition:
+        meta, data = await produce()
+        await self.put(key, meta, data)
+        return CachedRendition(key=key, meta=meta, data=data)
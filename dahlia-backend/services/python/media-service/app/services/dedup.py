@@ -0,0 +1,243 @@
+"""Near-duplicate index over 64-bit perceptual hashes.
+
+Uses multi-index hashing: the pHash is split into four 16-bit substrings,
+and each one has a sorted table. Two hashes within Hamming distance ``r``
+must agree on at least one substring to within ``r // 4`` bits. A lookup
+therefore probes a few sorted ranges per table with ``searchsorted``, then
+checks exact distances only on those candidates. The dHash is stored next to
+each pHash as a second, independent check.
+
+On disk the index is one immutable base file, memory-mapped at startup, plus
+an append-only log of additions since the last compaction. The log is
+replayed into memory on load.
+"""
+
+import functools
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.phash import hamming
+
+MAGIC = b"DPHIDX01"
+CHUNKS = 4
+_CHUNK_BITS = 64 // CHUNKS
+_HEADER = struct.Struct("<8sQQQ")
+_RECORD = struct.Struct("<QQ32s")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_masks(max_bits: int) -> np.ndarray:
+    masks = [0]
+    for bits in range(1, max_bits + 1):
+        for positions in itertools.combinations(range(_CHUNK_BITS), bits):
+            masks.append(sum(1 << p for p in positions))
+    return np.array(masks, dtype=np.uint16)
+
+
+def _substrings(hashes: np.ndarray, chunk: int) -> np.ndarray:
+    return ((hashes >> np.uint64(chunk * _CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+@dataclass
+class Match:
+    source_hash: str
+    phash_distance: int
+    dhash_distance: int
+
+
+class _Base:
+    """Memory-mapped, immutable section of the index."""
+
+    def __init__(self, path: Optional[str]):
+        self.count = 0
+        self.phash = np.empty(0, np.uint64)
+        self.dhash = np.empty(0, np.uint64)
+        self.digests = np.empty((0, 32), np.uint8)
+        self.keys = [np.empty(0, np.uint16) for _ in range(CHUNKS)]
+        self.order = [np.empty(0, np.uint32) for _ in range(CHUNKS)]
+        self._mmap = None
+        if path and os.path.exists(path) and os.path.getsize(path) >= _HEADER.size:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, chunks, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or chunks != CHUNKS:
+            raise ValueError(f"{path} is not a phash index")
+        buf = self._mmap
+        offset = _HEADER.size
+        self.phash = np.frombuffer(buf, np.uint64, count, offset)
+        offset += 8 * count
+        self.dhash = np.frombuffer(buf, np.uint64, count, offset)
+        offset += 8 * count
+        self.digests = np.frombuffer(buf, np.uint8, 32 * count, offset).reshape(count, 32)
+        offset += 32 * count
+        for c in range(CHUNKS):
+            self.keys[c] = np.frombuffer(buf, np.uint16, count, offset)
+            offset = _align(offset + 2 * count)
+            self.order[c] = np.frombuffer(buf, np.uint32, count, offset)
+            offset = _align(offset + 4 * count)
+        self.count = count
+
+
+def write_base(path: str, phash: np.ndarray, dhash: np.ndarray, digests: np.ndarray) -> None:
+    """Write a base file atomically (temp file + rename)."""
+    count = len(phash)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".phash-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, count, CHUNKS, 0))
+        f.write(np.ascontiguousarray(phash, np.uint64).tobytes())
+        f.write(np.ascontiguousarray(dhash, np.uint64).tobytes())
+        f.write(np.ascontiguousarray(digests, np.uint8).tobytes())
+        for c in range(CHUNKS):
+            sub = _substrings(phash, c)
+            order = np.argsort(sub, kind="stable").astype(np.uint32)
+            f.write(sub[order].tobytes())
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(order.tobytes())
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+    os.replace(tmp, path)
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: Optional[str] = None, compact_after: int = 50_000):
+        self.path = path
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._base = _Base(path)
+        self._delta_phash = array("Q")
+        self._delta_dhash = array("Q")
+        self._delta_digests = bytearray()
+        self._log = None
+        if path:
+            self._replay_log()
+            self._log = open(self._log_path, "ab")
+
+    @property
+    def _log_path(self) -> str:
+        return self.path + ".log"
+
+    def __len__(self) -> int:
+        return self._base.count + len(self._delta_phash)
+
+    def _replay_log(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "rb") as f:
+            data = f.read()
+        # A torn final record from a crash mid-append is dropped.
+        usable = len(data) - len(data) % _RECORD.size
+        for phash, dhash, digest in _RECORD.iter_unpack(data[:usable]):
+            self._append(phash, dhash, digest)
+
+    def _append(self, phash: int, dhash: int, digest: bytes) -> None:
+        self._delta_phash.append(phash)
+        self._delta_dhash.append(dhash)
+        self._delta_digests += digest
+
+    def add(self, source_hash: str, phash: int, dhash: int) -> None:
+        digest = bytes.fromhex(source_hash)
+        with self._lock:
+            self._append(phash, dhash, digest)
+            if self._log is not None:
+                self._log.write(_RECORD.pack(phash, dhash, digest))
+                self._log.flush()
+
+    def query(self, phash: int, dhash: int, radius: int = 6, dhash_radius: int = 10) -> List[Match]:
+        """All indexed images within ``radius`` pHash bits and ``dhash_radius`` dHash bits."""
+        masks = _probe_masks(radius // CHUNKS)
+        matches: List[Match] = []
+
+        base = self._base
+        if base.count:
+            query = np.array([phash], np.uint64)
+            spans = []
+            for c in range(CHUNKS):
+                probes = _substrings(query, c)[0] ^ masks
+                lo = np.searchsorted(base.keys[c], probes, "left")
+                lengths = np.searchsorted(base.keys[c], probes, "right") - lo
+                # Expand the [lo, hi) ranges into one index array without a Python loop.
+                total = int(lengths.sum())
+                if total:
+                    starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+                    spans.append(base.order[c][starts + np.arange(total)])
+            if spans:
+                candidates = np.concatenate(spans)
+                # A candidate found through several substrings is reported once.
+                rows = np.unique(candidates[hamming(base.phash[candidates], phash) <= radius])
+                pd = hamming(base.phash[rows], phash)
+                dd = hamming(base.dhash[rows], dhash)
+                for i in np.flatnonzero(dd <= dhash_radius):
+                    matches.append(Match(base.digests[rows[i]].tobytes().hex(), int(pd[i]), int(dd[i])))
+
+        # The log tail is scanned linearly; compaction keeps it short.
+        with self._lock:
+            n = len(self._delta_phash)
+            if n:
+                pd = hamming(np.frombuffer(self._delta_phash, np.uint64, n), phash)
+                dd = hamming(np.frombuffer(self._delta_dhash, np.uint64, n), dhash)
+                for i in np.flatnonzero((pd <= radius) & (dd <= dhash_radius)):
+                    digest = bytes(self._delta_digests[32 * i : 32 * i + 32]).hex()
+                    matches.append(Match(digest, int(pd[i]), int(dd[i])))
+
+        matches.sort(key=lambda m: (m.phash_distance, m.dhash_distance))
+        return matches
+
+    def needs_compaction(self) -> bool:
+        return len(self._delta_phash) >= self.compact_after
+
+    def compact(self) -> None:
+        """Fold the log into a new base file; safe to run alongside adds and queries."""
+        if not self.path or not self._compacting.acquire(blocking=False):
+            return
+        try:
+            self._compact()
+        finally:
+            self._compacting.release()
+
+    def _compact(self) -> None:
+        with self._lock:
+            n = len(self._delta_phash)
+            delta_phash = np.array(self._delta_phash[:n], np.uint64)
+            delta_dhash = np.array(self._delta_dhash[:n], np.uint64)
+            delta_digests = np.frombuffer(bytes(self._delta_digests[: 32 * n]), np.uint8).reshape(n, 32)
+        base = self._base
+        write_base(
+            self.path,
+            np.concatenate([base.phash, delta_phash]),
+            np.concatenate([base.dhash, delta_dhash]),
+            np.concatenate([base.digests, delta_digests]),
+        )
+        new_base = _Base(self.path)
+        with self._lock:
+            # Keep whatever was added while the base was being written.
+            self._delta_phash = self._delta_phash[n:]
+            self._delta_dhash = self._delta_dhash[n:]
+            self._delta_digests = self._delta_digests[32 * n :]
+            self._base = new_base
+            self._log.close()
+            with open(self._log_path + ".tmp", "wb") as f:
+                for i, (phash, dhash) in enumerate(zip(self._delta_phash, self._delta_dhash)):
+                    f.write(_RECORD.pack(phash, dhash, bytes(self._delta_digests[32 * i : 32 * i + 32])))
+            os.replace(self._log_path + ".tmp", self._log_path)
+            self._log = open(self._log_path, "ab")
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,90 @@
+"""Perceptual hashes (pHash, dHash) computed in vectorized NumPy batches.
+
+Both hashes are 64-bit. Images are reduced to small grayscale thumbnails with
+Pillow (using JPEG draft mode when decoding from bytes), stacked, and hashed
+in one pass: pHash via a separable 32x32 DCT of which the top-left 8x8
+low-frequency block is compared to its median, dHash via horizontal gradients
+of a 9x8 thumbnail.
+"""
+
+import io
+from typing import Iterable, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PHASH_SIZE = 32
+_LOW_FREQ = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    mat = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    mat[0] /= np.sqrt(2.0)
+    return mat.astype(np.float32)
+
+
+# Only the low-frequency rows are needed, so the transform is (8x32)·X·(32x8).
+_DCT_LOW = _dct_matrix(PHASH_SIZE)[:_LOW_FREQ]
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) booleans -> (N,) uint64, most significant bit first."""
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+def thumbnails(image: Image.Image) -> Tuple[np.ndarray, np.ndarray]:
+    """32x32 and 9x8 grayscale thumbnails of an already decoded image."""
+    small = image.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0).convert("L")
+    gradient = small.resize((9, 8), Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.float32), np.asarray(gradient, dtype=np.float32)
+
+
+def thumbnails_from_bytes(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    image = Image.open(io.BytesIO(data))
+    image.draft("L", (PHASH_SIZE * 2, PHASH_SIZE * 2))
+    image = ImageOps.exif_transpose(image)
+    return thumbnails(image.convert("RGB") if image.mode not in ("L", "RGB") else image)
+
+
+def phash_batch(pixels: np.ndarray) -> np.ndarray:
+    """pHash for a (N, 32, 32) float32 stack."""
+    coeffs = _DCT_LOW @ pixels @ _DCT_LOW.T
+    flat = coeffs.reshape(len(pixels), -1)
+    # The DC term tracks overall brightness, not structure.
+    median = np.median(flat[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(flat > median)
+
+
+def dhash_batch(pixels: np.ndarray) -> np.ndarray:
+    """dHash for a (N, 8, 9) float32 stack."""
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    return _pack_bits(bits.reshape(len(pixels), -1))
+
+
+def hash_thumbnails(thumbs: Iterable[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    thumbs = list(thumbs)
+    if not thumbs:
+        return np.empty(0, np.uint64), np.empty(0, np.uint64)
+    large = np.stack([t[0] for t in thumbs])
+    small = np.stack([t[1] for t in thumbs])
+    return phash_batch(large), dhash_batch(small)
+
+
+def hash_images(blobs: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """(phashes, dhashes) for a batch of encoded images."""
+    return hash_thumbnails(thumbnails_from_bytes(b) for b in blobs)
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    # SWAR popcount; NumPy < 2.0 has no bitwise_count ufunc.
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def hamming(hashes: np.ndarray, query: int) -> np.ndarray:
+    """Bit distance from each of ``hashes`` (uint64) to ``query``."""
+    return _popcount64(np.bitwise_xor(hashes, np.uint64(query)))
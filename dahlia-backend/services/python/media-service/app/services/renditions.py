@@ -0,0 +1,294 @@
+"""Multi-resolution rendition pipeline for uploaded images.
+
+The source is decoded exactly once. For JPEG the decoder runs in draft mode,
+so the DCT stage downsamples to the smallest scale that still covers the
+largest rendition and a 40 MP photo is never materialised at full resolution.
+Renditions are then derived largest-first, each from the previous uncropped
+output, and encoded in parallel (Pillow releases the GIL while encoding).
+EXIF orientation is applied to the small outputs rather than the decoded frame.
+
+The decoded frame is also fingerprinted (pHash/dHash) so uploads can be checked
+against the near-duplicate index before any rendition work is done.
+
+Pillow and NumPy are imported on the first decode, not with this module, so
+routes that only store or stream originals never load them.
+"""
+
+import hashlib
+import io
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+CONTENT_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+_ORIENTATION_TAG = 0x0112
+# EXIF orientation -> Image.Transpose member.
+_TRANSPOSE = {
+    2: "FLIP_LEFT_RIGHT",
+    3: "ROTATE_180",
+    4: "FLIP_TOP_BOTTOM",
+    5: "TRANSPOSE",
+    6: "ROTATE_270",
+    7: "TRANSVERSE",
+    8: "ROTATE_90",
+}
+SWAPS_AXES = frozenset({5, 6, 7, 8})
+
+# Maps (phash, dhash) to the source hash of an already stored near-duplicate.
+DuplicateLookup = Callable[[int, int], Optional[str]]
+
+
+class ImageDecodeError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class RenditionSpec:
+    """Target geometry for one rendition.
+
+    With ``crop`` the output is exactly ``width`` x ``height`` (center crop);
+    otherwise the image is scaled to fit inside the box, where a missing
+    ``height`` means only the width is bounded. Images are never upscaled.
+    """
+
+    name: str
+    width: int
+    height: Optional[int] = None
+    crop: bool = False
+    format: str = "JPEG"
+    quality: int = 82
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self.format]
+
+    def scale_for(self, size: Tuple[int, int]) -> float:
+        src_w, src_h = size
+        if self.crop:
+            return min(1.0, max(self.width / src_w, self.height / src_h))
+        if self.height is None:
+            return min(1.0, self.width / src_w)
+        return min(1.0, self.width / src_w, self.height / src_h)
+
+    def output_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        src_w, src_h = size
+        if self.crop:
+            return min(self.width, src_w), min(self.height, src_h)
+        scale = self.scale_for(size)
+        return max(1, round(src_w * scale)), max(1, round(src_h * scale))
+
+
+DEFAULT_RENDITIONS = (
+    RenditionSpec("full", 2048, 2048, quality=85),
+    RenditionSpec("feed", 1080, quality=82),
+    RenditionSpec("grid", 320, 320, crop=True, quality=80),
+    RenditionSpec("avatar", 150, 150, crop=True, quality=80),
+)
+
+
+@dataclass
+class Rendition:
+    spec: RenditionSpec
+    width: int
+    height: int
+    data: bytes
+
+    @property
+    def content_type(self) -> str:
+        return self.spec.content_type
+
+
+@dataclass
+class DecodedImage:
+    image: "Image.Image"
+    orientation: int
+    # Oriented (as displayed) dimensions of the original upload.
+    source_size: Tuple[int, int]
+
+    @property
+    def swaps_axes(self) -> bool:
+        return self.orientation in SWAPS_AXES
+
+
+@dataclass
+class PipelineResult:
+    source_hash: str
+    source_size: Tuple[int, int]
+    decoded_size: Tuple[int, int]
+    renditions: List[Rendition]
+    timings: Dict[str, float] = field(default_factory=dict)
+    phash: int = 0
+    dhash: int = 0
+    # Set when the upload matched an existing image; no renditions are produced.
+    duplicate_of: Optional[str] = None
+
+
+def source_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def oriented_size(size: Tuple[int, int], swap: bool) -> Tuple[int, int]:
+    """Swap ``size`` between raw and displayed axes for EXIF orientations 5-8."""
+    return (size[1], size[0]) if swap else size
+
+
+def decode_image(data: bytes, specs: Sequence[RenditionSpec] = DEFAULT_RENDITIONS) -> DecodedImage:
+    """Decode ``data`` once, at the smallest scale that still serves ``specs``."""
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        orientation = image.getexif().get(_ORIENTATION_TAG, 1)
+        swap = orientation in SWAPS_AXES
+        source_size = oriented_size(image.size, swap)
+
+        scale = max(spec.scale_for(source_size) for spec in specs)
+        needed = oriented_size(
+            (math.ceil(source_size[0] * scale), math.ceil(source_size[1] * scale)), swap
+        )
+        # No-op for formats without a reduced-resolution decoder.
+        image.draft("RGB", needed)
+        image.load()
+    except Image.DecompressionBombError as exc:
+        raise ImageDecodeError(str(exc)) from exc
+    except (OSError, SyntaxError) as exc:
+        raise ImageDecodeError(f"cannot decode image: {exc}") from exc
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return DecodedImage(image=image, orientation=orientation, source_size=source_size)
+
+
+def _oriented(image: "Image.Image", orientation: int) -> "Image.Image":
+    from PIL import Image
+
+    method = _TRANSPOSE.get(orientation)
+    return image if method is None else image.transpose(Image.Transpose[method])
+
+
+def fingerprint(image: "Image.Image", orientation: int = 1) -> Tuple[int, int]:
+    """(phash, dhash) of the image as displayed."""
+    from PIL import Image
+
+    from app.services.phash import PHASH_SIZE, hash_thumbnails, thumbnails
+
+    thumb = image.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    thumb = _oriented(thumb, orientation)
+    phashes, dhashes = hash_thumbnails([thumbnails(thumb)])
+    return int(phashes[0]), int(dhashes[0])
+
+
+def resize_for(base: "Image.Image", spec: RenditionSpec, swap: bool) -> "Image.Image":
+    """Resize the raw (unrotated) ``base`` for ``spec`` in oriented coordinates."""
+    from PIL import Image
+
+    size = oriented_size(base.size, swap)
+    scale = spec.scale_for(size)
+    out_w, out_h = spec.output_size(size)
+    box = None
+    if spec.crop:
+        crop_w, crop_h = out_w / scale, out_h / scale
+        left, top = (size[0] - crop_w) / 2, (size[1] - crop_h) / 2
+        box = (left, top, left + crop_w, top + crop_h)
+        if swap:
+            box = (box[1], box[0], box[3], box[2])
+    target = oriented_size((out_w, out_h), swap)
+    if target == base.size and box is None:
+        return base
+    return base.resize(target, Image.Resampling.LANCZOS, box=box, reducing_gap=2.0)
+
+
+def encode(image: "Image.Image", spec: RenditionSpec, orientation: int = 1) -> Rendition:
+    image = _oriented(image, orientation)
+    buf = io.BytesIO()
+    options = {"quality": spec.quality}
+    if spec.format == "JPEG":
+        options["progressive"] = image.width >= 1080
+    image.save(buf, format=spec.format, **options)
+    return Rendition(spec=spec, width=image.width, height=image.height, data=buf.getvalue())
+
+
+def resize_cascade(decoded: DecodedImage, specs: Sequence[RenditionSpec]) -> List[Tuple[RenditionSpec, "Image.Image"]]:
+    """Resize largest-first, feeding each uncropped output into the next step."""
+    ordered = sorted(specs, key=lambda s: s.scale_for(decoded.source_size), reverse=True)
+    base = decoded.image
+    resized = []
+    for spec in ordered:
+        image = resize_for(base, spec, decoded.swaps_axes)
+        if not spec.crop:
+            base = image
+        resized.append((spec, image))
+    return resized
+
+
+def process_image(
+    data: bytes,
+    specs: Sequence[RenditionSpec] = DEFAULT_RENDITIONS,
+    executor: Optional[Executor] = None,
+    encode_threads: int = 4,
+    lookup: Optional[DuplicateLookup] = None,
+) -> PipelineResult:
+    """Decode, resize and encode all ``specs``, recording per-stage timings.
+
+    With ``lookup``, a near-duplicate upload returns right after decoding with
+    ``duplicate_of`` set and no renditions.
+    """
+    started = time.perf_counter()
+    decoded = decode_image(data, specs)
+    phash, dhash = fingerprint(decoded.image, decoded.orientation)
+    decoded_at = time.perf_counter()
+    decoded_size = oriented_size(decoded.image.size, decoded.swaps_axes)
+    duplicate_of = lookup(phash, dhash) if lookup is not None else None
+    if duplicate_of is not None:
+        return PipelineResult(
+            source_hash=source_hash(data),
+            source_size=decoded.source_size,
+            decoded_size=decoded_size,
+            renditions=[],
+            timings={
+                "decode_ms": (decoded_at - started) * 1000,
+                "resize_ms": 0.0,
+                "encode_ms": 0.0,
+                "total_ms": (time.perf_counter() - started) * 1000,
+            },
+            phash=phash,
+            dhash=dhash,
+            duplicate_of=duplicate_of,
+        )
+    resized = resize_cascade(decoded, specs)
+    resized_at = time.perf_counter()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(encode_threads, len(resized))))
+    try:
+        futures = {
+            spec.name: executor.submit(encode, image, spec, decoded.orientation)
+            for spec, image in resized
+        }
+        by_name = {name: future.result() for name, future in futures.items()}
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+    finished = time.perf_counter()
+
+    return PipelineResult(
+        source_hash=source_hash(data),
+        source_size=decoded.source_size,
+        decoded_size=decoded_size,
+        renditions=[by_name[spec.name] for spec in specs],
+        timings={
+            "decode_ms": (decoded_at - started) * 1000,
+            "resize_ms": (resized_at - decoded_at) * 1000,
+            "encode_ms": (finished - resized_at) * 1000,
+            "total_ms": (finished - started) * 1000,
+        },
+        phash=phash,
+        dhash=dhash,
+    )
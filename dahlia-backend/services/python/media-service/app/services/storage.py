@@ -0,0 +1,302 @@
+"""Object storage backends for originals and other stored media.
+
+Reads are always ranged and chunked so a worker holds at most one chunk of
+an object at a time. ``S3ObjectStore`` talks to MinIO (or any S3 endpoint);
+``LocalObjectStore`` is the on-node tier and can hand out file locations for
+serving from an ``mmap``.
+
+Both backends also speak S3-style multipart uploads (create, upload part,
+complete, abort) so large media can be written one bounded part at a time.
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Optional, Sequence, Tuple
+
+
+class ObjectNotFound(KeyError):
+    pass
+
+
+@dataclass
+class ObjectStat:
+    size: int
+    content_type: str
+    etag: Optional[str] = None
+
+
+@dataclass
+class FileLocation:
+    path: str
+    offset: int
+    size: int
+
+
+def _guess_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def check_key(key: str) -> str:
+    parts = key.split("/")
+    # Dot segments cover traversal and the local store's temp and staging files.
+    if not key or key.startswith("/") or any(not p or p.startswith(".") for p in parts):
+        raise ObjectNotFound(key)
+    return key
+
+
+def multipart_etag(part_md5s: Sequence[bytes]) -> str:
+    """The ETag S3 (and MinIO) assign to a completed multipart object."""
+    return f"{hashlib.md5(b''.join(part_md5s)).hexdigest()}-{len(part_md5s)}"
+
+
+class LocalObjectStore:
+    def __init__(self, root: str, chunk_size: int):
+        self.root = root
+        self.chunk_size = chunk_size
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, check_key(key))
+
+    async def stat(self, key: str) -> ObjectStat:
+        try:
+            st = await asyncio.to_thread(os.stat, self._path(key))
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+        return ObjectStat(size=st.st_size, content_type=_guess_type(key), etag=f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def locate(self, key: str) -> FileLocation:
+        path = self._path(key)
+        try:
+            return FileLocation(path=path, offset=0, size=os.path.getsize(path))
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+        with f:
+            position = start
+            while position <= end:
+                length = min(self.chunk_size, end - position + 1)
+                chunk = await asyncio.to_thread(os.pread, f.fileno(), length, position)
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return await asyncio.to_thread(_read_file, self._path(key))
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        await asyncio.to_thread(_write_atomic, self._path(key), data)
+
+    def _staging(self, upload_id: str) -> str:
+        return os.path.join(self.root, ".multipart", check_key(upload_id))
+
+    async def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        check_key(key)
+        upload_id = uuid.uuid4().hex
+        await asyncio.to_thread(os.makedirs, self._staging(upload_id))
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, number: int, body: BinaryIO, size: int) -> str:
+        staging = self._staging(upload_id)
+        if not os.path.isdir(staging):
+            raise ObjectNotFound(upload_id)
+        return await asyncio.to_thread(_copy_atomic, os.path.join(staging, f"{number:05d}"), body)
+
+    async def complete_multipart(self, key: str, upload_id: str, parts: Sequence[Tuple[int, str]]) -> str:
+        staging = self._staging(upload_id)
+        paths = [os.path.join(staging, f"{number:05d}") for number, _ in parts]
+        try:
+            await asyncio.to_thread(_concatenate, self._path(key), paths)
+        except FileNotFoundError:
+            raise ObjectNotFound(upload_id)
+        await asyncio.to_thread(shutil.rmtree, staging, True)
+        return multipart_etag([bytes.fromhex(etag) for _, etag in parts])
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        await asyncio.to_thread(shutil.rmtree, self._staging(upload_id), True)
+
+
+class S3ObjectStore:
+    def __init__(
+        self,
+        bucket: str,
+        chunk_size: int,
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        client=None,
+    ):
+        if client is None:
+            import boto3
+            from botocore.config import Config
+
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=Config(signature_version="s3v4", max_pool_connections=32),
+            )
+        self.client = client
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+
+    def _not_found(self, exc: Exception) -> bool:
+        return _error_code(exc) in ("404", "NoSuchKey", "NotFound", "NoSuchUpload")
+
+    async def stat(self, key: str) -> ObjectStat:
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=check_key(key))
+        except Exception as exc:
+            if self._not_found(exc):
+                raise ObjectNotFound(key)
+            raise
+        return ObjectStat(
+            size=head["ContentLength"],
+            content_type=head.get("ContentType") or _guess_type(key),
+            etag=head.get("ETag", "").strip('"') or None,
+        )
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        try:
+            obj = await asyncio.to_thread(
+                self.client.get_object, Bucket=self.bucket, Key=check_key(key), Range=f"bytes={start}-{end}"
+            )
+        except Exception as exc:
+            if self._not_found(exc):
+                raise ObjectNotFound(key)
+            raise
+        body = obj["Body"]
+        try:
+            while chunk := await asyncio.to_thread(body.read, self.chunk_size):
+                yield chunk
+        finally:
+            # Releases the pooled connection even if the client went away mid-stream.
+            body.close()
+
+    async def get(self, key: str) -> bytes:
+        try:
+            obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=check_key(key))
+        except Exception as exc:
+            if self._not_found(exc):
+                raise ObjectNotFound(key)
+            raise
+        return await asyncio.to_thread(obj["Body"].read)
+
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=check_key(key),
+            Body=bytes(data),
+            ContentType=content_type or _guess_type(key),
+        )
+
+    async def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        response = await asyncio.to_thread(
+            self.client.create_multipart_upload,
+            Bucket=self.bucket,
+            Key=check_key(key),
+            ContentType=content_type or _guess_type(key),
+        )
+        return response["UploadId"]
+
+    async def upload_part(self, key: str, upload_id: str, number: int, body: BinaryIO, size: int) -> str:
+        try:
+            response = await asyncio.to_thread(
+                self.client.upload_part,
+                Bucket=self.bucket,
+                Key=check_key(key),
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body,
+                ContentLength=size,
+            )
+        except Exception as exc:
+            if self._not_found(exc):
+                raise ObjectNotFound(upload_id)
+            raise
+        return response["ETag"].strip('"')
+
+    async def complete_multipart(self, key: str, upload_id: str, parts: Sequence[Tuple[int, str]]) -> str:
+        try:
+            response = await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket,
+                Key=check_key(key),
+                UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": n, "ETag": f'"{etag}"'} for n, etag in parts]},
+            )
+        except Exception as exc:
+            if self._not_found(exc):
+                raise ObjectNotFound(upload_id)
+            raise
+        return response["ETag"].strip('"')
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        try:
+            await asyncio.to_thread(
+                self.client.abort_multipart_upload, Bucket=self.bucket, Key=check_key(key), UploadId=upload_id
+            )
+        except Exception as exc:
+            if not self._not_found(exc):
+                raise
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _copy_atomic(path: str, body: BinaryIO) -> str:
+    """Write ``body`` to ``path`` atomically; returns its MD5."""
+    md5 = hashlib.md5()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+    with os.fdopen(fd, "wb") as out:
+        while chunk := body.read(1024 * 1024):
+            md5.update(chunk)
+            out.write(chunk)
+    os.replace(tmp, path)
+    return md5.hexdigest()
+
+
+def _concatenate(path: str, parts: Sequence[str]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+    with os.fdopen(fd, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(tmp, path)
+
+
+def original_key(source_hash: str) -> str:
+    return f"originals/{source_hash[:2]}/{source_hash}"
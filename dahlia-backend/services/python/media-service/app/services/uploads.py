@@ -0,0 +1,476 @@
+"""Resumable chunked uploads.
+
+A client opens a session with the total size, PUTs numbered parts in any
+order (resending any that were cut off), asks which parts have landed, and
+completes. A part is received through one fixed ``buffer_bytes`` buffer.
+Each time the buffer fills, a worker thread hashes it (MD5, SHA-256) and
+appends it to the part's in-memory copy, which is then handed to the object
+store's multipart upload. Parts in flight are bounded in count and in bytes,
+so their memory is too. With ``spool_dir`` set, a part instead spills to a
+temporary file there beyond one buffer, trading disk writes for memory. On
+complete the store assembles the parts, and the resulting ETag is checked
+against the part digests.
+
+``sweep`` aborts the multipart uploads of sessions that expired before they
+were completed, so abandoned parts do not linger in the bucket.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+
+from app.services.storage import ObjectNotFound, multipart_etag
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects non-final parts below 5 MiB and uploads with more than 10k parts.
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,8}$")
+_MD5_HEX = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadNotFound(KeyError):
+    pass
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+class UploadBusy(Exception):
+    pass
+
+
+class UploadCorrupted(Exception):
+    pass
+
+
+@dataclass
+class PartInfo:
+    number: int
+    size: int
+    etag: str
+    sha256: str
+
+    def encode(self) -> str:
+        return f"{self.etag}:{self.sha256}:{self.size}"
+
+    @classmethod
+    def decode(cls, number: int, raw: str) -> "PartInfo":
+        etag, sha256, size = raw.split(":")
+        return cls(number=number, size=int(size), etag=etag, sha256=sha256)
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    key: str
+    multipart_id: str
+    size: int
+    part_size: int
+    content_type: str
+    expires_at: float
+    parts: Dict[int, PartInfo] = field(default_factory=dict)
+    # ETag of the assembled object once completed; completing again returns it.
+    etag: Optional[str] = None
+
+    @property
+    def part_count(self) -> int:
+        return max(1, math.ceil(self.size / self.part_size))
+
+    def part_length(self, number: int) -> int:
+        if number < self.part_count:
+            return self.part_size
+        return self.size - self.part_size * (self.part_count - 1)
+
+    def missing(self) -> List[int]:
+        return [n for n in range(1, self.part_count + 1) if n not in self.parts]
+
+    def checksum(self) -> str:
+        """SHA-256 over the concatenated part SHA-256 digests, in part order."""
+        digests = b"".join(bytes.fromhex(self.parts[n].sha256) for n in sorted(self.parts))
+        return hashlib.sha256(digests).hexdigest()
+
+
+_SESSION_FIELDS = ("key", "multipart_id", "size", "part_size", "content_type", "expires_at")
+
+# (upload_id, key, multipart_id) of a session that expired without completing.
+Expired = Tuple[str, str, str]
+
+
+class MemorySessionStore:
+    """Sessions for a single replica; use ``RedisSessionStore`` behind a load balancer."""
+
+    def __init__(self):
+        self._sessions: Dict[str, UploadSession] = {}
+
+    async def create(self, session: UploadSession) -> None:
+        self._sessions[session.upload_id] = session
+
+    async def get(self, upload_id: str) -> Optional[UploadSession]:
+        session = self._sessions.get(upload_id)
+        if session is None or session.expires_at <= time.time():
+            return None
+        return session
+
+    async def add_part(self, upload_id: str, part: PartInfo) -> None:
+        session = self._sessions.get(upload_id)
+        if session is not None:
+            session.parts[part.number] = part
+
+    async def finish(self, upload_id: str, etag: str) -> None:
+        session = self._sessions.get(upload_id)
+        if session is not None:
+            session.etag = etag
+
+    async def delete(self, upload_id: str) -> None:
+        self._sessions.pop(upload_id, None)
+
+    async def expired(self, now: float) -> List[Expired]:
+        """Drop sessions past their expiry; returns those whose multipart upload is still open."""
+        found = []
+        for upload_id in [u for u, s in self._sessions.items() if s.expires_at <= now]:
+            session = self._sessions.pop(upload_id)
+            if session.etag is None:
+                found.append((upload_id, session.key, session.multipart_id))
+        return found
+
+    async def forget(self, upload_id: str) -> None:
+        pass
+
+
+class RedisSessionStore:
+    """Sessions as Redis hashes, so any pod can take the next part.
+
+    A session hash expires with its session. Until the session completes, its
+    upload id also sits in the ``expiry`` sorted set, scored by expiry time.
+    Its key and multipart id sit in the ``multipart`` hash, which does not
+    expire. Together they let any pod abort the multipart upload once the
+    session hash has gone.
+    """
+
+    prefix = "media:upload:"
+    expiry = "media:uploads:expiry"
+    multipart = "media:uploads:multipart"
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def create(self, session: UploadSession) -> None:
+        name = self.prefix + session.upload_id
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(name, mapping={f: str(getattr(session, f)) for f in _SESSION_FIELDS})
+            pipe.expireat(name, int(session.expires_at))
+            pipe.zadd(self.expiry, {session.upload_id: session.expires_at})
+            pipe.hset(self.multipart, session.upload_id, f"{session.key}\n{session.multipart_id}")
+            await pipe.execute()
+
+    async def get(self, upload_id: str) -> Optional[UploadSession]:
+        raw = await self.redis.hgetall(self.prefix + upload_id)
+        if not raw:
+            return None
+        fields = {_text(k): _text(v) for k, v in raw.items()}
+        session = UploadSession(
+            upload_id=upload_id,
+            key=fields["key"],
+            multipart_id=fields["multipart_id"],
+            size=int(fields["size"]),
+            part_size=int(fields["part_size"]),
+            content_type=fields["content_type"],
+            expires_at=float(fields["expires_at"]),
+            etag=fields.get("etag"),
+        )
+        for name, value in fields.items():
+            if name.startswith("part:"):
+                number = int(name[5:])
+                session.parts[number] = PartInfo.decode(number, value)
+        return session
+
+    async def add_part(self, upload_id: str, part: PartInfo) -> None:
+        await self.redis.hset(self.prefix + upload_id, f"part:{part.number}", part.encode())
+
+    async def finish(self, upload_id: str, etag: str) -> None:
+        await self.redis.hset(self.prefix + upload_id, "etag", etag)
+        await self.forget(upload_id)
+
+    async def delete(self, upload_id: str) -> None:
+        await self.redis.delete(self.prefix + upload_id)
+        await self.forget(upload_id)
+
+    async def expired(self, now: float) -> List[Expired]:
+        upload_ids = [_text(u) for u in await self.redis.zrangebyscore(self.expiry, 0, now)]
+        if not upload_ids:
+            return []
+        found = []
+        for upload_id, raw in zip(upload_ids, await self.redis.hmget(self.multipart, upload_ids)):
+            if raw is None:
+                await self.forget(upload_id)
+                continue
+            key, multipart_id = _text(raw).split("\n", 1)
+            found.append((upload_id, key, multipart_id))
+        return found
+
+    async def forget(self, upload_id: str) -> None:
+        """Stop tracking ``upload_id`` for expiry; its multipart upload was completed or aborted."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(self.expiry, upload_id)
+            pipe.hdel(self.multipart, upload_id)
+            await pipe.execute()
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+@dataclass
+class CompletedUpload:
+    key: str
+    size: int
+    etag: str
+    checksum: str
+
+
+def upload_key(upload_id: str, filename: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return f"uploads/{upload_id[:2]}/{upload_id}{ext if _EXTENSION.match(ext) else ''}"
+
+
+class _ReceivedPart:
+    """A part's bytes as received, in memory or spooled under ``spool_dir``, and their digests."""
+
+    def __init__(self, buffer_bytes: int, spool_dir: Optional[str]):
+        if spool_dir is None:
+            self.file: BinaryIO = io.BytesIO()
+        else:
+            self.file = tempfile.SpooledTemporaryFile(max_size=buffer_bytes, dir=spool_dir)
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def append(self, data: bytearray) -> None:
+        self.md5.update(data)
+        self.sha256.update(data)
+        self.file.write(data)
+
+
+class UploadManager:
+    """Drives sessions against an object store's multipart API.
+
+    ``parts_per_session`` bounds how many parts one session may receive at
+    once; further PUTs for that session wait. ``max_parts_in_flight`` and
+    ``max_bytes_in_flight`` bound parts across all sessions; beyond either a
+    PUT is refused with ``UploadBusy``. A part in flight holds its length plus
+    one buffer in memory, or at most ``2 * buffer_bytes`` with ``spool_dir``.
+    """
+
+    def __init__(
+        self,
+        objects,
+        sessions,
+        part_size: int,
+        max_part_size: int,
+        max_upload_bytes: int,
+        session_ttl_seconds: int,
+        parts_per_session: int = 1,
+        max_parts_in_flight: int = 32,
+        max_bytes_in_flight: int = 256 * 1024 * 1024,
+        buffer_bytes: int = 1024 * 1024,
+        spool_dir: Optional[str] = None,
+        sweep_interval_seconds: float = 600.0,
+    ):
+        self.objects = objects
+        self.sessions = sessions
+        self.part_size = part_size
+        self.max_part_size = max_part_size
+        self.max_upload_bytes = max_upload_bytes
+        self.session_ttl_seconds = session_ttl_seconds
+        self.parts_per_session = parts_per_session
+        self.max_parts_in_flight = max_parts_in_flight
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self.buffer_bytes = buffer_bytes
+        self.spool_dir = spool_dir
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._in_flight = 0
+        self._bytes_in_flight = 0
+        self._slots: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def create(
+        self,
+        size: int,
+        content_type: str,
+        filename: Optional[str] = None,
+        part_size: Optional[int] = None,
+    ) -> UploadSession:
+        if size <= 0 or size > self.max_upload_bytes:
+            raise UploadRejected(f"size must be between 1 and {self.max_upload_bytes} bytes")
+        part_size = part_size or self.part_size
+        # Grow the part size rather than exceed the part-count limit.
+        part_size = max(part_size, math.ceil(size / MAX_PARTS))
+        if part_size < MIN_PART_SIZE and size > part_size:
+            raise UploadRejected(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        if part_size > self.max_part_size:
+            raise UploadRejected(f"part_size must be at most {self.max_part_size} bytes")
+
+        upload_id = uuid.uuid4().hex
+        key = upload_key(upload_id, filename)
+        multipart_id = await self.objects.create_multipart(key, content_type)
+        session = UploadSession(
+            upload_id=upload_id,
+            key=key,
+            multipart_id=multipart_id,
+            size=size,
+            part_size=part_size,
+            content_type=content_type,
+            expires_at=time.time() + self.session_ttl_seconds,
+        )
+        await self.sessions.create(session)
+        return session
+
+    async def status(self, upload_id: str) -> UploadSession:
+        session = await self.sessions.get(upload_id)
+        if session is None:
+            raise UploadNotFound(upload_id)
+        return session
+
+    async def put_part(
+        self,
+        upload_id: str,
+        number: int,
+        body: AsyncIterator[bytes],
+        sha256: Optional[str] = None,
+    ) -> PartInfo:
+        session = await self.status(upload_id)
+        if session.etag is not None:
+            raise UploadRejected("upload already completed")
+        if not 1 <= number <= session.part_count:
+            raise UploadRejected(f"part number must be between 1 and {session.part_count}")
+        if self._in_flight >= self.max_parts_in_flight:
+            raise UploadBusy("too many parts in flight")
+        # Reserved up front, for parts waiting on their session's slot too. A
+        # lone part larger than the budget is still let through.
+        length = session.part_length(number)
+        if self._bytes_in_flight and self._bytes_in_flight + length > self.max_bytes_in_flight:
+            raise UploadBusy("too many bytes in flight")
+
+        slot = self._slots.get(upload_id)
+        if slot is None:
+            slot = self._slots[upload_id] = asyncio.Semaphore(self.parts_per_session)
+        self._in_flight += 1
+        self._bytes_in_flight += length
+        try:
+            async with slot:
+                return await self._put_part(session, number, body, sha256)
+        finally:
+            self._in_flight -= 1
+            self._bytes_in_flight -= length
+
+    async def _receive(self, number: int, expected: int, body: AsyncIterator[bytes]) -> _ReceivedPart:
+        part = _ReceivedPart(self.buffer_bytes, self.spool_dir)
+        buf = bytearray()
+        received = 0
+        try:
+            async for chunk in body:
+                received += len(chunk)
+                if received > expected:
+                    raise UploadRejected(f"part {number} must be {expected} bytes")
+                buf += chunk
+                if len(buf) >= self.buffer_bytes:
+                    await asyncio.to_thread(part.append, buf)
+                    buf = bytearray()
+            if received != expected:
+                raise UploadRejected(f"part {number} must be {expected} bytes, got {received}")
+            if buf:
+                await asyncio.to_thread(part.append, buf)
+            part.file.seek(0)
+        except BaseException:
+            part.file.close()
+            raise
+        return part
+
+    async def _put_part(
+        self, session: UploadSession, number: int, body: AsyncIterator[bytes], sha256: Optional[str]
+    ) -> PartInfo:
+        expected = session.part_length(number)
+        received = await self._receive(number, expected, body)
+        md5, digest = received.md5.hexdigest(), received.sha256.hexdigest()
+        try:
+            etag = await self.objects.upload_part(session.key, session.multipart_id, number, received.file, expected)
+        except ObjectNotFound:
+            raise UploadNotFound(session.upload_id)
+        finally:
+            received.file.close()
+        # A non-MD5 ETag (e.g. SSE-KMS) can't be checked; the SHA-256 still can.
+        if _MD5_HEX.match(etag) and etag != md5:
+            raise UploadRejected(f"part {number} was corrupted in transit")
+        if sha256 is not None and sha256.lower() != digest:
+            raise UploadRejected(f"part {number} does not match its SHA-256")
+
+        part = PartInfo(number=number, size=expected, etag=etag, sha256=digest)
+        await self.sessions.add_part(session.upload_id, part)
+        return part
+
+    async def complete(self, upload_id: str, checksum: Optional[str] = None) -> CompletedUpload:
+        session = await self.status(upload_id)
+        if session.etag is not None:
+            return CompletedUpload(session.key, session.size, session.etag, session.checksum())
+        missing = session.missing()
+        if missing:
+            raise UploadRejected(f"missing parts: {missing[:20]}")
+        expected_checksum = session.checksum()
+        if checksum is not None and checksum.lower() != expected_checksum:
+            raise UploadRejected("checksum does not match the uploaded parts")
+
+        parts = [(n, session.parts[n].etag) for n in sorted(session.parts)]
+        try:
+            etag = await self.objects.complete_multipart(session.key, session.multipart_id, parts)
+        except ObjectNotFound:
+            raise UploadNotFound(upload_id)
+        if all(_MD5_HEX.match(e) for _, e in parts):
+            if etag != multipart_etag([bytes.fromhex(e) for _, e in parts]):
+                raise UploadCorrupted(f"assembled object {session.key} does not match its parts")
+        await self.sessions.finish(upload_id, etag)
+        return CompletedUpload(session.key, session.size, etag, expected_checksum)
+
+    async def abort(self, upload_id: str) -> None:
+        session = await self.status(upload_id)
+        if session.etag is None:
+            await self.objects.abort_multipart(session.key, session.multipart_id)
+        await self.sessions.delete(upload_id)
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Abort the multipart uploads of sessions expired by ``now``; returns how many were aborted."""
+        aborted = 0
+        for upload_id, key, multipart_id in await self.sessions.expired(time.time() if now is None else now):
+            await self.objects.abort_multipart(key, multipart_id)
+            await self.sessions.forget(upload_id)
+            aborted += 1
+        return aborted
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("sweeping expired uploads failed; retrying next interval")
+
+    def start(self) -> None:
+        self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
@@ -0,0 +1,296 @@
+"""Process pool for CPU-bound image work.
+
+Each upload is decoded in one worker, which copies the pixels into a
+``SharedMemory`` segment. Renditions are then resized and encoded by separate
+workers that map the same segment, so only the segment name and the encoded
+outputs cross process boundaries. The parent names and owns every segment and
+unlinks it when the job finishes, even if the worker that created it died.
+The decode worker also fingerprints the frame, so a near-duplicate upload is
+rejected before any rendition work is scheduled.
+
+A worker that dies mid-job (OOM on a decompression bomb, a segfault in a
+codec) breaks the whole ``ProcessPoolExecutor``. The pool then replaces the
+executor, and the jobs that were running on it fail with ``WorkerCrashed``.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import secrets
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Sequence, Set, Tuple
+
+from app.core.metrics import Counter
+from app.services.renditions import (
+    DEFAULT_RENDITIONS,
+    SWAPS_AXES,
+    DuplicateLookup,
+    PipelineResult,
+    Rendition,
+    RenditionSpec,
+    decode_image,
+    encode,
+    fingerprint,
+    oriented_size,
+    resize_for,
+    source_hash,
+)
+
+pool_restarts = Counter("media_worker_pool_restarts_total", "Process pools replaced after a worker died.")
+
+
+class PoolSaturated(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"image pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PoolClosed(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    def __init__(self):
+        super().__init__("an image worker crashed; the pool was restarted")
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    shm_name: str
+    size: Tuple[int, int]
+    orientation: int
+    source_size: Tuple[int, int]
+    decode_ms: float
+    phash: int
+    dhash: int
+
+
+def _init_worker(max_image_pixels: int) -> None:
+    # The parent decides when workers stop; don't let terminal or pod signals
+    # kill them mid-job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+
+def _decode_to_shared(data: bytes, specs: Sequence[RenditionSpec], shm_name: str) -> SharedFrame:
+    started = time.perf_counter()
+    decoded = decode_image(data, specs)
+    phash, dhash = fingerprint(decoded.image, decoded.orientation)
+    pixels = decoded.image.tobytes()
+    shm = shared_memory.SharedMemory(name=shm_name, create=True, size=len(pixels))
+    try:
+        shm.buf[: len(pixels)] = pixels
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedFrame(
+        shm_name=shm.name,
+        size=decoded.image.size,
+        orientation=decoded.orientation,
+        source_size=decoded.source_size,
+        decode_ms=(time.perf_counter() - started) * 1000,
+        phash=phash,
+        dhash=dhash,
+    )
+
+
+def _render_shared(frame: SharedFrame, spec: RenditionSpec) -> Tuple[Rendition, float, float]:
+    from PIL import Image
+
+    shm = shared_memory.SharedMemory(name=frame.shm_name)
+    try:
+        started = time.perf_counter()
+        base = Image.frombuffer("RGB", frame.size, shm.buf, "raw", "RGB", 0, 1)
+        image = resize_for(base, spec, frame.orientation in SWAPS_AXES)
+        if image is base:
+            image = base.copy()
+        del base
+        resized = time.perf_counter()
+        rendition = encode(image, spec, frame.orientation)
+        encoded = time.perf_counter()
+    finally:
+        shm.close()
+    return rendition, (resized - started) * 1000, (encoded - resized) * 1000
+
+
+def _unlink(name: str) -> None:
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+class ImageWorkerPool:
+    """Bounded process pool with backpressure and graceful draining."""
+
+    def __init__(self, workers: int, max_pending: int, max_image_pixels: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_image_pixels = max_image_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._closed = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._segments: Set[str] = set()
+        # Exponentially weighted job latency, used to size Retry-After.
+        self._avg_job_s = 1.0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["app.services.renditions"])
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.max_image_pixels,),
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace ``broken`` unless another job already did, or the pool is draining."""
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        if not self._closed:
+            self.start()
+            pool_restarts.inc()
+
+    def retry_after(self) -> int:
+        waves = self._pending / max(1, self.workers)
+        return max(1, math.ceil(waves * self._avg_job_s))
+
+    async def process(
+        self,
+        data: bytes,
+        specs: Sequence[RenditionSpec] = DEFAULT_RENDITIONS,
+        lookup: Optional[DuplicateLookup] = None,
+    ) -> PipelineResult:
+        if self._closed or self._executor is None:
+            raise PoolClosed("image pool is shutting down")
+        if self._pending >= self.max_pending:
+            raise PoolSaturated(self.retry_after())
+
+        self._pending += 1
+        self._idle.clear()
+        started = time.perf_counter()
+        executor = self._executor
+        try:
+            return await self._run(executor, data, specs, started, lookup)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise WorkerCrashed() from None
+        finally:
+            elapsed = time.perf_counter() - started
+            self._avg_job_s = 0.8 * self._avg_job_s + 0.2 * elapsed
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+
+    async def _run(
+        self,
+        executor: ProcessPoolExecutor,
+        data: bytes,
+        specs: Sequence[RenditionSpec],
+        started: float,
+        lookup: Optional[DuplicateLookup],
+    ) -> PipelineResult:
+        loop = asyncio.get_running_loop()
+        # Named here so the segment can be unlinked even if its worker dies.
+        shm_name = f"media_{secrets.token_hex(8)}"
+        self._segments.add(shm_name)
+        try:
+            frame = await loop.run_in_executor(executor, _decode_to_shared, data, specs, shm_name)
+            decoded_at = time.perf_counter()
+            duplicate_of = lookup(frame.phash, frame.dhash) if lookup is not None else None
+            if duplicate_of is not None:
+                return PipelineResult(
+                    source_hash=source_hash(data),
+                    source_size=frame.source_size,
+                    decoded_size=oriented_size(frame.size, frame.orientation in SWAPS_AXES),
+                    renditions=[],
+                    timings={
+                        "queue_ms": (decoded_at - started) * 1000 - frame.decode_ms,
+                        "decode_ms": frame.decode_ms,
+                        "resize_ms": 0.0,
+                        "encode_ms": 0.0,
+                        "total_ms": (time.perf_counter() - started) * 1000,
+                    },
+                    phash=frame.phash,
+                    dhash=frame.dhash,
+                    duplicate_of=duplicate_of,
+                )
+            outputs = await asyncio.gather(
+                *(loop.run_in_executor(executor, _render_shared, frame, spec) for spec in specs)
+            )
+        finally:
+            self._segments.discard(shm_name)
+            _unlink(shm_name)
+        finished = time.perf_counter()
+
+        return PipelineResult(
+            source_hash=source_hash(data),
+            source_size=frame.source_size,
+            decoded_size=oriented_size(frame.size, frame.orientation in SWAPS_AXES),
+            renditions=[rendition for rendition, _, _ in outputs],
+            timings={
+                "queue_ms": (decoded_at - started) * 1000 - frame.decode_ms,
+                "decode_ms": frame.decode_ms,
+                # Renditions run concurrently, so the slowest one is the stage cost.
+                "resize_ms": max(resize_ms for _, resize_ms, _ in outputs),
+                "encode_ms": max(encode_ms for _, _, encode_ms in outputs),
+                "total_ms": (finished - started) * 1000,
+            },
+            phash=frame.phash,
+            dhash=frame.dhash,
+        )
+
+    async def drain(self, timeout: float) -> None:
+        """Stop accepting jobs, wait up to ``timeout`` for in-flight ones, then stop workers.
+
+        Workers still busy after ``timeout`` are killed (they ignore SIGTERM),
+        and their jobs fail with ``WorkerCrashed``. The event loop is never
+        blocked on them.
+        """
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            idle = True
+        except asyncio.TimeoutError:
+            idle = False
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            if idle:
+                await asyncio.to_thread(executor.shutdown, wait=True)
+            else:
+                processes = list((executor._processes or {}).values())
+                await asyncio.to_thread(executor.shutdown, wait=False, cancel_futures=True)
+                for process in processes:
+                    if process.is_alive():
+                        process.kill()
+                await asyncio.to_thread(_join, processes, 5.0)
+        for name in list(self._segments):
+            _unlink(name)
+        self._segments.clear()
+
+
+def _join(processes, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
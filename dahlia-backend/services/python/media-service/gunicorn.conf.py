@@ -0,0 +1,71 @@
+"""Production server settings.
+
+A gunicorn master imports the app and the modules in ``preload_modules``, then
+forks the workers. Each worker runs its own uvicorn event loop (uvloop,
+httptools) and its own lifespan, so connections and pools are opened after
+the fork, never shared. Every setting can be overridden from the environment.
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import gc
+import importlib
+import math
+import os
+
+
+def cpu_limit():
+    """CPUs this container may use: its cgroup CPU quota, else the CPUs it may run on."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '9000')}"
+# Pinned: this service keeps its state in the worker process, and every extra
+# worker would hold its own diverging copy. WEB_CONCURRENCY is ignored; scale
+# with replicas.
+workers = 1
+worker_class = "app.core.server.Worker"
+# The app and preload_modules are imported once and shared copy-on-write.
+preload_app = True
+preload_modules = [m for m in os.environ.get("PRELOAD_MODULES", "numpy,PIL.Image").split(",") if m]
+# Connections the kernel queues while every worker is busy, capped by
+# net.core.somaxconn.
+backlog = int(os.environ.get("BACKLOG", 2048))
+# Longer than the ingress's 60s upstream idle timeout, so a worker never
+# closes a connection the proxy is about to reuse.
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", 75))
+# On SIGTERM workers stop accepting and finish in-flight requests for up to
+# this long. Kubernetes sends SIGKILL after 30s.
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 25))
+timeout = int(os.environ.get("WORKER_TIMEOUT_SECONDS", 60))
+# Requests are logged at the ingress.
+accesslog = None
+
+
+def on_starting(server):
+    for module in preload_modules:
+        importlib.import_module(module)
+
+
+def when_ready(server):
+    # Keep the collector from writing to, and so copying, preloaded objects
+    # in every worker.
+    gc.freeze()
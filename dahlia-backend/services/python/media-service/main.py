@@ -1,7 +1,92 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import media, uploads
+from app.core.config import get_settings
+from app.core.metrics import render_latest
+from app.services.cache import DiskTier, RedisMetaTier, RenditionCache
+from app.services.storage import LocalObjectStore, S3ObjectStore
+from app.services.uploads import MemorySessionStore, RedisSessionStore, UploadManager
+from app.services.workers import ImageWorkerPool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+
+    disk = DiskTier(settings.cache_dir, settings.cache_max_bytes)
+    disk.load()
+    redis = None
+    meta = None
+    if settings.redis_url:
+        import redis.asyncio as aioredis
+
+        redis = aioredis.from_url(settings.redis_url)
+        meta = RedisMetaTier(redis, settings.redis_meta_ttl_seconds)
+    app.state.rendition_cache = RenditionCache(disk, meta)
+    if settings.storage_backend == "s3":
+        app.state.objects = S3ObjectStore(
+            settings.s3_bucket,
+            settings.stream_chunk_bytes,
+            endpoint_url=settings.s3_endpoint_url,
+            access_key=settings.s3_access_key,
+            secret_key=settings.s3_secret_key,
+        )
+    else:
+        app.state.objects = LocalObjectStore(settings.storage_dir, settings.stream_chunk_bytes)
+    app.state.uploads = UploadManager(
+        app.state.objects,
+        RedisSessionStore(redis) if redis is not None else MemorySessionStore(),
+        part_size=settings.upload_part_size,
+        max_part_size=settings.upload_max_part_size,
+        max_upload_bytes=settings.upload_max_bytes,
+        session_ttl_seconds=settings.upload_session_ttl_seconds,
+        parts_per_session=settings.upload_parts_per_session,
+        max_parts_in_flight=settings.upload_max_parts_in_flight,
+        max_bytes_in_flight=settings.upload_max_bytes_in_flight,
+        buffer_bytes=settings.upload_buffer_bytes,
+        spool_dir=settings.upload_spool_dir,
+        sweep_interval_seconds=settings.upload_sweep_interval_seconds,
+    )
+    app.state.uploads.start()
+
+    index = None
+    if settings.dedup_enabled:
+        from app.services.dedup import NearDuplicateIndex
 
-app = FastAPI(title="media-service")
+        if settings.phash_index_path:
+            os.makedirs(os.path.dirname(settings.phash_index_path) or ".", exist_ok=True)
+        index = NearDuplicateIndex(settings.phash_index_path, settings.phash_compact_after)
+    app.state.dedup_index = index
+
+    pool = None
+    if settings.worker_processes > 0:
+        pool = ImageWorkerPool(
+            settings.worker_processes, settings.max_pending_jobs, settings.max_image_pixels
+        )
+        pool.start()
+    else:
+        # Images are decoded in this process; pool workers set their own limit.
+        from PIL import Image
+
+        Image.MAX_IMAGE_PIXELS = settings.max_image_pixels
+    app.state.image_pool = pool
+    yield
+    # uvicorn runs lifespan shutdown on SIGTERM once connections have closed.
+    await app.state.uploads.stop()
+    if pool is not None:
+        await pool.drain(settings.drain_timeout_seconds)
+    if index is not None:
+        index.close()
+    if redis is not None:
+        await redis.aclose()
+
+
+app = FastAPI(title="media-service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,10 +96,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(media.router)
+app.include_router(uploads.router)
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9000)
@@ -0,0 +1,68 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import media
+from app.api.media import default_quality
+from app.core.config import get_settings
+from app.services.cache import DiskTier, RedisMetaTier, RenditionCache, RenditionKey, RenditionMeta
+from app.services.renditions import DEFAULT_RENDITIONS
+from app.services.storage import LocalObjectStore
+
+SOURCE = "ab" * 32
+
+
+@pytest.mark.parametrize("spec", DEFAULT_RENDITIONS, ids=lambda spec: spec.name)
+def test_upload_renditions_are_cached_under_the_default_get_key(spec):
+    cached = RenditionKey.for_spec(SOURCE, spec)
+    assert cached is not None
+    requested = RenditionKey(
+        SOURCE,
+        cached.width,
+        cached.format,
+        default_quality(cached.width, cached.format, cached.crop, cached.box),
+        crop=cached.crop,
+        box=cached.box,
+    )
+    assert requested.digest == cached.digest
+    assert requested.spec().output_size((4000, 3000)) == spec.output_size((4000, 3000))
+
+
+def test_shapes_have_distinct_keys():
+    digests = {
+        RenditionKey(SOURCE, 320, "JPEG", 82, crop=crop, box=box).digest
+        for crop, box in ((False, False), (True, False), (False, True))
+    }
+    assert len(digests) == 3
+
+
+def _head_client(tmp_path, redis):
+    app = FastAPI()
+    app.include_router(media.router)
+    app.state.rendition_cache = RenditionCache(DiskTier(str(tmp_path / "cache"), 1024 * 1024), RedisMetaTier(redis, 60))
+    app.state.objects = LocalObjectStore(str(tmp_path / "objects"), 64 * 1024)
+    return TestClient(app)
+
+
+def test_head_is_answered_from_shared_metadata_on_a_disk_miss(tmp_path):
+    redis = fakeredis.FakeAsyncRedis()
+    width = get_settings().rendition_widths[0]
+    key = RenditionKey(SOURCE, width, "JPEG", default_quality(width, "JPEG", False, False))
+    # Rendered by another pod: only its metadata is here, and no original to render from.
+    asyncio.run(RedisMetaTier(redis, 60).put(key.digest, RenditionMeta(width, width // 2, "image/jpeg", 1234)))
+    client = _head_client(tmp_path, redis)
+
+    response = client.head(f"/media/images/{SOURCE}", params={"w": width})
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "1234"
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"] == f'"{key.digest}"'
+
+    response = client.head(f"/media/images/{SOURCE}", params={"w": width}, headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1134-1233/1234"
+
+    assert client.head(f"/media/images/{'cd' * 32}", params={"w": width}).status_code == 404
@@ -0,0 +1,144 @@
+import io
+import os
+import random
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from app.services.dedup import _RECORD, NearDuplicateIndex, write_base
+from app.services.phash import hamming, hash_images
+
+RADIUS = 6
+
+
+def _digest(i: int) -> str:
+    return f"{i:064x}"
+
+
+def _flip(value: int, bits, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def _neighbours(query: int, seed: int = 3):
+    """Hashes at every distance from 0 to 2 * RADIUS of ``query``, plus random ones."""
+    rng = random.Random(seed)
+    hashes = [_flip(query, d, rng) for d in range(2 * RADIUS + 1) for _ in range(20)]
+    hashes += [rng.getrandbits(64) for _ in range(2000)]
+    return hashes
+
+
+def _brute_force(hashes, dhashes, query: int, dquery: int, radius: int, dhash_radius: int):
+    return sorted(
+        _digest(i)
+        for i, (p, d) in enumerate(zip(hashes, dhashes))
+        if bin(p ^ query).count("1") <= radius and bin(d ^ dquery).count("1") <= dhash_radius
+    )
+
+
+def _jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _scene(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)
+    return Image.fromarray(pixels).resize((640, 480), Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(4))
+
+
+def test_hamming_matches_popcount():
+    rng = random.Random(1)
+    hashes = [rng.getrandbits(64) for _ in range(500)]
+    query = rng.getrandbits(64)
+    expected = [bin(h ^ query).count("1") for h in hashes]
+    assert hamming(np.array(hashes, np.uint64), query).tolist() == expected
+
+
+def test_perceptual_hashes_survive_resizing_and_recompression():
+    original = _scene(1)
+    copy = original.resize((400, 300), Image.Resampling.LANCZOS)
+    phashes, dhashes = hash_images([_jpeg(original), _jpeg(copy, quality=60), _jpeg(_scene(2))])
+    assert bin(int(phashes[0]) ^ int(phashes[1])).count("1") <= RADIUS
+    assert bin(int(dhashes[0]) ^ int(dhashes[1])).count("1") <= 10
+    assert bin(int(phashes[0]) ^ int(phashes[2])).count("1") > 2 * RADIUS
+
+
+@pytest.mark.parametrize("compacted", [True, False], ids=["base", "log"])
+def test_lookup_finds_exactly_the_hashes_within_the_radius(tmp_path, compacted):
+    query = 0x0123456789ABCDEF
+    hashes = _neighbours(query)
+    # dHash distances 0..15, so the second check cuts some pHash matches.
+    dhashes = [_flip(query, i % 16, random.Random(i)) for i in range(len(hashes))]
+    index = NearDuplicateIndex(str(tmp_path / "phash.idx"))
+    for i, (p, d) in enumerate(zip(hashes, dhashes)):
+        index.add(_digest(i), p, d)
+    if compacted:
+        index.compact()
+        assert os.path.getsize(tmp_path / "phash.idx.log") == 0
+
+    for radius in (RADIUS - 1, RADIUS, RADIUS + 1):
+        found = index.query(query, query, radius=radius, dhash_radius=10)
+        assert sorted(m.source_hash for m in found) == _brute_force(hashes, dhashes, query, query, radius, 10)
+        assert all(m.phash_distance <= radius and m.dhash_distance <= 10 for m in found)
+        assert [m.phash_distance for m in found] == sorted(m.phash_distance for m in found)
+    # Hashes exactly at the threshold are in, one bit further out are not.
+    distances = {m.phash_distance for m in index.query(query, query, radius=RADIUS, dhash_radius=64)}
+    assert RADIUS in distances and RADIUS + 1 not in distances
+    index.close()
+
+
+def test_base_and_log_reload_after_restart(tmp_path):
+    path = str(tmp_path / "phash.idx")
+    rng = random.Random(5)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    index = NearDuplicateIndex(path)
+    for i, p in enumerate(hashes[:200]):
+        index.add(_digest(i), p, p)
+    index.compact()
+    for i, p in enumerate(hashes[200:], start=200):
+        index.add(_digest(i), p, p)
+    index.close()
+    # A crash mid-append leaves a torn record, which is dropped on replay.
+    with open(path + ".log", "ab") as f:
+        f.write(b"\x01" * 10)
+
+    reloaded = NearDuplicateIndex(path)
+    assert len(reloaded) == 300
+    assert reloaded._base.count == 200
+    for i in (0, 199, 200, 299):
+        assert reloaded.query(hashes[i], hashes[i], radius=0, dhash_radius=0)[0].source_hash == _digest(i)
+    reloaded.close()
+
+
+def test_compaction_folds_the_log_into_a_new_base(tmp_path):
+    path = str(tmp_path / "phash.idx")
+    index = NearDuplicateIndex(path, compact_after=3)
+    rng = random.Random(9)
+    hashes = [rng.getrandbits(64) for _ in range(5)]
+    for i, p in enumerate(hashes[:3]):
+        index.add(_digest(i), p, p)
+    assert index.needs_compaction()
+    index.compact()
+    assert not index.needs_compaction()
+    assert index._base.count == 3 and len(index) == 3
+
+    index.add(_digest(3), hashes[3], hashes[3])
+    assert os.path.getsize(path + ".log") == _RECORD.size
+    index.compact()
+    index.add(_digest(4), hashes[4], hashes[4])
+    assert index._base.count == 4 and len(index) == 5
+    for i, p in enumerate(hashes):
+        assert [m.source_hash for m in index.query(p, p, radius=0, dhash_radius=0)] == [_digest(i)]
+    index.close()
+
+
+def test_write_base_round_trips_an_empty_index(tmp_path):
+    path = str(tmp_path / "phash.idx")
+    write_base(path, np.empty(0, np.uint64), np.empty(0, np.uint64), np.empty((0, 32), np.uint8))
+    index = NearDuplicateIndex(path)
+    assert len(index) == 0 and index.query(0, 0) == []
+    index.close()
@@ -0,0 +1,99 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.renditions import (
+    DEFAULT_RENDITIONS,
+    ImageDecodeError,
+    RenditionSpec,
+    decode_image,
+    process_image,
+)
+
+# EXIF orientation 6: the camera was turned; viewers rotate 90 degrees clockwise.
+ROTATE_CW = 6
+
+
+def _encode(image: Image.Image, fmt: str = "JPEG", orientation: int = 1) -> bytes:
+    buf = io.BytesIO()
+    options = {}
+    if orientation != 1:
+        exif = image.getexif()
+        exif[0x0112] = orientation
+        options["exif"] = exif.tobytes()
+    image.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def _half_red(size) -> Image.Image:
+    """Red on the left half of the raw pixels, blue on the right."""
+    image = Image.new("RGB", size, (0, 0, 255))
+    image.paste((255, 0, 0), (0, 0, size[0] // 2, size[1]))
+    return image
+
+
+def _sizes(result):
+    return {r.spec.name: (r.width, r.height) for r in result.renditions}
+
+
+def test_jpeg_is_decoded_at_a_reduced_scale():
+    decoded = decode_image(_encode(Image.new("RGB", (6000, 4000), (90, 120, 30))))
+    assert decoded.source_size == (6000, 4000)
+    # Half scale still covers the 2048-wide "full" rendition; a quarter would not.
+    assert decoded.image.size == (3000, 2000)
+
+    # Only the avatar and grid are wanted, so an eighth is enough.
+    small = (RenditionSpec("grid", 320, 320, crop=True),)
+    assert decode_image(_encode(Image.new("RGB", (6000, 4000))), small).image.size == (750, 500)
+
+
+def test_formats_without_draft_mode_are_decoded_whole():
+    decoded = decode_image(_encode(Image.new("RGB", (3000, 2000)), "PNG"))
+    assert decoded.image.size == (3000, 2000)
+
+
+def test_undecodable_upload_is_rejected():
+    with pytest.raises(ImageDecodeError):
+        decode_image(b"not an image")
+    with pytest.raises(ImageDecodeError):
+        decode_image(_encode(Image.new("RGB", (64, 64)))[:200])
+
+
+def test_rendition_sizes():
+    result = process_image(_encode(Image.new("RGB", (3000, 2000), (10, 200, 10))))
+    assert result.source_size == (3000, 2000)
+    assert _sizes(result) == {"full": (2048, 1365), "feed": (1080, 720), "grid": (320, 320), "avatar": (150, 150)}
+    for rendition in result.renditions:
+        with Image.open(io.BytesIO(rendition.data)) as image:
+            assert image.size == (rendition.width, rendition.height)
+            assert image.format == rendition.spec.format
+    assert [r.spec for r in result.renditions] == list(DEFAULT_RENDITIONS)
+
+
+def test_small_images_are_never_upscaled():
+    result = process_image(_encode(Image.new("RGB", (100, 80))))
+    assert _sizes(result) == {"full": (100, 80), "feed": (100, 80), "grid": (100, 80), "avatar": (100, 80)}
+
+
+def test_exif_orientation_is_applied_to_renditions():
+    result = process_image(_encode(_half_red((3000, 2000)), orientation=ROTATE_CW))
+    # Sizes are those of the image as displayed, which is portrait.
+    assert result.source_size == (2000, 3000)
+    assert result.decoded_size[0] < result.decoded_size[1]
+    assert _sizes(result) == {"full": (1365, 2048), "feed": (1080, 1620), "grid": (320, 320), "avatar": (150, 150)}
+
+    feed = next(r for r in result.renditions if r.spec.name == "feed")
+    with Image.open(io.BytesIO(feed.data)) as image:
+        # Rotated clockwise, the raw left half ends up on top.
+        top = image.getpixel((image.width // 2, image.height // 4))
+        bottom = image.getpixel((image.width // 2, 3 * image.height // 4))
+    assert top[0] > 200 and top[2] < 60
+    assert bottom[2] > 200 and bottom[0] < 60
+
+
+def test_orientation_does_not_change_the_fingerprint():
+    upright = _half_red((800, 600)).transpose(Image.Transpose.ROTATE_270)
+    rotated = process_image(_encode(_half_red((800, 600)), orientation=ROTATE_CW), specs=DEFAULT_RENDITIONS[-1:])
+    plain = process_image(_encode(upright), specs=DEFAULT_RENDITIONS[-1:])
+    assert bin(rotated.phash ^ plain.phash).count("1") <= 6
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import media
+from app.api.streaming import parse_range
+from app.services.storage import LocalObjectStore
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.mark.parametrize(
+    "header, size, expected",
+    [
+        (None, 100, None),
+        ("bytes=0-9", 100, (0, 9)),
+        ("bytes=90-", 100, (90, 99)),
+        ("bytes=90-500", 100, (90, 99)),
+        ("bytes=-10", 100, (90, 99)),
+        ("bytes=-500", 100, (0, 99)),
+        (" bytes=5-5 ", 100, (5, 5)),
+        # Multi-range and malformed headers get the whole object.
+        ("bytes=0-1,5-6", 100, None),
+        ("bytes=-", 100, None),
+        ("items=0-9", 100, None),
+    ],
+)
+def test_parse_range(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize(
+    "header, size",
+    [("bytes=100-", 100), ("bytes=10-5", 100), ("bytes=-0", 100), ("bytes=0-", 0), ("bytes=-5", 0)],
+)
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(HTTPException) as raised:
+        parse_range(header, size)
+    assert raised.value.status_code == 416
+    assert raised.value.headers["Content-Range"] == f"bytes */{size}"
+
+
+@pytest.fixture
+def client(tmp_path):
+    store = LocalObjectStore(str(tmp_path), 1000)
+    asyncio.run(store.put("videos/clip.mp4", DATA))
+    asyncio.run(store.put("empty.bin", b""))
+    app = FastAPI()
+    app.include_router(media.router)
+    app.state.objects = store
+    return TestClient(app)
+
+
+def test_object_is_served_whole_and_in_ranges(client):
+    response = client.get("/media/objects/videos/clip.mp4")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+
+    # Spans several 1000-byte chunks and starts off a page boundary.
+    response = client.get("/media/objects/videos/clip.mp4", headers={"Range": "bytes=4097-7000"})
+    assert response.status_code == 206
+    assert response.content == DATA[4097:7001]
+    assert response.headers["content-range"] == f"bytes 4097-7000/{len(DATA)}"
+    assert response.headers["content-length"] == str(7001 - 4097)
+
+    response = client.get("/media/objects/videos/clip.mp4", headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == DATA[-10:]
+
+    response = client.head("/media/objects/videos/clip.mp4", headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "100"
+    assert response.content == b""
+
+
+def test_unsatisfiable_range_gets_416(client):
+    response = client.get("/media/objects/videos/clip.mp4", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_empty_object(client):
+    response = client.get("/media/objects/empty.bin")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == "0"
+
+    response = client.get("/media/objects/empty.bin", headers={"Range": "bytes=-5"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
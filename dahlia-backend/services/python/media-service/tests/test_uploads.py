@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import fakeredis
+import pytest
+
+from app.services.storage import LocalObjectStore
+from app.services.uploads import (
+    MIN_PART_SIZE,
+    MemorySessionStore,
+    RedisSessionStore,
+    UploadBusy,
+    UploadManager,
+    UploadRejected,
+)
+
+PART = MIN_PART_SIZE
+
+
+async def _body(data: bytes, chunk: int = 64 * 1024):
+    for start in range(0, len(data), chunk):
+        yield data[start : start + chunk]
+
+
+def _manager(tmp_path, sessions, ttl=3600, spool=True, **kwargs):
+    return UploadManager(
+        LocalObjectStore(str(tmp_path / "objects"), 64 * 1024),
+        sessions,
+        part_size=PART,
+        max_part_size=4 * PART,
+        max_upload_bytes=100 * PART,
+        session_ttl_seconds=ttl,
+        buffer_bytes=256 * 1024,
+        spool_dir=str(tmp_path) if spool else None,
+        **kwargs,
+    )
+
+
+def _staging(tmp_path):
+    root = tmp_path / "objects" / ".multipart"
+    return sorted(os.listdir(root)) if root.exists() else []
+
+
+@pytest.mark.parametrize("spool", [False, True])
+@pytest.mark.parametrize("sessions", [MemorySessionStore, lambda: RedisSessionStore(fakeredis.FakeAsyncRedis())])
+def test_parts_are_received_and_assembled(tmp_path, sessions, spool):
+    data = os.urandom(2 * PART + 12345)
+
+    async def run():
+        manager = _manager(tmp_path, sessions(), spool=spool)
+        session = await manager.create(len(data), "video/mp4", "clip.mp4")
+        for number in (3, 1, 2):
+            chunk = data[(number - 1) * PART : number * PART]
+            part = await manager.put_part(session.upload_id, number, _body(chunk), hashlib.sha256(chunk).hexdigest())
+            assert part.size == len(chunk)
+        done = await manager.complete(session.upload_id)
+        with open(tmp_path / "objects" / done.key, "rb") as f:
+            assert f.read() == data
+
+    asyncio.run(run())
+
+
+def test_wrong_part_size_is_rejected(tmp_path):
+    async def run():
+        manager = _manager(tmp_path, MemorySessionStore())
+        session = await manager.create(2 * PART, "video/mp4")
+        with pytest.raises(UploadRejected):
+            await manager.put_part(session.upload_id, 1, _body(b"x" * (PART + 1)))
+        with pytest.raises(UploadRejected):
+            await manager.put_part(session.upload_id, 1, _body(b"x" * (PART - 1)))
+        assert (await manager.status(session.upload_id)).parts == {}
+
+    asyncio.run(run())
+
+
+def test_parts_in_flight_are_bounded_in_bytes(tmp_path):
+    async def run():
+        manager = _manager(tmp_path, MemorySessionStore(), spool=False, max_bytes_in_flight=PART + 1)
+        first = await manager.create(2 * PART, "video/mp4")
+        second = await manager.create(2 * PART, "video/mp4")
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+            yield b"x" * PART
+
+        pending = asyncio.create_task(manager.put_part(first.upload_id, 1, held()))
+        await asyncio.sleep(0)
+        with pytest.raises(UploadBusy):
+            await manager.put_part(second.upload_id, 1, _body(b"y" * PART))
+        release.set()
+        assert (await pending).size == PART
+        # The budget is released once the part is stored.
+        assert (await manager.put_part(second.upload_id, 1, _body(b"y" * PART))).size == PART
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("sessions", [MemorySessionStore, lambda: RedisSessionStore(fakeredis.FakeAsyncRedis())])
+def test_sweep_aborts_multipart_uploads_of_expired_sessions(tmp_path, sessions):
+    async def run():
+        store = sessions()
+        manager = _manager(tmp_path, store, ttl=3600)
+        abandoned = await manager.create(2 * PART, "video/mp4")
+        await manager.put_part(abandoned.upload_id, 1, _body(b"x" * PART))
+        done = await manager.create(10, "text/plain")
+        await manager.put_part(done.upload_id, 1, _body(b"0123456789"))
+        await manager.complete(done.upload_id)
+        live = await _manager(tmp_path, store, ttl=3 * 3600).create(2 * PART, "video/mp4")
+        assert len(_staging(tmp_path)) == 2
+
+        later = time.time() + 2 * 3600
+        assert await manager.sweep(now=later) == 1
+        assert _staging(tmp_path) == [live.multipart_id]
+        assert await manager.sweep(now=later) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import os
+import signal
+import time
+
+import pytest
+from PIL import Image
+
+from app.services.renditions import RenditionSpec
+from app.services.workers import ImageWorkerPool, WorkerCrashed
+
+SPECS = (RenditionSpec("grid", 64, 64, crop=True),)
+
+
+def _jpeg(size=(400, 300)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 80, 40)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def _segments():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("media_")}
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs POSIX shared memory")
+def test_pool_is_replaced_after_a_worker_dies():
+    async def run():
+        pool = ImageWorkerPool(workers=1, max_pending=4, max_image_pixels=50_000_000)
+        pool.start()
+        try:
+            before = _segments()
+            assert len((await pool.process(_jpeg(), SPECS)).renditions) == 1
+
+            broken = pool._executor
+            for pid in list(broken._processes):
+                os.kill(pid, signal.SIGKILL)
+            deadline = time.monotonic() + 5
+            while not broken._broken and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+
+            with pytest.raises(WorkerCrashed):
+                await pool.process(_jpeg(), SPECS)
+            assert pool._executor is not broken
+            assert len((await pool.process(_jpeg(), SPECS)).renditions) == 1
+            assert _segments() == before
+            assert pool.pending == 0
+        finally:
+            await pool.drain(timeout=5)
+
+    asyncio.run(run())
+
+
+def test_drain_terminates_workers_still_busy_after_the_timeout():
+    async def run():
+        pool = ImageWorkerPool(workers=1, max_pending=4, max_image_pixels=50_000_000)
+        pool.start()
+        processes = []
+        # A job that outlives the drain timeout, admitted as process() would.
+        pool._pending += 1
+        pool._idle.clear()
+        stuck = asyncio.get_running_loop().run_in_executor(pool._executor, time.sleep, 60)
+        while not processes:
+            processes = list(pool._executor._processes.values())
+            await asyncio.sleep(0.05)
+
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        started = time.monotonic()
+        await pool.drain(timeout=0.2)
+        elapsed = time.monotonic() - started
+        ticker.cancel()
+
+        assert elapsed < 5
+        # The loop kept running while the pool shut down.
+        assert ticks >= 10
+        assert not any(process.is_alive() for process in processes)
+        with pytest.raises(Exception):
+            await stuck
+
+    asyncio.run(run())
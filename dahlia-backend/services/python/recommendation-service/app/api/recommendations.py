@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.core.config import get_settings
+from app.models.recommendation import (
+    Candidate,
+    CandidatesRequest,
+    CandidatesResponse,
+    EmbeddingKind,
+    EmbeddingRequest,
+    FeatureEvent,
+    FeatureEventBatch,
+    RankRequest,
+    RankResponse,
+    ScoreRequest,
+    ScoreResponse,
+)
+from app.services.ann import EmbeddingIndex
+from app.services.batching import Overloaded
+from app.services.features import FeatureStore
+
+router = APIRouter(prefix="/recommendations", tags=["recommendations"])
+
+
+def _index(request: Request, kind: str) -> EmbeddingIndex:
+    return request.app.state.embeddings[kind]
+
+
+@router.put("/embeddings/{kind}/{item_id}", status_code=204)
+async def put_embedding(request: Request, kind: EmbeddingKind, item_id: str, body: EmbeddingRequest):
+    try:
+        _index(request, kind).upsert(item_id, body.vector)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return Response(status_code=204)
+
+
+@router.delete("/embeddings/{kind}/{item_id}", status_code=204)
+async def delete_embedding(request: Request, kind: EmbeddingKind, item_id: str):
+    if not _index(request, kind).delete(item_id):
+        raise HTTPException(status_code=404, detail="embedding not found")
+    return Response(status_code=204)
+
+
+@router.post("/candidates", response_model=CandidatesResponse)
+async def candidates(request: Request, body: CandidatesRequest):
+    """Nearest items to a user's embedding: candidate generation for the For You feed."""
+    started = time.perf_counter()
+    vector = body.vector
+    if body.user_id is not None:
+        vector = _index(request, "users").get(body.user_id)
+        if vector is None:
+            raise HTTPException(status_code=404, detail="user has no embedding")
+    k = max(1, min(body.k, get_settings().max_candidates))
+    try:
+        neighbors = _index(request, body.kind).search(vector, k, body.nprobe)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return CandidatesResponse(
+        took_ms=(time.perf_counter() - started) * 1000,
+        candidates=[Candidate(id=n.id, score=n.score) for n in neighbors],
+    )
+
+
+async def _score(request: Request, features: np.ndarray) -> np.ndarray:
+    batcher = request.app.state.batcher
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="ranking model not loaded")
+    try:
+        return await batcher.submit(features)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except Overloaded:
+        raise HTTPException(status_code=429, detail="scoring queue is full", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="scoring deadline exceeded")
+
+
+@router.post("/score", response_model=ScoreResponse)
+async def score(request: Request, body: ScoreRequest):
+    """Ranking scores for candidate feature rows, batched with concurrent requests."""
+    started = time.perf_counter()
+    scores = await _score(request, np.asarray(body.features, np.float32))
+    return ScoreResponse(took_ms=(time.perf_counter() - started) * 1000, scores=scores.tolist())
+
+
+@router.post("/rank", response_model=RankResponse)
+async def rank(request: Request, body: RankRequest):
+    """Order candidate posts for a viewer, with features from the feature store."""
+    started = time.perf_counter()
+    if len(body.post_ids) > get_settings().max_candidates:
+        raise HTTPException(status_code=422, detail="too many candidates")
+    features = request.app.state.features.gather(body.user_id, body.post_ids).matrix()
+    scores = await _score(request, features)
+    order = np.argsort(-scores, kind="stable")
+    return RankResponse(
+        took_ms=(time.perf_counter() - started) * 1000,
+        candidates=[Candidate(id=body.post_ids[i], score=float(scores[i])) for i in order.tolist()],
+    )
+
+
+def _require(event: FeatureEvent, *fields: str) -> None:
+    missing = [name for name in fields if getattr(event, name) is None]
+    if missing:
+        raise ValueError(f"{event.type} needs {', '.join(missing)}")
+
+
+def _apply(store: FeatureStore, event: FeatureEvent) -> None:
+    kind = event.type
+    if kind == "post.created":
+        _require(event, "post_id", "user_id", "created_at")
+        store.create_post(
+            event.post_id, event.user_id, event.created_at / 1000, event.like_count or 0, event.comment_count or 0
+        )
+    elif kind == "post.deleted":
+        _require(event, "post_id")
+        store.delete_post(event.post_id)
+    elif kind in ("post.liked", "post.unliked"):
+        _require(event, "post_id", "user_id")
+        store.like(event.post_id, event.user_id, liked=kind == "post.liked")
+    elif kind == "post.commented":
+        _require(event, "post_id", "user_id")
+        store.comment(event.post_id, event.user_id)
+    elif kind in ("user.followed", "user.unfollowed"):
+        _require(event, "user_id", "target_user_id")
+        store.follow(event.user_id, event.target_user_id, following=kind == "user.followed")
+    else:
+        _require(event, "user_id")
+        store.update_user(
+            event.user_id,
+            follower_count=event.follower_count,
+            following_count=event.following_count,
+            post_count=event.post_count,
+        )
+
+
+@router.post("/events", status_code=202)
+async def feature_events(request: Request, body: FeatureEventBatch):
+    """Apply follow, like, comment and post events to the feature store, in order."""
+    store = request.app.state.features
+    for position, event in enumerate(body.events):
+        try:
+            _apply(store, event)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail={"applied": position, "error": str(exc)})
+    return {"applied": len(body.events)}
+
+
+@router.get("/features/stats")
+async def feature_stats(request: Request):
+    return request.app.state.features.stats()
+
+
+@router.get("/embeddings/stats")
+async def embedding_stats(request: Request):
+    return {kind: index.stats() for kind, index in request.app.state.embeddings.items()}
@@ -0,0 +1,63 @@
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import Field
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="RECOMMENDATION_")
+
+    # Embedding indexes, one directory per kind (posts, users); unset keeps them in memory only.
+    ann_path: Optional[str] = "/var/lib/recommendation/ann"
+    embedding_dim: int = 64
+    # "cosine" normalises vectors on insert; "ip" scores raw inner products.
+    ann_metric: str = "cosine"
+    # Stored precision: "int8" (per-vector scale) or "float16".
+    ann_dtype: str = "int8"
+    # Clusters scanned per query; more raises recall and latency.
+    ann_nprobe: int = 16
+    # Pending inserts before the delta is folded into a new on-disk generation.
+    ann_compact_after: int = 50_000
+    ann_compact_check_seconds: float = 60.0
+    max_candidates: int = 2000
+
+    # Feature store snapshots (unset keeps features in memory only), how often
+    # they are written, and how fast viewer-author affinity decays.
+    features_path: Optional[str] = "/var/lib/recommendation/features"
+    features_snapshot_interval_seconds: float = 300.0
+    affinity_half_life_days: float = 14.0
+
+    # "numpy" serves a versioned artifact from ranking_artifact_root without
+    # importing torch; "torch" loads the state_dict at ranking_model_path.
+    # Scoring is disabled until the model exists.
+    ranking_backend: str = "numpy"
+    ranking_artifact_root: Optional[str] = "/var/lib/recommendation/models"
+    ranking_model_name: str = "ranking"
+    # Pin a version instead of following the artifact's CURRENT pointer.
+    ranking_model_version: Optional[str] = None
+    # Check weight checksums at startup (reads every file instead of mapping lazily).
+    ranking_verify_artifact: bool = False
+    ranking_model_path: Optional[str] = "/var/lib/recommendation/models/ranking.pt"
+    # torch backend only; artifacts carry their own shapes and feature names.
+    # Must equal len(app.services.features.FEATURE_NAMES) for /recommendations/rank.
+    ranking_feature_dim: int = 8
+    ranking_hidden: List[int] = [256, 128]
+    # torch intra-op threads for the forward pass; one pass runs at a time. The
+    # numpy backend uses BLAS threads, set with OPENBLAS_NUM_THREADS at startup.
+    inference_threads: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    # Latency knobs: a batch runs once it holds this many rows, or this long
+    # after its oldest request arrived, whichever comes first.
+    batch_max_items: int = 2048
+    batch_max_wait_ms: float = 2.0
+    # Rows queued before new requests get 429, and how long a request may wait
+    # for its scores before 504.
+    batch_max_queue_items: int = 32768
+    score_timeout_ms: float = 100.0
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
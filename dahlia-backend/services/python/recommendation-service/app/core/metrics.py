@@ -0,0 +1,90 @@
+"""Minimal Prometheus text-format metrics.
+
+Counters and gauges are process-local; each pod is scraped on ``/metrics``.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted(labels.items()))
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._values.items()):
+            label_str = ",".join(f'{k}="{v}"' for k, v in key)
+            lines.append(f"{self.name}{{{label_str}}} {value}" if label_str else f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts (the last one is +Inf), then sum and count.
+            counts = self._counts.setdefault(key, [0.0] * (len(self.buckets) + 3))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._counts.items())
+        for key, counts in items:
+            base = ",".join(f'{k}="{v}"' for k, v in key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = f'{base},le="{le}"' if base else f'le="{le}"'
+                lines.append(f"{self.name}_bucket{{{labels}}} {cumulative}")
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {counts[-2]}")
+            lines.append(f"{self.name}_count{suffix} {counts[-1]}")
+        return "\n".join(lines)
+
+
+def render_latest() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
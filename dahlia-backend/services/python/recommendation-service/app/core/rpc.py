@@ -0,0 +1,334 @@
+"""grpc.aio runtime for calling and serving the shared proto contracts.
+
+``scripts/generate-protos.sh`` generates the stubs into ``app/proto``.
+
+``RpcClient`` calls a service with its generated stub::
+
+    users = RpcClient("user-service:9090").stub(user_pb2_grpc.UserServiceStub)
+    user = await users.GetUser(user_pb2.GetUserRequest(user_id=user_id))
+
+- Calls are spread over ``pool_size`` channels. Each channel has its own
+  HTTP/2 connection, and so its own stream limit and, behind a ClusterIP
+  Service, its own pod.
+- Every unary call gets a deadline. It is the ``timeout`` passed in, else the
+  method's entry in ``DEADLINES``, else ``default_timeout``. Inside a
+  handler served by ``serve``, it is also capped by the time the caller has
+  left.
+- Idempotent reads (``HEDGED``) are hedged. When an attempt has no answer
+  after the method's recent p95 latency, or fails with UNAVAILABLE, another
+  attempt goes out on the next channel. The first answer wins and the others
+  are cancelled. Extra attempts are capped at ``hedge_ratio`` of calls, so a
+  slow backend is not sent double its load.
+- Unary calls return a coroutine rather than a ``grpc.aio`` call object,
+  so their metadata is not exposed.
+- A request of ``compress_min_bytes`` or more is sent gzip-compressed.
+  Responses are compressed only if the server chooses to, using an algorithm
+  this client advertised in ``grpc-accept-encoding``.
+- Keepalive pings go out every 5 minutes, only while calls are in flight.
+  That is grpc-java's ``permitKeepAliveTime``; pinging more often gets the
+  connection closed with ``too_many_pings``.
+
+``serve`` starts a ``grpc.aio`` server for generated servicers. It gzips
+unary responses of ``compress_min_bytes`` or more, and all streamed
+messages, for clients that accept gzip.
+It closes each connection after ``max_connection_age`` so clients reconnect
+and spread over new pods.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import grpc
+
+# Per-method deadlines in seconds; other methods get the client's default_timeout.
+DEADLINES: Dict[str, float] = {
+    "/user.UserService/GetUser": 0.3,
+    "/user.UserService/GetFollowers": 1.0,
+    "/post.PostService/GetPost": 0.3,
+    "/auth.AuthService/Login": 2.0,
+    "/auth.AuthService/Signup": 2.0,
+}
+# Reads that are safe to send twice.
+HEDGED = frozenset({"/user.UserService/GetUser", "/post.PostService/GetPost"})
+# Codes that mean the attempt never reached a handler and may go elsewhere.
+_RETRYABLE = frozenset({grpc.StatusCode.UNAVAILABLE})
+
+_CLIENT_OPTIONS = [
+    # Without this, channels with equal arguments share one connection.
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.keepalive_time_ms", 300_000),
+    ("grpc.keepalive_timeout_ms", 20_000),
+    ("grpc.keepalive_permit_without_calls", 0),
+    # Spreads calls over every address of a headless Service (dns:/// target).
+    ("grpc.service_config", json.dumps({"loadBalancingConfig": [{"round_robin": {}}]})),
+]
+
+# Absolute monotonic deadline of the RPC this task is serving, if any.
+_inbound_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("inbound_deadline", default=None)
+
+
+class _Latencies:
+    """Recent latencies of one method, for its hedging delay."""
+
+    def __init__(self, size: int = 256):
+        self._recent: deque = deque(maxlen=size)
+        self._sorted: list = []
+        self._stale = 0
+
+    def add(self, seconds: float) -> None:
+        self._recent.append(seconds)
+        self._stale += 1
+
+    def percentile(self, q: float, default: float) -> float:
+        if len(self._recent) < 20:
+            return default
+        if self._stale >= 16 or not self._sorted:
+            self._sorted = sorted(self._recent)
+            self._stale = 0
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class _HedgeBudget:
+    """Allows extra attempts up to ``ratio`` of calls, plus a small burst."""
+
+    def __init__(self, ratio: float, burst: int = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.calls = 0
+        self.extra = 0
+
+    def take(self) -> bool:
+        if self.extra >= self.calls * self.ratio + self.burst:
+            return False
+        self.extra += 1
+        return True
+
+
+class _UnaryUnary:
+    def __init__(self, client: "RpcClient", method: str, serializer, deserializer):
+        self._client = client
+        self._method = method
+        self._callables = [
+            channel.unary_unary(method, request_serializer=serializer, response_deserializer=deserializer)
+            for channel in client._channels
+        ]
+        self._latencies = _Latencies()
+
+    def __call__(self, request, *, timeout: Optional[float] = None, metadata=None, compression=None):
+        return self._call(request, timeout, metadata, compression)
+
+    async def _call(self, request, timeout, metadata, compression):
+        client = self._client
+        timeout = client.timeout_for(self._method, timeout)
+        if compression is None and request.ByteSize() >= client.compress_min_bytes:
+            compression = grpc.Compression.Gzip
+        started = time.monotonic()
+        try:
+            if self._method in client.hedged:
+                response = await self._hedged(request, started + timeout, metadata, compression)
+            else:
+                response = await client._next(self._callables)(
+                    request, timeout=timeout, metadata=metadata, compression=compression
+                )
+        except grpc.aio.AioRpcError as exc:
+            client.stats[f"error:{exc.code().name}"] += 1
+            raise
+        self._latencies.add(time.monotonic() - started)
+        client.stats["ok"] += 1
+        return response
+
+    async def _hedged(self, request, deadline: float, metadata, compression):
+        client = self._client
+        budget = client._budget
+        budget.calls += 1
+        delay = self._latencies.percentile(0.95, client.hedge_delay)
+        calls = set()
+
+        def launch():
+            call = client._next(self._callables)(
+                request, timeout=max(0.0, deadline - time.monotonic()), metadata=metadata, compression=compression
+            )
+            calls.add(asyncio.ensure_future(call))
+
+        launch()
+        error = None
+        try:
+            while calls:
+                can_hedge = len(calls) < client.hedge_attempts and time.monotonic() < deadline
+                done, _ = await asyncio.wait(
+                    calls, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if budget.take():
+                        client.stats["hedged"] += 1
+                        launch()
+                    else:
+                        client.stats["hedge_denied"] += 1
+                        delay = None
+                    continue
+                for task in done:
+                    calls.discard(task)
+                    try:
+                        return task.result()
+                    except grpc.aio.AioRpcError as exc:
+                        if exc.code() not in _RETRYABLE:
+                            raise
+                        error = exc
+                if not calls and time.monotonic() < deadline and budget.take():
+                    client.stats["retried"] += 1
+                    launch()
+            raise error
+        finally:
+            # Cancelling a task cancels its RPC; wait for both to unwind so no
+            # task outlives the call or logs an unretrieved exception.
+            for task in calls:
+                task.cancel()
+            await asyncio.gather(*calls, return_exceptions=True)
+
+
+class _PooledChannel:
+    """Stands in for a ``grpc.aio.Channel`` when building generated stubs."""
+
+    def __init__(self, client: "RpcClient"):
+        self._client = client
+
+    def unary_unary(self, method, request_serializer=None, response_deserializer=None, **kwargs):
+        return _UnaryUnary(self._client, method, request_serializer, response_deserializer)
+
+    def _streaming(self, kind: str, method, request_serializer=None, response_deserializer=None, **kwargs):
+        callables = [
+            getattr(channel, kind)(method, request_serializer=request_serializer, response_deserializer=response_deserializer)
+            for channel in self._client._channels
+        ]
+        client = self._client
+
+        def call(*args, timeout: Optional[float] = None, **kwargs):
+            return client._next(callables)(*args, timeout=client.timeout_for(method, timeout), **kwargs)
+
+        return call
+
+    def unary_stream(self, method, *args, **kwargs):
+        return self._streaming("unary_stream", method, *args, **kwargs)
+
+    def stream_unary(self, method, *args, **kwargs):
+        return self._streaming("stream_unary", method, *args, **kwargs)
+
+    def stream_stream(self, method, *args, **kwargs):
+        return self._streaming("stream_stream", method, *args, **kwargs)
+
+
+class RpcClient:
+    def __init__(
+        self,
+        target: str,
+        pool_size: int = 2,
+        default_timeout: float = 1.0,
+        deadlines: Optional[Dict[str, float]] = None,
+        hedged: Iterable[str] = HEDGED,
+        hedge_delay: float = 0.05,
+        hedge_attempts: int = 2,
+        hedge_ratio: float = 0.1,
+        compress_min_bytes: int = 1024,
+        options: Sequence[Tuple[str, object]] = (),
+    ):
+        self.target = target
+        self.default_timeout = default_timeout
+        self.deadlines = {**DEADLINES, **(deadlines or {})}
+        self.hedged = frozenset(hedged)
+        # Used until a method has enough latency samples for its p95.
+        self.hedge_delay = hedge_delay
+        self.hedge_attempts = hedge_attempts
+        self.compress_min_bytes = compress_min_bytes
+        self.stats: Counter = Counter()
+        self._budget = _HedgeBudget(hedge_ratio)
+        self._channels = [
+            grpc.aio.insecure_channel(target, options=[*_CLIENT_OPTIONS, *options]) for _ in range(pool_size)
+        ]
+        self._turn = itertools.count()
+
+    def _next(self, callables: list):
+        return callables[next(self._turn) % len(callables)]
+
+    def timeout_for(self, method: str, timeout: Optional[float] = None) -> float:
+        """Deadline of a call: its own or the method's, capped by the inbound call's remaining time."""
+        if timeout is None:
+            timeout = self.deadlines.get(method, self.default_timeout)
+        inbound = _inbound_deadline.get()
+        if inbound is not None:
+            timeout = min(timeout, max(0.0, inbound - time.monotonic()))
+        return timeout
+
+    def stub(self, stub_class: Callable):
+        """A generated ``*Stub`` bound to this client's channel pool."""
+        return stub_class(_PooledChannel(self))
+
+    async def wait_ready(self, timeout: float = 10.0) -> None:
+        await asyncio.wait_for(asyncio.gather(*(c.channel_ready() for c in self._channels)), timeout)
+
+    async def close(self, grace: Optional[float] = None) -> None:
+        await asyncio.gather(*(c.close(grace) for c in self._channels))
+
+
+class _ServerRuntime(grpc.aio.ServerInterceptor):
+    """Records the inbound deadline for outgoing calls and leaves small unary responses uncompressed."""
+
+    def __init__(self, compress_min_bytes: int):
+        self.compress_min_bytes = compress_min_bytes
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None:
+            return handler
+        behavior = handler.unary_unary
+        min_bytes = self.compress_min_bytes
+
+        async def unary_unary(request, context):
+            remaining = context.time_remaining()
+            token = _inbound_deadline.set(None if remaining is None else time.monotonic() + remaining)
+            try:
+                response = await behavior(request, context)
+            finally:
+                _inbound_deadline.reset(token)
+            if response is not None and response.ByteSize() < min_bytes:
+                context.disable_next_message_compression()
+            return response
+
+        return grpc.unary_unary_rpc_method_handler(
+            unary_unary,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+
+async def serve(
+    servicers: Sequence[Tuple[Callable, object]],
+    port: int,
+    max_concurrent_rpcs: Optional[int] = None,
+    compress_min_bytes: int = 1024,
+    max_connection_age: float = 1800.0,
+    options: Sequence[Tuple[str, object]] = (),
+) -> grpc.aio.Server:
+    """Start a server for ``(add_XServicer_to_server, servicer)`` pairs; stop it with ``await server.stop(grace)``."""
+    server = grpc.aio.server(
+        interceptors=[_ServerRuntime(compress_min_bytes)],
+        # Sent as identity to clients that do not list gzip in grpc-accept-encoding.
+        compression=grpc.Compression.Gzip,
+        maximum_concurrent_rpcs=max_concurrent_rpcs,
+        options=[
+            ("grpc.max_connection_age_ms", int(max_connection_age * 1000)),
+            ("grpc.max_connection_age_grace_ms", 30_000),
+            # Clients ping at most every 5 minutes, and only during calls.
+            ("grpc.http2.min_recv_ping_interval_without_data_ms", 300_000),
+            *options,
+        ],
+    )
+    for add, servicer in servicers:
+        add(servicer, server)
+    server.add_insecure_port(f"[::]:{port}")
+    await server.start()
+    return server
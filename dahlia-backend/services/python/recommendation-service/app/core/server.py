@@ -0,0 +1,8 @@
+"""Gunicorn worker class; see gunicorn.conf.py."""
+
+from uvicorn.workers import UvicornWorker
+
+
+class Worker(UvicornWorker):
+    # Explicit rather than "auto", which silently falls back to asyncio and h11.
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,91 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, model_validator
+
+EmbeddingKind = Literal["posts", "users"]
+
+
+class EmbeddingRequest(BaseModel):
+    vector: List[float]
+
+
+class CandidatesRequest(BaseModel):
+    """Query by a stored user embedding (``user_id``) or an explicit ``vector``."""
+
+    kind: EmbeddingKind = "posts"
+    user_id: Optional[str] = None
+    vector: Optional[List[float]] = None
+    k: int = 500
+    nprobe: Optional[int] = None
+
+    @model_validator(mode="after")
+    def _one_query(self):
+        if (self.user_id is None) == (self.vector is None):
+            raise ValueError("exactly one of user_id and vector is required")
+        return self
+
+
+class Candidate(BaseModel):
+    id: str
+    score: float
+
+
+class CandidatesResponse(BaseModel):
+    took_ms: float
+    candidates: List[Candidate]
+
+
+class ScoreRequest(BaseModel):
+    # One row of ranking features per candidate.
+    features: List[List[float]]
+
+
+class ScoreResponse(BaseModel):
+    took_ms: float
+    scores: List[float]
+
+
+class FeatureEvent(BaseModel):
+    """One change feeding the feature store; the fields used depend on ``type``.
+
+    - ``post.created``: ``post_id``, ``user_id`` (author), ``created_at`` (epoch ms),
+      optionally ``like_count`` and ``comment_count`` (a ``PostResponse``)
+    - ``post.deleted``: ``post_id``
+    - ``post.liked`` / ``post.unliked`` / ``post.commented``: ``post_id``, ``user_id``
+    - ``user.followed`` / ``user.unfollowed``: ``user_id``, ``target_user_id`` (a ``FollowRequest``)
+    - ``user.updated``: ``user_id`` and any of the counts (a ``UserResponse``)
+    """
+
+    type: Literal[
+        "post.created",
+        "post.deleted",
+        "post.liked",
+        "post.unliked",
+        "post.commented",
+        "user.followed",
+        "user.unfollowed",
+        "user.updated",
+    ]
+    post_id: Optional[str] = None
+    user_id: Optional[str] = None
+    target_user_id: Optional[str] = None
+    created_at: Optional[int] = None
+    like_count: Optional[int] = None
+    comment_count: Optional[int] = None
+    follower_count: Optional[int] = None
+    following_count: Optional[int] = None
+    post_count: Optional[int] = None
+
+
+class FeatureEventBatch(BaseModel):
+    events: List[FeatureEvent]
+
+
+class RankRequest(BaseModel):
+    user_id: str
+    post_ids: List[str]
+
+
+class RankResponse(BaseModel):
+    took_ms: float
+    candidates: List[Candidate]
@@ -0,0 +1,530 @@
+"""Approximate nearest-neighbour index over embeddings (inverted file, NumPy only).
+
+The vectors are clustered around ``nlist`` centroids (spherical k-means) and
+stored grouped by cluster, so each cluster's vectors are one contiguous slice.
+A query scores the centroids, takes the ``nprobe`` best clusters (more if they
+hold too few vectors for ``k``), and scores only the vectors in those slices.
+Vectors are stored as float16, or as int8 with a per-vector scale, and scored
+by inner product (``cosine`` normalises on insert).
+
+On disk, each compaction writes a generation directory of ``.npy`` files that
+is memory-mapped on load, and ``CURRENT`` names the live one. Inserts and
+deletes since then go to an append-only log and an in-memory delta that is
+scanned exhaustively, and compaction folds them into a new generation.
+"""
+
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+METRICS = ("cosine", "ip")
+DTYPES = ("float16", "int8")
+_OP = struct.Struct("<cH")
+_CHUNK = 65536
+
+
+@dataclass
+class Neighbor:
+    id: str
+    score: float
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Storage form of float32 ``vectors``: float16, or int8 plus one scale per vector."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), np.int32)
+    for start in range(0, len(vectors), _CHUNK):
+        out[start : start + _CHUNK] = np.argmax(vectors[start : start + _CHUNK] @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-norm centroids, points assigned by inner product."""
+    rng = np.random.default_rng(seed)
+    sample = _normalize(np.asarray(sample, np.float32))
+    nlist = max(1, min(nlist, len(sample)))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nonempty = counts > 0
+        sums = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        centroids[nonempty] = _normalize(sums)
+        # Reseed empty clusters on random points so every list stays useful.
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+def default_nlist(count: int) -> int:
+    """About 4·sqrt(n) lists, as a power of two; small indexes are one list (exact search)."""
+    if count < 20_000:
+        return 1
+    return int(2 ** round(np.log2(4 * np.sqrt(count))))
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(s, s + n)`` for each pair, without a Python loop."""
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class _Generation:
+    """One immutable, memory-mapped generation directory."""
+
+    def __init__(self, directory: Optional[str], dim: int, dtype: str):
+        self.directory = directory
+        self.count = 0
+        self.centroids = np.zeros((1, dim), np.float32)
+        self.offsets = np.zeros(2, np.int64)
+        self.vectors = np.empty((0, dim), np.dtype(dtype))
+        self.scales: Optional[np.ndarray] = np.empty(0, np.float32) if dtype == "int8" else None
+        self.ids = np.empty(0, "S1")
+        self.id_order = np.empty(0, np.int64)
+        self.trained_on = 0
+        if directory:
+            self._open(directory, dim, dtype)
+        # Tombstones for rows deleted since this generation was written.
+        self.dead = np.zeros(self.count, bool)
+
+    def _open(self, directory: str, dim: int, dtype: str) -> None:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["dim"] != dim or meta["dtype"] != dtype:
+            raise ValueError(f"{directory} holds {meta['dtype']}[{meta['dim']}] vectors, not {dtype}[{dim}]")
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.count = meta["count"]
+        self.trained_on = meta["trained_on"]
+        self.centroids = np.array(load("centroids.npy"))
+        self.offsets = np.array(load("offsets.npy"))
+        self.vectors = load("vectors.npy")
+        self.scales = load("scales.npy") if dtype == "int8" else None
+        self.ids = load("ids.npy")
+        self.id_order = load("id_order.npy")
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def find(self, item_id: str) -> Optional[int]:
+        if not self.count:
+            return None
+        key = item_id.encode()
+        if len(key) > self.ids.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(self.ids, key, sorter=self.id_order))
+        if position < self.count:
+            row = int(self.id_order[position])
+            if self.ids[row] == key:
+                return row
+        return None
+
+    def lists(self) -> np.ndarray:
+        """Cluster of each row."""
+        return np.repeat(np.arange(self.nlist, dtype=np.int32), np.diff(self.offsets))
+
+
+def write_generation(
+    directory: str,
+    centroids: np.ndarray,
+    offsets: np.ndarray,
+    vectors: np.ndarray,
+    scales: Optional[np.ndarray],
+    ids: np.ndarray,
+    trained_on: int,
+) -> None:
+    os.makedirs(directory)
+    np.save(os.path.join(directory, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(directory, "offsets.npy"), offsets.astype(np.int64))
+    np.save(os.path.join(directory, "vectors.npy"), vectors)
+    if scales is not None:
+        np.save(os.path.join(directory, "scales.npy"), scales)
+    np.save(os.path.join(directory, "ids.npy"), ids)
+    np.save(os.path.join(directory, "id_order.npy"), np.argsort(ids, kind="stable"))
+    meta = {
+        "count": len(ids),
+        "dim": vectors.shape[1],
+        "dtype": vectors.dtype.name,
+        "nlist": len(centroids),
+        "trained_on": trained_on,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+class EmbeddingIndex:
+    def __init__(
+        self,
+        path: Optional[str],
+        dim: int,
+        metric: str = "cosine",
+        dtype: str = "int8",
+        nprobe: int = 32,
+        compact_after: int = 50_000,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r}")
+        if dtype not in DTYPES:
+            raise ValueError(f"unknown dtype {dtype!r}")
+        self.path = path
+        self.dim = dim
+        self.metric = metric
+        self.dtype = dtype
+        self.nprobe = nprobe
+        self.compact_after = compact_after
+        self._vector_bytes = 4 * dim
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._base = _Generation(self._current(), dim, dtype)
+        self._reset_delta()
+        self._log = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            if os.path.exists(self._log_path):
+                with open(self._log_path, "rb") as f:
+                    self._replay(f.read())
+            self._log = open(self._log_path, "ab")
+
+    # -- on-disk layout -------------------------------------------------
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "delta.log")
+
+    def _current(self) -> Optional[str]:
+        if not self.path:
+            return None
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _reset_delta(self) -> None:
+        self._delta = np.empty((1024, self.dim), np.float32)
+        self._delta_ids: List[str] = []
+        self._delta_alive = bytearray()
+        self._delta_pos = {}
+
+    # -- updates ----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._base.count - int(self._base.dead.sum()) + len(self._delta_pos)
+
+    def _prepare(self, vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"expected {self.dim} dimensions, got {vector.shape[0]}")
+        return _normalize(vector) if self.metric == "cosine" else vector
+
+    def _apply_delete(self, item_id: str) -> bool:
+        removed = False
+        row = self._base.find(item_id)
+        if row is not None and not self._base.dead[row]:
+            self._base.dead[row] = True
+            removed = True
+        position = self._delta_pos.pop(item_id, None)
+        if position is not None:
+            self._delta_alive[position] = 0
+            removed = True
+        return removed
+
+    def _apply_upsert(self, item_id: str, vector: np.ndarray) -> None:
+        self._apply_delete(item_id)
+        n = len(self._delta_ids)
+        if n == len(self._delta):
+            grown = np.empty((2 * n, self.dim), np.float32)
+            grown[:n] = self._delta
+            self._delta = grown
+        self._delta[n] = vector
+        self._delta_ids.append(item_id)
+        self._delta_alive.append(1)
+        self._delta_pos[item_id] = n
+
+    def _write(self, op: bytes, item_id: str, vector: Optional[np.ndarray] = None) -> None:
+        if self._log is None:
+            return
+        key = item_id.encode()
+        self._log.write(_OP.pack(op, len(key)) + key + (vector.tobytes() if vector is not None else b""))
+        self._log.flush()
+
+    def _replay(self, data: bytes) -> None:
+        position = 0
+        while position + _OP.size <= len(data):
+            op, length = _OP.unpack_from(data, position)
+            end = position + _OP.size + length + (self._vector_bytes if op == b"I" else 0)
+            # A torn final record from a crash mid-append is dropped.
+            if end > len(data):
+                break
+            item_id = data[position + _OP.size : position + _OP.size + length].decode()
+            if op == b"I":
+                vector = np.frombuffer(data, np.float32, self.dim, end - self._vector_bytes)
+                self._apply_upsert(item_id, vector)
+            else:
+                self._apply_delete(item_id)
+            position = end
+
+    def upsert(self, item_id: str, vector: Sequence[float]) -> None:
+        vector = self._prepare(vector)
+        with self._lock:
+            self._apply_upsert(item_id, vector)
+            self._write(b"I", item_id, vector)
+
+    def upsert_many(self, item_ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Bulk ``upsert``, e.g. for a backfill from the training pipeline."""
+        vectors = np.asarray(vectors, np.float32).reshape(len(item_ids), self.dim)
+        if self.metric == "cosine":
+            vectors = _normalize(vectors)
+        with self._lock:
+            for item_id in item_ids:
+                self._apply_delete(item_id)
+            n = len(self._delta_ids)
+            if n + len(item_ids) > len(self._delta):
+                grown = np.empty((max(2 * len(self._delta), n + len(item_ids)), self.dim), np.float32)
+                grown[:n] = self._delta[:n]
+                self._delta = grown
+            self._delta[n : n + len(item_ids)] = vectors
+            self._delta_ids.extend(item_ids)
+            self._delta_alive.extend(b"\x01" * len(item_ids))
+            for offset, item_id in enumerate(item_ids):
+                # A repeated id in the batch: the last vector wins.
+                previous = self._delta_pos.get(item_id)
+                if previous is not None:
+                    self._delta_alive[previous] = 0
+                self._delta_pos[item_id] = n + offset
+            if self._log is not None:
+                for item_id, vector in zip(item_ids, vectors):
+                    key = item_id.encode()
+                    self._log.write(_OP.pack(b"I", len(key)) + key + vector.tobytes())
+                self._log.flush()
+
+    def delete(self, item_id: str) -> bool:
+        with self._lock:
+            removed = self._apply_delete(item_id)
+            if removed:
+                self._write(b"D", item_id)
+            return removed
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        """Stored vector (dequantized if it has been compacted)."""
+        with self._lock:
+            position = self._delta_pos.get(item_id)
+            if position is not None:
+                return self._delta[position].copy()
+            base = self._base
+            row = base.find(item_id)
+            if row is None or base.dead[row]:
+                return None
+            scales = base.scales[row : row + 1] if base.scales is not None else None
+            return dequantize(base.vectors[row : row + 1], scales)[0]
+
+    # -- search -----------------------------------------------------------
+
+    def search(self, vector: Sequence[float], k: int = 500, nprobe: Optional[int] = None) -> List[Neighbor]:
+        query = self._prepare(vector)
+        nprobe = nprobe or self.nprobe
+        with self._lock:
+            base = self._base
+            dead = base.dead
+            n = len(self._delta_ids)
+            delta = self._delta[:n]
+            delta_alive = np.frombuffer(bytes(self._delta_alive), np.uint8)
+            delta_ids = self._delta_ids[:n]
+
+        scores, labels = [], []
+        if base.count:
+            rows = self._probe(base, query, k, nprobe)
+            base_scores = base.vectors[rows].astype(np.float32) @ query
+            if base.scales is not None:
+                base_scores *= base.scales[rows]
+            base_scores[dead[rows]] = -np.inf
+            scores.append(base_scores)
+            labels.append(rows)
+        if n:
+            delta_scores = delta @ query
+            delta_scores[delta_alive == 0] = -np.inf
+            scores.append(delta_scores)
+            # Delta entries are labelled after the base rows.
+            labels.append(np.arange(n) + base.count)
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        labels = np.concatenate(labels)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        neighbors = []
+        for label, score in zip(labels[top].tolist(), scores[top].tolist()):
+            item_id = base.ids[label].decode() if label < base.count else delta_ids[label - base.count]
+            neighbors.append(Neighbor(item_id, score))
+        return neighbors
+
+    @staticmethod
+    def _probe(base: _Generation, query: np.ndarray, k: int, nprobe: int) -> np.ndarray:
+        """Rows of the best ``nprobe`` lists, widened until they hold a few times ``k`` rows."""
+        sizes = np.diff(base.offsets)
+        if base.nlist <= nprobe:
+            return np.arange(base.count)
+        ranked = np.argsort(-(base.centroids @ query))
+        # Small lists near the query would otherwise starve a top-500 request.
+        enough = int(np.searchsorted(np.cumsum(sizes[ranked]), 4 * k)) + 1
+        chosen = ranked[: max(nprobe, enough)]
+        return _ranges(base.offsets[chosen], sizes[chosen])
+
+    # -- compaction -------------------------------------------------------
+
+    def needs_compaction(self) -> bool:
+        return len(self._delta_ids) >= self.compact_after
+
+    def compact(self, retrain: bool = False) -> None:
+        """Fold the delta into a new generation; safe to run alongside updates and searches."""
+        if not self.path or not self._compacting.acquire(blocking=False):
+            return
+        try:
+            self._compact(retrain)
+        finally:
+            self._compacting.release()
+
+    def _compact(self, retrain: bool) -> None:
+        with self._lock:
+            base = self._base
+            dead = base.dead.copy()
+            n = len(self._delta_ids)
+            delta = self._delta[:n].copy()
+            alive = np.frombuffer(bytes(self._delta_alive), np.uint8).astype(bool)
+            delta_ids = self._delta_ids[:n]
+            log_position = self._log.tell()
+
+        base_rows = np.flatnonzero(~dead)
+        delta_rows = np.flatnonzero(alive)
+        total = len(base_rows) + len(delta_rows)
+
+        def gather(positions: np.ndarray) -> np.ndarray:
+            """Float32 vectors of live items, numbered base rows first, then delta."""
+            in_base = positions < len(base_rows)
+            rows = base_rows[positions[in_base]]
+            scales = base.scales[rows] if base.scales is not None else None
+            return np.concatenate(
+                [dequantize(base.vectors[rows], scales), delta[delta_rows[positions[~in_base] - len(base_rows)]]]
+            )
+
+        nlist = default_nlist(total)
+        if retrain or (base.nlist != nlist and total > 2 * base.trained_on):
+            rng = np.random.default_rng(total)
+            sample = gather(np.sort(rng.choice(total, min(total, 64 * nlist), replace=False)))
+            centroids = train_centroids(sample, nlist)
+            trained_on = total
+            base_lists = np.empty(len(base_rows), np.int32)
+            for start in range(0, len(base_rows), _CHUNK):
+                positions = np.arange(start, min(start + _CHUNK, len(base_rows)))
+                base_lists[positions] = _assign(gather(positions), centroids)
+        else:
+            centroids = base.centroids
+            trained_on = base.trained_on
+            base_lists = base.lists()[base_rows]
+        lists = np.concatenate([base_lists, _assign(delta[delta_rows], centroids)])
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=len(centroids)))))
+
+        width = max([base.ids.dtype.itemsize] + [len(delta_ids[i].encode()) for i in delta_rows])
+        ids = np.empty(total, f"S{max(width, 1)}")
+        vectors = np.empty((total, self.dim), np.dtype(self.dtype))
+        scales = np.empty(total, np.float32) if self.dtype == "int8" else None
+        delta_id_array = np.array([delta_ids[i] for i in delta_rows], dtype=ids.dtype)
+        for start in range(0, total, _CHUNK):
+            chunk = order[start : start + _CHUNK]
+            from_base = chunk < len(base_rows)
+            picked_base = base_rows[chunk[from_base]]
+            picked_delta = chunk[~from_base] - len(base_rows)
+            # Base rows keep their stored codes; only new vectors are quantized.
+            codes, chunk_scales = quantize(delta[delta_rows[picked_delta]], self.dtype)
+            target = slice(start, start + len(chunk))
+            vectors[target][from_base] = base.vectors[picked_base]
+            vectors[target][~from_base] = codes
+            if scales is not None:
+                scales[target][from_base] = base.scales[picked_base]
+                scales[target][~from_base] = chunk_scales
+            ids[target][from_base] = base.ids[picked_base]
+            ids[target][~from_base] = delta_id_array[picked_delta]
+
+        name = f"gen-{time.time_ns()}"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        write_generation(staging, centroids, offsets, vectors, scales, ids, trained_on)
+        os.replace(staging, os.path.join(self.path, name))
+        fresh = _Generation(os.path.join(self.path, name), self.dim, self.dtype)
+
+        with self._lock:
+            self._log.flush()
+            with open(self._log_path, "rb") as f:
+                f.seek(log_position)
+                tail = f.read()
+            # Updates made while the generation was being written are replayed on top of it.
+            self._base = fresh
+            self._reset_delta()
+            self._replay(tail)
+            with open(self._log_path + ".tmp", "wb") as f:
+                f.write(tail)
+            tmp = os.path.join(self.path, "CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(name)
+            os.replace(tmp, os.path.join(self.path, "CURRENT"))
+            os.replace(self._log_path + ".tmp", self._log_path)
+            self._log.close()
+            self._log = open(self._log_path, "ab")
+        if base.directory:
+            shutil.rmtree(base.directory, ignore_errors=True)
+
+    def stats(self) -> dict:
+        base = self._base
+        return {
+            "items": len(self),
+            "base": base.count,
+            "delta": len(self._delta_ids),
+            "lists": base.nlist,
+            "dtype": self.dtype,
+            "bytes": int(base.vectors.nbytes + (base.scales.nbytes if base.scales is not None else 0)),
+        }
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,240 @@
+"""Versioned model artifacts and a NumPy-only MLP runtime.
+
+An artifact is a directory ``{root}/{name}/{version}/`` holding one ``.npy``
+file per weight matrix and bias, plus ``manifest.json`` describing the layers,
+input features and a SHA-256 per file. ``{root}/{name}/CURRENT`` names the
+version to serve. Weights are memory-mapped on load, so a pod starts scoring
+without importing torch or TensorFlow and without reading the weights up front.
+
+Artifacts are written offline with ``write_artifact``, or converted from a
+torch ``state_dict``:
+
+    python -m app.services.artifacts export ranking.pt /var/lib/recommendation/models ranking --version 2024-06-01
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT = "dahlia-mlp/1"
+ACTIVATIONS = ("relu", "none")
+
+
+class ArtifactError(Exception):
+    """The artifact is missing, malformed or does not match its manifest."""
+
+
+@dataclass
+class Dense:
+    weight: np.ndarray  # (inputs, outputs), so a batch is ``x @ weight``
+    bias: np.ndarray
+    activation: str
+
+
+class NumpyMLP:
+    """Callable mapping a float32 ``(rows, input_dim)`` array to one score per row."""
+
+    def __init__(self, layers: Sequence[Dense], feature_names: Sequence[str] = (), version: str = ""):
+        self.layers = list(layers)
+        self.feature_names = tuple(feature_names)
+        self.version = version
+        self.input_dim = self.layers[0].weight.shape[0]
+
+    def __call__(self, features: np.ndarray) -> np.ndarray:
+        x = np.asarray(features, np.float32)
+        for layer in self.layers:
+            x = x @ layer.weight
+            x += layer.bias
+            if layer.activation == "relu":
+                np.maximum(x, 0, out=x)
+        return x.reshape(-1)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_artifact(
+    root: str,
+    name: str,
+    version: str,
+    layers: Sequence[Tuple[np.ndarray, np.ndarray, str]],
+    feature_names: Sequence[str] = (),
+    activate: bool = True,
+) -> str:
+    """Write ``(weight, bias, activation)`` layers as a new version; returns its directory.
+
+    ``weight`` is ``(inputs, outputs)``. With ``activate`` the version becomes CURRENT.
+    """
+    model_dir = os.path.join(root, name)
+    final = os.path.join(model_dir, version)
+    if os.path.exists(final):
+        raise ArtifactError(f"{name} version {version} already exists")
+    staging = os.path.join(model_dir, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    manifest_layers = []
+    files = {}
+    for i, (weight, bias, activation) in enumerate(layers):
+        if activation not in ACTIVATIONS:
+            raise ArtifactError(f"unknown activation {activation!r}")
+        weight = np.ascontiguousarray(weight, np.float32)
+        bias = np.ascontiguousarray(bias, np.float32).reshape(-1)
+        if bias.shape[0] != weight.shape[1]:
+            raise ArtifactError(f"layer {i}: bias has {bias.shape[0]} entries for {weight.shape[1]} outputs")
+        entry = {"activation": activation}
+        for part, array in (("weight", weight), ("bias", bias)):
+            filename = f"layer{i}.{part}.npy"
+            np.save(os.path.join(staging, filename), array)
+            files[filename] = _sha256(os.path.join(staging, filename))
+            entry[part] = {"file": filename, "shape": list(array.shape)}
+        manifest_layers.append(entry)
+    manifest = {
+        "format": FORMAT,
+        "name": name,
+        "version": version,
+        "created_at": time.time(),
+        "feature_names": list(feature_names),
+        "layers": manifest_layers,
+        "sha256": files,
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, final)
+    if activate:
+        set_current(root, name, version)
+    return final
+
+
+def set_current(root: str, name: str, version: str) -> None:
+    """Point ``CURRENT`` at ``version`` (rollout or rollback)."""
+    model_dir = os.path.join(root, name)
+    if not os.path.isdir(os.path.join(model_dir, version)):
+        raise ArtifactError(f"{name} has no version {version}")
+    tmp = os.path.join(model_dir, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(model_dir, "CURRENT"))
+
+
+def versions(root: str, name: str) -> List[str]:
+    model_dir = os.path.join(root, name)
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(
+        entry
+        for entry in os.listdir(model_dir)
+        if not entry.startswith(".") and os.path.isfile(os.path.join(model_dir, entry, "manifest.json"))
+    )
+
+
+def current_version(root: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, name, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_mlp(root: str, name: str, version: Optional[str] = None, verify: bool = False) -> NumpyMLP:
+    """Memory-map ``version`` (default: CURRENT) of an MLP artifact.
+
+    ``verify`` checks every file against its SHA-256, which reads the weights in full.
+    """
+    version = version or current_version(root, name)
+    if not version:
+        raise ArtifactError(f"no current version of {name} under {root}")
+    directory = os.path.join(root, name, version)
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ArtifactError(f"{directory} has no manifest")
+    if manifest.get("format") != FORMAT:
+        raise ArtifactError(f"{directory} is {manifest.get('format')!r}, not {FORMAT}")
+    if verify:
+        for filename, expected in manifest["sha256"].items():
+            if _sha256(os.path.join(directory, filename)) != expected:
+                raise ArtifactError(f"{directory}/{filename} does not match its checksum")
+
+    layers = []
+    for i, entry in enumerate(manifest["layers"]):
+        arrays = {}
+        for part in ("weight", "bias"):
+            array = np.load(os.path.join(directory, entry[part]["file"]), mmap_mode="r")
+            if list(array.shape) != entry[part]["shape"] or array.dtype != np.float32:
+                raise ArtifactError(f"{directory}: layer {i} {part} is {array.dtype}{list(array.shape)}")
+            arrays[part] = array
+        if layers and layers[-1].weight.shape[1] != arrays["weight"].shape[0]:
+            raise ArtifactError(f"{directory}: layer {i} does not take layer {i - 1}'s output")
+        layers.append(Dense(arrays["weight"], arrays["bias"], entry["activation"]))
+    if not layers:
+        raise ArtifactError(f"{directory} has no layers")
+    return NumpyMLP(layers, manifest.get("feature_names", ()), version)
+
+
+def layers_from_state_dict(state_dict) -> List[Tuple[np.ndarray, np.ndarray, str]]:
+    """Layers of an ``nn.Sequential`` of ``Linear``/``ReLU`` (as built by ``build_ranking_mlp``).
+
+    Linear weights are ``(outputs, inputs)`` in torch and are transposed; every
+    layer but the last is followed by ReLU.
+    """
+    weights = sorted(
+        (key for key in state_dict if key.endswith(".weight")), key=lambda key: int(key.split(".")[0])
+    )
+    layers = []
+    for i, key in enumerate(weights):
+        prefix = key[: -len(".weight")]
+        weight = state_dict[key].detach().cpu().numpy().T
+        bias = state_dict[f"{prefix}.bias"].detach().cpu().numpy()
+        layers.append((weight, bias, "relu" if i < len(weights) - 1 else "none"))
+    return layers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage ranking model artifacts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="convert a torch state_dict into an artifact")
+    export.add_argument("state_dict")
+    export.add_argument("root")
+    export.add_argument("name")
+    export.add_argument("--version", default=time.strftime("%Y%m%dT%H%M%S"))
+    export.add_argument("--no-activate", action="store_true")
+    activate = commands.add_parser("activate", help="point CURRENT at a version")
+    activate.add_argument("root")
+    activate.add_argument("name")
+    activate.add_argument("version")
+    listing = commands.add_parser("list", help="list versions")
+    listing.add_argument("root")
+    listing.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import torch
+
+        from app.services.features import FEATURE_NAMES
+
+        layers = layers_from_state_dict(torch.load(args.state_dict, map_location="cpu"))
+        path = write_artifact(args.root, args.name, args.version, layers, FEATURE_NAMES, not args.no_activate)
+        print(path)
+    elif args.command == "activate":
+        set_current(args.root, args.name, args.version)
+    else:
+        current = current_version(args.root, args.name)
+        for version in versions(args.root, args.name):
+            print(("* " if version == current else "  ") + version)
+
+
+if __name__ == "__main__":
+    main()
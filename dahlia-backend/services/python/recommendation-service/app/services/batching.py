@@ -0,0 +1,155 @@
+"""Dynamic micro-batching for model inference.
+
+Concurrent ``submit`` calls each bring a matrix of candidate feature rows.
+The batcher gathers them until ``max_batch_items`` rows are waiting or
+``max_wait`` seconds have passed since the oldest one arrived. It then runs
+one forward pass over the concatenated rows on a dedicated thread and hands
+each caller its slice of the scores. While a pass runs, the next batch keeps
+filling, so batches grow with load and the added latency stays bounded by
+``max_wait`` plus one pass.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.core.metrics import Counter, Histogram
+
+batch_items = Histogram(
+    "recommendation_batch_items", "Rows per forward pass", (1, 16, 64, 256, 512, 1024, 2048, 4096, 8192)
+)
+batch_requests = Histogram("recommendation_batch_requests", "Requests per forward pass", (1, 2, 4, 8, 16, 32, 64))
+batch_seconds = Histogram(
+    "recommendation_batch_seconds", "Forward pass latency", (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+)
+queue_seconds = Histogram(
+    "recommendation_batch_queue_seconds",
+    "Time a request waited before its forward pass started",
+    (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1),
+)
+rejected_total = Counter("recommendation_batch_rejected_total", "Scoring requests refused by reason")
+
+
+class Overloaded(Exception):
+    """More rows are queued than ``max_queue_items``; the caller should shed or retry."""
+
+
+@dataclass
+class _Pending:
+    features: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        score: Callable[[np.ndarray], np.ndarray],
+        width: Optional[int] = None,
+        max_batch_items: int = 2048,
+        max_wait: float = 0.002,
+        max_queue_items: int = 32768,
+        timeout: Optional[float] = 0.1,
+    ):
+        self.score = score
+        self.width = width
+        self.max_batch_items = max_batch_items
+        self.max_wait = max_wait
+        self.max_queue_items = max_queue_items
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued_items = 0
+        self._carry: Optional[_Pending] = None
+        self._task: Optional[asyncio.Task] = None
+        # One thread: passes run back to back, and the model's own intra-op
+        # threads are the only parallelism.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, features: np.ndarray) -> np.ndarray:
+        """Scores for ``features`` (one row per candidate)."""
+        features = np.ascontiguousarray(features, np.float32)
+        if features.ndim != 2 or (self.width is not None and features.shape[1] != self.width):
+            raise ValueError(f"expected rows of {self.width} features, got shape {features.shape}")
+        rows = len(features)
+        if rows == 0:
+            return np.empty(0, np.float32)
+        if self._queued_items + rows > self.max_queue_items:
+            rejected_total.inc(reason="queue_full")
+            raise Overloaded(f"{self._queued_items} rows already queued")
+        future = asyncio.get_running_loop().create_future()
+        self._queued_items += rows
+        self._queue.put_nowait(_Pending(features, future, time.monotonic()))
+        try:
+            # On timeout the future is cancelled, and dropped if its batch has not started.
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            rejected_total.inc(reason="timeout")
+            raise
+
+    async def _next_batch(self) -> List[_Pending]:
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        batch, rows = [first], len(first.features)
+        deadline = first.enqueued_at + self.max_wait
+        while rows < self.max_batch_items:
+            if self._queue.empty():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                pending = self._queue.get_nowait()
+            if rows + len(pending.features) > self.max_batch_items:
+                # Keep requests whole; this one opens the next batch.
+                self._carry = pending
+                break
+            batch.append(pending)
+            rows += len(pending.features)
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            for pending in batch:
+                self._queued_items -= len(pending.features)
+            batch = [p for p in batch if not p.future.done()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            for pending in batch:
+                queue_seconds.observe(started - pending.enqueued_at)
+            inputs = batch[0].features if len(batch) == 1 else np.concatenate([p.features for p in batch])
+            try:
+                scores = await loop.run_in_executor(self._executor, self.score, inputs)
+            except Exception as exc:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+                continue
+            batch_seconds.observe(time.monotonic() - started)
+            batch_items.observe(len(inputs))
+            batch_requests.observe(len(batch))
+            offset = 0
+            for pending in batch:
+                rows = len(pending.features)
+                if not pending.future.done():
+                    pending.future.set_result(scores[offset : offset + rows])
+                offset += rows
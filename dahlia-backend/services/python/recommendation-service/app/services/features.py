@@ -0,0 +1,422 @@
+"""Precomputed ranking features in columnar NumPy arrays.
+
+Users and posts each get a dense row number on first sight (a dict maps the
+string id to it), and every feature is a NumPy column indexed by that row.
+Viewer-author pairs live in a third table keyed by ``viewer_row << 32 |
+author_row`` through an open-addressing ``Int64HashMap``, so looking up the
+pairs for a whole candidate list is a handful of vectorised probes.
+
+Events (follows, likes, comments, new and deleted posts) update single cells.
+``gather`` turns a viewer and a candidate list into a feature matrix in one
+pass of array indexing, with no per-candidate queries.
+
+Snapshots are directories of ``.npy`` files selected by a ``CURRENT`` pointer;
+loading one is a plain read of each column, with only the id dicts rebuilt.
+"""
+
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Column order of ``FeatureBatch.matrix``, i.e. the ranking model's input.
+FEATURE_NAMES = (
+    "known",
+    "log_like_count",
+    "log_comment_count",
+    "log_age_hours",
+    "log_author_followers",
+    "log_author_posts",
+    "follows_author",
+    "affinity",
+)
+
+# Affinity gained per interaction with an author's post; it halves every ``half_life``.
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+_EMPTY = -1
+_GOLDEN_INT = 0x9E3779B97F4A7C15
+_GOLDEN = np.uint64(_GOLDEN_INT)
+_U64 = (1 << 64) - 1
+
+
+class Int64HashMap:
+    """Non-negative int64 keys to int64 values, linear probing, vectorised lookups."""
+
+    def __init__(self, capacity: int = 1024):
+        capacity = 1 << max(4, (capacity - 1).bit_length())
+        self.keys = np.full(capacity, _EMPTY, np.int64)
+        self.values = np.zeros(capacity, np.int64)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _slots(self, keys: np.ndarray) -> np.ndarray:
+        # Fibonacci hashing: the top bits of key * 2^64/phi.
+        bits = len(self.keys).bit_length() - 1
+        hashed = keys.astype(np.uint64) * _GOLDEN
+        return (hashed >> np.uint64(64 - bits)).astype(np.int64)
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        """Value per key, -1 where absent."""
+        keys = np.asarray(keys, np.int64)
+        mask = len(self.keys) - 1
+        result = np.full(len(keys), -1, np.int64)
+        slots = self._slots(keys)
+        pending = np.arange(len(keys))
+        while len(pending):
+            found = self.keys[slots[pending]]
+            hit = found == keys[pending]
+            result[pending[hit]] = self.values[slots[pending[hit]]]
+            pending = pending[~hit & (found != _EMPTY)]
+            slots[pending] = (slots[pending] + 1) & mask
+        return result
+
+    def _slot(self, key: int) -> int:
+        # ``_slots`` for one key, in Python ints: far cheaper than a 1-element array.
+        bits = len(self.keys).bit_length() - 1
+        return ((key * _GOLDEN_INT) & _U64) >> (64 - bits)
+
+    def get(self, key: int) -> int:
+        keys = self.keys
+        mask = len(keys) - 1
+        slot = self._slot(key)
+        while True:
+            found = keys[slot]
+            if found == key:
+                return int(self.values[slot])
+            if found == _EMPTY:
+                return -1
+            slot = (slot + 1) & mask
+
+    def put(self, key: int, value: int) -> None:
+        if 2 * (self.size + 1) > len(self.keys):
+            self._rehash(2 * len(self.keys))
+        mask = len(self.keys) - 1
+        slot = self._slot(key)
+        while True:
+            found = self.keys[slot]
+            if found == key:
+                self.values[slot] = value
+                return
+            if found == _EMPTY:
+                self.keys[slot] = key
+                self.values[slot] = value
+                self.size += 1
+                return
+            slot = (slot + 1) & mask
+
+    def _insert_new(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Insert distinct keys known to be absent, all at once."""
+        mask = len(self.keys) - 1
+        slots = self._slots(keys)
+        pending = np.arange(len(keys))
+        while len(pending):
+            targets = slots[pending]
+            free = self.keys[targets] == _EMPTY
+            # Several keys may want the same free slot; the first one takes it.
+            taken, first = np.unique(targets[free], return_index=True)
+            winners = pending[free][first]
+            self.keys[taken] = keys[winners]
+            self.values[taken] = values[winners]
+            placed = np.zeros(len(keys), bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            blocked = pending[self.keys[slots[pending]] != _EMPTY]
+            slots[blocked] = (slots[blocked] + 1) & mask
+        self.size += len(keys)
+
+    def _rehash(self, capacity: int) -> None:
+        live = self.keys != _EMPTY
+        keys, values = self.keys[live], self.values[live]
+        self.keys = np.full(capacity, _EMPTY, np.int64)
+        self.values = np.zeros(capacity, np.int64)
+        self.size = 0
+        self._insert_new(keys, values)
+
+
+class _Columns:
+    """One growable NumPy array per column; rows ``0..count-1`` are in use."""
+
+    def __init__(self, schema: Dict[str, tuple], capacity: int = 1024):
+        self.schema = schema
+        self.count = 0
+        self.columns = {name: np.full(capacity, default, dtype) for name, (dtype, default) in schema.items()}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self) -> int:
+        row = self.count
+        if row == len(self.columns[next(iter(self.schema))]):
+            self._grow(2 * row)
+        self.count += 1
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        for name, (dtype, default) in self.schema.items():
+            grown = np.full(capacity, default, dtype)
+            old = self.columns[name]
+            grown[: len(old)] = old
+            self.columns[name] = grown
+
+    def export(self) -> Dict[str, np.ndarray]:
+        """Copies of the used part of each column, to save outside the lock."""
+        return {name: column[: self.count].copy() for name, column in self.columns.items()}
+
+    def load(self, directory: str, prefix: str) -> None:
+        for name in self.schema:
+            self.columns[name] = np.load(os.path.join(directory, f"{prefix}.{name}.npy"))
+        self.count = len(self.columns[next(iter(self.schema))])
+        if self.count < 1024:
+            self._grow(1024)
+
+
+class _Table(_Columns):
+    """Columns whose rows are addressed by string id."""
+
+    def __init__(self, schema: Dict[str, tuple], capacity: int = 1024):
+        super().__init__(schema, capacity)
+        self.index: Dict[str, int] = {}
+        self.ids: List[str] = []
+
+    def row(self, item_id: str) -> int:
+        """Row of ``item_id``, appended with default values if new."""
+        row = self.index.get(item_id)
+        if row is None:
+            row = self.append()
+            self.index[item_id] = row
+            self.ids.append(item_id)
+        return row
+
+    def rows(self, item_ids: Iterable[str]) -> np.ndarray:
+        get = self.index.get
+        return np.fromiter((get(i, -1) for i in item_ids), np.int64)
+
+    def export(self) -> Dict[str, np.ndarray]:
+        columns = super().export()
+        columns["ids"] = np.array([i.encode() for i in self.ids], dtype=bytes)
+        return columns
+
+    def load(self, directory: str, prefix: str) -> None:
+        super().load(directory, prefix)
+        ids = np.load(os.path.join(directory, f"{prefix}.ids.npy"))
+        self.ids = [i.decode() for i in ids.tolist()]
+        self.index = {item_id: row for row, item_id in enumerate(self.ids)}
+
+
+USER_SCHEMA = {
+    "follower_count": (np.int32, 0),
+    "following_count": (np.int32, 0),
+    "post_count": (np.int32, 0),
+}
+POST_SCHEMA = {
+    "author": (np.int64, -1),
+    "created_at": (np.float64, np.nan),
+    "like_count": (np.int32, 0),
+    "comment_count": (np.int32, 0),
+    "deleted": (np.bool_, False),
+}
+PAIR_SCHEMA = {
+    # viewer_row << 32 | author_row; ``pair_index`` maps it back to the row.
+    "key": (np.int64, -1),
+    "follows": (np.bool_, False),
+    # Decayed interaction score as of ``affinity_at``.
+    "affinity": (np.float32, 0.0),
+    "affinity_at": (np.float64, 0.0),
+}
+
+
+@dataclass
+class FeatureBatch:
+    post_ids: Sequence[str]
+    columns: Dict[str, np.ndarray]
+
+    def matrix(self) -> np.ndarray:
+        """``(len(post_ids), len(FEATURE_NAMES))`` float32 model input."""
+        return np.stack([self.columns[name] for name in FEATURE_NAMES], axis=1).astype(np.float32)
+
+
+class FeatureStore:
+    def __init__(self, path: Optional[str] = None, affinity_half_life: float = 14 * 86400.0):
+        self.path = path
+        self.decay = math.log(2) / affinity_half_life
+        self._lock = threading.Lock()
+        self.users = _Table(USER_SCHEMA)
+        self.posts = _Table(POST_SCHEMA)
+        self.pairs = _Columns(PAIR_SCHEMA)
+        self.pair_index = Int64HashMap()
+        current = self._current()
+        if current:
+            self._load(current)
+
+    # -- events -------------------------------------------------------------
+
+    def update_user(self, user_id: str, **counts: Optional[int]) -> None:
+        """Absolute counts from a ``UserResponse``; None leaves a count unchanged."""
+        with self._lock:
+            row = self.users.row(user_id)
+            for name, value in counts.items():
+                if value is not None:
+                    self.users.columns[name][row] = value
+
+    def create_post(self, post_id: str, author_id: str, created_at: float, like_count: int = 0, comment_count: int = 0) -> None:
+        with self._lock:
+            row = self.posts.row(post_id)
+            columns = self.posts.columns
+            is_new = columns["author"][row] < 0
+            columns["author"][row] = self.users.row(author_id)
+            columns["created_at"][row] = created_at
+            columns["like_count"][row] = like_count
+            columns["comment_count"][row] = comment_count
+            columns["deleted"][row] = False
+            if is_new:
+                self.users.columns["post_count"][columns["author"][row]] += 1
+
+    def delete_post(self, post_id: str) -> None:
+        with self._lock:
+            row = self.posts.index.get(post_id)
+            if row is not None and not self.posts.columns["deleted"][row]:
+                self.posts.columns["deleted"][row] = True
+                author = self.posts.columns["author"][row]
+                if author >= 0:
+                    self.users.columns["post_count"][author] -= 1
+
+    def like(self, post_id: str, user_id: str, liked: bool = True, now: Optional[float] = None) -> None:
+        with self._lock:
+            row = self.posts.row(post_id)
+            likes = self.posts.columns["like_count"]
+            likes[row] = max(0, likes[row] + (1 if liked else -1))
+            if liked:
+                self._interact(user_id, row, LIKE_WEIGHT, now)
+
+    def comment(self, post_id: str, user_id: str, now: Optional[float] = None) -> None:
+        with self._lock:
+            row = self.posts.row(post_id)
+            self.posts.columns["comment_count"][row] += 1
+            self._interact(user_id, row, COMMENT_WEIGHT, now)
+
+    def follow(self, user_id: str, target_user_id: str, following: bool = True) -> None:
+        """Apply a ``FollowRequest`` (``user_id`` follows ``target_user_id``)."""
+        with self._lock:
+            follower, target = self.users.row(user_id), self.users.row(target_user_id)
+            pair = self._pair(follower, target)
+            if self.pairs.columns["follows"][pair] == following:
+                return
+            self.pairs.columns["follows"][pair] = following
+            step = 1 if following else -1
+            self.users.columns["following_count"][follower] += step
+            self.users.columns["follower_count"][target] += step
+
+    def _pair(self, viewer: int, author: int) -> int:
+        key = viewer << 32 | author
+        row = self.pair_index.get(key)
+        if row < 0:
+            row = self.pairs.append()
+            self.pairs.columns["key"][row] = key
+            self.pair_index.put(key, row)
+        return row
+
+    def _interact(self, user_id: str, post_row: int, weight: float, now: Optional[float]) -> None:
+        author = int(self.posts.columns["author"][post_row])
+        if author < 0:
+            return
+        now = time.time() if now is None else now
+        pair = self._pair(self.users.row(user_id), author)
+        columns = self.pairs.columns
+        elapsed = max(0.0, now - columns["affinity_at"][pair])
+        columns["affinity"][pair] = columns["affinity"][pair] * math.exp(-self.decay * elapsed) + weight
+        columns["affinity_at"][pair] = now
+
+    # -- reads ----------------------------------------------------------------
+
+    def gather(self, viewer_id: Optional[str], post_ids: Sequence[str], now: Optional[float] = None) -> FeatureBatch:
+        """Features of ``post_ids`` for ``viewer_id``; unknown posts get zeros and ``known=0``."""
+        now = time.time() if now is None else now
+        with self._lock:
+            posts = self.posts.rows(post_ids)
+            viewer = self.users.index.get(viewer_id, -1) if viewer_id else -1
+            p = self.posts.columns
+            known = (posts >= 0) & ~p["deleted"][posts]
+            safe = np.where(known, posts, 0)
+            authors = np.where(known, p["author"][safe], -1)
+            has_author = authors >= 0
+            author_rows = np.where(has_author, authors, 0)
+            u = self.users.columns
+
+            pair_rows = np.full(len(posts), -1, np.int64)
+            if viewer >= 0 and has_author.any():
+                pair_rows[has_author] = self.pair_index.get_many((viewer << 32) | authors[has_author])
+            has_pair = pair_rows >= 0
+            pair_safe = np.where(has_pair, pair_rows, 0)
+            q = self.pairs.columns
+            follows = has_pair & q["follows"][pair_safe]
+            elapsed = np.maximum(0.0, now - q["affinity_at"][pair_safe])
+            affinity = np.where(has_pair, q["affinity"][pair_safe] * np.exp(-self.decay * elapsed), 0.0)
+
+            age_hours = np.maximum(0.0, now - p["created_at"][safe]) / 3600.0
+            columns = {
+                "known": known.astype(np.float32),
+                "log_like_count": np.where(known, np.log1p(p["like_count"][safe]), 0.0),
+                "log_comment_count": np.where(known, np.log1p(p["comment_count"][safe]), 0.0),
+                "log_age_hours": np.where(known & ~np.isnan(age_hours), np.log1p(np.nan_to_num(age_hours)), 0.0),
+                "log_author_followers": np.where(has_author, np.log1p(u["follower_count"][author_rows]), 0.0),
+                "log_author_posts": np.where(has_author, np.log1p(u["post_count"][author_rows]), 0.0),
+                "follows_author": follows.astype(np.float32),
+                "affinity": affinity,
+            }
+        return FeatureBatch(post_ids, columns)
+
+    def stats(self) -> dict:
+        return {"users": len(self.users), "posts": len(self.posts), "pairs": len(self.pairs)}
+
+    # -- snapshots ------------------------------------------------------------
+
+    def _current(self) -> Optional[str]:
+        if not self.path:
+            return None
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _load(self, directory: str) -> None:
+        self.users.load(directory, "users")
+        self.posts.load(directory, "posts")
+        self.pairs.load(directory, "pairs")
+        self.pair_index = Int64HashMap(2 * len(self.pairs))
+        self.pair_index._insert_new(self.pairs.columns["key"][: len(self.pairs)], np.arange(len(self.pairs)))
+
+    def snapshot(self) -> None:
+        """Write the current state as a new snapshot generation."""
+        if not self.path:
+            return
+        with self._lock:
+            tables = {"users": self.users.export(), "posts": self.posts.export(), "pairs": self.pairs.export()}
+            stats = self.stats()
+        os.makedirs(self.path, exist_ok=True)
+        name = f"snap-{time.time_ns()}"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        os.makedirs(staging)
+        for prefix, columns in tables.items():
+            for column, values in columns.items():
+                np.save(os.path.join(staging, f"{prefix}.{column}.npy"), values)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"created_at": time.time(), **stats}, f)
+        previous = self._current()
+        os.replace(staging, os.path.join(self.path, name))
+        tmp = os.path.join(self.path, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.path, "CURRENT"))
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
@@ -0,0 +1,92 @@
+"""Ranking model: an MLP over candidate feature rows.
+
+Serving reads a versioned NumPy artifact (``app.services.artifacts``), so the
+pod never imports torch. The torch path loads a raw ``state_dict`` instead; it
+stays for models that have not been exported yet, and torch is imported only
+when it is selected.
+"""
+
+import logging
+import os
+from typing import Sequence
+
+import numpy as np
+
+from app.services.artifacts import ArtifactError, current_version, load_mlp
+from app.services.features import FEATURE_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+def build_ranking_mlp(input_dim: int, hidden: Sequence[int] = (256, 128)):
+    """``Linear``/``ReLU`` stack ending in one logit per row."""
+    from torch import nn
+
+    layers = []
+    width = input_dim
+    for size in hidden:
+        layers += [nn.Linear(width, size), nn.ReLU()]
+        width = size
+    layers.append(nn.Linear(width, 1))
+    return nn.Sequential(*layers)
+
+
+def configure_threads(intra_op: int, inter_op: int = 1) -> None:
+    """Pin torch's thread pools; call once, before the first forward pass."""
+    import torch
+
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        # Only settable before any inter-op work has started in this process.
+        logger.warning("torch inter-op threads already initialised; leaving at %d", torch.get_num_interop_threads())
+
+
+class TorchScorer:
+    """Callable mapping a float32 ``(rows, features)`` array to one score per row."""
+
+    def __init__(self, model, input_dim: int):
+        import torch
+
+        self._torch = torch
+        self.model = model.eval()
+        self.input_dim = input_dim
+
+    @classmethod
+    def load(cls, path: str, input_dim: int, hidden: Sequence[int] = (256, 128)) -> "TorchScorer":
+        import torch
+
+        model = build_ranking_mlp(input_dim, hidden)
+        model.load_state_dict(torch.load(path, map_location="cpu"))
+        return cls(model, input_dim)
+
+    def __call__(self, features: np.ndarray) -> np.ndarray:
+        torch = self._torch
+        with torch.inference_mode():
+            logits = self.model(torch.from_numpy(features))
+        return logits.reshape(-1).numpy()
+
+
+def load_scorer(settings):
+    """Scorer for the configured backend, or None when there is no model to serve."""
+    if settings.ranking_backend == "torch":
+        path = settings.ranking_model_path
+        if not path or not os.path.exists(path):
+            logger.warning("no ranking model at %s; scoring is disabled", path)
+            return None
+        configure_threads(settings.inference_threads)
+        return TorchScorer.load(path, settings.ranking_feature_dim, settings.ranking_hidden)
+
+    root, name = settings.ranking_artifact_root, settings.ranking_model_name
+    if not root or not (settings.ranking_model_version or current_version(root, name)):
+        logger.warning("no ranking artifact %s under %s; scoring is disabled", name, root)
+        return None
+    scorer = load_mlp(root, name, settings.ranking_model_version, verify=settings.ranking_verify_artifact)
+    if scorer.feature_names and scorer.feature_names != FEATURE_NAMES:
+        raise ArtifactError(
+            f"{name} {scorer.version} was trained on {list(scorer.feature_names)}, "
+            f"the feature store serves {list(FEATURE_NAMES)}"
+        )
+    logger.info("serving %s %s (%d inputs)", name, scorer.version, scorer.input_dim)
+    return scorer
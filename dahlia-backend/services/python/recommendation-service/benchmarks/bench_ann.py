@@ -0,0 +1,90 @@
+"""Top-k retrieval latency and recall of the embedding index.
+
+Generates clustered synthetic embeddings (a Gaussian mixture, closer to real
+item embeddings than uniform noise), bulk-loads and compacts them into a
+memory-mapped generation, then times ``search`` for held-out queries and
+measures recall@k against exact inner-product search.
+
+    cd services/python/recommendation-service
+    python -m benchmarks.bench_ann --items 1000000 --dim 64 --k 500 --nprobe 16 32 64
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.ann import EmbeddingIndex, _normalize
+
+
+def embeddings(count: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    out = np.empty((count, dim), np.float32)
+    for start in range(0, count, 100_000):
+        n = min(100_000, count - start)
+        out[start : start + n] = centers[rng.integers(0, topics, n)] + 0.6 * rng.normal(size=(n, dim))
+    return _normalize(out)
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(items: int, dim: int, dtype: str, k: int, nprobes, queries: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    vectors = embeddings(items + queries, dim, max(64, items // 2000), rng)
+    corpus, held_out = vectors[:items], vectors[items:]
+    ids = [f"post-{i}" for i in range(items)]
+
+    with tempfile.TemporaryDirectory() as path:
+        index = EmbeddingIndex(path, dim, dtype=dtype, compact_after=items + 1)
+        started = time.perf_counter()
+        index.upsert_many(ids, corpus)
+        index.compact()
+        print(f"built {items} x {dim} {dtype} in {time.perf_counter() - started:.1f}s: {index.stats()}")
+        # Reopen so searches run against the memory-mapped files, as after a pod restart.
+        index.close()
+        started = time.perf_counter()
+        index = EmbeddingIndex(path, dim, dtype=dtype)
+        print(f"opened in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        exact = []
+        for q in held_out:
+            scores = corpus @ q
+            top = np.argpartition(-scores, k)[:k]
+            exact.append({ids[i] for i in top})
+
+        print(f"{'nprobe':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'recall@' + str(k):>11}")
+        for nprobe in nprobes:
+            index.search(held_out[0], k, nprobe)
+            samples, recalls = [], []
+            for q, truth in zip(held_out, exact):
+                started = time.perf_counter()
+                found = index.search(q, k, nprobe)
+                samples.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(truth & {n.id for n in found}) / k)
+            print(
+                f"{nprobe:>7} {percentile(samples, 0.5):>8.2f} {percentile(samples, 0.95):>8.2f}"
+                f" {percentile(samples, 0.99):>8.2f} {statistics.mean(recalls):>11.3f}"
+            )
+        index.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--k", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.items, args.dim, args.dtype, args.k, args.nprobe, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
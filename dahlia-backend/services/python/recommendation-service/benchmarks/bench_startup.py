@@ -0,0 +1,124 @@
+"""Cold-start cost of the ranking scorer, per backend.
+
+Writes a synthetic ranking MLP as a NumPy artifact (and, when torch is
+installed, as a state_dict with the same weights), then starts fresh
+interpreters that import the app, load the scorer the way the lifespan does
+and score one batch. Reports the median of each phase, peak RSS and which
+frameworks ended up imported.
+
+    cd services/python/recommendation-service
+    python -m benchmarks.bench_startup --hidden 256 128 --runs 5
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from app.services.artifacts import write_artifact
+from app.services.features import FEATURE_NAMES
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+from app.core.config import get_settings
+from app.services.model import load_scorer
+imported = time.perf_counter()
+scorer = load_scorer(get_settings())
+loaded = time.perf_counter()
+import numpy as np
+scorer(np.random.default_rng(0).random((ROWS, scorer.input_dim), dtype=np.float32))
+scored = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "first_score_ms": (scored - loaded) * 1000,
+    "total_ms": (scored - started) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "frameworks": sorted(m for m in ("torch", "tensorflow") if m in sys.modules),
+}))
+"""
+
+
+def layers(hidden, rng: np.random.Generator):
+    out, width = [], len(FEATURE_NAMES)
+    for size in list(hidden) + [1]:
+        weight = rng.normal(scale=width**-0.5, size=(width, size)).astype(np.float32)
+        out.append((weight, np.zeros(size, np.float32), "relu" if size != 1 else "none"))
+        width = size
+    return out
+
+
+def measure(env: dict, rows: int, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        child = subprocess.run(
+            [sys.executable, "-c", CHILD.replace("ROWS", str(rows))],
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    summary = {key: statistics.median(s[key] for s in samples) for key in samples[0] if key != "frameworks"}
+    summary["frameworks"] = ",".join(samples[0]["frameworks"]) or "-"
+    return summary
+
+
+def run(hidden, rows: int, runs: int) -> None:
+    rng = np.random.default_rng(7)
+    mlp = layers(hidden, rng)
+    with tempfile.TemporaryDirectory() as root:
+        write_artifact(root, "ranking", "bench", mlp, FEATURE_NAMES)
+        base = {
+            "PYTHONPATH": os.getcwd(),
+            "RECOMMENDATION_ANN_PATH": "",
+            "RECOMMENDATION_FEATURES_PATH": "",
+            "RECOMMENDATION_RANKING_ARTIFACT_ROOT": root,
+            "RECOMMENDATION_RANKING_HIDDEN": json.dumps(list(hidden)),
+        }
+        results = {"numpy": measure({**base, "RECOMMENDATION_RANKING_BACKEND": "numpy"}, rows, runs)}
+        if importlib.util.find_spec("torch") is not None:
+            import torch
+
+            state = {}
+            for i, (weight, bias, _) in enumerate(mlp):
+                state[f"{2 * i}.weight"] = torch.from_numpy(weight.T.copy())
+                state[f"{2 * i}.bias"] = torch.from_numpy(bias)
+            path = os.path.join(root, "ranking.pt")
+            torch.save(state, path)
+            results["torch"] = measure(
+                {**base, "RECOMMENDATION_RANKING_BACKEND": "torch", "RECOMMENDATION_RANKING_MODEL_PATH": path},
+                rows,
+                runs,
+            )
+        else:
+            print("torch is not installed; skipping the torch backend")
+
+    print(f"MLP {len(FEATURE_NAMES)} -> {' -> '.join(map(str, hidden))} -> 1, first batch of {rows} rows, median of {runs}")
+    print(f"{'backend':>8} {'import ms':>10} {'load ms':>8} {'score ms':>9} {'total ms':>9} {'RSS MB':>7}  frameworks")
+    for backend, r in results.items():
+        print(
+            f"{backend:>8} {r['import_ms']:>10.1f} {r['load_ms']:>8.1f} {r['first_score_ms']:>9.1f}"
+            f" {r['total_ms']:>9.1f} {r['max_rss_mb']:>7.1f}  {r['frameworks']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hidden", type=int, nargs="+", default=[256, 128])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.hidden, args.rows, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,83 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import recommendations
+from app.core.config import get_settings
+from app.core.metrics import render_latest
+from app.services.ann import EmbeddingIndex
+from app.services.batching import MicroBatcher
+from app.services.features import FeatureStore
+from app.services.model import load_scorer
+
+
+async def compact_embeddings(indexes, interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        for index in indexes.values():
+            if index.needs_compaction():
+                await loop.run_in_executor(None, index.compact)
+
+
+async def snapshot_features(store: FeatureStore, interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(None, store.snapshot)
 
-app = FastAPI(title="recommendation-service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    app.state.embeddings = {
+        kind: EmbeddingIndex(
+            os.path.join(settings.ann_path, kind) if settings.ann_path else None,
+            settings.embedding_dim,
+            metric=settings.ann_metric,
+            dtype=settings.ann_dtype,
+            nprobe=settings.ann_nprobe,
+            compact_after=settings.ann_compact_after,
+        )
+        for kind in ("posts", "users")
+    }
+    compaction = asyncio.create_task(
+        compact_embeddings(app.state.embeddings, settings.ann_compact_check_seconds)
+    )
+    app.state.features = FeatureStore(
+        settings.features_path, affinity_half_life=settings.affinity_half_life_days * 86400
+    )
+    snapshots = asyncio.create_task(
+        snapshot_features(app.state.features, settings.features_snapshot_interval_seconds)
+    )
+    scorer = load_scorer(settings)
+    batcher = None
+    if scorer is not None:
+        batcher = MicroBatcher(
+            scorer,
+            width=scorer.input_dim,
+            max_batch_items=settings.batch_max_items,
+            max_wait=settings.batch_max_wait_ms / 1000,
+            max_queue_items=settings.batch_max_queue_items,
+            timeout=settings.score_timeout_ms / 1000,
+        )
+        batcher.start()
+    app.state.batcher = batcher
+    yield
+    if batcher is not None:
+        await batcher.stop()
+    compaction.cancel()
+    snapshots.cancel()
+    await asyncio.get_running_loop().run_in_executor(None, app.state.features.snapshot)
+    for index in app.state.embeddings.values():
+        index.close()
+
+
+app = FastAPI(title="recommendation-service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,10 +87,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(recommendations.router)
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9002)
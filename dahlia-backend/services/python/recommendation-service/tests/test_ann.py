@@ -0,0 +1,69 @@
+import numpy as np
+
+from app.services.ann import EmbeddingIndex
+
+DIM = 16
+
+
+def _data(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(32, DIM))
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, DIM))
+    return [f"p{i}" for i in range(n)], vectors.astype(np.float32), rng
+
+
+def _exact(ids, vectors, query, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def _recall(index, ids, vectors, queries, k, nprobe=None):
+    hits = 0
+    for query in queries:
+        found = {n.id for n in index.search(query, k, nprobe)}
+        hits += len(found & set(_exact(ids, vectors, query, k)))
+    return hits / (k * len(queries))
+
+
+def test_delta_search_is_exact():
+    ids, vectors, rng = _data(500)
+    index = EmbeddingIndex(None, DIM)
+    index.upsert_many(ids, vectors)
+    for query in rng.normal(size=(5, DIM)):
+        assert [n.id for n in index.search(query, 20)] == _exact(ids, vectors, query, 20)
+
+
+def test_compacted_recall_against_exact(tmp_path):
+    ids, vectors, rng = _data(20_000)
+    index = EmbeddingIndex(str(tmp_path), DIM, dtype="int8", nprobe=32)
+    index.upsert_many(ids, vectors)
+    index.compact(retrain=True)
+    assert index.stats()["lists"] > 32
+    queries = rng.normal(size=(20, DIM))
+    assert _recall(index, ids, vectors, queries, 50) >= 0.9
+    # Probing every list leaves only quantization error.
+    assert _recall(index, ids, vectors, queries, 50, nprobe=10_000) >= 0.97
+
+
+def test_updates_and_deletes_survive_compaction_and_reopen(tmp_path):
+    ids, vectors, rng = _data(1000)
+    index = EmbeddingIndex(str(tmp_path), DIM, dtype="float16")
+    index.upsert_many(ids, vectors)
+    index.compact(retrain=True)
+    moved = rng.normal(size=DIM).astype(np.float32)
+    index.upsert("p1", moved)
+    assert index.delete("p2")
+    assert not index.delete("p2")
+    index.close()
+
+    # The log replays the edits made after the last generation.
+    reopened = EmbeddingIndex(str(tmp_path), DIM, dtype="float16")
+    assert len(reopened) == len(ids) - 1
+    assert reopened.get("p2") is None
+    assert reopened.search(moved, 1)[0].id == "p1"
+    reopened.compact()
+    assert reopened.get("p2") is None
+    assert reopened.search(moved, 1)[0].id == "p1"
+    assert all(n.id != "p2" for n in reopened.search(vectors[2], 10, nprobe=10_000))
+    reopened.close()
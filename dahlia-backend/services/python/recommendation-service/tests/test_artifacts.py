@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.services.artifacts import (
+    ArtifactError,
+    current_version,
+    layers_from_state_dict,
+    load_mlp,
+    set_current,
+    versions,
+    write_artifact,
+)
+
+
+def _layers(seed, dims=(8, 16, 4, 1)):
+    rng = np.random.default_rng(seed)
+    return [
+        (rng.normal(size=(i, o)).astype(np.float32), rng.normal(size=o).astype(np.float32), "relu" if o > 1 else "none")
+        for i, o in zip(dims, dims[1:])
+    ]
+
+
+def _reference(layers, x):
+    for weight, bias, activation in layers:
+        x = x @ weight + bias
+        if activation == "relu":
+            x = np.maximum(x, 0)
+    return x.reshape(-1)
+
+
+def test_loaded_mlp_matches_reference(tmp_path):
+    layers = _layers(0)
+    write_artifact(str(tmp_path), "ranking", "v1", layers, ["a", "b"])
+    model = load_mlp(str(tmp_path), "ranking", verify=True)
+    x = np.random.default_rng(1).normal(size=(32, 8)).astype(np.float32)
+    np.testing.assert_allclose(model(x), _reference(layers, x), rtol=1e-5, atol=1e-5)
+    assert (model.version, model.input_dim, model.feature_names) == ("v1", 8, ("a", "b"))
+
+
+def test_versions_rollout_and_rollback(tmp_path):
+    root = str(tmp_path)
+    write_artifact(root, "ranking", "v1", _layers(0))
+    write_artifact(root, "ranking", "v2", _layers(1), activate=False)
+    assert versions(root, "ranking") == ["v1", "v2"]
+    assert current_version(root, "ranking") == "v1"
+    set_current(root, "ranking", "v2")
+    assert load_mlp(root, "ranking").version == "v2"
+    set_current(root, "ranking", "v1")
+    assert load_mlp(root, "ranking").version == "v1"
+    with pytest.raises(ArtifactError):
+        set_current(root, "ranking", "v3")
+    with pytest.raises(ArtifactError):
+        write_artifact(root, "ranking", "v1", _layers(2))
+
+
+def test_corrupt_artifacts_are_rejected(tmp_path):
+    root = str(tmp_path)
+    with pytest.raises(ArtifactError):
+        load_mlp(root, "ranking")
+    directory = write_artifact(root, "ranking", "v1", _layers(0))
+    np.save(os.path.join(directory, "layer0.bias.npy"), np.zeros(16, np.float32))
+    load_mlp(root, "ranking")
+    with pytest.raises(ArtifactError, match="checksum"):
+        load_mlp(root, "ranking", verify=True)
+
+    np.save(os.path.join(directory, "layer1.weight.npy"), np.zeros((17, 4), np.float32))
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    manifest["layers"][1]["weight"]["shape"] = [17, 4]
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ArtifactError, match="does not take"):
+        load_mlp(root, "ranking")
+
+
+def test_torch_state_dict_export_matches_the_module():
+    torch = pytest.importorskip("torch")
+    from app.services.model import build_ranking_mlp
+
+    module = build_ranking_mlp(8, (16, 4)).eval()
+    x = np.random.default_rng(2).normal(size=(32, 8)).astype(np.float32)
+    with torch.no_grad():
+        expected = module(torch.from_numpy(x)).numpy().reshape(-1)
+    np.testing.assert_allclose(_reference(layers_from_state_dict(module.state_dict()), x), expected, rtol=1e-5, atol=1e-5)
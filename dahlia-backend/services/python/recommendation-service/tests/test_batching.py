@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.services.batching import MicroBatcher, Overloaded
+
+
+def _run(batcher, body):
+    async def run():
+        batcher.start()
+        try:
+            return await body(batcher)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_share_a_pass_and_get_their_own_rows():
+    passes = []
+
+    def score(features):
+        passes.append(len(features))
+        return features.sum(axis=1)
+
+    async def body(batcher):
+        requests = [np.full((n, 3), i, np.float32) for i, n in enumerate((1, 4, 2, 5), start=1)]
+        results = await asyncio.gather(*(batcher.submit(r) for r in requests))
+        return requests, results
+
+    requests, results = _run(MicroBatcher(score, width=3, max_wait=0.05), body)
+    for request, result in zip(requests, results):
+        np.testing.assert_array_equal(result, request.sum(axis=1))
+    assert passes == [12]
+
+
+def test_requests_are_never_split_across_passes():
+    passes = []
+
+    def score(features):
+        passes.append(len(features))
+        return np.zeros(len(features), np.float32)
+
+    async def body(batcher):
+        await asyncio.gather(*(batcher.submit(np.zeros((3, 2), np.float32)) for _ in range(5)))
+
+    _run(MicroBatcher(score, width=2, max_batch_items=7, max_wait=0.05), body)
+    assert passes == [6, 6, 3]
+
+
+def test_errors_and_limits():
+    def score(features):
+        raise RuntimeError("model failed")
+
+    async def body(batcher):
+        with pytest.raises(ValueError):
+            await batcher.submit(np.zeros((2, 5), np.float32))
+        with pytest.raises(Overloaded):
+            await batcher.submit(np.zeros((9, 2), np.float32))
+        with pytest.raises(RuntimeError, match="model failed"):
+            await batcher.submit(np.zeros((2, 2), np.float32))
+        assert len(await batcher.submit(np.zeros((0, 2), np.float32))) == 0
+
+    _run(MicroBatcher(score, width=2, max_queue_items=8), body)
+
+
+def test_request_that_times_out_before_its_pass_is_dropped():
+    passes = []
+
+    def score(features):
+        passes.append(len(features))
+        time.sleep(0.2)
+        return np.zeros(len(features), np.float32)
+
+    async def body(batcher):
+        first = asyncio.ensure_future(batcher.submit(np.zeros((1, 2), np.float32)))
+        await asyncio.sleep(0.02)
+        with pytest.raises(asyncio.TimeoutError):
+            await batcher.submit(np.zeros((2, 2), np.float32))
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        await asyncio.sleep(0.3)
+
+    _run(MicroBatcher(score, width=2, max_wait=0.001, timeout=0.1), body)
+    assert passes == [1]
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+
+from app.services.features import FEATURE_NAMES, FeatureStore, Int64HashMap
+
+NOW = 1_700_000_000.0
+DAY = 86400.0
+
+
+def test_hash_map_matches_a_dict_through_growth():
+    rng = np.random.default_rng(0)
+    table, expected = Int64HashMap(16), {}
+    for key, value in zip(rng.integers(0, 1 << 40, 5000).tolist(), range(5000)):
+        table.put(key, value)
+        expected[key] = value
+    assert len(table) == len(expected)
+    probes = np.array(list(expected) + rng.integers(1 << 41, 1 << 42, 500).tolist(), np.int64)
+    want = [expected.get(k, -1) for k in probes.tolist()]
+    assert table.get_many(probes).tolist() == want
+    assert [table.get(k) for k in probes.tolist()] == want
+
+
+def _store(path=None):
+    store = FeatureStore(path, affinity_half_life=7 * DAY)
+    store.update_user("author", follower_count=99)
+    store.create_post("p1", "author", created_at=NOW - 3600, like_count=2)
+    store.create_post("p2", "author", created_at=NOW - 7200)
+    store.create_post("gone", "author", created_at=NOW)
+    store.delete_post("gone")
+    store.follow("viewer", "author")
+    store.like("p1", "viewer", now=NOW - 7 * DAY)
+    store.comment("p2", "viewer", now=NOW - 7 * DAY)
+    return store
+
+
+def _rows(store, viewer="viewer"):
+    batch = store.gather(viewer, ["p1", "p2", "gone", "unknown"], now=NOW)
+    matrix = batch.matrix()
+    assert matrix.shape == (4, len(FEATURE_NAMES)) and matrix.dtype == np.float32
+    return [dict(zip(FEATURE_NAMES, row.tolist())) for row in matrix]
+
+
+def test_gather_columns():
+    p1, p2, gone, unknown = _rows(_store())
+    assert p1["known"] == 1.0 and p1["log_like_count"] == np.float32(math.log1p(3))
+    assert p2["log_comment_count"] == np.float32(math.log1p(1))
+    assert p1["log_age_hours"] == np.float32(math.log1p(1)) and p2["log_age_hours"] == np.float32(math.log1p(2))
+    # 99 from the user record, plus the viewer's follow.
+    assert p1["log_author_followers"] == np.float32(math.log1p(100))
+    assert p1["log_author_posts"] == np.float32(math.log1p(2))
+    assert p1["follows_author"] == p2["follows_author"] == 1.0
+    # Like (1) and comment (2), a half-life ago, decayed to half.
+    assert abs(p1["affinity"] - 1.5) < 1e-4
+    assert all(value == 0.0 for value in gone.values())
+    assert all(value == 0.0 for value in unknown.values())
+    stranger = _rows(_store(), viewer="stranger")[0]
+    assert stranger["follows_author"] == stranger["affinity"] == 0.0
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = _store(str(tmp_path))
+    store.snapshot()
+    store.snapshot()
+    assert sum(1 for entry in tmp_path.iterdir() if entry.name.startswith("snap-")) == 1
+    loaded = FeatureStore(str(tmp_path), affinity_half_life=7 * DAY)
+    assert loaded.stats() == store.stats()
+    assert _rows(loaded) == _rows(store)
+    loaded.follow("viewer", "author", following=False)
+    assert _rows(loaded)[0]["follows_author"] == 0.0
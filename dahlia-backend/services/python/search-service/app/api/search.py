@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from app.core.config import get_settings
+from app.core.cursor import Cursor, CursorError
+from app.models.search import (
+    IndexEventBatch,
+    PostDocument,
+    ProfileUpdatedEvent,
+    SearchHitResponse,
+    SearchResponse,
+    Suggestion,
+    TypeaheadResponse,
+    UserDocument,
+)
+from app.services.bulk import IndexEvent
+from app.services.cache import CachedPage, cache_key
+from app.services.index import InvertedIndex
+from app.services.ingest import MemorySource
+from app.services.typeahead import Profile
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+# Handlers that search or change an index are plain ``def``: FastAPI runs them
+# in its threadpool, so scoring and compaction never block the event loop. The
+# indexes, the typeahead and the result cache are all guarded by locks.
+
+
+def _index(request: Request, collection: str) -> InvertedIndex:
+    return request.app.state.indexes[collection]
+
+
+def _decode_cursor(request: Request, cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    """The ``(score, id)`` of the previous page's last hit."""
+    if not cursor:
+        return None
+    try:
+        position = request.app.state.cursors.decode(cursor)
+    except CursorError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(position.score, float) or not isinstance(position.key, str):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return position.score, position.key
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _search(
+    request: Request, collection: str, q: str, limit: int, cursor: Optional[str], filters: Dict[str, str]
+) -> Response:
+    """A ``SearchResponse`` page, rendered once and then served from the result cache."""
+    started = time.perf_counter()
+    settings = get_settings()
+    limit = min(limit, settings.max_results)
+    after = _decode_cursor(request, cursor)
+
+    cache = request.app.state.result_cache
+    key = cache_key(collection, q, filters, cursor, limit)
+    page = cache.get(key) if cache is not None else None
+    status = "hit"
+    if page is None:
+        status = "miss"
+        epoch = cache.begin() if cache is not None else 0
+        # One extra hit tells whether there is a next page.
+        hits = _index(request, collection).search(q, limit + 1, filters=filters, after=after).hits
+        next_cursor = None
+        if len(hits) > limit:
+            last = hits[limit - 1]
+            next_cursor = request.app.state.cursors.encode(Cursor(float(last.score), last.id))
+        shown = [SearchHitResponse(id=h.id, score=h.score, source=h.source) for h in hits[:limit]]
+        body = _dumps([hit.model_dump() for hit in shown])
+        page = CachedPage(body, next_cursor)
+        if cache is not None:
+            # The cursor pins where the page starts, so only its own hits matter.
+            cache.put(key, page, [(collection, h.id) for h in hits[:limit]], epoch)
+
+    # Splice the cached hits into the envelope rather than re-serialising them.
+    took_ms = (time.perf_counter() - started) * 1000
+    content = b"".join(
+        (
+            b'{"query":', _dumps(q),
+            b',"took_ms":', _dumps(took_ms),
+            b',"hits":', page.body,
+            b',"next_cursor":', _dumps(page.next_cursor),
+            b"}",
+        )
+    )
+    return Response(content=content, media_type="application/json", headers={"X-Cache": status})
+
+
+def _delete(request: Request, collection: str, doc_id: str) -> Response:
+    if not _index(request, collection).delete(doc_id):
+        raise HTTPException(status_code=404, detail="document not found")
+    return Response(status_code=204)
+
+
+@router.get("/users", response_model=SearchResponse)
+def search_users(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+):
+    return _search(request, "users", q, limit, cursor, {})
+
+
+@router.put("/users/{user_id}", status_code=204)
+def index_user(request: Request, user_id: str, doc: UserDocument):
+    _index(request, "users").upsert(user_id, doc.model_dump())
+    request.app.state.typeahead.upsert(Profile(user_id, doc.username, doc.display_name, doc.follower_count))
+    return Response(status_code=204)
+
+
+@router.delete("/users/{user_id}", status_code=204)
+def delete_user(request: Request, user_id: str):
+    request.app.state.typeahead.delete(user_id)
+    return _delete(request, "users", user_id)
+
+
+@router.get("/typeahead", response_model=TypeaheadResponse)
+def typeahead(request: Request, q: str = Query(..., min_length=1), limit: int = Query(8, ge=1)):
+    started = time.perf_counter()
+    limit = min(limit, get_settings().typeahead_max_results)
+    suggestions = request.app.state.typeahead.complete(q, limit)
+    return TypeaheadResponse(
+        query=q,
+        took_ms=(time.perf_counter() - started) * 1000,
+        suggestions=[
+            Suggestion(user_id=s.user_id, username=s.username, display_name=s.display_name, follower_count=s.weight)
+            for s in suggestions
+        ],
+    )
+
+
+@router.post("/events/profile-updated", status_code=202)
+def profile_updated(request: Request, event: ProfileUpdatedEvent):
+    """Apply an ``UpdateProfileRequest`` to the user index and typeahead."""
+    changes = event.model_dump(exclude={"user_id"}, exclude_none=True)
+    users = _index(request, "users")
+    current = users.get(event.user_id)
+    if current is not None and changes:
+        users.upsert(event.user_id, {**current, **changes})
+    applied = current is not None
+    if event.display_name is not None:
+        applied = request.app.state.typeahead.update_display_name(event.user_id, event.display_name) or applied
+    return {"applied": applied}
+
+
+@router.post("/events/index", status_code=202)
+async def enqueue_index_events(request: Request, batch: IndexEventBatch):
+    """Queue document changes for the indexing pipeline (``SEARCH_INGEST_SOURCE=memory``)."""
+    pipeline = request.app.state.pipeline
+    if pipeline is None or not isinstance(pipeline.source, MemorySource):
+        raise HTTPException(status_code=409, detail="index events are consumed from the broker")
+    timeout = get_settings().ingest_publish_timeout_seconds
+    for accepted, item in enumerate(batch.events):
+        event = IndexEvent(**item.model_dump(exclude_none=True))
+        try:
+            await asyncio.wait_for(pipeline.source.publish(event), timeout)
+        except asyncio.TimeoutError:
+            # The pipeline is behind; the caller retries the rest.
+            raise HTTPException(
+                status_code=429, detail={"accepted": accepted}, headers={"Retry-After": "1"}
+            )
+    return {"accepted": len(batch.events)}
+
+
+@router.get("/posts", response_model=SearchResponse)
+def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+):
+    filters = {"user_id": user_id} if user_id else {}
+    return _search(request, "posts", q, limit, cursor, filters)
+
+
+@router.put("/posts/{post_id}", status_code=204)
+def index_post(request: Request, post_id: str, doc: PostDocument):
+    _index(request, "posts").upsert(post_id, doc.model_dump())
+    return Response(status_code=204)
+
+
+@router.delete("/posts/{post_id}", status_code=204)
+def delete_post(request: Request, post_id: str):
+    return _delete(request, "posts", post_id)
+
+
+@router.get("/stats")
+def index_stats(request: Request):
+    stats = {name: index.stats() for name, index in request.app.state.indexes.items()}
+    if request.app.state.result_cache is not None:
+        stats["result_cache"] = request.app.state.result_cache.stats()
+    return stats
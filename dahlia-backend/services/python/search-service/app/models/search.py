@@ -0,0 +1,71 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class UserDocument(BaseModel):
+    username: str
+    display_name: str = ""
+    bio: str = ""
+    avatar_url: Optional[str] = None
+    # Popularity used to rank typeahead suggestions.
+    follower_count: int = 0
+
+
+class PostDocument(BaseModel):
+    user_id: str
+    caption: str = ""
+    location: Optional[str] = None
+    image_url: Optional[str] = None
+
+
+class SearchHitResponse(BaseModel):
+    id: str
+    score: float
+    source: dict
+
+
+class SearchResponse(BaseModel):
+    query: str
+    took_ms: float
+    hits: List[SearchHitResponse]
+    # Pass back as ``cursor`` for the next page; absent on the last one.
+    next_cursor: Optional[str] = None
+
+
+class ProfileUpdatedEvent(BaseModel):
+    """Mirrors ``user.UpdateProfileRequest``; unset fields are unchanged."""
+
+    user_id: str
+    display_name: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+
+class Suggestion(BaseModel):
+    user_id: str
+    username: str
+    display_name: str
+    follower_count: int
+
+
+class TypeaheadResponse(BaseModel):
+    query: str
+    took_ms: float
+    suggestions: List[Suggestion]
+
+
+class IndexEventRequest(BaseModel):
+    """One document change for the indexing pipeline, as published by the owning service."""
+
+    collection: Literal["users", "posts"]
+    op: Literal["index", "delete"] = "index"
+    id: str
+    source: dict = {}
+    # Monotonic per document (e.g. updated_at in ms); older writes are dropped.
+    version: Optional[int] = None
+    produced_at: Optional[float] = None
+
+
+class IndexEventBatch(BaseModel):
+    events: List[IndexEventRequest]
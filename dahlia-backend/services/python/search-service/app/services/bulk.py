@@ -0,0 +1,170 @@
+"""Bulk sinks for the indexing pipeline.
+
+A sink takes a batch of ``IndexEvent`` and returns one ``ItemResult`` per
+event, so the pipeline can ack, retry or dead-letter each one independently.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexEvent:
+    collection: str
+    op: str
+    id: str
+    source: Dict[str, object] = field(default_factory=dict)
+    # Monotonic per document (e.g. updated_at in ms); older writes lose.
+    version: Optional[int] = None
+    # Producer timestamp (epoch seconds), for indexing lag.
+    produced_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> "IndexEvent":
+        body = json.loads(raw)
+        op = body.get("op", "index")
+        if op not in ("index", "delete"):
+            raise ValueError(f"unknown op {op!r}")
+        return cls(
+            collection=body["collection"],
+            op=op,
+            id=str(body["id"]),
+            source=body.get("source") or {},
+            version=body.get("version"),
+            produced_at=body.get("produced_at") or time.time(),
+        )
+
+    def to_json(self) -> bytes:
+        return json.dumps(
+            {
+                "collection": self.collection,
+                "op": self.op,
+                "id": self.id,
+                "source": self.source,
+                "version": self.version,
+                "produced_at": self.produced_at,
+            }
+        ).encode()
+
+
+@dataclass
+class ItemResult:
+    ok: bool
+    retryable: bool = False
+    error: Optional[str] = None
+
+
+OK = ItemResult(ok=True)
+
+
+class LocalIndexSink:
+    """Applies batches to the in-process indexes (``app.services.index``)."""
+
+    def __init__(self, indexes, typeahead=None):
+        self.indexes = indexes
+        self.typeahead = typeahead
+        self._versions: Dict[tuple, int] = {}
+
+    async def write(self, events: Sequence[IndexEvent]) -> List[ItemResult]:
+        # The indexes are thread-safe; keep a large batch off the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._apply, events)
+
+    def _apply(self, events: Sequence[IndexEvent]) -> List[ItemResult]:
+        results = []
+        for event in events:
+            index = self.indexes.get(event.collection)
+            if index is None:
+                results.append(ItemResult(ok=False, error=f"unknown collection {event.collection}"))
+                continue
+            if event.version is not None:
+                key = (event.collection, event.id)
+                if event.version < self._versions.get(key, -1):
+                    results.append(OK)
+                    continue
+                self._versions[key] = event.version
+            if event.op == "delete":
+                index.delete(event.id)
+            else:
+                index.upsert(event.id, event.source)
+            if self.typeahead is not None and event.collection == "users":
+                self._update_typeahead(event)
+            results.append(OK)
+        return results
+
+    def _update_typeahead(self, event: IndexEvent) -> None:
+        from app.services.typeahead import Profile
+
+        if event.op == "delete":
+            self.typeahead.delete(event.id)
+        elif event.source.get("username"):
+            source = event.source
+            self.typeahead.upsert(
+                Profile(event.id, str(source["username"]), str(source.get("display_name") or ""), int(source.get("follower_count") or 0))
+            )
+
+    async def close(self) -> None:
+        return None
+
+
+class ElasticsearchSink:
+    """Sends batches to Elasticsearch's ``_bulk`` API over a pooled ``httpx.AsyncClient``."""
+
+    def __init__(self, client, index_prefix: str = "dahlia-", refresh: bool = False):
+        self.client = client
+        self.index_prefix = index_prefix
+        self.refresh = refresh
+
+    def _body(self, events: Sequence[IndexEvent]) -> bytes:
+        lines = []
+        for event in events:
+            meta = {"_index": self.index_prefix + event.collection, "_id": event.id}
+            if event.version is not None:
+                # Lets concurrent batches land out of order without regressing a document.
+                meta["version"] = event.version
+                meta["version_type"] = "external_gte"
+            lines.append(json.dumps({event.op: meta}))
+            if event.op == "index":
+                lines.append(json.dumps(event.source))
+        return ("\n".join(lines) + "\n").encode()
+
+    async def write(self, events: Sequence[IndexEvent]) -> List[ItemResult]:
+        try:
+            response = await self.client.post(
+                "/_bulk",
+                content=self._body(events),
+                headers={"Content-Type": "application/x-ndjson"},
+                params={"refresh": "true"} if self.refresh else None,
+            )
+        except Exception as exc:  # transport errors: the whole batch is retryable
+            logger.warning("bulk request failed: %s", exc)
+            return [ItemResult(ok=False, retryable=True, error=str(exc))] * len(events)
+        if response.status_code == 429 or response.status_code >= 500:
+            return [ItemResult(ok=False, retryable=True, error=f"HTTP {response.status_code}")] * len(events)
+        if response.status_code >= 400:
+            return [ItemResult(ok=False, error=f"HTTP {response.status_code}: {response.text[:200]}")] * len(events)
+
+        body = response.json()
+        if not body.get("errors"):
+            return [OK] * len(events)
+        results = []
+        for item in body["items"]:
+            (action,) = item.values()
+            status = action.get("status", 500)
+            if status < 300 or (status == 404 and "delete" in item):
+                results.append(OK)
+            elif status == 409:
+                # A newer version is already indexed.
+                results.append(OK)
+            else:
+                error = json.dumps(action.get("error"))[:200]
+                results.append(ItemResult(ok=False, retryable=status == 429 or status >= 500, error=error))
+        return results
+
+    async def close(self) -> None:
+        await self.client.aclose()
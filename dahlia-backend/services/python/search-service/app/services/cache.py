@@ -0,0 +1,167 @@
+"""Query-result cache with TTL, an LRU byte budget and per-document invalidation.
+
+Entries hold the rendered hits of one results page, keyed by collection,
+normalised query, filters, page cursor and page size. Each entry also records
+the documents shown on it; page cursors are keyset positions, so changes above
+a page do not shift it. A reverse map from document to entries lets an update
+or delete of one document drop exactly the pages it affects. A document that is
+new to the index, or newly matches a query, only shows up once the cached page
+expires, which is what the TTL bounds.
+
+A search that started before an invalidation must not store a page computed
+from the old document, so ``put`` takes the epoch returned by ``begin`` and
+refuses the entry if any of its documents were invalidated since.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+
+from app.core.metrics import Counter, Gauge
+from app.services.text import tokenize
+
+lookups_total = Counter("search_cache_lookups_total", "Result cache lookups by outcome (hit, miss, expired)")
+evictions_total = Counter("search_cache_evictions_total", "Result cache removals by reason (lru, invalidated)")
+cache_bytes = Gauge("search_cache_bytes", "Bytes held by the result cache")
+
+# Rough per-entry bookkeeping (entry, key tuple, reverse-map slots) on top of the payload.
+ENTRY_OVERHEAD = 256
+
+CacheKey = Tuple[Hashable, ...]
+DocKey = Tuple[str, str]
+
+
+def cache_key(
+    collection: str, query: str, filters: Mapping[str, str], cursor: Optional[str], limit: int
+) -> CacheKey:
+    """Key under which equivalent requests share an entry.
+
+    BM25 sums over query terms, so term order and case do not change results.
+    """
+    terms = " ".join(sorted(tokenize(query)))
+    return (collection, terms, tuple(sorted(filters.items())), cursor or "", limit)
+
+
+@dataclass
+class CachedPage:
+    body: bytes
+    next_cursor: Optional[str]
+
+
+@dataclass
+class _Entry:
+    page: CachedPage
+    docs: Tuple[DocKey, ...]
+    size: int
+    expires_at: float
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 30.0,
+        max_entry_bytes: int = 1024 * 1024,
+        max_tracked: int = 100_000,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._by_doc: Dict[DocKey, Set[CacheKey]] = {}
+        self._bytes = 0
+        self._epoch = 0
+        # Epoch of each document's latest invalidation, oldest first; trimmed to
+        # ``max_tracked``, below ``_floor`` every document counts as invalidated.
+        self._touched: "OrderedDict[DocKey, int]" = OrderedDict()
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def begin(self) -> int:
+        """Epoch to pass to ``put`` for a result computed from here on."""
+        return self._epoch
+
+    def get(self, key: CacheKey) -> Optional[CachedPage]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                lookups_total.inc(outcome="miss")
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                lookups_total.inc(outcome="expired")
+                return None
+            self._entries.move_to_end(key)
+            lookups_total.inc(outcome="hit")
+            return entry.page
+
+    def put(self, key: CacheKey, page: CachedPage, docs: Iterable[DocKey], epoch: int) -> bool:
+        docs = tuple(docs)
+        size = len(page.body) + ENTRY_OVERHEAD
+        if size > self.max_entry_bytes:
+            return False
+        with self._lock:
+            if epoch < self._floor or any(self._touched.get(doc, -1) > epoch for doc in docs):
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(page, docs, size, time.monotonic() + self.ttl)
+            for doc in docs:
+                self._by_doc.setdefault(doc, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                evictions_total.inc(reason="lru")
+            cache_bytes.set(self._bytes)
+            return True
+
+    def invalidate(self, collection: str, doc_id: str) -> int:
+        """Drop every page that depends on ``doc_id``; returns how many."""
+        doc = (collection, doc_id)
+        with self._lock:
+            self._epoch += 1
+            self._touched[doc] = self._epoch
+            self._touched.move_to_end(doc)
+            if len(self._touched) > self.max_tracked:
+                _, self._floor = self._touched.popitem(last=False)
+            keys = self._by_doc.pop(doc, ())
+            for key in list(keys):
+                self._drop(key)
+            if keys:
+                evictions_total.inc(len(keys), reason="invalidated")
+                cache_bytes.set(self._bytes)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_doc.clear()
+            self._bytes = 0
+            self._epoch += 1
+            self._floor = self._epoch
+            self._touched.clear()
+            cache_bytes.set(0)
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for doc in entry.docs:
+            keys = self._by_doc.get(doc)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_doc[doc]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,224 @@
+"""In-process inverted index with BM25 ranking.
+
+Each indexed field has its own term dictionary of compressed posting lists
+and its own length statistics; a query scores every (field, term) pair with
+BM25 and weights it by the field's boost. Documents get monotonically
+increasing internal ids, so postings are append-only: an update deletes the
+old internal id and appends a new one, and deleted ids are skipped at query
+time. Once deletions exceed ``max_deleted_ratio`` of the index, it is rebuilt
+from the stored sources.
+
+``on_change``, if set, is called with the document id after every upsert or
+delete, e.g. to invalidate cached results that show it.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.services.postings import PostingList
+from app.services.ranking import STRATEGIES, TermScorer
+from app.services.text import tokenize
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    boost: float = 1.0
+
+
+USER_FIELDS = (Field("username", 3.0), Field("display_name", 2.0), Field("bio", 1.0))
+POST_FIELDS = (Field("caption", 1.0), Field("location", 0.5))
+
+
+@dataclass
+class SearchHit:
+    id: str
+    score: float
+    source: dict
+
+
+@dataclass
+class SearchResult:
+    hits: List[SearchHit]
+    took_ms: float
+
+
+class _FieldIndex:
+    __slots__ = ("terms", "lengths", "total_length")
+
+    def __init__(self):
+        self.terms: Dict[str, PostingList] = {}
+        self.lengths = array("I")
+        self.total_length = 0
+
+
+class InvertedIndex:
+    def __init__(
+        self,
+        fields: Sequence[Field],
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_deleted_ratio: float = 0.25,
+        strategy: str = "maxscore",
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy!r}")
+        self.fields = tuple(fields)
+        self.k1 = k1
+        self.b = b
+        self.max_deleted_ratio = max_deleted_ratio
+        self.strategy = strategy
+        self.on_change: Optional[Callable[[str], None]] = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._fields = {f.name: _FieldIndex() for f in self.fields}
+        self._ids: List[Optional[str]] = []
+        self._sources: List[Optional[dict]] = []
+        self._live = bytearray()
+        self._by_id: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._by_id
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._by_id.get(doc_id)
+            return None if doc is None else self._sources[doc]
+
+    def upsert(self, doc_id: str, source: Mapping[str, object]) -> None:
+        source = dict(source)
+        with self._lock:
+            self._remove(doc_id)
+            self._append(doc_id, source)
+            self._maybe_compact()
+        if self.on_change is not None:
+            self.on_change(doc_id)
+
+    def delete(self, doc_id: str) -> bool:
+        with self._lock:
+            removed = self._remove(doc_id)
+            self._maybe_compact()
+        if removed and self.on_change is not None:
+            self.on_change(doc_id)
+        return removed
+
+    def _append(self, doc_id: str, source: dict) -> None:
+        doc = len(self._ids)
+        for field in self.fields:
+            index = self._fields[field.name]
+            tokens = tokenize(str(source.get(field.name) or ""))
+            for term, tf in Counter(tokens).items():
+                postings = index.terms.get(term)
+                if postings is None:
+                    postings = index.terms[term] = PostingList()
+                postings.append(doc, tf)
+            index.lengths.append(len(tokens))
+            index.total_length += len(tokens)
+        self._ids.append(doc_id)
+        self._sources.append(source)
+        self._live.append(1)
+        self._by_id[doc_id] = doc
+
+    def _remove(self, doc_id: str) -> bool:
+        doc = self._by_id.pop(doc_id, None)
+        if doc is None:
+            return False
+        self._live[doc] = 0
+        self._sources[doc] = None
+        for index in self._fields.values():
+            index.total_length -= index.lengths[doc]
+        return True
+
+    @property
+    def deleted(self) -> int:
+        return len(self._ids) - len(self._by_id)
+
+    def _maybe_compact(self) -> None:
+        if self.deleted > 1000 and self.deleted > self.max_deleted_ratio * len(self._ids):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rebuild postings from live documents, dropping deleted ids."""
+        with self._lock:
+            live = [(self._ids[d], self._sources[d]) for d in sorted(self._by_id.values())]
+            self._reset()
+            for doc_id, source in live:
+                self._append(doc_id, source)
+
+    def _scorers(self, terms: Sequence[str]) -> List[TermScorer]:
+        docs = len(self._by_id)
+        scorers = []
+        for term, count in Counter(terms).items():
+            for field in self.fields:
+                index = self._fields[field.name]
+                postings = index.terms.get(term)
+                if postings is None or index.total_length == 0:
+                    continue
+                # df still counts deleted docs until the next compaction.
+                df = min(postings.df, docs)
+                idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+                avgdl = index.total_length / docs
+                scorers.append(TermScorer(postings, field.boost * idf * count, index.lengths, self.k1, self.b, avgdl))
+        return scorers
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        strategy: Optional[str] = None,
+        filters: Optional[Mapping[str, object]] = None,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> SearchResult:
+        """Top ``limit`` hits; ``filters`` keeps documents whose source fields equal the given values.
+
+        ``after`` is the ``(score, id)`` of the previous page's last hit; only
+        hits ranked below it are returned. If that document has since been
+        deleted, hits tied with its score are skipped.
+        """
+        started = time.perf_counter()
+        top_k = STRATEGIES[strategy or self.strategy]
+        with self._lock:
+            terms = tokenize(query)
+            hits: List[SearchHit] = []
+            if terms and self._by_id and limit > 0:
+                live = self._live
+                if filters:
+                    sources = self._sources
+                    conditions = tuple(filters.items())
+
+                    def accept(doc: int) -> bool:
+                        return live[doc] == 1 and all(sources[doc].get(k) == v for k, v in conditions)
+
+                else:
+
+                    def accept(doc: int) -> bool:
+                        return live[doc] == 1
+
+                position = None
+                if after is not None:
+                    doc = self._by_id.get(after[1])
+                    position = (after[0], len(self._ids) if doc is None else doc)
+                ranked = top_k(self._scorers(terms), limit, accept, position)
+                hits = [SearchHit(self._ids[doc], score, self._sources[doc]) for score, doc in ranked]
+        return SearchResult(hits=hits, took_ms=(time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._by_id),
+                "deleted": self.deleted,
+                "terms": {name: len(index.terms) for name, index in self._fields.items()},
+                "postings_bytes": sum(
+                    p.nbytes() for index in self._fields.values() for p in index.terms.values()
+                ),
+            }
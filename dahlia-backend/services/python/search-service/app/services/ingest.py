@@ -0,0 +1,314 @@
+"""Asynchronous indexing pipeline.
+
+    source -> bounded queue -> batcher -> bulk sink (at most ``max_in_flight``)
+
+A source yields deliveries: an ``IndexEvent`` plus ack/nack callbacks. The
+consumer puts them on a bounded queue, so a slow sink stalls consumption. For
+RabbitMQ the unacked deliveries are also capped by the channel prefetch, which
+pushes the backpressure back to the broker. The batcher cuts a batch at
+``max_docs`` events, ``max_bytes`` of source or ``max_wait`` seconds after its
+first event, whichever comes first. Failed items are retried with full-jitter
+exponential backoff if the sink says they are retryable; a write that raises
+counts as a retryable failure of every event in the batch. Each delivery is
+acked only once its event is indexed, or nacked without requeue (to the
+queue's dead-letter exchange, if any) once it is given up on, so broker
+events survive a pipeline restart.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+from app.core.metrics import Counter, Gauge, Histogram
+from app.services.bulk import IndexEvent, ItemResult
+
+logger = logging.getLogger(__name__)
+
+batch_documents = Histogram(
+    "search_indexing_batch_documents", "Events per bulk request", (1, 10, 50, 100, 250, 500, 1000, 2000)
+)
+batch_seconds = Histogram(
+    "search_indexing_batch_seconds", "Bulk request latency", (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+lag_seconds = Histogram(
+    "search_indexing_lag_seconds", "Time from event production to indexing", (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+last_lag_seconds = Gauge("search_indexing_last_lag_seconds", "Indexing lag of the most recent batch")
+queue_depth = Gauge("search_indexing_queue_depth", "Events waiting to be batched")
+documents_total = Counter("search_indexing_documents_total", "Events by outcome (indexed, retried, failed)")
+
+
+@dataclass
+class Delivery:
+    event: IndexEvent
+    size: int
+    ack: Callable[[], Awaitable[None]]
+    nack: Callable[[], Awaitable[None]]
+
+
+async def _noop() -> None:
+    return None
+
+
+class MemorySource:
+    """In-process stand-in for the broker; ``publish`` blocks while it is full."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def publish(self, event: IndexEvent) -> None:
+        await self._queue.put(event)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def deliveries(self) -> AsyncIterator[Delivery]:
+        while True:
+            event = await self._queue.get()
+            yield Delivery(event, len(str(event.source)), _noop, _noop)
+
+    async def close(self) -> None:
+        return None
+
+
+class RabbitMQSource:
+    """Consumes ``IndexEvent`` JSON from a queue bound to the events exchange.
+
+    The queue is durable and shared by every replica, so each event reaches
+    one of them, unless ``exclusive`` is set. Then it belongs to this
+    connection and is deleted with it, so each replica gets every event.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        exchange: str,
+        queue: str,
+        routing_keys: Sequence[str],
+        prefetch: int = 1000,
+        exclusive: bool = False,
+    ):
+        self.url = url
+        self.exchange = exchange
+        self.queue = queue
+        self.routing_keys = list(routing_keys)
+        self.prefetch = prefetch
+        self.exclusive = exclusive
+        self._connection = None
+
+    async def deliveries(self) -> AsyncIterator[Delivery]:
+        import aio_pika
+
+        await self.close()
+        self._connection = await aio_pika.connect_robust(self.url)
+        channel = await self._connection.channel()
+        # Bounds unacked messages; the broker stops delivering once the pipeline falls behind.
+        await channel.set_qos(prefetch_count=self.prefetch)
+        exchange = await channel.declare_exchange(self.exchange, aio_pika.ExchangeType.TOPIC, durable=True)
+        if self.exclusive:
+            queue = await channel.declare_queue(self.queue, exclusive=True, auto_delete=True)
+        else:
+            queue = await channel.declare_queue(self.queue, durable=True)
+        for key in self.routing_keys:
+            await queue.bind(exchange, routing_key=key)
+        async with queue.iterator() as messages:
+            async for message in messages:
+                try:
+                    event = IndexEvent.from_json(message.body)
+                except (ValueError, KeyError, TypeError) as exc:
+                    logger.warning("dropping malformed index event: %s", exc)
+                    documents_total.inc(outcome="failed")
+                    await message.reject(requeue=False)
+                    continue
+                yield Delivery(
+                    event,
+                    len(message.body),
+                    message.ack,
+                    lambda message=message: message.nack(requeue=False),
+                )
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+
+
+class IndexingPipeline:
+    """``sink`` is a ``LocalIndexSink`` or ``ElasticsearchSink`` (``app.services.bulk``)."""
+
+    def __init__(
+        self,
+        source,
+        sink,
+        max_docs: int = 500,
+        max_bytes: int = 5 * 1024 * 1024,
+        max_wait: float = 0.2,
+        max_in_flight: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 10.0,
+        queue_size: int = 5000,
+    ):
+        self.source = source
+        self.sink = sink
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._flushes: set = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._consume()), asyncio.create_task(self._batch())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Whatever was queued but not sent stays unacked and is redelivered.
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.source.close()
+        await self.sink.close()
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                async for delivery in self.source.deliveries():
+                    await self._queue.put(delivery)
+                    queue_depth.set(self._queue.qsize())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("index event source failed; reconnecting")
+                await asyncio.sleep(1.0)
+
+    async def _batch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = batch[0].size
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_docs and size < self.max_bytes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    delivery = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(delivery)
+                size += delivery.size
+            queue_depth.set(self._queue.qsize())
+            # Waiting here stops the batcher, the queue fills and the consumer blocks.
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    async def _flush(self, batch: List[Delivery]) -> None:
+        try:
+            pending = batch
+            attempt = 0
+            while pending:
+                started = time.perf_counter()
+                try:
+                    results = await self.sink.write([d.event for d in pending])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    # A failed request (connection reset, 5xx, timeout) retries the whole batch.
+                    logger.warning("bulk write of %d events failed: %r", len(pending), exc)
+                    results = [ItemResult(ok=False, retryable=True, error=repr(exc))] * len(pending)
+                batch_seconds.observe(time.perf_counter() - started)
+                batch_documents.observe(len(pending))
+                now = time.time()
+                retry = []
+                for delivery, result in zip(pending, results):
+                    if result.ok:
+                        lag = max(0.0, now - delivery.event.produced_at)
+                        lag_seconds.observe(lag)
+                        last_lag_seconds.set(lag)
+                        documents_total.inc(outcome="indexed")
+                        await delivery.ack()
+                    elif result.retryable and attempt < self.max_retries:
+                        retry.append(delivery)
+                    else:
+                        logger.warning(
+                            "giving up on %s %s/%s: %s",
+                            delivery.event.op,
+                            delivery.event.collection,
+                            delivery.event.id,
+                            result.error,
+                        )
+                        documents_total.inc(outcome="failed")
+                        await delivery.nack()
+                if retry:
+                    documents_total.inc(len(retry), outcome="retried")
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                pending = retry
+        finally:
+            self._slots.release()
+
+
+def build_pipeline(settings, indexes, typeahead=None) -> Optional[IndexingPipeline]:
+    """Pipeline from ``Settings``; its source is exposed as ``pipeline.source``."""
+    if settings.ingest_source == "rabbitmq":
+        # Elasticsearch is shared, so replicas split the events between them.
+        # Local indexes are per replica, and each needs every event.
+        shared = settings.ingest_sink == "elasticsearch"
+        source = RabbitMQSource(
+            settings.rabbitmq_url,
+            settings.rabbitmq_exchange,
+            settings.rabbitmq_queue if shared else f"{settings.rabbitmq_queue}.{socket.gethostname()}",
+            settings.rabbitmq_routing_keys,
+            settings.rabbitmq_prefetch,
+            exclusive=not shared,
+        )
+    elif settings.ingest_source == "memory":
+        source = MemorySource(settings.ingest_queue_size)
+    else:
+        return None
+
+    if settings.ingest_sink == "elasticsearch":
+        import httpx
+
+        from app.services.bulk import ElasticsearchSink
+
+        client = httpx.AsyncClient(
+            base_url=settings.elasticsearch_url,
+            timeout=settings.elasticsearch_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=settings.ingest_max_in_flight,
+                max_keepalive_connections=settings.ingest_max_in_flight,
+            ),
+        )
+        sink = ElasticsearchSink(client, settings.elasticsearch_index_prefix)
+    else:
+        from app.services.bulk import LocalIndexSink
+
+        sink = LocalIndexSink(indexes, typeahead)
+
+    return IndexingPipeline(
+        source,
+        sink,
+        max_docs=settings.ingest_batch_max_docs,
+        max_bytes=settings.ingest_batch_max_bytes,
+        max_wait=settings.ingest_batch_max_wait_seconds,
+        max_in_flight=settings.ingest_max_in_flight,
+        max_retries=settings.ingest_max_retries,
+        backoff_base=settings.ingest_backoff_base_seconds,
+        backoff_cap=settings.ingest_backoff_cap_seconds,
+        queue_size=settings.ingest_queue_size,
+    )
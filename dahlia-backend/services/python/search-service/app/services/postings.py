@@ -0,0 +1,176 @@
+"""Compressed posting lists.
+
+Postings are ``(doc, tf)`` pairs with strictly increasing doc ids. They are
+sealed into blocks of ``BLOCK_SIZE`` entries: the doc-id gaps and then the term
+frequencies, each as LEB128 varints, in one ``bytearray`` per list. A skip
+table of ``array`` columns (last doc, byte offset and max tf per block) lets a
+cursor jump over whole blocks without decoding them. The unsealed tail stays
+in plain arrays so appends are O(1).
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import List, Tuple
+
+BLOCK_SIZE = 128
+# Larger than any internal doc id; marks an exhausted cursor.
+END = 1 << 62
+
+
+def encode_varints(values, out: bytearray) -> None:
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_varints(data, offset: int, count: int) -> Tuple[List[int], int]:
+    values = []
+    append = values.append
+    for _ in range(count):
+        byte = data[offset]
+        offset += 1
+        value = byte & 0x7F
+        shift = 7
+        while byte & 0x80:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        append(value)
+    return values, offset
+
+
+class PostingList:
+    __slots__ = ("data", "last_docs", "offsets", "block_max_tf", "tail_docs", "tail_tfs", "df", "max_tf")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.last_docs = array("Q")
+        self.offsets = array("Q")
+        self.block_max_tf = array("I")
+        self.tail_docs = array("Q")
+        self.tail_tfs = array("I")
+        self.df = 0
+        self.max_tf = 0
+
+    def __len__(self) -> int:
+        return self.df
+
+    @property
+    def last_doc(self) -> int:
+        if self.tail_docs:
+            return self.tail_docs[-1]
+        return self.last_docs[-1] if self.last_docs else -1
+
+    def append(self, doc: int, tf: int) -> None:
+        if doc <= self.last_doc:
+            raise ValueError(f"doc {doc} is not after {self.last_doc}")
+        self.tail_docs.append(doc)
+        self.tail_tfs.append(tf)
+        self.df += 1
+        if tf > self.max_tf:
+            self.max_tf = tf
+        if len(self.tail_docs) == BLOCK_SIZE:
+            self._seal()
+
+    def _seal(self) -> None:
+        previous = self.last_docs[-1] if self.last_docs else 0
+        gaps = []
+        for doc in self.tail_docs:
+            gaps.append(doc - previous)
+            previous = doc
+        self.offsets.append(len(self.data))
+        self.last_docs.append(self.tail_docs[-1])
+        self.block_max_tf.append(max(self.tail_tfs))
+        encode_varints(gaps, self.data)
+        encode_varints(self.tail_tfs, self.data)
+        self.tail_docs = array("Q")
+        self.tail_tfs = array("I")
+
+    @property
+    def blocks(self) -> int:
+        """Sealed blocks plus the tail, if any."""
+        return len(self.last_docs) + (1 if self.tail_docs else 0)
+
+    def block(self, index: int) -> Tuple[List[int], List[int]]:
+        """Decoded ``(docs, tfs)`` of block ``index``."""
+        if index == len(self.last_docs):
+            return self.tail_docs.tolist(), self.tail_tfs.tolist()
+        count = BLOCK_SIZE
+        gaps, offset = decode_varints(self.data, self.offsets[index], count)
+        tfs, _ = decode_varints(self.data, offset, count)
+        doc = self.last_docs[index - 1] if index else 0
+        docs = []
+        for gap in gaps:
+            doc += gap
+            docs.append(doc)
+        return docs, tfs
+
+    def block_last_doc(self, index: int) -> int:
+        if index == len(self.last_docs):
+            return self.tail_docs[-1]
+        return self.last_docs[index]
+
+    def block_for(self, target: int, start: int = 0) -> int:
+        """First block at or after ``start`` that may contain a doc >= ``target``."""
+        return bisect_left(self.last_docs, target, start)
+
+    def nbytes(self) -> int:
+        arrays = (self.last_docs, self.offsets, self.block_max_tf, self.tail_docs, self.tail_tfs)
+        return len(self.data) + sum(a.itemsize * len(a) for a in arrays)
+
+
+class Cursor:
+    """Forward-only iterator over a ``PostingList``, decoding one block at a time."""
+
+    __slots__ = ("postings", "block_index", "docs", "tfs", "pos", "doc")
+
+    def __init__(self, postings: PostingList):
+        self.postings = postings
+        self.block_index = -1
+        self.docs: List[int] = []
+        self.tfs: List[int] = []
+        self.pos = 0
+        self.doc = END
+        if postings.df:
+            self._load(0)
+
+    def _load(self, index: int) -> None:
+        if index >= self.postings.blocks:
+            self.doc = END
+            return
+        self.block_index = index
+        self.docs, self.tfs = self.postings.block(index)
+        self.pos = 0
+        self.doc = self.docs[0]
+
+    @property
+    def tf(self) -> int:
+        return self.tfs[self.pos]
+
+    def next(self) -> int:
+        self.pos += 1
+        if self.pos < len(self.docs):
+            self.doc = self.docs[self.pos]
+        else:
+            self._load(self.block_index + 1)
+        return self.doc
+
+    def advance(self, target: int) -> int:
+        """Move to the first doc >= ``target``."""
+        if self.doc >= target:
+            return self.doc
+        postings = self.postings
+        if postings.block_last_doc(self.block_index) < target:
+            self._load(postings.block_for(target, self.block_index + 1))
+            if self.doc >= target or self.doc == END:
+                return self.doc
+        self.pos = bisect_left(self.docs, target, self.pos)
+        if self.pos == len(self.docs):
+            # Only possible in the unsealed tail, which has no skip entry.
+            self._load(self.block_index + 1)
+        else:
+            self.doc = self.docs[self.pos]
+        return self.doc
@@ -0,0 +1,163 @@
+"""Top-k BM25 retrieval over posting cursors.
+
+``wand_top_k`` and ``maxscore_top_k`` use each term's score upper bound to
+skip documents that cannot enter the current top k. Both only decode the
+blocks of a posting list they actually land in. MaxScore is the default: its
+inner loop is the tightest in pure Python (see benchmarks/bench_search.py). ``exhaustive_top_k``
+scores every posting and serves as the reference the other two must match.
+
+Results are ordered by score, then by internal doc id. ``after``, a
+``(score, doc)`` position taken from the last hit of the previous page, keeps
+only documents ranked below it. A later page is therefore another top k,
+rather than the top ``offset + k`` with all but the last k thrown away.
+"""
+
+import heapq
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.services.postings import END, Cursor, PostingList
+
+
+class TermScorer:
+    """BM25 contribution of one (field, term) pair.
+
+    ``norm_base + norm_scale * dl`` is BM25's ``k1 * (1 - b + b * dl / avgdl)``.
+    Because ``dl >= tf`` the contribution is increasing in ``tf``, so the
+    list's max tf gives a safe upper bound.
+    """
+
+    __slots__ = ("cursor", "weight", "lengths", "norm_base", "norm_scale", "upper_bound")
+
+    def __init__(self, postings: PostingList, weight: float, lengths, k1: float, b: float, avgdl: float):
+        self.cursor = Cursor(postings)
+        self.weight = weight * (k1 + 1)
+        self.lengths = lengths
+        self.norm_base = k1 * (1 - b)
+        self.norm_scale = k1 * b / avgdl
+        top = postings.max_tf
+        self.upper_bound = self.weight * top / (top + self.norm_base + self.norm_scale * top)
+
+    def score(self) -> float:
+        tf = self.cursor.tf
+        return self.weight * tf / (tf + self.norm_base + self.norm_scale * self.lengths[self.cursor.doc])
+
+
+Hits = List[Tuple[float, int]]
+Position = Optional[Tuple[float, int]]
+
+
+def _below(after: Position, score: float, doc: int) -> bool:
+    """Whether ``(score, doc)`` ranks after the ``after`` position."""
+    return after is None or score < after[0] or (score == after[0] and doc > after[1])
+
+
+def _push(heap: list, k: int, score: float, doc: int) -> float:
+    """Offer ``doc`` to the top-k heap and return the new entry threshold."""
+    # Ties keep the earlier doc: (score, -doc) orders later docs first for eviction.
+    if len(heap) < k:
+        heapq.heappush(heap, (score, -doc))
+    elif score > heap[0][0]:
+        heapq.heapreplace(heap, (score, -doc))
+    return heap[0][0] if len(heap) == k else 0.0
+
+
+def _ranked(heap: list) -> Hits:
+    return [(score, -neg) for score, neg in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+
+def exhaustive_top_k(
+    scorers: Sequence[TermScorer], k: int, accept: Callable[[int], bool], after: Position = None
+) -> Hits:
+    totals = {}
+    for s in scorers:
+        cursor = s.cursor
+        while cursor.doc != END:
+            totals[cursor.doc] = totals.get(cursor.doc, 0.0) + s.score()
+            cursor.next()
+    heap: list = []
+    for doc in sorted(totals):
+        if accept(doc) and _below(after, totals[doc], doc):
+            _push(heap, k, totals[doc], doc)
+    return _ranked(heap)
+
+
+def wand_top_k(
+    scorers: Sequence[TermScorer], k: int, accept: Callable[[int], bool], after: Position = None
+) -> Hits:
+    heap: list = []
+    threshold = 0.0
+    live = [s for s in scorers if s.cursor.doc != END]
+    while live:
+        live.sort(key=lambda s: s.cursor.doc)
+        # Pivot: first cursor at which the summed upper bounds could beat the threshold.
+        bound = 0.0
+        pivot = -1
+        for i, s in enumerate(live):
+            bound += s.upper_bound
+            if bound > threshold:
+                pivot = i
+                break
+        if pivot < 0:
+            break
+        pivot_doc = live[pivot].cursor.doc
+        if pivot_doc == END:
+            break
+        if live[0].cursor.doc == pivot_doc:
+            score = 0.0
+            for s in live:
+                if s.cursor.doc != pivot_doc:
+                    break
+                score += s.score()
+                s.cursor.next()
+            if score > threshold and accept(pivot_doc) and _below(after, score, pivot_doc):
+                threshold = _push(heap, k, score, pivot_doc)
+        else:
+            # Nothing before the pivot doc can qualify; skip those cursors up to it.
+            for s in live[:pivot]:
+                s.cursor.advance(pivot_doc)
+        live = [s for s in live if s.cursor.doc != END]
+    return _ranked(heap)
+
+
+def maxscore_top_k(
+    scorers: Sequence[TermScorer], k: int, accept: Callable[[int], bool], after: Position = None
+) -> Hits:
+    ordered = sorted(scorers, key=lambda s: s.upper_bound)
+    # prefix[i] = summed upper bounds of ordered[: i + 1].
+    prefix = []
+    total = 0.0
+    for s in ordered:
+        total += s.upper_bound
+        prefix.append(total)
+
+    heap: list = []
+    threshold = 0.0
+    first_essential = 0
+    while True:
+        # Terms whose combined bound can't beat the threshold only refine scores.
+        while first_essential < len(ordered) and prefix[first_essential] <= threshold:
+            first_essential += 1
+        essential = ordered[first_essential:]
+        if not essential:
+            break
+        doc = min(s.cursor.doc for s in essential)
+        if doc == END:
+            break
+        score = 0.0
+        for s in essential:
+            if s.cursor.doc == doc:
+                score += s.score()
+                s.cursor.next()
+        for i in range(first_essential - 1, -1, -1):
+            if score + prefix[i] <= threshold:
+                break
+            s = ordered[i]
+            if s.cursor.advance(doc) == doc:
+                score += s.score()
+        else:
+            if score > threshold and accept(doc) and _below(after, score, doc):
+                threshold = _push(heap, k, score, doc)
+    return _ranked(heap)
+
+
+STRATEGIES = {"wand": wand_top_k, "maxscore": maxscore_top_k, "exhaustive": exhaustive_top_k}
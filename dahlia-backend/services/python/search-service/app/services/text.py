@@ -0,0 +1,20 @@
+"""Analysis shared by indexing and querying."""
+
+import re
+import unicodedata
+from typing import List
+
+# Letters and digits only, so "@jane_doe" and "#sunset" yield "jane", "doe", "sunset".
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics ("Café" -> "cafe")."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(fold(text)) if text else []
@@ -0,0 +1,323 @@
+"""Prefix completion over usernames and display names.
+
+The index is a flattened trie: one row per prefix of up to ``max_prefix``
+characters that covers at least ``slots`` users, in lexicographic order, each
+holding the ids of the ``slots`` most popular users under it. The rows are
+precomputed at build time by visiting users in descending popularity. A
+popular prefix is therefore one binary search plus a few record reads. Any
+other prefix matches fewer than ``slots`` users (or is longer than
+``max_prefix``), so scanning its range of the sorted key list is cheap.
+
+The built structure is a single file of offset tables and UTF-8 blobs that is
+``mmap``-ed and read through ``memoryview`` casts, so a pod can serve from a
+snapshot without parsing or rebuilding it. Updates go to an in-memory overlay
+that shadows the snapshot's records for those users. ``snapshot()`` folds the
+overlay into a new file.
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.text import fold
+
+MAGIC = b"DTYPEAH1"
+_SECTIONS = 14
+# magic, users, entries, prefixes, slots, max_prefix, then each section's offset.
+_HEADER = struct.Struct(f"<8sIIIII4x{_SECTIONS}Q")
+
+
+@dataclass(frozen=True)
+class Profile:
+    user_id: str
+    username: str
+    display_name: str
+    weight: int
+
+
+@dataclass
+class Suggestion:
+    user_id: str
+    username: str
+    display_name: str
+    weight: int
+
+
+def completion_keys(username: str, display_name: str) -> List[str]:
+    """Keys a user can be found under: the username, the display name, and each later word of it."""
+    keys = {fold(username)}
+    name = " ".join(fold(display_name).split())
+    if name:
+        keys.add(name)
+        words = name.split(" ")
+        for i in range(1, len(words)):
+            keys.add(" ".join(words[i:]))
+    keys.discard("")
+    return sorted(keys)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class _Strings:
+    """``count`` strings as a u64 offset table plus a UTF-8 blob."""
+
+    def __init__(self, buf: memoryview, offsets_at: int, blob_at: int, count: int):
+        self.offsets = buf[offsets_at : offsets_at + 8 * (count + 1)].cast("Q")
+        self.blob = buf[blob_at:]
+        self.count = count
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode()
+
+    def lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _pack_strings(values: List[str]) -> Tuple[bytes, bytes]:
+    encoded = [v.encode() for v in values]
+    offsets = array("Q", [0])
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+    return offsets.tobytes(), b"".join(encoded)
+
+
+def build_snapshot(profiles: Iterable[Profile], slots: int = 16, max_prefix: int = 6) -> bytes:
+    # Index order is popularity order, so a lower index always ranks higher.
+    users = sorted(profiles, key=lambda p: (-p.weight, p.user_id))
+    entries: List[Tuple[str, int]] = []
+    tops: Dict[str, List[int]] = {}
+    for index, profile in enumerate(users):
+        for key in completion_keys(profile.username, profile.display_name):
+            entries.append((key, index))
+            # Users arrive most popular first, so the first ``slots`` per prefix are its top k.
+            for length in range(1, min(len(key), max_prefix) + 1):
+                top = tops.get(key[:length])
+                if top is None:
+                    tops[key[:length]] = [index]
+                elif len(top) < slots and index not in top:
+                    top.append(index)
+    # str order is code point order, which matches the UTF-8 byte order used for lookups.
+    entries.sort()
+    # Prefixes with fewer users are answered by scanning their key range.
+    prefixes = sorted(p for p, top in tops.items() if len(top) == slots)
+    matrix = array("I")
+    for prefix in prefixes:
+        matrix.extend(tops[prefix])
+    by_id = sorted(range(len(users)), key=lambda i: users[i].user_id.encode())
+
+    sections = [
+        *_pack_strings([p.user_id for p in users]),
+        *_pack_strings([p.username for p in users]),
+        *_pack_strings([p.display_name for p in users]),
+        array("q", (p.weight for p in users)).tobytes(),
+        *_pack_strings([key for key, _ in entries]),
+        array("I", (index for _, index in entries)).tobytes(),
+        *_pack_strings(prefixes),
+        matrix.tobytes(),
+        array("I", by_id).tobytes(),
+    ]
+    # Blobs are variable length; the header records where each section starts.
+    offsets = []
+    position = _align(_HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+    out = bytearray(position)
+    _HEADER.pack_into(out, 0, MAGIC, len(users), len(entries), len(prefixes), slots, max_prefix, *offsets)
+    for offset, section in zip(offsets, sections):
+        out[offset : offset + len(section)] = section
+    return bytes(out)
+
+
+def write_snapshot(path: str, profiles: Iterable[Profile], slots: int = 16, max_prefix: int = 6) -> None:
+    """Build the typeahead structure for ``profiles`` and write it atomically."""
+    data = build_snapshot(profiles, slots, max_prefix)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".typeahead-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class _Snapshot:
+    """Read-only view over a built structure (an ``mmap`` or bytes)."""
+
+    def __init__(self, data):
+        magic, users, entries, prefixes, slots, max_prefix, *o = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a typeahead snapshot")
+        buf = memoryview(data)
+        self._data = data
+        self.users = users
+        self.slots = slots
+        self.max_prefix = max_prefix
+        self.user_ids = _Strings(buf, o[0], o[1], users)
+        self.usernames = _Strings(buf, o[2], o[3], users)
+        self.display_names = _Strings(buf, o[4], o[5], users)
+        self.weights = buf[o[6] : o[6] + 8 * users].cast("q")
+        self.keys = _Strings(buf, o[7], o[8], entries)
+        self.entry_users = buf[o[9] : o[9] + 4 * entries].cast("I")
+        self.prefixes = _Strings(buf, o[10], o[11], prefixes)
+        self.tops = buf[o[12] : o[12] + 4 * prefixes * slots].cast("I")
+        self.by_id = buf[o[13] : o[13] + 4 * users].cast("I")
+
+    @classmethod
+    def load(cls, path: str) -> "_Snapshot":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def profile(self, index: int) -> Profile:
+        return Profile(self.user_ids[index], self.usernames[index], self.display_names[index], self.weights[index])
+
+    def find(self, user_id: str) -> Optional[int]:
+        key = user_id.encode()
+        lo, hi = 0, self.users
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.user_ids.raw(self.by_id[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.users and self.user_ids.raw(self.by_id[lo]) == key:
+            return self.by_id[lo]
+        return None
+
+    def top(self, prefix: str) -> Optional[List[int]]:
+        """Precomputed ``slots`` most popular users under ``prefix``, if it has a row."""
+        key = prefix.encode()
+        row = self.prefixes.lower_bound(key)
+        if row == self.prefixes.count or self.prefixes.raw(row) != key:
+            return None
+        return self.tops[row * self.slots : (row + 1) * self.slots].tolist()
+
+    def scan(self, prefix: str, limit: int) -> List[int]:
+        """Users with a key under ``prefix``, most popular first, from at most ``limit`` keys."""
+        key = prefix.encode()
+        found = set()
+        i = self.keys.lower_bound(key)
+        end = min(self.keys.count, i + limit)
+        while i < end and self.keys.raw(i).startswith(key):
+            found.add(self.entry_users[i])
+            i += 1
+        return sorted(found)
+
+
+class TypeaheadIndex:
+    """Snapshot plus an in-memory overlay of updated and deleted profiles."""
+
+    def __init__(self, path: Optional[str] = None, slots: int = 16, max_prefix: int = 6, scan_limit: int = 5000):
+        self.path = path
+        self.slots = slots
+        self.max_prefix = max_prefix
+        self.scan_limit = scan_limit
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._base = _Snapshot.load(path)
+        else:
+            self._base = _Snapshot(build_snapshot([], slots, max_prefix))
+        # user_id -> newer profile, or None once deleted; shadows the snapshot.
+        self._overrides: Dict[str, Optional[Profile]] = {}
+        self._delta: List[Tuple[str, str]] = []
+
+    @property
+    def pending(self) -> int:
+        """Overlay entries not yet folded into a snapshot."""
+        return len(self._overrides)
+
+    def get(self, user_id: str) -> Optional[Profile]:
+        with self._lock:
+            if user_id in self._overrides:
+                return self._overrides[user_id]
+            index = self._base.find(user_id)
+            return None if index is None else self._base.profile(index)
+
+    def _unlink_delta(self, user_id: str) -> None:
+        previous = self._overrides.get(user_id)
+        if previous is not None:
+            for key in completion_keys(previous.username, previous.display_name):
+                i = bisect_left(self._delta, (key, user_id))
+                if i < len(self._delta) and self._delta[i] == (key, user_id):
+                    del self._delta[i]
+
+    def upsert(self, profile: Profile) -> None:
+        with self._lock:
+            self._unlink_delta(profile.user_id)
+            self._overrides[profile.user_id] = profile
+            for key in completion_keys(profile.username, profile.display_name):
+                insort(self._delta, (key, profile.user_id))
+
+    def update_display_name(self, user_id: str, display_name: str) -> bool:
+        """Apply a profile update; False if the user is unknown."""
+        current = self.get(user_id)
+        if current is None:
+            return False
+        self.upsert(Profile(user_id, current.username, display_name, current.weight))
+        return True
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._unlink_delta(user_id)
+            self._overrides[user_id] = None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        query = " ".join(fold(prefix).split())
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            base, overrides = self._base, self._overrides
+            candidates = base.top(query) if len(query) <= base.max_prefix else None
+            if candidates is not None:
+                candidates = [i for i in candidates if base.user_ids[i] not in overrides]
+                # Too many of the precomputed users were shadowed; this is exact
+                # only up to ``scan_limit`` keys, until the next snapshot.
+                if len(candidates) < limit:
+                    candidates = None
+            if candidates is None:
+                candidates = [i for i in base.scan(query, self.scan_limit) if base.user_ids[i] not in overrides]
+            found = {}
+            for i in candidates[:limit]:
+                profile = base.profile(i)
+                found[profile.user_id] = profile
+            i = bisect_left(self._delta, (query,))
+            while i < len(self._delta) and self._delta[i][0].startswith(query):
+                profile = overrides[self._delta[i][1]]
+                found[profile.user_id] = profile
+                i += 1
+        best = heapq.nsmallest(limit, found.values(), key=lambda p: (-p.weight, p.user_id))
+        return [Suggestion(p.user_id, p.username, p.display_name, p.weight) for p in best]
+
+    def snapshot(self) -> None:
+        """Fold the overlay into a new snapshot file and serve from it."""
+        if not self.path:
+            return
+        with self._lock:
+            base, overrides = self._base, dict(self._overrides)
+        profiles = [base.profile(i) for i in range(base.users) if base.user_ids[i] not in overrides]
+        profiles.extend(p for p in overrides.values() if p is not None)
+        write_snapshot(self.path, profiles, self.slots, self.max_prefix)
+        fresh = _Snapshot.load(self.path)
+        with self._lock:
+            self._base = fresh
+            # Keep overlay entries that changed while the snapshot was being built.
+            for user_id, profile in overrides.items():
+                if user_id in self._overrides and self._overrides[user_id] is profile:
+                    self._unlink_delta(user_id)
+                    del self._overrides[user_id]
@@ -0,0 +1,98 @@
+"""Search latency with and without the result cache.
+
+Replays a skewed query stream (a few trending queries make up most traffic)
+against ``GET /search/posts`` through the ASGI app, optionally interleaving
+post updates that invalidate cached pages, and prints latency for cache hits,
+misses and the uncached baseline.
+
+    cd services/python/search-service
+    python -m benchmarks.bench_cache --docs 100000 --requests 20000 --write-ratio 0.01
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SEARCH_TYPEAHEAD_PATH", "")
+os.environ.setdefault("SEARCH_INGEST_SOURCE", "none")
+
+import httpx  # noqa: E402
+
+from benchmarks.bench_search import _zipf_words, build, percentile  # noqa: E402
+
+
+def query_stream(count: int, distinct: int, seed: int):
+    rng = random.Random(seed + 2)
+    pool = [" ".join(_zipf_words(rng, rng.randint(1, 3), 2_000)) for _ in range(distinct)]
+    # Zipf over the pool itself, so the top queries dominate like trending searches do.
+    return [pool[int(distinct ** rng.random()) - 1] for _ in range(count)]
+
+
+async def replay(app, stream, write_ratio: float, docs: int, seed: int):
+    rng = random.Random(seed + 3)
+    samples = {"hit": [], "miss": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://search") as client:
+        for q in stream:
+            if rng.random() < write_ratio:
+                doc = rng.randrange(docs)
+                caption = " ".join(_zipf_words(rng, rng.randint(3, 30), 50_000))
+                await client.put(f"/search/posts/post-{doc}", json={"user_id": "u", "caption": caption})
+            started = time.perf_counter()
+            response = await client.get("/search/posts", params={"q": q, "limit": 20})
+            elapsed = (time.perf_counter() - started) * 1000
+            samples[response.headers.get("x-cache", "miss")].append(elapsed)
+    return samples
+
+
+def report(label: str, samples) -> None:
+    if not samples:
+        print(f"{label:>12} {'-':>8}")
+        return
+    print(
+        f"{label:>12} {len(samples):>8} {percentile(samples, 0.5):>8.3f} {percentile(samples, 0.95):>8.3f}"
+        f" {percentile(samples, 0.99):>8.3f} {statistics.mean(samples):>8.3f}"
+    )
+
+
+async def run(docs: int, requests: int, distinct: int, write_ratio: float, seed: int) -> None:
+    import main
+
+    async with main.lifespan(main.app):
+        started = time.perf_counter()
+        index = build(docs, seed)
+        print(f"indexed {docs} posts in {time.perf_counter() - started:.1f}s")
+        cache = main.app.state.result_cache
+        index.on_change = main.app.state.indexes["posts"].on_change
+        main.app.state.indexes["posts"] = index
+        stream = query_stream(requests, distinct, seed)
+
+        main.app.state.result_cache = None
+        baseline = await replay(main.app, stream, write_ratio, docs, seed)
+        main.app.state.result_cache = cache
+        cached = await replay(main.app, stream, write_ratio, docs, seed)
+
+        print(f"{'':>12} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        report("uncached", baseline["miss"])
+        report("cache hit", cached["hit"])
+        report("cache miss", cached["miss"])
+        total = len(cached["hit"]) + len(cached["miss"])
+        print(f"hit ratio {len(cached['hit']) / total:.1%}, cache {cache.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=5_000, help="distinct queries in the stream")
+    parser.add_argument("--write-ratio", type=float, default=0.01, help="post updates per request")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args.docs, args.requests, args.distinct, args.write_ratio, args.seed))
+
+
+if __name__ == "__main__":
+    main()
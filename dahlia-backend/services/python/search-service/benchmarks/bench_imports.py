@@ -0,0 +1,95 @@
+"""Import time and resident memory of the app, checked against a budget.
+
+Starts fresh interpreters under ``python -X importtime`` that import
+``main``, which is the app and everything its routes pull in. It reports:
+
+- the median wall time of the import
+- RSS once it finishes
+- the packages that took longest, by self time
+- which of the ``LAZY`` modules were loaded
+
+The run fails if the import takes longer than ``BUDGET_MS``, if RSS exceeds
+``BUDGET_RSS_MIB``, or if a ``LAZY`` module was imported. ``LAZY`` lists heavy
+modules that must not load at startup: those the service imports only on the
+code paths that need them, and frameworks it does not use at all. The exit
+status is non-zero on failure, so CI can run this as a check.
+
+    cd services/python/search-service
+    python -m benchmarks.bench_imports --runs 5
+"""
+
+import argparse
+import collections
+import json
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = 1000
+BUDGET_RSS_MIB = 65
+LAZY = ("httpx", "aio_pika", "numpy", "PIL", "cv2", "torch", "tensorflow")
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+try:
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+except OSError:
+    pass
+print(json.dumps({"import_ms": elapsed * 1000, "rss_mib": rss, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD], capture_output=True, text=True, check=True
+    )
+    self_us = collections.Counter()
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        self_us[name.strip().split(".")[0]] += int(own)
+    return json.loads(proc.stdout.splitlines()[-1]), self_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--budget-rss-mib", type=float, default=BUDGET_RSS_MIB)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r, _ in runs)
+    rss_mib = statistics.median(r["rss_mib"] for r, _ in runs)
+    self_us = sum((s for _, s in runs), collections.Counter())
+    loaded = [m for m in LAZY if m in runs[-1][0]["modules"]]
+
+    print(f"import main   {import_ms:8.0f} ms   (budget {args.budget_ms:.0f} ms)")
+    print(f"rss           {rss_mib:8.1f} MiB  (budget {args.budget_rss_mib:.0f} MiB)")
+    print("heaviest packages by self time:")
+    for name, us in self_us.most_common(args.top):
+        print(f"  {name:<24}{us / len(runs) / 1000:8.1f} ms")
+    print(f"lazy modules loaded at import: {', '.join(loaded) or 'none'}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.0f} ms")
+    if rss_mib > args.budget_rss_mib:
+        failures.append(f"RSS is {rss_mib:.1f} MiB")
+    if loaded:
+        failures.append(f"imported {', '.join(loaded)} at startup")
+    if failures:
+        sys.exit("over budget: " + "; ".join(failures))
+    print("within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Cost of deep pages: keyset cursors against offset pagination.
+
+Builds a post corpus in which one query matches every document. It walks the
+first ``--check-pages`` pages with signed keyset cursors and checks that they
+neither repeat nor skip a hit. It then times pages 1 to 1000 both ways:
+
+- A keyset page is a top-``limit`` search below the cursor position.
+- An offset page is a top-``offset + limit`` search with everything above the
+  page thrown away. This is what the cursor used to encode.
+
+Relevance is computed at query time, so a keyset page still scores every
+candidate. It saves the deep heap and the discarded hits, not the scoring.
+The timeline service's benchmark of the same name shows cursors over sorted
+sets, where a page costs the same at any depth.
+
+    cd services/python/search-service
+    python -m benchmarks.bench_pagination --docs 30000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.cursor import Cursor, CursorCodec
+from app.services.index import POST_FIELDS, InvertedIndex
+
+QUERY = "sunset beach"
+
+
+def build(size: int, seed: int) -> InvertedIndex:
+    rng = random.Random(seed)
+    index = InvertedIndex(POST_FIELDS)
+    for doc in range(size):
+        words = ["sunset"] * rng.randint(1, 3) + [f"w{rng.randint(0, 5000)}" for _ in range(rng.randint(3, 30))]
+        if rng.random() < 0.3:
+            words.append("beach")
+        rng.shuffle(words)
+        index.upsert(f"post-{doc}", {"caption": " ".join(words)})
+    return index
+
+
+def keyset_page(index: InvertedIndex, codec: CursorCodec, cursor, limit: int):
+    after = None
+    if cursor:
+        position = codec.decode(cursor)
+        after = (position.score, position.key)
+    hits = index.search(QUERY, limit + 1, after=after).hits
+    next_cursor = codec.encode(Cursor(hits[limit - 1].score, hits[limit - 1].id)) if len(hits) > limit else None
+    return hits[:limit], next_cursor
+
+
+def offset_page(index: InvertedIndex, page: int, limit: int):
+    offset = page * limit
+    return index.search(QUERY, offset + limit + 1).hits[offset : offset + limit]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(docs: int, check_pages: int, limit: int, repeat: int, seed: int) -> None:
+    index = build(docs, seed)
+    codec = CursorCodec("bench")
+    # One ranking of everything; page p starts after hit p * limit - 1.
+    ranking = index.search(QUERY, docs).hits
+    cursor, walked = None, []
+    for _ in range(check_pages):
+        hits, cursor = keyset_page(index, codec, cursor, limit)
+        walked += hits
+        if cursor is None:
+            break
+    if len({h.id for h in walked}) != len(walked):
+        raise AssertionError("keyset pages repeated a hit")
+    if [h.id for h in walked] != [h.id for h in ranking[: len(walked)]]:
+        raise AssertionError("keyset pages disagree with a single ranking")
+    print(f"{docs:,} matching docs, {len(walked) // limit} keyset pages checked")
+
+    print(f"{'page':>6} {'keyset ms':>10} {'offset ms':>10}")
+    for page in (1, 10, 100, 1000):
+        if page * limit > len(ranking):
+            break
+        last = ranking[(page - 1) * limit - 1] if page > 1 else None
+        cursor = codec.encode(Cursor(last.score, last.id)) if last else None
+        keyset = timed(lambda: keyset_page(index, codec, cursor, limit), repeat)
+        offset = timed(lambda: offset_page(index, page - 1, limit), repeat)
+        print(f"{page:>6} {keyset:>10.2f} {offset:>10.2f}")
+
+    token = codec.encode(Cursor(ranking[-1].score, ranking[-1].id))
+    n = 100_000
+    started = time.perf_counter()
+    for _ in range(n):
+        codec.decode(token)
+    decode_us = (time.perf_counter() - started) / n * 1e6
+    print(f"cursor of {len(token)} chars decodes in {decode_us:.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--check-pages", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.docs, args.check_pages, args.limit, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Query latency against corpus size for each top-k strategy.
+
+Builds synthetic post corpora with a Zipfian vocabulary, runs the same query
+set through exhaustive scoring, WAND and MaxScore, checks that all three
+agree, and prints p50/p95 latency and index size.
+
+    cd services/python/search-service
+    python -m benchmarks.bench_search --sizes 10000 100000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.index import POST_FIELDS, InvertedIndex
+from app.services.ranking import STRATEGIES
+
+VOCABULARY = 50_000
+PLACES = ["paris", "tokyo", "new york", "lisbon", "cape town", "berlin", "lagos", "lima"]
+
+
+def _zipf_words(rng: random.Random, count: int, vocabulary: int):
+    # Inverse-CDF sampling of rank ~ 1/r, cheap enough for millions of tokens.
+    return [f"w{int(vocabulary ** rng.random())}" for _ in range(count)]
+
+
+def build(size: int, seed: int) -> InvertedIndex:
+    rng = random.Random(seed)
+    index = InvertedIndex(POST_FIELDS)
+    for doc in range(size):
+        caption = " ".join(_zipf_words(rng, rng.randint(3, 30), VOCABULARY))
+        location = rng.choice(PLACES) if rng.random() < 0.3 else None
+        index.upsert(f"post-{doc}", {"caption": caption, "location": location})
+    return index
+
+
+def queries(count: int, seed: int):
+    rng = random.Random(seed + 1)
+    return [" ".join(_zipf_words(rng, rng.randint(1, 4), 2_000)) for _ in range(count)]
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(sizes, query_count: int, limit: int, seed: int) -> None:
+    query_set = queries(query_count, seed)
+    print(f"{'docs':>9} {'strategy':>10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'postings MiB':>13}")
+    for size in sizes:
+        started = time.perf_counter()
+        index = build(size, seed)
+        build_s = time.perf_counter() - started
+        mib = index.stats()["postings_bytes"] / 2**20
+        # Scores, not ids: summation order differs between strategies, so exact ties may break differently.
+        reference = {q: [round(h.score, 6) for h in index.search(q, limit, "exhaustive").hits] for q in query_set}
+        for strategy in STRATEGIES:
+            samples = []
+            for q in query_set:
+                result = index.search(q, limit, strategy)
+                samples.append(result.took_ms)
+                got = [round(h.score, 6) for h in result.hits]
+                if got != reference[q]:
+                    raise AssertionError(f"{strategy} disagrees with exhaustive for {q!r}")
+            print(
+                f"{size:>9} {strategy:>10} {percentile(samples, 0.5):>8.3f} {percentile(samples, 0.95):>8.3f}"
+                f" {statistics.mean(samples):>8.3f} {mib:>13.1f}"
+            )
+        print(f"{'':>9} built in {build_s:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.limit, args.seed)
+
+
+if __name__ == "__main__":
+    main()
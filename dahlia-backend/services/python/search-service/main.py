@@ -1,7 +1,72 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import search
+from app.core.config import get_settings
+from app.core.cursor import CursorCodec
+from app.core.metrics import render_latest
+from app.services.cache import ResultCache
+from app.services.ingest import build_pipeline
+from app.services.index import POST_FIELDS, USER_FIELDS, InvertedIndex
+from app.services.typeahead import TypeaheadIndex
+
+
+async def snapshot_typeahead(index: TypeaheadIndex, interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        if index.pending:
+            await loop.run_in_executor(None, index.snapshot)
+
 
-app = FastAPI(title="search-service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    options = dict(
+        k1=settings.bm25_k1,
+        b=settings.bm25_b,
+        max_deleted_ratio=settings.max_deleted_ratio,
+        strategy=settings.top_k_strategy,
+    )
+    app.state.indexes = {
+        "users": InvertedIndex(USER_FIELDS, **options),
+        "posts": InvertedIndex(POST_FIELDS, **options),
+    }
+    cache = None
+    if settings.result_cache_enabled:
+        cache = ResultCache(
+            max_bytes=settings.result_cache_max_bytes,
+            ttl=settings.result_cache_ttl_seconds,
+            max_entry_bytes=settings.result_cache_max_entry_bytes,
+        )
+        for name, index in app.state.indexes.items():
+            index.on_change = partial(cache.invalidate, name)
+    app.state.result_cache = cache
+    app.state.cursors = CursorCodec(settings.cursor_secret)
+    if settings.typeahead_path:
+        os.makedirs(os.path.dirname(settings.typeahead_path) or ".", exist_ok=True)
+    typeahead = TypeaheadIndex(settings.typeahead_path, settings.typeahead_slots, settings.typeahead_max_prefix)
+    app.state.typeahead = typeahead
+    snapshots = asyncio.create_task(
+        snapshot_typeahead(typeahead, settings.typeahead_snapshot_interval_seconds)
+    )
+    pipeline = build_pipeline(settings, app.state.indexes, typeahead)
+    app.state.pipeline = pipeline
+    if pipeline is not None:
+        pipeline.start()
+    yield
+    if pipeline is not None:
+        await pipeline.stop()
+    snapshots.cancel()
+
+
+app = FastAPI(title="search-service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,10 +76,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(search.router)
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9001)
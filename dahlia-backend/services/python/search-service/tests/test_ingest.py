@@ -0,0 +1,67 @@
+import asyncio
+import socket
+
+from app.core.config import Settings
+from app.services.bulk import OK, IndexEvent
+from app.services.ingest import Delivery, IndexingPipeline, build_pipeline
+
+
+class FlakySink:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    async def write(self, events):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("connection reset")
+        return [OK] * len(events)
+
+    async def close(self):
+        return None
+
+
+def _flush(sink, max_retries: int):
+    outcomes = []
+
+    def delivery(i: int) -> Delivery:
+        async def ack():
+            outcomes.append(("ack", i))
+
+        async def nack():
+            outcomes.append(("nack", i))
+
+        event = IndexEvent(op="upsert", collection="posts", id=f"p{i}", source={"caption": "x"})
+        return Delivery(event, 1, ack, nack)
+
+    async def run():
+        pipeline = IndexingPipeline(None, sink, max_retries=max_retries, backoff_base=0.001, backoff_cap=0.001)
+        await pipeline._slots.acquire()
+        await pipeline._flush([delivery(i) for i in range(3)])
+        # The slot is released even when the sink keeps failing.
+        assert pipeline._slots._value == 4
+
+    asyncio.run(run())
+    return sorted(outcomes)
+
+
+def test_sink_error_retries_the_whole_batch():
+    sink = FlakySink(failures=2)
+    assert _flush(sink, max_retries=5) == [("ack", 0), ("ack", 1), ("ack", 2)]
+    assert sink.calls == 3
+
+
+def test_sink_error_nacks_after_max_retries():
+    sink = FlakySink(failures=10)
+    assert _flush(sink, max_retries=2) == [("nack", 0), ("nack", 1), ("nack", 2)]
+    assert sink.calls == 3
+
+
+def test_local_sink_gets_a_queue_per_replica():
+    local = build_pipeline(Settings(ingest_source="rabbitmq", ingest_sink="local"), {}).source
+    assert local.queue == f"search-service.index.{socket.gethostname()}"
+    assert local.exclusive
+
+    shared = build_pipeline(Settings(ingest_source="rabbitmq", ingest_sink="elasticsearch"), {}).source
+    assert shared.queue == "search-service.index"
+    assert not shared.exclusive
@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import search
+from app.core.cursor import CursorCodec
+from app.services.index import POST_FIELDS, InvertedIndex
+
+
+def _client(index: InvertedIndex) -> TestClient:
+    app = FastAPI()
+    app.include_router(search.router)
+    app.state.indexes = {"posts": index}
+    app.state.result_cache = None
+    app.state.cursors = CursorCodec("test-secret")
+    return TestClient(app)
+
+
+def _pages(client: TestClient, q: str, limit: int, **params):
+    ids = []
+    cursor = None
+    while True:
+        query = {"q": q, "limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        body = client.get("/search/posts", params=query).json()
+        ids.extend(hit["id"] for hit in body["hits"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_pages_have_no_repeats_or_gaps():
+    index = InvertedIndex(POST_FIELDS)
+    for i in range(230):
+        # Few distinct lengths, so many hits tie on score.
+        caption = "sunset " + "beach " * (i % 4)
+        index.upsert(f"p{i:03d}", {"caption": caption, "location": "", "user_id": f"u{i % 3}"})
+    client = _client(index)
+
+    everything = [hit.id for hit in index.search("sunset beach", 1000).hits]
+    assert len(everything) == 230
+    for limit in (1, 7, 50, 230):
+        assert _pages(client, "sunset beach", limit) == everything
+
+    filtered = [hit.id for hit in index.search("sunset", 1000, filters={"user_id": "u1"}).hits]
+    assert _pages(client, "sunset", 9, user_id="u1") == filtered
+
+
+def test_tampered_cursor_is_rejected():
+    index = InvertedIndex(POST_FIELDS)
+    for i in range(3):
+        index.upsert(f"p{i}", {"caption": "sunset", "location": ""})
+    client = _client(index)
+    cursor = client.get("/search/posts", params={"q": "sunset", "limit": 1}).json()["next_cursor"]
+    response = client.get("/search/posts", params={"q": "sunset", "limit": 1, "cursor": cursor[:-2] + "AA"})
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from app.services.postings import BLOCK_SIZE, END, Cursor, PostingList, decode_varints, encode_varints
+
+
+@pytest.mark.parametrize("values", [[], [0], [127, 128, 16383, 16384], [2**35, 1, 2**62 - 1]])
+def test_varints_round_trip(values):
+    out = bytearray(b"\xff")
+    encode_varints(values, out)
+    decoded, offset = decode_varints(out, 1, len(values))
+    assert decoded == values
+    assert offset == len(out)
+
+
+@pytest.mark.parametrize("count", [1, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 5 * BLOCK_SIZE + 17])
+def test_blocks_round_trip(count):
+    rng = random.Random(count)
+    postings = PostingList()
+    expected = []
+    doc = 0
+    for _ in range(count):
+        doc += rng.choice([1, 2, 130, 20000])
+        tf = rng.randint(1, 300)
+        postings.append(doc, tf)
+        expected.append((doc, tf))
+
+    decoded = []
+    for i in range(postings.blocks):
+        docs, tfs = postings.block(i)
+        decoded.extend(zip(docs, tfs))
+    assert decoded == expected
+    assert postings.df == count
+    assert postings.max_tf == max(tf for _, tf in expected)
+    assert postings.blocks == -(-count // BLOCK_SIZE)
+
+
+def test_append_rejects_unordered_docs():
+    postings = PostingList()
+    postings.append(5, 1)
+    with pytest.raises(ValueError):
+        postings.append(5, 1)
+
+
+def test_cursor_advance_matches_a_scan():
+    rng = random.Random(7)
+    postings = PostingList()
+    docs = sorted(rng.sample(range(100_000), 3 * BLOCK_SIZE + 40))
+    for doc in docs:
+        postings.append(doc, 1)
+
+    cursor = Cursor(postings)
+    seen = [cursor.doc]
+    while cursor.next() != END:
+        seen.append(cursor.doc)
+    assert seen == docs
+
+    cursor = Cursor(postings)
+    for target in sorted(rng.sample(range(100_050), 200)):
+        expected = next((d for d in docs if d >= max(target, cursor.doc)), END)
+        assert cursor.advance(target) == expected
+    assert cursor.advance(10**9) == END
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from app.services.index import USER_FIELDS, InvertedIndex
+
+WORDS = ["ada", "grace", "linus", "guido", "ken", "dennis", "barbara", "edsger", "donald", "alan", "rust", "python"]
+
+
+def _index(docs: int = 600, seed: int = 3) -> InvertedIndex:
+    rng = random.Random(seed)
+    index = InvertedIndex(USER_FIELDS)
+    for i in range(docs):
+        index.upsert(
+            f"u{i}",
+            {
+                "username": rng.choice(WORDS),
+                "display_name": " ".join(rng.choices(WORDS, k=rng.randint(1, 3))),
+                "bio": " ".join(rng.choices(WORDS, k=rng.randint(0, 12))),
+                "team": rng.choice(["red", "blue"]),
+            },
+        )
+    # Leave some deleted documents in the postings.
+    for i in range(0, docs, 9):
+        index.delete(f"u{i}")
+    return index
+
+
+def _assert_same_ranking(actual, expected, scores):
+    """Same scores in the same order; ids may differ only among ties.
+
+    Strategies sum term scores in different orders, so tied documents can
+    differ in the last bit and swap places.
+    """
+    assert [hit.score for hit in actual.hits] == pytest.approx([hit.score for hit in expected.hits], rel=1e-12)
+    for hit in actual.hits:
+        assert hit.score == pytest.approx(scores[hit.id], rel=1e-12)
+
+
+@pytest.mark.parametrize("strategy", ["maxscore", "wand"])
+@pytest.mark.parametrize("query", ["ada", "grace linus", "python rust alan donald", "nobody", "ada ada ken"])
+def test_pruned_top_k_matches_exhaustive(strategy, query):
+    index = _index()
+    scores = {hit.id: hit.score for hit in index.search(query, 1000, strategy="exhaustive").hits}
+    for limit in (1, 10, 50, 1000):
+        expected = index.search(query, limit, strategy="exhaustive")
+        _assert_same_ranking(index.search(query, limit, strategy=strategy), expected, scores)
+
+
+@pytest.mark.parametrize("strategy", ["maxscore", "wand"])
+def test_pruned_top_k_matches_exhaustive_with_filters_and_after(strategy):
+    index = _index()
+    filters = {"team": "blue"}
+    scores = {hit.id: hit.score for hit in index.search("grace edsger", 1000, strategy="exhaustive").hits}
+    first = index.search("grace edsger", 15, strategy="exhaustive", filters=filters)
+    assert all(hit.source["team"] == "blue" for hit in first.hits)
+    last = first.hits[-1]
+    expected = index.search("grace edsger", 15, strategy="exhaustive", filters=filters, after=(last.score, last.id))
+    actual = index.search("grace edsger", 15, strategy=strategy, filters=filters, after=(last.score, last.id))
+    _assert_same_ranking(actual, expected, scores)
+    assert not {hit.id for hit in actual.hits} & {hit.id for hit in first.hits}
+
+
+def test_exhaustive_scores_are_bm25():
+    index = InvertedIndex(USER_FIELDS)
+    index.upsert("a", {"username": "ada", "display_name": "", "bio": ""})
+    index.upsert("b", {"username": "grace", "display_name": "ada", "bio": ""})
+    index.upsert("c", {"username": "grace", "display_name": "", "bio": "ada ada ada"})
+    hits = index.search("ada", 10, strategy="exhaustive").hits
+    # The username boost outranks display name, which outranks a repeated bio term.
+    assert [hit.id for hit in hits] == ["a", "b", "c"]
@@ -0,0 +1,102 @@
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import ENTRY_OVERHEAD, CachedPage, ResultCache, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _page(n: int = 100) -> CachedPage:
+    return CachedPage(b"x" * n, None)
+
+
+def _key(query: str):
+    return cache_key("posts", query, {}, None, 20)
+
+
+def test_equivalent_queries_share_a_key():
+    assert cache_key("posts", "Red  Fox", {"a": "1", "b": "2"}, None, 20) == cache_key(
+        "posts", "fox red", {"b": "2", "a": "1"}, "", 20
+    )
+    assert _key("fox") != cache_key("posts", "fox", {}, "next", 20)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResultCache(ttl=30.0)
+    assert cache.put(_key("fox"), _page(), [("posts", "p1")], cache.begin())
+    clock[0] += 29.9
+    assert cache.get(_key("fox")) is not None
+    clock[0] += 0.1
+    assert cache.get(_key("fox")) is None
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(clock):
+    size = 100 + ENTRY_OVERHEAD
+    cache = ResultCache(max_bytes=3 * size)
+    for query in ("a", "b", "c"):
+        cache.put(_key(query), _page(), [], cache.begin())
+    assert cache.nbytes == 3 * size
+    # "a" becomes the most recently used, so "b" goes first.
+    assert cache.get(_key("a")) is not None
+    cache.put(_key("d"), _page(), [], cache.begin())
+    assert cache.get(_key("b")) is None
+    assert all(cache.get(_key(q)) is not None for q in ("a", "c", "d"))
+    assert cache.nbytes == 3 * size
+
+    # One large entry pushes out as many as it needs.
+    cache.put(_key("e"), _page(100 + size), [], cache.begin())
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+
+
+def test_oversized_entries_are_not_cached():
+    cache = ResultCache(max_entry_bytes=1000)
+    assert not cache.put(_key("fox"), _page(1000), [], cache.begin())
+    assert len(cache) == 0
+
+
+def test_invalidation_drops_only_pages_showing_the_document():
+    cache = ResultCache()
+    cache.put(_key("fox"), _page(), [("posts", "p1"), ("posts", "p2")], cache.begin())
+    cache.put(_key("dog"), _page(), [("posts", "p2")], cache.begin())
+    cache.put(_key("cat"), _page(), [("posts", "p3")], cache.begin())
+    cache.put(_key("users"), _page(), [("users", "p1")], cache.begin())
+
+    assert cache.invalidate("posts", "p2") == 2
+    assert cache.get(_key("fox")) is None and cache.get(_key("dog")) is None
+    assert cache.get(_key("cat")) is not None
+    # Same id in another collection is a different document.
+    assert cache.get(_key("users")) is not None
+    assert cache.invalidate("posts", "p2") == 0
+    assert cache.nbytes == 2 * (100 + ENTRY_OVERHEAD)
+
+
+def test_put_refuses_a_page_computed_before_an_invalidation():
+    cache = ResultCache()
+    epoch = cache.begin()
+    # The document changes while the search is running.
+    cache.invalidate("posts", "p1")
+    assert not cache.put(_key("fox"), _page(), [("posts", "p1")], epoch)
+    assert cache.get(_key("fox")) is None
+    # Pages not showing that document are still fine, and so are later searches.
+    assert cache.put(_key("dog"), _page(), [("posts", "p2")], epoch)
+    assert cache.put(_key("fox"), _page(), [("posts", "p1")], cache.begin())
+
+
+def test_untracked_invalidations_refuse_older_epochs():
+    cache = ResultCache(max_tracked=2)
+    epoch = cache.begin()
+    for doc_id in ("p1", "p2", "p3"):
+        cache.invalidate("posts", doc_id)
+    # p1 has been trimmed from the tracked set, so its epoch is unknown.
+    assert not cache.put(_key("fox"), _page(), [("posts", "p1")], epoch)
+    assert cache.put(_key("fox"), _page(), [("posts", "p1")], cache.begin())
+
+    epoch = cache.begin()
+    cache.clear()
+    assert not cache.put(_key("dog"), _page(), [], epoch)
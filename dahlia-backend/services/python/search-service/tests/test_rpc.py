@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import grpc
+
+from app.core.rpc import RpcClient, _UnaryUnary
+
+METHOD = "/user.UserService/GetUser"
+
+
+class Unavailable(grpc.aio.AioRpcError):
+    def __init__(self):
+        super().__init__(grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(), grpc.aio.Metadata())
+
+
+def _hedged(callables, **kwargs):
+    """Run one hedged call over fake attempt callables; returns (response, stats)."""
+
+    async def run():
+        client = RpcClient("localhost:1", pool_size=len(callables), hedge_delay=0.01, **kwargs)
+        try:
+            unary = _UnaryUnary(client, METHOD, None, None)
+            unary._callables = callables
+            response = await unary._hedged(object(), time.monotonic() + 5, None, None)
+            # Nothing the call started may still be running once it returns.
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+            return response, client.stats
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_hedge_wins_and_slow_attempt_is_cancelled():
+    unwound = []
+
+    async def slow(request, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            unwound.append("slow")
+        return "slow"
+
+    async def fast(request, **kwargs):
+        await asyncio.sleep(0.02)
+        return "fast"
+
+    response, stats = _hedged([slow, fast])
+    assert response == "fast"
+    assert stats["hedged"] == 1
+    assert unwound == ["slow"]
+
+
+def test_unavailable_attempt_is_retried():
+    async def down(request, **kwargs):
+        raise Unavailable()
+
+    async def up(request, **kwargs):
+        return "up"
+
+    response, stats = _hedged([down, up])
+    assert response == "up"
+    assert stats["retried"] == 1
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from app.services.typeahead import Profile, TypeaheadIndex, completion_keys, write_snapshot
+
+NAMES = ["anna", "anders", "andrea", "bob", "bobby", "boris", "carla", "carl", "zoë", "zoe"]
+
+
+def _profiles(n: int = 400, seed: int = 7):
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(n):
+        display_name = f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()}"
+        profiles.append(Profile(f"u{i}", f"{rng.choice(NAMES)}{i}", display_name, rng.randrange(1000)))
+    return profiles
+
+
+def _expected(profiles, prefix: str, limit: int):
+    matches = [p for p in profiles if any(k.startswith(prefix) for k in completion_keys(p.username, p.display_name))]
+    return [p.user_id for p in sorted(matches, key=lambda p: (-p.weight, p.user_id))[:limit]]
+
+
+def _ids(index: TypeaheadIndex, prefix: str, limit: int = 10):
+    return [s.user_id for s in index.complete(prefix, limit)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "typeahead.bin")
+    write_snapshot(path, _profiles(), slots=8, max_prefix=4)
+    return TypeaheadIndex(path, slots=8, max_prefix=4)
+
+
+def test_completion_keys_cover_username_and_later_words():
+    assert completion_keys("Ann_Lee", "Ann  Marie Lee") == ["ann marie lee", "ann_lee", "lee", "marie lee"]
+
+
+@pytest.mark.parametrize("prefix", ["a", "an", "and", "bob", "bobby1", "c", "carl 2", "marie", "zo", "zoe", "x"])
+@pytest.mark.parametrize("limit", [1, 5, 10])
+def test_completions_rank_by_weight(index, prefix, limit):
+    # Short prefixes come from the precomputed rows, longer ones from a scan.
+    assert _ids(index, prefix, limit) == _expected(_profiles(), prefix, limit)
+
+
+def test_overlay_shadows_the_snapshot(index):
+    profiles = {p.user_id: p for p in _profiles()}
+    top = _ids(index, "b", 3)
+
+    # A rename moves the user to its new keys and off its old ones.
+    renamed = profiles[top[0]]
+    index.upsert(Profile(renamed.user_id, "quentin", "Quentin", renamed.weight))
+    profiles[renamed.user_id] = index.get(renamed.user_id)
+    assert renamed.user_id not in _ids(index, renamed.username, 10)
+    assert _ids(index, "quen") == [renamed.user_id]
+
+    # A deleted user disappears from the precomputed rows and from scans.
+    index.delete(top[1])
+    del profiles[top[1]]
+    assert index.get(top[1]) is None
+    for prefix in ("b", "bo", "bob", "bobby", profiles[top[2]].username):
+        assert _ids(index, prefix) == _expected(profiles.values(), prefix, 10)
+
+    # A new popular user outranks everyone under its prefixes.
+    index.upsert(Profile("new", "bobcat", "Bob Cat", 10_000))
+    profiles["new"] = index.get("new")
+    assert _ids(index, "bob")[0] == "new"
+    assert _ids(index, "cat") == ["new"]
+    assert index.pending == 3
+    assert index.update_display_name("new", "Robert Cat")
+    assert _ids(index, "robert") == ["new"]
+    assert not index.update_display_name(top[1], "Ghost")
+
+
+def test_snapshot_round_trips_through_the_file(index, tmp_path):
+    index.upsert(Profile("new", "bobcat", "Bob Cat", 10_000))
+    index.delete("u0")
+    before = {prefix: _ids(index, prefix) for prefix in ("a", "bob", "carl", "cat", "zo", "u")}
+
+    index.snapshot()
+    assert index.pending == 0
+    assert {prefix: _ids(index, prefix) for prefix in before} == before
+
+    reloaded = TypeaheadIndex(index.path, slots=8, max_prefix=4)
+    assert {prefix: _ids(reloaded, prefix) for prefix in before} == before
+    assert reloaded.get("new") == Profile("new", "bobcat", "Bob Cat", 10_000)
+    assert reloaded.get("u0") is None
+    assert reloaded.get("u1") == _profiles()[1]
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-import os
 import sys
 
+from scaffold import Scaffold, load_services, print_report, template
+
 PROJECT_NAME = "sonet-backend"
+SCAFFOLD = Scaffold(PROJECT_NAME)
 
 MAKEFILE = """
 .PHONY: help proto build test docker-build dev
@@ -114,23 +116,17 @@ set -e
 echo "🐳 Building all Docker images..."
 
 services=(
-    "api-gateway"
-    "user-service"
-    "boo-service"
-    "dm-service"
-    "export-service"
-    "feed-service"
-    "media-service"
-    "metrics-service"
-    "ghost-reaper"
+{}
 )
 
-for service in "${services[@]}"; do
+for service in "${{services[@]}}"; do
     echo "Building $service..."
     if [[ -d "services/swift/$service" ]]; then
         docker build -t sonet/$service:latest services/swift/$service
     elif [[ -d "services/rust/$service" ]]; then
         docker build -t sonet/$service:latest services/rust/$service
+    elif [[ -d "services/python/$service" ]]; then
+        docker build -t sonet/$service:latest services/python/$service
     fi
 done
 
@@ -309,7 +305,7 @@ struct Application {{
 
 func configure(_ app: Vapor.Application) throws {{
     app.http.server.configuration.hostname = "0.0.0.0"
-    app.http.server.configuration.port = 8080
+    app.http.server.configuration.port = {}
     
     try routes(app)
 }}
@@ -331,7 +327,7 @@ RUN swift build -c release
 FROM swift:5.9-slim
 WORKDIR /app
 COPY --from=builder /build/.build/release/{} ./
-EXPOSE 8080
+EXPOSE {}
 ENTRYPOINT ["./{}"]
 """
 
@@ -357,12 +353,12 @@ RUST_MAIN = """use tonic::transport::Server;
 use tracing_subscriber;
 
 #[tokio::main]
-async fn main() -> Result<(), Box<dyn std::error::Error>> {
+async fn main() -> Result<(), Box<dyn std::error::Error>> {{
     tracing_subscriber::fmt::init();
     
-    let addr = "0.0.0.0:50051".parse()?;
+    let addr = "0.0.0.0:{}".parse()?;
     
-    tracing::info!("Server listening on {}", addr);
+    tracing::info!("Server listening on {{}}", addr);
     
     Server::builder()
         .add_service(service_impl())
@@ -370,15 +366,15 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
         .await?;
     
     Ok(())
-}
+}}
 
 fn service_impl() -> impl tonic::codegen::Service<
     http::Request<tonic::body::BoxBody>,
     Response = http::Response<tonic::body::BoxBody>,
-> {
+> {{
     // Placeholder
     todo!()
-}
+}}
 """
 
 RUST_BUILD = """fn main() {
@@ -399,65 +395,83 @@ FROM debian:bookworm-slim
 RUN apt-get update && apt-get install -y ca-certificates && rm -rf /var/lib/apt/lists/*
 WORKDIR /app
 COPY --from=builder /build/target/release/{} ./
-EXPOSE 50051
+EXPOSE {}
 ENTRYPOINT ["./{}"]
 """
 
 K8S_DEPLOYMENT = """apiVersion: apps/v1
 kind: Deployment
 metadata:
-  name: {}
+  name: {name}
   namespace: sonet
 spec:
-  replicas: 2
+  replicas: {replicas}
   selector:
     matchLabels:
-      app: {}
+      app: {name}
   template:
     metadata:
       labels:
-        app: {}
+        app: {name}
     spec:
       containers:
-      - name: {}
-        image: sonet/{}:latest
+      - name: {name}
+        image: sonet/{name}:latest
         ports:
-        - containerPort: {}
+        - containerPort: {port}
         env:
         - name: ENV
           value: "production"
         resources:
           requests:
-            memory: "256Mi"
-            cpu: "250m"
+            memory: "{memory_request}"
+            cpu: "{cpu_request}"
           limits:
-            memory: "512Mi"
-            cpu: "500m"
+            memory: "{memory_limit}"
+            cpu: "{cpu_limit}"
 ---
 apiVersion: v1
 kind: Service
 metadata:
-  name: {}
+  name: {name}
   namespace: sonet
 spec:
   selector:
-    app: {}
+    app: {name}
   ports:
-  - port: {}
-    targetPort: {}
+  - port: {port}
+    targetPort: {port}
 """
 
-def create_file(path, content):
-  dirpath = os.path.dirname(path)
-  if dirpath:
-    os.makedirs(dirpath, exist_ok=True)
-  with open(path, 'w') as f:
-    f.write(content.strip() + '\n')
+K8S_HPA = """---
+apiVersion: autoscaling/v2
+kind: HorizontalPodAutoscaler
+metadata:
+  name: {name}
+  namespace: sonet
+spec:
+  scaleTargetRef:
+    apiVersion: apps/v1
+    kind: Deployment
+    name: {name}
+  minReplicas: {min_replicas}
+  maxReplicas: {max_replicas}
+  metrics:
+  - type: Resource
+    resource:
+      name: cpu
+      target:
+        type: Utilization
+        averageUtilization: {cpu_utilization}
+"""
+
+def create_file(path, content, mode=None):
+  SCAFFOLD.create_file(path, content, mode)
 
 def create_dir(path):
-    os.makedirs(path, exist_ok=True)
+    SCAFFOLD.create_dir(path)
 
-def create_swift_service(name, port=8080):
+def create_swift_service(name, port):
     base = f"services/swift/{name}"
     dirs = [
         f"{base}/Sources/{name}/Routes",
@@ -473,11 +487,11 @@ def create_swift_service(name, port=8080):
         create_dir(d)
     
     create_file(f"{base}/Package.swift", SWIFT_PACKAGE.format(name, name, name, name, name, name))
-    create_file(f"{base}/Sources/{name}/main.swift", SWIFT_MAIN)
-    create_file(f"{base}/Dockerfile", SWIFT_DOCKERFILE.format(name, name))
+    create_file(f"{base}/Sources/{name}/main.swift", SWIFT_MAIN.format(port))
+    create_file(f"{base}/Dockerfile", SWIFT_DOCKERFILE.format(name, port, name))
     create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice")
 
-def create_rust_service(name, port=50051):
+def create_rust_service(name, port):
     base = f"services/rust/{name}"
     dirs = [
         f"{base}/src/service",
@@ -489,21 +503,27 @@ def create_rust_service(name, port=50051):
         create_dir(d)
     
     create_file(f"{base}/Cargo.toml", RUST_CARGO.format(name))
-    create_file(f"{base}/src/main.rs", RUST_MAIN)
+    create_file(f"{base}/src/main.rs", RUST_MAIN.format(port))
     create_file(f"{base}/build.rs", RUST_BUILD)
-    create_file(f"{base}/Dockerfile", RUST_DOCKERFILE.format(name, name))
+    create_file(f"{base}/Dockerfile", RUST_DOCKERFILE.format(name, port, name))
     create_file(f"{base}/README.md", f"# {name}\n\n{name} microservice")
 
-def create_k8s_manifest(name, port):
-    base = f"infra/k8s/services/{name}"
+def create_k8s_manifest(service):
+    base = f"infra/k8s/services/{service.name}"
     create_dir(base)
-    create_file(f"{base}/deployment.yaml", K8S_DEPLOYMENT.format(name, name, name, name, name, port, name, name, port, port))
+    manifest = K8S_DEPLOYMENT.format(**vars(service))
+    if service.autoscaling:
+        manifest += K8S_HPA.format(name=service.name, **vars(service.autoscaling))
+    create_file(f"{base}/deployment.yaml", manifest)
 
 def main():
     print("🚀 Scaffolding Sonet Backend Monorepo...")
     
-    create_dir(PROJECT_NAME)
-    os.chdir(PROJECT_NAME)
+    services = load_services(PROJECT_NAME)
+    swift_services = [s for s in services if s.runtime == "swift"]
+    rust_services = [s for s in services if s.runtime == "rust"]
+    # The Python services are hand-written; only their shared modules are rendered.
+    python_services = [s for s in services if s.runtime == "python"]
     
     base_dirs = [
         "services/swift",
@@ -534,10 +554,12 @@ def main():
     create_file("README.md", "# Sonet Backend\n\nMicroservices backend for Sonet")
     create_file(".gitignore", "target/\n.build/\n*.swp\n.DS_Store\nshared/proto-gen/")
     
-    create_file("scripts/generate-protos.sh", GENERATE_PROTOS)
-    create_file("scripts/build-all.sh", BUILD_ALL)
-    os.chmod("scripts/generate-protos.sh", 0o755)
-    os.chmod("scripts/build-all.sh", 0o755)
+    create_file("scripts/generate-protos.sh", GENERATE_PROTOS, mode=0o755)
+    create_file(
+        "scripts/build-all.sh",
+        BUILD_ALL.format("\n".join(f'    "{s.name}"' for s in services)),
+        mode=0o755,
+    )
     
     create_file("infra/docker-compose/docker-compose.yml", DOCKER_COMPOSE)
     
@@ -546,28 +568,15 @@ def main():
     create_file("protos/feed.proto", FEED_PROTO)
     create_file("protos/common.proto", 'syntax = "proto3";\n\npackage common;\n\nmessage Empty {}')
     
-    swift_services = [
-        ("api-gateway", 8080),
-        ("user-service", 8081),
-        ("boo-service", 8082),
-        ("dm-service", 8083),
-        ("export-service", 8084)
-    ]
-    
-    for name, port in swift_services:
-        create_swift_service(name, port)
-        create_k8s_manifest(name, port)
-    
-    rust_services = [
-        ("feed-service", 50051),
-        ("media-service", 50052),
-        ("metrics-service", 50053),
-        ("ghost-reaper", 50054)
-    ]
+    SCAFFOLD.run_parallel(
+        [(create_swift_service, (s.name, s.port)) for s in swift_services]
+        + [(create_k8s_manifest, (s,)) for s in swift_services]
+    )
     
-    for name, port in rust_services:
-        create_rust_service(name, port)
-        create_k8s_manifest(name, port)
+    SCAFFOLD.run_parallel(
+        [(create_rust_service, (s.name, s.port)) for s in rust_services]
+        + [(create_k8s_manifest, (s,)) for s in rust_services]
+    )
     
     create_file("services/swift/build-all.sh", """#!/bin/bash
 set -e
@@ -578,18 +587,18 @@ for service in */; do
     cd ..
 done
 echo "✅ All Swift services built"
-""")
-    os.chmod("services/swift/build-all.sh", 0o755)
+""", mode=0o755)
     
+    for s in python_services:
+        if s.cursor:
+            create_file(f"services/python/{s.name}/app/core/cursor.py", template("cursor.py"))
+
     create_file("services/rust/Cargo.toml", """[workspace]
 members = [
-    "feed-service",
-    "media-service",
-    "metrics-service",
-    "ghost-reaper"
+{}
 ]
 resolver = "2"
-""")
+""".format(",\n".join(f'    "{s.name}"' for s in rust_services)))
     
     create_file("infra/k8s/base/namespace.yaml", """apiVersion: v1
 kind: Namespace
@@ -600,6 +609,7 @@ metadata:
     create_file("docs/architecture/overview.md", "# Sonet Architecture\n\nOverview of the microservices architecture")
     create_file("docs/deployment/local-setup.md", "# Local Development Setup\n\n1. Start dependencies: `make dev`\n2. Build services: `make build`")
     
+    print_report(SCAFFOLD.write(force="--force" in sys.argv))
     print("✅ Backend monorepo scaffolded successfully!")
     print(f"📂 Navigate to {PROJECT_NAME}")
     print("🏗️  Run: make dev (start local environment)")
@@ -0,0 +1,276 @@
+"""Incremental file writer shared by the a.py - e.py scaffolding scripts.
+
+Generators do not touch the disk while they run. ``create_file`` and
+``create_dir`` only record what the tree should contain. ``write`` then
+brings the tree up to date:
+
+- Directories are created in one pass, leaf directories only.
+- Each file is hashed (SHA-256) and compared with what is on disk. Only
+  files whose content or mode differs are written.
+- A written file goes to a temporary sibling first and is then renamed into
+  place, so a reader never sees a half-written file.
+- Files are checked and written on a thread pool.
+
+Unchanged files keep their mtime, so Docker layers and Gradle tasks that
+depend on them stay cached. A re-run on an up-to-date tree writes nothing.
+
+A file created with ``once`` is a starting point that is then written by
+hand, such as a service's ``main.py``. It is written only if it does not
+exist, is never overwritten, even with ``force``, and is not recorded.
+
+``.scaffold-manifest.json`` at the root records the hash of every other file
+the generator wrote. It is deterministic, so it can be committed. A file whose
+content no longer matches its manifest hash was edited by hand. So was a
+file that exists but is not in the manifest. Such files are left alone and
+reported, unless ``force`` is set.
+
+``load_services`` reads a project's services from ``services.toml``, which
+is the single source of their ports, replicas, resources and autoscaling.
+``template`` reads files shared by several generators from ``templates/``.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+MANIFEST = ".scaffold-manifest.json"
+SERVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services.toml")
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+WRITTEN, UNCHANGED, KEPT = "written", "unchanged", "kept"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _default_mode():
+    # What open(path, 'w') would have produced.
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@dataclass(frozen=True)
+class Autoscaling:
+    min_replicas: int
+    max_replicas: int
+    cpu_utilization: int
+
+
+@dataclass(frozen=True)
+class Volume:
+    name: str
+    mount_path: str
+    size: str
+
+
+@dataclass(frozen=True)
+class Service:
+    name: str
+    runtime: str
+    port: int
+    description: str = ""
+    replicas: int = 2
+    cpu_request: str = "250m"
+    memory_request: str = "256Mi"
+    cpu_limit: str = "500m"
+    memory_limit: str = "512Mi"
+    autoscaling: Optional[Autoscaling] = field(default=None)
+    # Deployment update strategy; None keeps Kubernetes' rolling update.
+    strategy: Optional[str] = None
+    # Extra container environment, as (name, value) pairs.
+    env: Tuple[Tuple[str, str], ...] = ()
+    # A PersistentVolumeClaim, "<service>-<name>", mounted at mount_path.
+    volume: Optional[Volume] = field(default=None)
+    # Python services: dependency profiles (see PYTHON_PROFILES in a.py), and
+    # heavy modules imported before the workers fork.
+    profiles: Tuple[str, ...] = ()
+    preload: Tuple[str, ...] = ()
+    # Python services: profiles left out of requirements.txt, each rendered as
+    # requirements-<profile>.txt for a build that needs it.
+    extras: Tuple[str, ...] = ()
+    # Python services: RSS bench_imports allows after importing the app.
+    import_rss_mib: int = 80
+    # Python services: a fixed worker count, for state held in the process.
+    # None sizes the workers from the CPU limit or WEB_CONCURRENCY.
+    workers: Optional[int] = None
+    # Python services that paginate: app/core/cursor.py from templates/cursor.py,
+    # and a <PREFIX>_CURSOR_SECRET taken from the service's Secret.
+    cursor: bool = False
+
+
+def template(name):
+    """Contents of ``templates/<name>``, a file several generators render verbatim."""
+    with open(os.path.join(TEMPLATES, name)) as f:
+        return f.read()
+
+
+def load_services(project, path=SERVICES):
+    """``project``'s services from the manifest at ``path``, with ``[defaults]`` filled in."""
+    with open(path, "rb") as f:
+        manifest = tomllib.load(f)
+    defaults = manifest.get("defaults", {})
+    services = []
+    for entry in manifest.get(project, {}).get("services", []):
+        merged = {**defaults, **entry}
+        for table in ("resources", "autoscaling"):
+            if table in defaults or table in entry:
+                merged[table] = {**defaults.get(table, {}), **entry.get(table, {})}
+        autoscaling = merged.pop("autoscaling", None)
+        volume = merged.pop("volume", None)
+        for key in ("profiles", "preload", "extras"):
+            merged[key] = tuple(merged.get(key, ()))
+        merged["env"] = tuple((key, str(value)) for key, value in merged.get("env", {}).items())
+        try:
+            service = Service(
+                **merged.pop("resources", {}),
+                **merged,
+                autoscaling=Autoscaling(**autoscaling) if autoscaling else None,
+                volume=Volume(**volume) if volume else None,
+            )
+        except TypeError as exc:
+            raise ValueError(f"{path}: {project} service {entry.get('name')!r}: {exc}") from None
+        if service.autoscaling and not (
+            service.autoscaling.min_replicas <= service.replicas <= service.autoscaling.max_replicas
+        ):
+            raise ValueError(f"{path}: {project}/{service.name}: replicas outside the autoscaling range")
+        services.append(service)
+    for key in ("name", "port"):
+        values = [getattr(s, key) for s in services]
+        duplicates = sorted({v for v in values if values.count(v) > 1})
+        if duplicates:
+            raise ValueError(f"{path}: {project} has duplicate service {key}s: {duplicates}")
+    return services
+
+
+class Scaffold:
+    def __init__(self, root):
+        self.root = root
+        self._files = {}
+        self._dirs = set()
+        self._lock = threading.Lock()
+
+    def create_dir(self, path):
+        with self._lock:
+            self._dirs.add(os.path.normpath(path))
+
+    def create_file(self, path, content, mode=None, once=False):
+        """Record ``path`` (relative to the root) with ``content``, stripped and newline-terminated."""
+        path = os.path.normpath(path)
+        data = (content.strip() + "\n").encode()
+        with self._lock:
+            previous = self._files.get(path)
+            if previous is not None and previous[0] != data:
+                raise ValueError(f"{path} rendered twice with different content")
+            self._files[path] = (data, mode, once)
+
+    def run_parallel(self, calls, workers=None):
+        """Run independent generator ``(function, args)`` calls concurrently."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(function, *args) for function, args in calls]:
+                future.result()
+
+    def _make_dirs(self):
+        wanted = set(self._dirs)
+        for path in self._files:
+            parent = os.path.dirname(path)
+            if parent:
+                wanted.add(parent)
+        # makedirs creates parents, so only directories with no wanted
+        # subdirectory need a call.
+        leaves = set(wanted)
+        for path in wanted:
+            parent = os.path.dirname(path)
+            while parent:
+                leaves.discard(parent)
+                parent = os.path.dirname(parent)
+        for path in sorted(leaves):
+            os.makedirs(os.path.join(self.root, path), exist_ok=True)
+
+    def _sync(self, path, data, mode, once, recorded, force, default_mode):
+        target = os.path.join(self.root, path)
+        digest = None if once else _sha256(data)
+        if once and os.path.exists(target):
+            return UNCHANGED, None
+        try:
+            with open(target, "rb") as f:
+                current = f.read()
+            current_mode = os.stat(target).st_mode & 0o7777
+        except FileNotFoundError:
+            current = current_mode = None
+        wanted_mode = mode if mode is not None else (current_mode if current_mode is not None else default_mode)
+
+        if current == data:
+            if current_mode != wanted_mode:
+                os.chmod(target, wanted_mode)
+            return UNCHANGED, digest
+        if current is not None and not force and _sha256(current) != recorded:
+            return KEPT, recorded
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target) or ".", prefix=f".{os.path.basename(target)}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, wanted_mode)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return WRITTEN, digest
+
+    def write(self, force=False, workers=None):
+        """Bring the tree under ``root`` up to date; returns ``{status: [paths]}``."""
+        os.makedirs(self.root, exist_ok=True)
+        manifest_path = os.path.join(self.root, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self._make_dirs()
+
+        default_mode = _default_mode()
+        paths = sorted(self._files)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(
+                    lambda path: self._sync(path, *self._files[path], manifest.get(path), force, default_mode),
+                    paths,
+                )
+            )
+
+        report = {WRITTEN: [], UNCHANGED: [], KEPT: []}
+        updated = dict(manifest)
+        for path, (status, digest) in zip(paths, results):
+            report[status].append(path)
+            if digest is None:
+                updated.pop(path, None)
+            else:
+                updated[path] = digest
+        if updated != manifest:
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f"{MANIFEST}.")
+            with os.fdopen(fd, "w") as f:
+                json.dump(dict(sorted(updated.items())), f, indent=1)
+                f.write("\n")
+            os.chmod(tmp, default_mode)
+            os.replace(tmp, manifest_path)
+        return report
+
+
+def print_report(report):
+    print(
+        f"📝 {len(report[WRITTEN])} written, {len(report[UNCHANGED])} unchanged,"
+        f" {len(report[KEPT])} kept with local edits"
+    )
+    for path in report[KEPT]:
+        print(f"   kept {path} (edited since generated; rerun with --force to overwrite)")
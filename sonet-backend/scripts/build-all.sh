@@ -13,6 +13,8 @@ services=(
     "media-service"
     "metrics-service"
     "ghost-reaper"
+    "timeline-service"
+    "counter-service"
 )
 
 for service in "${services[@]}"; do
@@ -21,6 +23,8 @@ for service in "${services[@]}"; do
         docker build -t sonet/$service:latest services/swift/$service
     elif [[ -d "services/rust/$service" ]]; then
         docker build -t sonet/$service:latest services/rust/$service
+    elif [[ -d "services/python/$service" ]]; then
+        docker build -t sonet/$service:latest services/python/$service
     fi
 done
 
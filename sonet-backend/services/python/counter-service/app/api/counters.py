@@ -0,0 +1,42 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.models.counters import CountsResponse, IncrementBatch
+
+router = APIRouter(prefix="/counters", tags=["counters"])
+
+
+@router.post("/increments", status_code=202)
+async def increment(request: Request, body: IncrementBatch):
+    """Accumulate increments; they reach Redis within one flush interval."""
+    counters = request.app.state.counters
+    unknown = {i.kind for i in body.increments} - set(counters.kinds)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"unknown counter kinds: {sorted(unknown)}")
+    # Checked up front, so a batch is accepted whole or not at all.
+    try:
+        ids = [counters.parse_ids(i.kind, [i.id])[0] for i in body.increments]
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    for i, entity_id in zip(body.increments, ids):
+        counters.incr(i.kind, entity_id, i.delta)
+    return {"accepted": len(body.increments)}
+
+
+@router.get("/stats")
+async def counter_stats(request: Request):
+    return request.app.state.counters.stats()
+
+
+@router.get("/{kind}", response_model=CountsResponse)
+async def counts(request: Request, kind: str, ids: List[str] = Query(..., min_length=1, max_length=1000)):
+    """``like_count``, ``fire_count`` or ``follower_count`` for up to 1000 ids."""
+    counters = request.app.state.counters
+    if kind not in counters.kinds:
+        raise HTTPException(status_code=404, detail=f"unknown counter kind {kind!r}")
+    try:
+        ids = counters.parse_ids(kind, ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return CountsResponse(kind=kind, counts=await counters.get(kind, ids))
@@ -0,0 +1,20 @@
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class Increment(BaseModel):
+    """One ``LikePost``, ``FireBoo`` or ``FollowUser`` side effect; ``delta`` is -1 to undo one."""
+
+    kind: str
+    id: str = Field(min_length=1)
+    delta: int = 1
+
+
+class IncrementBatch(BaseModel):
+    increments: List[Increment]
+
+
+class CountsResponse(BaseModel):
+    kind: str
+    counts: Dict[str, int]
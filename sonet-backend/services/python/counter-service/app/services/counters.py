@@ -0,0 +1,300 @@
+"""Write-combining counters: process -> Redis -> Postgres.
+
+An increment (a like, a fire, a follow) is added to a ``ShardedAccumulator``.
+Every ``flush_interval_ms`` each shard's summed deltas go to Redis as one
+pipelined ``MULTI`` of ``HINCRBY cnt:{kind} {id} {delta}``. A failed flush
+puts its deltas back for the next one.
+
+Every ``reconcile_interval`` seconds each kind's hash of Redis deltas is folded
+into Postgres:
+
+1. ``RENAMENX cnt:{kind} cnt:{kind}:claim``, then ``HSETNX`` a fresh batch
+   token into the claim under the empty field, in one ``MULTI``. Increments
+   arriving meanwhile start a new ``cnt:{kind}``.
+2. The claimed deltas are applied in one Postgres transaction, which records
+   the token (``PostgresCountStore.apply``).
+3. The claim is deleted if it still holds that token.
+
+A claim left by a crash, or one that another replica is working on, is
+retried with its original token, so every delta reaches Postgres exactly once.
+Ids are checked against the kind's ``id_type`` on the way in; a claimed id
+that still would not cast (written by an older build, or straight to Redis)
+is dropped and counted rather than failing its whole batch forever.
+A like therefore costs one dict update in process. It costs a share of one
+``HINCRBY`` per flush for its post, and a share of one Postgres transaction per
+reconcile for its kind.
+
+A count is the Postgres value plus the deltas in ``cnt:{kind}``, in the claim,
+and still in process. Reads come from a local cache that is at most
+``max_staleness_ms`` old. This process's own increments are added on top,
+so a client sees its like immediately. Between step 2 and step 3 a fetched
+count includes the claimed deltas twice. That window is one Redis round trip.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple
+
+from redis.exceptions import WatchError
+
+from app.core.metrics import Counter, Gauge, Histogram
+from app.services.accumulator import Key, ShardedAccumulator
+from app.services.store import Kind
+
+logger = logging.getLogger(__name__)
+
+increments_total = Counter("counter_increments_total", "Increments accepted, by kind")
+flush_keys = Histogram("counter_flush_keys", "Keys written to Redis per flush", (1, 10, 100, 1000, 10000, 100000))
+flush_seconds = Histogram("counter_flush_seconds", "Flush latency", (0.001, 0.005, 0.01, 0.05, 0.1, 0.5))
+reconciled_total = Counter("counter_reconciled_keys_total", "Deltas folded into Postgres, by kind")
+reconcile_seconds = Histogram("counter_reconcile_seconds", "Reconcile latency per kind", (0.01, 0.05, 0.1, 0.5, 1, 5))
+cache_reads = Counter("counter_cache_reads_total", "Counts read, by cache result")
+rejected_total = Counter("counter_rejected_ids_total", "Claimed deltas dropped for ids of the wrong type, by kind")
+failures_total = Counter("counter_failures_total", "Failed flushes and reconciles, by stage")
+pending_gauge = Gauge("counter_pending_keys", "Keys with deltas not yet flushed to Redis")
+
+# Hash field of a claim holding its batch token; ids are never empty.
+_TOKEN = ""
+# counter_batches rows outlive any retry of their batch by far.
+_BATCH_RETENTION_SECONDS = 86400
+
+
+def _pending(kind: str) -> str:
+    return f"cnt:{kind}"
+
+
+def _claim(kind: str) -> str:
+    return f"cnt:{kind}:claim"
+
+
+class CounterService:
+    def __init__(
+        self,
+        redis,
+        store,
+        kinds: Mapping[str, Kind],
+        flush_interval_ms: int = 100,
+        shards: int = 16,
+        reconcile_interval: float = 5.0,
+        max_staleness_ms: int = 1000,
+        cache_max_entries: int = 200_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.redis = redis
+        self.store = store
+        self.kinds = kinds
+        self.flush_interval = flush_interval_ms / 1000
+        self.reconcile_interval = reconcile_interval
+        self.max_staleness = max_staleness_ms / 1000
+        self.cache_max_entries = cache_max_entries
+        self.clock = clock
+        self.accumulator = ShardedAccumulator(shards)
+        # (kind, id) -> (count excluding unflushed local deltas, expires at).
+        self._cache: "OrderedDict[Key, Tuple[int, float]]" = OrderedDict()
+        self._pruned_at = float("-inf")
+        self._tasks = []
+
+    def _check(self, kind: str) -> None:
+        if kind not in self.kinds:
+            raise KeyError(kind)
+
+    def parse_ids(self, kind: str, ids: Sequence[str]) -> List[str]:
+        """``ids`` in canonical form; ValueError names the first that does not fit the kind's ``id_type``."""
+        self._check(kind)
+        return [self.kinds[kind].parse_id(entity_id) for entity_id in ids]
+
+    def incr(self, kind: str, entity_id: str, delta: int = 1) -> None:
+        self._check(kind)
+        entity_id = self.kinds[kind].parse_id(entity_id)
+        self.accumulator.add(kind, entity_id, delta)
+        increments_total.inc(kind=kind)
+
+    async def flush(self) -> int:
+        """Write accumulated deltas to Redis; returns the number of keys written."""
+        written = 0
+        for deltas in self.accumulator.drain():
+            started = time.perf_counter()
+            pipe = self.redis.pipeline(transaction=True)
+            for (kind, entity_id), delta in deltas.items():
+                pipe.hincrby(_pending(kind), entity_id, delta)
+            try:
+                await pipe.execute()
+            except Exception:
+                # MULTI applied all or nothing; the undrained shards wait too.
+                self.accumulator.merge(deltas)
+                failures_total.inc(stage="flush")
+                logger.exception("counter flush of %d keys failed; retrying next interval", len(deltas))
+                break
+            self._bump(deltas)
+            written += len(deltas)
+            flush_keys.observe(len(deltas))
+            flush_seconds.observe(time.perf_counter() - started)
+        pending_gauge.set(len(self.accumulator))
+        return written
+
+    def _bump(self, deltas: Dict[Key, int]) -> None:
+        """Move flushed deltas into cached counts, which no longer see them in process."""
+        for key, delta in deltas.items():
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache[key] = (entry[0] + delta, entry[1])
+
+    async def reconcile(self, kind: str) -> int:
+        """Fold ``kind``'s Redis deltas into Postgres; returns the number of ids updated."""
+        started = time.perf_counter()
+        claim = _claim(kind)
+        pipe = self.redis.pipeline(transaction=True)
+        # Fails harmlessly when nothing is pending or a claim is still open.
+        pipe.renamenx(_pending(kind), claim)
+        pipe.hsetnx(claim, _TOKEN, uuid.uuid4().hex)
+        await pipe.execute(raise_on_error=False)
+        fields = await self.redis.hgetall(claim)
+        token = fields.pop(_TOKEN.encode(), b"").decode()
+        deltas: Dict[str, int] = {}
+        rejected = 0
+        for entity_id, delta in fields.items():
+            try:
+                entity_id = self.kinds[kind].parse_id(entity_id.decode())
+            except ValueError:
+                rejected += 1
+                continue
+            if int(delta):
+                deltas[entity_id] = deltas.get(entity_id, 0) + int(delta)
+        if rejected:
+            # Released with the claim below.
+            rejected_total.inc(rejected, kind=kind)
+            logger.warning("dropping %d %s deltas whose ids are not %s", rejected, kind, self.kinds[kind].id_type)
+        if deltas:
+            if await self.store.apply(kind, token, deltas):
+                reconciled_total.inc(len(deltas), kind=kind)
+            else:
+                logger.info("counter batch %s for %s was already applied", token, kind)
+        await self._release(claim, token)
+        reconcile_seconds.observe(time.perf_counter() - started, kind=kind)
+        return len(deltas)
+
+    async def _release(self, claim: str, token: str) -> None:
+        """Delete ``claim`` unless another replica has replaced it since we read it."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(claim)
+                if (await pipe.hget(claim, _TOKEN) or b"").decode() != token:
+                    return
+                pipe.multi()
+                pipe.delete(claim)
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def reconcile_all(self) -> int:
+        updated = 0
+        for kind in self.kinds:
+            try:
+                updated += await self.reconcile(kind)
+            except Exception:
+                failures_total.inc(stage="reconcile")
+                logger.exception("reconciling %s counters failed; the claim is retried next interval", kind)
+        if self.clock() - self._pruned_at >= 3600:
+            self._pruned_at = self.clock()
+            await self.store.prune(_BATCH_RETENTION_SECONDS)
+        return updated
+
+    async def _fetch(self, kind: str, ids: Sequence[str]) -> Dict[str, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget(_pending(kind), ids)
+        pipe.hmget(_claim(kind), ids)
+        pending, claimed = await pipe.execute()
+        stored = await self.store.counts(kind, ids)
+        return {
+            entity_id: stored.get(entity_id, 0) + int(p or 0) + int(c or 0)
+            for entity_id, p, c in zip(ids, pending, claimed)
+        }
+
+    async def get(self, kind: str, ids: Sequence[str]) -> Dict[str, int]:
+        """Counts of ``ids``, at most ``max_staleness_ms`` old plus this process's unflushed increments.
+
+        ``ids`` must be canonical (``parse_ids``).
+        """
+        self._check(kind)
+        now = self.clock()
+        base: Dict[str, int] = {}
+        missing = []
+        for entity_id in dict.fromkeys(ids):
+            entry = self._cache.get((kind, entity_id))
+            if entry is not None and entry[1] > now:
+                base[entity_id] = entry[0]
+                self._cache.move_to_end((kind, entity_id))
+            else:
+                missing.append(entity_id)
+        cache_reads.inc(len(base), result="hit")
+        if missing:
+            cache_reads.inc(len(missing), result="miss")
+            fetched = await self._fetch(kind, missing)
+            expires = self.clock() + self.max_staleness
+            for entity_id, count in fetched.items():
+                self._cache[(kind, entity_id)] = (count, expires)
+                self._cache.move_to_end((kind, entity_id))
+                base[entity_id] = count
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        return {i: max(base[i] + self.accumulator.pending(kind, i), 0) for i in base}
+
+    async def _every(self, interval: float, step: Callable, what: str) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await step()
+            except Exception:
+                logger.exception("counter %s failed", what)
+
+    async def start(self) -> None:
+        await self.store.connect()
+        self._tasks = [
+            asyncio.create_task(self._every(self.flush_interval, self.flush, "flush")),
+            asyncio.create_task(self._every(self.reconcile_interval, self.reconcile_all, "reconcile")),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        await self.reconcile_all()
+        await self.store.close()
+        await self.redis.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "kinds": sorted(self.kinds),
+            "unflushed_keys": len(self.accumulator),
+            "cached_counts": len(self._cache),
+            "increments": {kind: increments_total.value(kind=kind) for kind in self.kinds},
+            "reconciled": {kind: reconciled_total.value(kind=kind) for kind in self.kinds},
+        }
+
+
+def connect(url: str):
+    """``redis.asyncio`` client for ``url``; ``fakeredis://`` gives an in-process stand-in."""
+    if url.startswith("fakeredis://"):
+        from fakeredis import aioredis
+
+        return aioredis.FakeRedis()
+    import redis.asyncio
+
+    return redis.asyncio.from_url(url)
+
+
+def build_counters(settings, store, kinds: Mapping[str, Kind]) -> CounterService:
+    return CounterService(
+        connect(settings.redis_url),
+        store,
+        kinds,
+        flush_interval_ms=settings.flush_interval_ms,
+        shards=settings.accumulator_shards,
+        reconcile_interval=settings.reconcile_interval_seconds,
+        max_staleness_ms=settings.max_staleness_ms,
+        cache_max_entries=settings.cache_max_entries,
+    )
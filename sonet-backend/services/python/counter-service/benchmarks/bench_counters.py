@@ -0,0 +1,106 @@
+"""Write amplification and read latency of write-combined counters.
+
+Replays ``--likes`` likes over ``--posts`` posts, drawn from a 1/rank popularity
+curve, arriving at ``--rate`` per second. In simulated time, the service
+flushes every ``--flush-ms`` and reconciles every ``--reconcile-seconds``. The
+benchmark reports Redis commands and Postgres transactions per like, against
+one transaction per like for a direct ``UPDATE``. It also checks that the
+stored counts match the likes replayed, and times cached and uncached reads.
+
+Against fakeredis this measures client-side cost only; point ``--redis-url``
+at a real Redis to include round trips.
+
+    cd services/python/counter-service
+    python -m benchmarks.bench_counters --likes 1000000 --rate 50000
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter as Tally
+
+import numpy as np
+
+from app.services.counters import CounterService, connect
+from app.services.store import MemoryCountStore, parse_kinds
+
+KIND = "post_likes"
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args) -> None:
+    rng = np.random.default_rng(args.seed)
+    posts = (args.posts ** rng.random(args.likes)).astype(np.int64) - 1
+    ids = [f"p{i}" for i in range(args.posts)]
+    kinds = parse_kinds({KIND: "posts.like_count"})
+    store = MemoryCountStore(kinds)
+    redis = connect(args.redis_url)
+    await redis.delete(f"cnt:{KIND}", f"cnt:{KIND}:claim")
+    clock = [0.0]
+    counters = CounterService(redis, store, kinds, shards=args.shards, clock=lambda: clock[0])
+
+    per_flush = max(1, int(args.rate * args.flush_ms / 1000))
+    flushes_per_reconcile = max(1, int(args.reconcile_seconds * 1000 / args.flush_ms))
+    written = flushes = 0
+    incr_s = flush_s = reconcile_s = 0.0
+    for start in range(0, args.likes, per_flush):
+        started = time.perf_counter()
+        for post in posts[start : start + per_flush].tolist():
+            counters.incr(KIND, ids[post])
+        incr_s += time.perf_counter() - started
+        started = time.perf_counter()
+        written += await counters.flush()
+        flush_s += time.perf_counter() - started
+        flushes += 1
+        clock[0] += args.flush_ms / 1000
+        if flushes % flushes_per_reconcile == 0:
+            started = time.perf_counter()
+            await counters.reconcile_all()
+            reconcile_s += time.perf_counter() - started
+    await counters.reconcile_all()
+
+    expected = Tally(posts.tolist())
+    stored = store.rows[KIND]
+    assert all(stored.get(ids[p], 0) == n for p, n in expected.items()), "stored counts drifted"
+    print(f"{args.likes:,} likes over {len(expected):,} posts at {args.rate:,}/s")
+    print(f"  accumulate: {args.likes / incr_s:,.0f} likes/s in process")
+    print(f"  redis:      {written:,} HINCRBY in {flushes:,} flushes = {written / args.likes:.3f} per like")
+    print(
+        f"  postgres:   {store.transactions:,} transactions = {store.transactions / args.likes:.6f} per like"
+        f" (direct UPDATE: 1.0), {len(expected):,} rows"
+    )
+    print(f"  flush {flush_s / flushes * 1000:.2f} ms each, reconcile {reconcile_s:.2f}s total")
+
+    hot = [ids[p] for p, _ in expected.most_common(20)]
+    # Uncached reads step the clock past the staleness bound every time.
+    for label, step in (("cached", 0.0), ("uncached", counters.max_staleness)):
+        samples = []
+        for _ in range(args.reads):
+            clock[0] += step
+            started = time.perf_counter()
+            await counters.get(KIND, hot)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"  read 20 counts, {label:>8}: p50 {percentile(samples, 0.5):.3f} ms, p99 {percentile(samples, 0.99):.3f} ms")
+    await redis.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--rate", type=int, default=50_000)
+    parser.add_argument("--flush-ms", type=int, default=100)
+    parser.add_argument("--reconcile-seconds", type=float, default=5.0)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--redis-url", default="fakeredis://")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
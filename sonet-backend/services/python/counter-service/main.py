@@ -0,0 +1,46 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import counters
+from app.core.config import get_settings
+from app.core.metrics import render_latest
+from app.services.counters import build_counters
+from app.services.store import build_store, parse_kinds
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    kinds = parse_kinds(settings.kinds)
+    app.state.counters = build_counters(settings, build_store(settings, kinds), kinds)
+    await app.state.counters.start()
+    yield
+    await app.state.counters.stop()
+
+
+app = FastAPI(title="counter-service", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(counters.router)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8092)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Request
+
+from app.models.reaper import LifecycleEventBatch
+
+router = APIRouter(prefix="/reaper", tags=["reaper"])
+
+
+@router.post("/events", status_code=202)
+async def lifecycle_events(request: Request, body: LifecycleEventBatch):
+    """Schedule the lifecycle deadlines of new or extended boos."""
+    events = body.events
+    try:
+        request.app.state.reaper.schedule(
+            [e.boo_id for e in events],
+            [e.ghosts_at if e.ghosts_at is not None else e.expires_at for e in events],
+            [e.oblivion_at for e in events],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"boo ids must be UUIDs: {exc}")
+    return {"scheduled": len(events)}
+
+
+@router.get("/stats")
+async def reaper_stats(request: Request):
+    return request.app.state.reaper.stats()
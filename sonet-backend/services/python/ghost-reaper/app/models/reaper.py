@@ -0,0 +1,22 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class LifecycleEvent(BaseModel):
+    """A boo whose deadlines to track (fields as in ``BooResponse``, epoch ms).
+
+    ``boo.created`` and ``boo.extended`` both schedule: GHOST at ``ghosts_at``
+    (default ``expires_at``), then OBLIVION at ``oblivion_at`` (default
+    ``REAPER_OBLIVION_DELAY_SECONDS`` after that).
+    """
+
+    type: Literal["boo.created", "boo.extended"]
+    boo_id: str
+    expires_at: int
+    ghosts_at: Optional[int] = None
+    oblivion_at: Optional[int] = None
+
+
+class LifecycleEventBatch(BaseModel):
+    events: List[LifecycleEvent]
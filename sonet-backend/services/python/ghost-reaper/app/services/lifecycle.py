@@ -0,0 +1,186 @@
+"""Where lifecycle transitions are applied and announced.
+
+A transition is one ``UPDATE`` per batch of due boos, guarded so that only
+rows still in an earlier state and whose deadline has really passed change;
+stale wheel entries (deleted boos, moved expiries) match nothing. The rows
+that did change come back via ``RETURNING`` and are announced as one message
+per batch.
+"""
+
+import json
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Sequence, Tuple
+
+LIVE, GHOST, OBLIVION = "LIVE", "GHOST", "OBLIVION"
+# Wheel entry kinds: the lifecycle a due entry moves its boo to.
+KINDS = {1: GHOST, 2: OBLIVION}
+KIND_OF = {lifecycle: kind for kind, lifecycle in KINDS.items()}
+# Lifecycle -> (states it may be entered from, deadline column).
+TRANSITIONS = {GHOST: ((LIVE,), "ghosts_at"), OBLIVION: ((LIVE, GHOST), "oblivion_at")}
+
+
+def _ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def _datetime(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+class PostgresBooStore:
+    """Boos in Postgres: ``id uuid``, ``user_id``, ``lifecycle text``, ``updated_at``,
+    ``ghosts_at`` and ``oblivion_at`` (``timestamptz``) in ``table``.
+
+    ``updated_at`` must be set when a boo is created and whenever its deadlines
+    move (an extension), e.g. by a trigger. Recovery scans
+    ``lifecycle <> 'OBLIVION' AND updated_at >= $1``; index it.
+    """
+
+    def __init__(self, dsn: str, table: str = "boos", pool_size: int = 4):
+        self.dsn = dsn
+        self.table = table
+        self.pool_size = pool_size
+        self._pool = None
+
+    async def connect(self) -> None:
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+
+    async def apply(self, lifecycle: str, ids: Sequence[str], at_ms: int) -> List[Tuple[str, str]]:
+        """Move due ``ids`` to ``lifecycle``; returns ``(id, user_id)`` of the rows that changed."""
+        sources, column = TRANSITIONS[lifecycle]
+        rows = await self._pool.fetch(
+            f"UPDATE {self.table} SET lifecycle = $1"
+            f" WHERE id = ANY($2::uuid[]) AND lifecycle = ANY($3::text[]) AND {column} <= $4"
+            " RETURNING id, user_id",
+            lifecycle,
+            [uuid.UUID(i) for i in ids],
+            list(sources),
+            _datetime(at_ms),
+        )
+        return [(str(r["id"]), str(r["user_id"])) for r in rows]
+
+    async def pending(self, since_ms: int, batch: int = 10_000) -> AsyncIterator[List[Tuple[str, str, int, int]]]:
+        """``(id, lifecycle, ghosts_at, oblivion_at)`` of unfinished boos updated since ``since_ms``, in batches."""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                cursor = conn.cursor(
+                    f"SELECT id, lifecycle, ghosts_at, oblivion_at FROM {self.table}"
+                    " WHERE lifecycle <> 'OBLIVION' AND updated_at >= $1",
+                    _datetime(since_ms),
+                    prefetch=batch,
+                )
+                out = []
+                async for r in cursor:
+                    out.append((str(r["id"]), r["lifecycle"], _ms(r["ghosts_at"]), _ms(r["oblivion_at"])))
+                    if len(out) == batch:
+                        yield out
+                        out = []
+                if out:
+                    yield out
+
+
+class MemoryBooStore:
+    """In-process stand-in with the same semantics, for local runs and benchmarks."""
+
+    def __init__(self):
+        self.boos: Dict[str, dict] = {}
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def add(self, boo_id: str, user_id: str, created_at: int, ghosts_at: int, oblivion_at: int) -> None:
+        self.boos[boo_id] = {
+            "user_id": user_id,
+            "lifecycle": LIVE,
+            "updated_at": created_at,
+            "ghosts_at": ghosts_at,
+            "oblivion_at": oblivion_at,
+        }
+
+    def extend(self, boo_id: str, at: int, ghosts_at: int, oblivion_at: int) -> None:
+        self.boos[boo_id].update(updated_at=at, ghosts_at=ghosts_at, oblivion_at=oblivion_at)
+
+    async def apply(self, lifecycle: str, ids: Sequence[str], at_ms: int) -> List[Tuple[str, str]]:
+        sources, column = TRANSITIONS[lifecycle]
+        changed = []
+        for boo_id in ids:
+            boo = self.boos.get(boo_id)
+            if boo is not None and boo["lifecycle"] in sources and boo[column] <= at_ms:
+                boo["lifecycle"] = lifecycle
+                changed.append((boo_id, boo["user_id"]))
+        return changed
+
+    async def pending(self, since_ms: int, batch: int = 10_000) -> AsyncIterator[List[Tuple[str, str, int, int]]]:
+        rows = [
+            (boo_id, b["lifecycle"], b["ghosts_at"], b["oblivion_at"])
+            for boo_id, b in self.boos.items()
+            if b["lifecycle"] != OBLIVION and b["updated_at"] >= since_ms
+        ]
+        for start in range(0, len(rows), batch):
+            yield rows[start : start + batch]
+
+
+def _message(lifecycle: str, boos: Sequence[Tuple[str, str]], at_ms: int) -> bytes:
+    return json.dumps(
+        {"lifecycle": lifecycle, "at": at_ms, "boos": [{"id": i, "user_id": u} for i, u in boos]},
+        separators=(",", ":"),
+    ).encode()
+
+
+class NatsPublisher:
+    """One message per transitioned batch on ``{subject_prefix}.{ghost|oblivion}``."""
+
+    def __init__(self, url: str, subject_prefix: str = "boo.lifecycle"):
+        self.url = url
+        self.subject_prefix = subject_prefix
+        self._nc = None
+
+    async def connect(self) -> None:
+        import nats
+
+        self._nc = await nats.connect(self.url)
+
+    async def close(self) -> None:
+        if self._nc is not None:
+            await self._nc.drain()
+
+    async def publish(self, lifecycle: str, boos: Sequence[Tuple[str, str]], at_ms: int) -> None:
+        await self._nc.publish(f"{self.subject_prefix}.{lifecycle.lower()}", _message(lifecycle, boos, at_ms))
+        await self._nc.flush()
+
+
+class MemoryPublisher:
+    def __init__(self, keep: int = 1000):
+        self.messages: deque = deque(maxlen=keep)
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, lifecycle: str, boos: Sequence[Tuple[str, str]], at_ms: int) -> None:
+        self.messages.append(json.loads(_message(lifecycle, boos, at_ms)))
+
+
+def build_store(settings):
+    if settings.database_url == "memory://":
+        return MemoryBooStore()
+    return PostgresBooStore(settings.database_url, settings.boos_table, settings.database_pool_size)
+
+
+def build_publisher(settings):
+    if settings.nats_url == "memory://":
+        return MemoryPublisher()
+    return NatsPublisher(settings.nats_url, settings.subject_prefix)
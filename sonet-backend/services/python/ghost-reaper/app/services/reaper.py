@@ -0,0 +1,264 @@
+"""Moves boos LIVE -> GHOST -> OBLIVION as their deadlines pass.
+
+Deadlines live in a ``TimingWheel`` instead of being polled for: each boo
+has one entry, due at ``ghosts_at`` and carrying ``oblivion_at`` as ``then``,
+re-scheduled as an OBLIVION entry once it fires. Every tick, due entries are
+grouped by transition and applied ``batch_size`` at a time, one ``UPDATE``
+and one published message per batch. A batch whose UPDATE fails is retried
+``retry_seconds`` later; a failed publish is retried in place with backoff.
+
+The pending entries are checkpointed to ``path`` every
+``checkpoint_interval`` seconds (``.npy`` under a ``CURRENT`` pointer). On
+start the last checkpoint is loaded, then boos created or extended since it,
+less ``recovery_overlap``, are re-read from the store (by ``updated_at``), so
+a deadline moved after the checkpoint is not lost. Entries that came due while
+the reaper was down fire on the first tick. Without a checkpoint, every
+unfinished boo is loaded.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from app.core.metrics import Counter, Gauge, Histogram
+from app.services.lifecycle import GHOST, KIND_OF, KINDS, LIVE, OBLIVION
+from app.services.wheel import ENTRY, TimingWheel, entries, pack_ids, unpack_ids
+
+logger = logging.getLogger(__name__)
+
+pending_gauge = Gauge("reaper_pending_deadlines", "Deadlines held in the timing wheel")
+transitions_total = Counter("reaper_transitions_total", "Boos moved, by lifecycle")
+stale_total = Counter("reaper_stale_deadlines_total", "Due entries whose boo had moved on or gone")
+failures_total = Counter("reaper_failures_total", "Failed batches by stage")
+batch_seconds = Histogram(
+    "reaper_batch_seconds", "UPDATE + publish latency per batch", (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+lag_seconds = Histogram(
+    "reaper_lag_seconds", "Delay between a deadline and its transition", (1, 2, 5, 10, 30, 60, 300, 3600)
+)
+
+
+class Reaper:
+    def __init__(
+        self,
+        store,
+        publisher,
+        path: Optional[str] = None,
+        tick_ms: int = 1000,
+        levels: int = 4,
+        batch_size: int = 5000,
+        oblivion_delay: float = 7 * 86400,
+        retry_seconds: float = 30.0,
+        publish_attempts: int = 5,
+        checkpoint_interval: float = 60.0,
+        recovery_overlap: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.publisher = publisher
+        self.path = path
+        self.batch_size = batch_size
+        self.oblivion_delay_ms = int(oblivion_delay * 1000)
+        self.retry_ms = int(retry_seconds * 1000)
+        self.publish_attempts = publish_attempts
+        self.checkpoint_interval = checkpoint_interval
+        self.recovery_overlap_ms = int(recovery_overlap * 1000)
+        self.clock = clock
+        self.wheel = TimingWheel(self._now_ms(), tick_ms, levels)
+        # Held across a tick, so a checkpoint never misses entries in flight.
+        self._lock = asyncio.Lock()
+        self._tasks = []
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def schedule(
+        self, ids: Sequence[str], ghosts_at: Sequence[int], oblivion_at: Optional[Sequence[Optional[int]]] = None
+    ) -> None:
+        """Track boos (UUIDs) that become GHOST at ``ghosts_at`` and OBLIVION at ``oblivion_at`` (epoch ms).
+
+        Scheduling a boo again (e.g. its expiry moved) adds a new deadline; the
+        old one fires harmlessly.
+        """
+        ghosts = np.asarray(ghosts_at, np.int64)
+        oblivion = ghosts + self.oblivion_delay_ms
+        if oblivion_at is not None:
+            given = np.array([-1 if o is None else o for o in oblivion_at], np.int64)
+            oblivion = np.where(given >= 0, given, oblivion)
+        rows = entries(pack_ids(ids), ghosts, oblivion, np.full(len(ghosts), KIND_OF[GHOST], np.uint8))
+        self.wheel.schedule(rows)
+        pending_gauge.set(len(self.wheel))
+
+    def _schedule_pending(self, rows) -> None:
+        """Recovered ``(id, lifecycle, ghosts_at, oblivion_at)`` rows."""
+        live = [r for r in rows if r[1] == LIVE]
+        ghost = [r for r in rows if r[1] == GHOST]
+        if live:
+            self.schedule([r[0] for r in live], [r[2] for r in live], [r[3] for r in live])
+        if ghost:
+            at = np.array([r[3] for r in ghost], np.int64)
+            kind = np.full(len(ghost), KIND_OF[OBLIVION], np.uint8)
+            self.wheel.schedule(entries(pack_ids(r[0] for r in ghost), at, np.zeros(len(ghost), np.int64), kind))
+
+    async def _publish(self, lifecycle: str, changed, at_ms: int) -> None:
+        delay = 0.1
+        for attempt in range(self.publish_attempts):
+            try:
+                await self.publisher.publish(lifecycle, changed, at_ms)
+                return
+            except Exception:
+                if attempt == self.publish_attempts - 1:
+                    # The UPDATE has committed; re-running it would match nothing.
+                    failures_total.inc(stage="publish")
+                    logger.exception("dropping %s event for %d boos", lifecycle, len(changed))
+                    return
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _apply(self, rows: np.ndarray, now_ms: int) -> None:
+        lifecycle = KINDS[int(rows["kind"][0])]
+        started = time.perf_counter()
+        try:
+            changed = await self.store.apply(lifecycle, unpack_ids(rows["id"]), now_ms)
+        except Exception:
+            failures_total.inc(stage="update")
+            logger.exception("%s transition of %d boos failed; retrying", lifecycle, len(rows))
+            retry = rows.copy()
+            retry["at"] = now_ms + self.retry_ms
+            # The OBLIVION follow-up is already scheduled.
+            retry["then"] = 0
+            self.wheel.schedule(retry)
+            return
+        if changed:
+            await self._publish(lifecycle, changed, now_ms)
+        batch_seconds.observe(time.perf_counter() - started)
+        transitions_total.inc(len(changed), lifecycle=lifecycle)
+        stale_total.inc(len(rows) - len(changed))
+        lag = now_ms - int(rows["at"].min())
+        lag_seconds.observe(max(lag, 0) / 1000)
+
+    async def tick(self) -> int:
+        """Fire everything due now; returns the number of entries fired."""
+        async with self._lock:
+            now_ms = self._now_ms()
+            due = self.wheel.advance(now_ms)
+            if len(due):
+                follow_up = due[(due["kind"] == KIND_OF[GHOST]) & (due["then"] > 0)].copy()
+                for kind in KINDS:
+                    rows = due[due["kind"] == kind]
+                    for start in range(0, len(rows), self.batch_size):
+                        await self._apply(rows[start : start + self.batch_size], now_ms)
+                if len(follow_up):
+                    follow_up["at"] = follow_up["then"]
+                    follow_up["then"] = 0
+                    follow_up["kind"] = KIND_OF[OBLIVION]
+                    self.wheel.schedule(follow_up)
+            pending_gauge.set(len(self.wheel))
+            return len(due)
+
+    async def _run(self) -> None:
+        tick = self.wheel.tick_ms / 1000
+        while True:
+            await asyncio.sleep(tick - self.clock() % tick)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("reaper tick failed")
+
+    async def _checkpoints(self) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self.checkpoint()
+
+    def _current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _write_checkpoint(self, rows: np.ndarray, saved_at: int) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        name = f"ckpt-{saved_at}"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "wheel.npy"), rows)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"saved_at": saved_at, "pending": len(rows)}, f)
+        previous = self._current()
+        os.replace(staging, os.path.join(self.path, name))
+        tmp = os.path.join(self.path, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(self.path, "CURRENT"))
+        if previous and previous != os.path.join(self.path, name):
+            shutil.rmtree(previous, ignore_errors=True)
+
+    async def checkpoint(self) -> None:
+        """Persist every pending deadline."""
+        if not self.path:
+            return
+        async with self._lock:
+            rows, saved_at = self.wheel.export(), self._now_ms()
+        await asyncio.get_running_loop().run_in_executor(None, self._write_checkpoint, rows, saved_at)
+
+    async def recover(self) -> None:
+        since = 0
+        current = self._current() if self.path else None
+        if current:
+            with open(os.path.join(current, "meta.json")) as f:
+                saved_at = json.load(f)["saved_at"]
+            rows = np.load(os.path.join(current, "wheel.npy"))
+            if rows.dtype != ENTRY:
+                raise ValueError(f"{current} holds {rows.dtype}, expected {ENTRY}")
+            self.wheel.schedule(rows)
+            since = saved_at - self.recovery_overlap_ms
+            logger.info("restored %d deadlines from %s", len(rows), current)
+        async for batch in self.store.pending(since):
+            self._schedule_pending(batch)
+        pending_gauge.set(len(self.wheel))
+
+    async def start(self) -> None:
+        await self.store.connect()
+        await self.publisher.connect()
+        await self.recover()
+        self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._checkpoints())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.checkpoint()
+        await self.publisher.close()
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.wheel),
+            "tick": self.wheel.tick,
+            "tick_ms": self.wheel.tick_ms,
+            "transitions": {name: transitions_total.value(lifecycle=name) for name in (GHOST, OBLIVION)},
+        }
+
+
+def build_reaper(settings, store, publisher) -> Reaper:
+    return Reaper(
+        store,
+        publisher,
+        path=settings.checkpoint_path,
+        tick_ms=settings.tick_ms,
+        levels=settings.wheel_levels,
+        batch_size=settings.update_batch_size,
+        oblivion_delay=settings.oblivion_delay_seconds,
+        retry_seconds=settings.retry_seconds,
+        publish_attempts=settings.publish_attempts,
+        checkpoint_interval=settings.checkpoint_interval_seconds,
+        recovery_overlap=settings.recovery_overlap_seconds,
+    )
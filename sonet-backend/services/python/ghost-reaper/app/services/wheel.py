@@ -0,0 +1,153 @@
+"""Hierarchical timing wheel over array-backed slots.
+
+Deadlines are rounded up to ``tick_ms`` ticks and hashed into ``levels``
+wheels of 256 slots: level 0 holds the next 256 ticks one slot per tick,
+level 1 the next 65 536 ticks 256 per slot, and so on (with 1 s ticks, four
+levels reach ~136 years). Each time level 0 wraps, the level 1 slot that just
+came due is cascaded down, and likewise up the levels, so every entry is moved
+at most ``levels`` times and ``advance`` only touches due slots.
+
+A slot is a growable NumPy structured array (``ENTRY``, 33 bytes a row), not a
+list of objects, so millions of pending deadlines cost tens of MB. Placement
+and cascades are vectorised: rows are bucketed with one ``argsort`` and
+appended per slot in chunks.
+
+Entries are never cancelled. A deadline that no longer applies (the boo was
+deleted, or its expiry moved) fires and is ignored by the transition's
+``WHERE`` clause; a moved deadline is simply scheduled again.
+"""
+
+import uuid
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+# ``at`` is the deadline in epoch ms; ``then`` the next deadline for the same
+# boo once this one fires (0 for none); ``kind`` the transition it triggers.
+ENTRY = np.dtype([("id", "V16"), ("at", "<i8"), ("then", "<i8"), ("kind", "u1")])
+
+SLOT_BITS = 8
+SLOTS = 1 << SLOT_BITS
+MASK = SLOTS - 1
+
+
+def pack_ids(ids: Iterable[str]) -> np.ndarray:
+    """UUID strings as a ``V16`` array; raises ValueError on anything else."""
+    return np.frombuffer(b"".join(uuid.UUID(i).bytes for i in ids), "V16")
+
+
+def unpack_ids(ids: np.ndarray) -> List[str]:
+    return [str(uuid.UUID(bytes=bytes(i))) for i in ids]
+
+
+def entries(ids: np.ndarray, at: np.ndarray, then: np.ndarray, kind: np.ndarray) -> np.ndarray:
+    rows = np.empty(len(ids), ENTRY)
+    rows["id"], rows["at"], rows["then"], rows["kind"] = ids, at, then, kind
+    return rows
+
+
+class _Slot:
+    __slots__ = ("rows", "size")
+
+    def __init__(self):
+        self.rows: Optional[np.ndarray] = None
+        self.size = 0
+
+    def extend(self, rows: np.ndarray) -> None:
+        needed = self.size + len(rows)
+        if self.rows is None or needed > len(self.rows):
+            grown = np.empty(max(needed, 2 * self.size, 16), ENTRY)
+            if self.size:
+                grown[: self.size] = self.rows[: self.size]
+            self.rows = grown
+        self.rows[self.size : needed] = rows
+        self.size = needed
+
+    def take(self) -> np.ndarray:
+        out = self.rows[: self.size].copy() if self.size else np.empty(0, ENTRY)
+        # Release the buffer: a drained far-future slot may stay empty for days.
+        self.rows, self.size = None, 0
+        return out
+
+
+class TimingWheel:
+    def __init__(self, now_ms: int, tick_ms: int = 1000, levels: int = 4):
+        if levels < 2:
+            # Entries parked past the horizon need a level above 0 to cascade from.
+            raise ValueError("a timing wheel needs at least 2 levels")
+        self.tick_ms = tick_ms
+        self.levels = levels
+        self.tick = now_ms // tick_ms
+        self._wheels = [[_Slot() for _ in range(SLOTS)] for _ in range(levels)]
+        self._due = _Slot()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, rows: np.ndarray) -> None:
+        """Add ``ENTRY`` rows; those already due fire on the next ``advance``."""
+        if not len(rows):
+            return
+        self._size += len(rows)
+        self._place(rows)
+
+    def _place(self, rows: np.ndarray) -> None:
+        deadline = -(-rows["at"] // self.tick_ms)
+        delta = deadline - self.tick
+        due = delta <= 0
+        if due.any():
+            self._due.extend(rows[due])
+            rows, deadline, delta = rows[~due], deadline[~due], delta[~due]
+            if not len(rows):
+                return
+        horizon = 1 << (SLOT_BITS * self.levels)
+        # Beyond the top level's reach, park in its farthest slot; the entry is
+        # re-placed from there when that slot cascades.
+        deadline = np.minimum(deadline, self.tick + horizon - 1)
+        delta = deadline - self.tick
+        level = np.zeros(len(rows), np.int64)
+        for l in range(1, self.levels):
+            level += delta >= (1 << (SLOT_BITS * l))
+        slot = (deadline >> (SLOT_BITS * level)) & MASK
+        key = level * SLOTS + slot
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        bounds = np.flatnonzero(np.diff(key)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(key)]):
+            k = int(key[start])
+            self._wheels[k // SLOTS][k % SLOTS].extend(rows[order[start:end]])
+
+    def advance(self, now_ms: int) -> np.ndarray:
+        """Move the clock to ``now_ms`` and return every entry that came due."""
+        fired = [self._due.take()]
+        target = now_ms // self.tick_ms
+        while self.tick < target:
+            self.tick += 1
+            t = self.tick
+            # Cascade from the top so entries land in slots not yet visited.
+            cascade = []
+            for level in range(1, self.levels):
+                if (t >> (SLOT_BITS * (level - 1))) & MASK:
+                    break
+                cascade.append(level)
+            for level in reversed(cascade):
+                rows = self._wheels[level][(t >> (SLOT_BITS * level)) & MASK].take()
+                if len(rows):
+                    self._place(rows)
+            slot = self._wheels[0][t & MASK]
+            if slot.size:
+                fired.append(slot.take())
+            if self._due.size:
+                # Cascaded entries due exactly at this tick.
+                fired.append(self._due.take())
+        out = np.concatenate(fired) if len(fired) > 1 else fired[0]
+        self._size -= len(out)
+        return out
+
+    def export(self) -> np.ndarray:
+        """Every pending entry, for a checkpoint."""
+        parts = [self._due.rows[: self._due.size]] if self._due.size else []
+        for wheel in self._wheels:
+            parts += [slot.rows[: slot.size] for slot in wheel if slot.size]
+        return np.concatenate(parts) if parts else np.empty(0, ENTRY)
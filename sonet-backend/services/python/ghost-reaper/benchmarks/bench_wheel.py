@@ -0,0 +1,89 @@
+"""Memory and CPU cost of the timing wheel at millions of pending deadlines.
+
+Schedules ``--deadlines`` boos with GHOST deadlines spread over ``--days``,
+reports the bytes held and the scheduling rate, writes and reloads a
+checkpoint, then runs the wheel through ``--simulate-hours`` of one-second
+ticks and reports per-tick cost. Only the wheel is measured: UPDATEs and
+publishing are out of the loop.
+
+    cd services/python/ghost-reaper
+    python -m benchmarks.bench_wheel --deadlines 5000000 --days 2
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.lifecycle import MemoryBooStore, MemoryPublisher
+from app.services.reaper import Reaper
+from app.services.wheel import ENTRY, entries
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(deadlines: int, days: float, hours: float, chunk: int) -> None:
+    rng = np.random.default_rng(7)
+    clock = [time.time()]
+    now = int(clock[0] * 1000)
+    with tempfile.TemporaryDirectory() as path:
+        reaper = Reaper(MemoryBooStore(), MemoryPublisher(), path=path, clock=lambda: clock[0])
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        for start in range(0, deadlines, chunk):
+            n = min(chunk, deadlines - start)
+            ghosts = now + rng.integers(0, int(days * 86400_000), n)
+            ids = np.frombuffer(rng.bytes(16 * n), "V16")
+            reaper.wheel.schedule(entries(ids, ghosts, ghosts + 7 * 86400_000, np.ones(n, np.uint8)))
+        elapsed = time.perf_counter() - started
+        held = reaper.wheel.export().nbytes
+        print(
+            f"scheduled {deadlines:,} in {elapsed:.2f}s ({deadlines / elapsed:,.0f}/s);"
+            f" {held / 1e6:.0f} MB of rows ({ENTRY.itemsize} B each),"
+            f" peak RSS +{(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024:.0f} MB"
+        )
+
+        started = time.perf_counter()
+        await reaper.checkpoint()
+        written = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(path) for f in fs)
+        restored = Reaper(MemoryBooStore(), MemoryPublisher(), path=path, clock=lambda: clock[0])
+        started = time.perf_counter()
+        await restored.recover()
+        print(
+            f"checkpoint {size / 1e6:.0f} MB written in {written:.2f}s,"
+            f" recovered {len(restored.wheel):,} in {time.perf_counter() - started:.2f}s"
+        )
+        del restored
+
+        samples, fired = [], 0
+        for _ in range(int(hours * 3600)):
+            clock[0] += 1
+            started = time.perf_counter()
+            fired += len(reaper.wheel.advance(int(clock[0] * 1000)))
+            samples.append((time.perf_counter() - started) * 1000)
+        print(
+            f"{len(samples):,} ticks fired {fired:,}: mean {sum(samples) / len(samples):.3f} ms,"
+            f" p99 {percentile(samples, 0.99):.3f} ms, max {max(samples):.1f} ms (cascades)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deadlines", type=int, default=5_000_000)
+    parser.add_argument("--days", type=float, default=2.0)
+    parser.add_argument("--simulate-hours", type=float, default=2.0)
+    parser.add_argument("--chunk", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.deadlines, args.days, args.simulate_hours, args.chunk))
+
+
+if __name__ == "__main__":
+    main()
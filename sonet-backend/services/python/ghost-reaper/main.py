@@ -0,0 +1,46 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import reaper
+from app.core.config import get_settings
+from app.core.metrics import render_latest
+from app.services.lifecycle import build_publisher, build_store
+from app.services.reaper import build_reaper
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    app.state.reaper = build_reaper(settings, build_store(settings), build_publisher(settings))
+    await app.state.reaper.start()
+    yield
+    await app.state.reaper.stop()
+
+
+app = FastAPI(title="ghost-reaper", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(reaper.router)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
+if __name__ == "__main__":
+    import uvicorn
+    # One process owns the wheel; uvicorn would otherwise take WEB_CONCURRENCY.
+    uvicorn.run(app, host="0.0.0.0", port=8091, workers=1)
@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+from app.services.lifecycle import GHOST, LIVE, OBLIVION, MemoryBooStore, MemoryPublisher
+from app.services.reaper import Reaper
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+START = 1_700_000_000_000
+
+
+class Clock:
+    def __init__(self, ms: int):
+        self.ms = ms
+
+    def __call__(self) -> float:
+        return self.ms / 1000
+
+
+def _reaper(store, clock, path) -> Reaper:
+    return Reaper(
+        store,
+        MemoryPublisher(),
+        path=str(path),
+        tick_ms=1000,
+        oblivion_delay=HOUR_MS / 1000,
+        recovery_overlap=5 * 60,
+        clock=clock,
+    )
+
+
+async def _at(reaper: Reaper, clock: Clock, ms: int) -> None:
+    clock.ms = ms
+    await reaper.tick()
+
+
+def test_boos_ghost_then_go_to_oblivion(tmp_path):
+    async def scenario():
+        clock = Clock(START)
+        store = MemoryBooStore()
+        reaper = _reaper(store, clock, tmp_path)
+        boos = [str(uuid.uuid4()) for _ in range(3)]
+        for i, boo in enumerate(boos):
+            store.add(boo, f"u{i}", START, START + (i + 1) * MINUTE_MS, START + (i + 1) * MINUTE_MS + HOUR_MS)
+        reaper.schedule(boos, [START + (i + 1) * MINUTE_MS for i in range(3)])
+
+        await _at(reaper, clock, START + 2 * MINUTE_MS)
+        assert [store.boos[b]["lifecycle"] for b in boos] == [GHOST, GHOST, LIVE]
+        assert reaper.publisher.messages[-1]["lifecycle"] == GHOST
+        assert {b["id"] for b in reaper.publisher.messages[-1]["boos"]} == set(boos[:2])
+
+        await _at(reaper, clock, START + 3 * MINUTE_MS + HOUR_MS)
+        # The last boo's OBLIVION follow-up was already due when scheduled; it fires on the next tick.
+        await reaper.tick()
+        assert [store.boos[b]["lifecycle"] for b in boos] == [OBLIVION] * 3
+        assert len(reaper.wheel) == 0
+
+    asyncio.run(scenario())
+
+
+def test_recovery_keeps_a_deadline_extended_after_the_checkpoint(tmp_path):
+    async def scenario():
+        clock = Clock(START)
+        store = MemoryBooStore()
+        old, new = str(uuid.uuid4()), str(uuid.uuid4())
+        reaper = _reaper(store, clock, tmp_path)
+        # Created well before the checkpoint, due an hour after the start.
+        store.add(old, "u1", START, START + HOUR_MS, START + 2 * HOUR_MS)
+        reaper.schedule([old], [START + HOUR_MS], [START + 2 * HOUR_MS])
+        clock.ms = START + 30 * MINUTE_MS
+        await reaper.checkpoint()
+
+        # Extended after the checkpoint, then the reaper dies before the next one.
+        clock.ms = START + 45 * MINUTE_MS
+        store.extend(old, clock.ms, START + 3 * HOUR_MS, START + 4 * HOUR_MS)
+        reaper.schedule([old], [START + 3 * HOUR_MS], [START + 4 * HOUR_MS])
+        store.add(new, "u2", clock.ms, START + 90 * MINUTE_MS, START + 4 * HOUR_MS)
+        reaper.schedule([new], [START + 90 * MINUTE_MS], [START + 4 * HOUR_MS])
+
+        restarted = _reaper(store, clock, tmp_path)
+        await restarted.recover()
+        # The checkpointed deadline still fires, but matches nothing.
+        await _at(restarted, clock, START + 2 * HOUR_MS)
+        assert store.boos[old]["lifecycle"] == LIVE
+        assert store.boos[new]["lifecycle"] == GHOST
+        await _at(restarted, clock, START + 3 * HOUR_MS)
+        assert store.boos[old]["lifecycle"] == GHOST
+        await _at(restarted, clock, START + 4 * HOUR_MS)
+        assert store.boos[old]["lifecycle"] == OBLIVION
+        assert store.boos[new]["lifecycle"] == OBLIVION
+
+    asyncio.run(scenario())
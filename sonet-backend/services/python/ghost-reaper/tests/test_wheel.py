@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.wheel import ENTRY, TimingWheel, entries, pack_ids, unpack_ids
+
+
+def _rows(deadlines):
+    n = len(deadlines)
+    ids = np.arange(n, dtype=">u8")
+    packed = np.zeros(n, [("hi", ">u8"), ("lo", ">u8")])
+    packed["lo"] = ids
+    return entries(packed.view("V16"), np.asarray(deadlines, np.int64), np.zeros(n, np.int64), np.ones(n, np.uint8))
+
+
+def _index(rows) -> list:
+    return [int.from_bytes(bytes(i)[8:], "big") for i in rows["id"]]
+
+
+def test_wheel_fires_like_brute_force():
+    levels = 2
+    rng = random.Random(levels)
+    tick_ms = 10
+    start = 1_000_000_007
+    # Past deadlines, near ones and some beyond the wheel's horizon.
+    horizon_ms = (1 << (8 * levels)) * tick_ms
+    deadlines = [start + rng.randint(-5_000, 2 * horizon_ms) for _ in range(5_000)]
+    deadlines += [start + rng.randint(0, 3_000) for _ in range(2_000)]
+    wheel = TimingWheel(start, tick_ms, levels)
+    wheel.schedule(_rows(deadlines))
+    assert len(wheel) == len(deadlines)
+
+    fired_at = {}
+    previous = {}
+    now = start
+    end = start + 2 * horizon_ms + 10 * tick_ms
+    while now < end:
+        before = now
+        now += rng.choice([1, 7, tick_ms, 25 * tick_ms, 300 * tick_ms])
+        for i in _index(wheel.advance(now)):
+            assert i not in fired_at
+            fired_at[i], previous[i] = now, before
+
+    assert len(fired_at) == len(deadlines)
+    assert len(wheel) == 0
+    for i, at in enumerate(deadlines):
+        due_tick = -(-at // tick_ms)
+        # Fires on the first advance whose tick reaches the deadline; one
+        # already due when scheduled fires on the first advance.
+        assert fired_at[i] // tick_ms >= due_tick or at <= start
+        assert previous[i] // tick_ms < due_tick or previous[i] == start
+
+
+def test_single_level_wheel_is_rejected():
+    with pytest.raises(ValueError):
+        TimingWheel(0, 1000, 1)
+
+
+def test_export_round_trips_pending_entries():
+    wheel = TimingWheel(0, 1000, 4)
+    wheel.schedule(_rows([500, 70_000, 5 * 10**7, 10**8]))
+    wheel.advance(1000)
+    exported = wheel.export()
+    assert exported.dtype == ENTRY
+    assert sorted(exported["at"].tolist()) == [70_000, 5 * 10**7, 10**8]
+
+    restored = TimingWheel(1000, 1000, 4)
+    restored.schedule(exported)
+    assert sorted(restored.advance(10**8)["at"].tolist()) == [70_000, 5 * 10**7, 10**8]
+
+
+def test_ids_must_be_uuids():
+    ids = ["5b0c9e2a-4f4e-4c53-9d1e-0f1f3d2a7c10", "00000000-0000-0000-0000-000000000001"]
+    assert unpack_ids(pack_ids(ids)) == ids
+    with pytest.raises(ValueError):
+        pack_ids(["not-a-uuid"])
@@ -0,0 +1,69 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.core.config import get_settings
+from app.models.timeline import FeedItem, FeedResponse, TimelineEvent, TimelineEventBatch
+from app.services.timeline import TimelineStore
+
+router = APIRouter(tags=["feed"])
+
+
+@router.get("/feed", response_model=FeedResponse)
+async def get_feed(request: Request, user_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None):
+    """``FeedService.GetFeed``: a page of the user's home timeline, newest first, live boos only."""
+    settings = get_settings()
+    limit = min(limit or settings.feed_default_limit, settings.feed_max_limit)
+    try:
+        page = await request.app.state.timelines.read(user_id, limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return FeedResponse(
+        items=[FeedItem(boo_id=e.boo_id, created_at=e.created_at, expires_at=e.expires_at) for e in page.entries],
+        next_cursor=page.next_cursor,
+    )
+
+
+def _require(event: TimelineEvent, *fields: str) -> None:
+    missing = [f for f in fields if getattr(event, f) is None]
+    if missing:
+        raise ValueError(f"{event.type} requires {', '.join(missing)}")
+
+
+async def _apply(store: TimelineStore, event: TimelineEvent) -> None:
+    if event.type == "boo.created":
+        _require(event, "boo_id", "created_at", "expires_at")
+        await store.publish(event.user_id, event.boo_id, event.created_at, event.expires_at)
+    elif event.type == "post.created":
+        _require(event, "boo_id", "created_at")
+        await store.publish(event.user_id, event.boo_id, event.created_at)
+    elif event.type == "boo.deleted":
+        # The expiry locates the boo's bucket.
+        _require(event, "boo_id", "expires_at")
+        await store.remove(event.user_id, event.boo_id, event.expires_at)
+    elif event.type == "post.deleted":
+        _require(event, "boo_id")
+        await store.remove(event.user_id, event.boo_id)
+    elif event.type == "user.followed":
+        _require(event, "target_user_id")
+        await store.follow(event.user_id, event.target_user_id)
+    else:
+        _require(event, "target_user_id")
+        await store.unfollow(event.user_id, event.target_user_id)
+
+
+@router.post("/timeline/events", status_code=202)
+async def timeline_events(request: Request, body: TimelineEventBatch):
+    """Apply boo and follow events to the timelines, in order."""
+    store = request.app.state.timelines
+    for position, event in enumerate(body.events):
+        try:
+            await _apply(store, event)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail={"applied": position, "error": str(exc)})
+    return {"applied": len(body.events)}
+
+
+@router.get("/timeline/stats")
+async def timeline_stats(request: Request, user_id: Optional[str] = None):
+    return await request.app.state.timelines.stats(user_id)
@@ -0,0 +1,48 @@
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from app.core.cursor import require_secret
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="TIMELINE_")
+
+    # "fakeredis://" runs against an in-process stand-in (local runs, benchmarks).
+    redis_url: str = "redis://redis:6379/0"
+
+    # Timelines and outboxes are partitioned into buckets of this many seconds
+    # of expires_at; a bucket is dropped whole once all of it has expired.
+    bucket_seconds: int = 3600
+    # Materialized home timelines keep the newest entries per bucket only, and
+    # expire once their owner stops reading; the next read rebuilds from outboxes.
+    timeline_max_length: int = 800
+    timeline_ttl_seconds: int = 7 * 86400
+    # Each author's recent boos, for follow backfill, rebuilds and pull reads.
+    outbox_max_length: int = 200
+    # Authors with at least this many followers are not fanned out on write;
+    # their followers pull from the author's outbox at read time instead.
+    celebrity_follower_threshold: int = 10_000
+    # Followers written per pipelined round trip during fan-out.
+    fanout_batch_size: int = 1000
+    # Followees merged when rebuilding an expired timeline.
+    rebuild_max_following: int = 2000
+
+    feed_default_limit: int = 20
+    feed_max_limit: int = 100
+    # Signs feed cursors; every replica must share it. Required unless ENV is
+    # "dev", the default for local runs; the manifests set ENV=production.
+    cursor_secret: Optional[str] = None
+    env: str = Field("dev", validation_alias="ENV")
+
+    @model_validator(mode="after")
+    def _cursor_secret(self):
+        self.cursor_secret = require_secret(self.cursor_secret, self.env)
+        return self
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
@@ -0,0 +1,38 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class TimelineEvent(BaseModel):
+    """One change to feed into timelines; the fields used depend on ``type``.
+
+    - ``boo.created`` / ``boo.deleted``: ``boo_id``, ``user_id`` (author),
+      ``created_at`` and ``expires_at`` (epoch ms, as in ``BooResponse``)
+    - ``user.followed`` / ``user.unfollowed``: ``user_id``, ``target_user_id`` (a ``FollowRequest``)
+
+    Dahlia posts use ``post.created`` / ``post.deleted`` and never expire.
+    """
+
+    type: Literal["boo.created", "boo.deleted", "post.created", "post.deleted", "user.followed", "user.unfollowed"]
+    boo_id: Optional[str] = None
+    user_id: str
+    target_user_id: Optional[str] = None
+    created_at: Optional[int] = None
+    expires_at: Optional[int] = None
+
+
+class TimelineEventBatch(BaseModel):
+    events: List[TimelineEvent]
+
+
+class FeedItem(BaseModel):
+    boo_id: str
+    created_at: int
+    expires_at: Optional[int] = None
+
+
+class FeedResponse(BaseModel):
+    """Mirrors ``feed.FeedResponse``; items carry ids for the caller to hydrate."""
+
+    items: List[FeedItem]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,424 @@
+"""Home timelines materialized in Redis sorted sets, partitioned by expiry.
+
+Each boo is written to its author's outbox and fanned out on write to the home
+timeline of every follower, scored by ``created_at`` in epoch ms. Fan-out
+writes go out as pipelined batches, ``fanout_batch_size`` followers per round
+trip.
+
+Timelines and outboxes are split into buckets by ``expires_at``: the entry
+lands in ``{family}:{bucket}`` with ``bucket = expires_at // bucket_seconds``,
+and ``{family}:idx`` lists the family's buckets. Every bucket key carries a
+``PEXPIREAT`` at its bucket's end, so Redis drops an expired bucket as one key
+deletion rather than entry by entry. Reads only touch buckets from the current
+one onward, so they never scan ghosted or oblivion boos; within that first
+bucket, entries are filtered by the ``expires_at`` stored in the member
+(``{boo_id}:{expires_at}``). Boos without an expiry (Dahlia posts) share the
+``FOREVER`` bucket.
+
+Authors with ``celebrity_follower_threshold`` followers or more are in the
+``celebs`` set and are not fanned out. A reader's page merges their timeline
+with the outboxes of the celebrities they follow (hybrid pull). Promotion is
+sticky: boos written while an author was pull-only exist only in the outbox.
+
+Each bucket is trimmed to ``timeline_max_length``. A timeline's index expires
+``timeline_ttl_seconds`` after its owner last read it; a read without one
+rebuilds the timeline from the outboxes of the reader's followees.
+
+Pages are keyset-paginated on ``(created_at, member)``, newest first, with
+signed cursors (``app.core.cursor``). A page seeks past the cursor in each
+bucket, so it costs the same at any depth and stays stable while new boos
+arrive.
+"""
+
+import heapq
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.cursor import Cursor, CursorCodec, CursorError
+from app.core.metrics import Counter, Histogram
+
+fanout_recipients = Histogram(
+    "timeline_fanout_recipients", "Timelines written per boo", (0, 10, 100, 1000, 5000, 10000)
+)
+fanout_seconds = Histogram(
+    "timeline_fanout_seconds", "Fan-out latency per boo", (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+read_seconds = Histogram(
+    "timeline_read_seconds", "Feed page latency", (0.0005, 0.001, 0.002, 0.005, 0.01, 0.05)
+)
+pulled_sources = Histogram("timeline_read_pulled_outboxes", "Celebrity outboxes merged per page", (0, 1, 4, 16, 64))
+read_buckets = Histogram("timeline_read_buckets", "Expiry buckets read per page", (1, 2, 4, 8, 16, 32, 64, 128))
+rebuilds_total = Counter("timeline_rebuilds_total", "Timelines rebuilt from outboxes on read")
+
+CELEBS = "celebs"
+# Bucket for entries that never expire; sorts after every real bucket.
+FOREVER = 2**52
+
+
+def _timeline(user_id: str) -> str:
+    return f"tl:{user_id}"
+
+
+def _marker(user_id: str) -> str:
+    # Present while the timeline is materialized; an empty family has no keys.
+    return f"tlm:{user_id}"
+
+
+def _outbox(user_id: str) -> str:
+    return f"ob:{user_id}"
+
+
+def _followers(user_id: str) -> str:
+    return f"fr:{user_id}"
+
+
+def _following(user_id: str) -> str:
+    return f"fg:{user_id}"
+
+
+def _index(family: str) -> str:
+    return f"{family}:idx"
+
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _member(boo_id: str, expires_at: Optional[int]) -> str:
+    return f"{boo_id}:{expires_at or 0}"
+
+
+def _split(member: str) -> Tuple[str, Optional[int]]:
+    boo_id, expires_at = member.rsplit(":", 1)
+    return boo_id, int(expires_at) or None
+
+
+@dataclass
+class TimelineEntry:
+    boo_id: str
+    created_at: int
+    expires_at: Optional[int]
+
+
+@dataclass
+class TimelinePage:
+    entries: List[TimelineEntry]
+    next_cursor: Optional[str]
+
+
+class TimelineStore:
+    def __init__(
+        self,
+        redis,
+        cursor_secret: str,
+        max_length: int = 800,
+        ttl: int = 7 * 86400,
+        outbox_max_length: int = 200,
+        celebrity_threshold: int = 10_000,
+        batch_size: int = 1000,
+        rebuild_max_following: int = 2000,
+        bucket_seconds: int = 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.redis = redis
+        self.max_length = max_length
+        self.ttl = ttl
+        self.outbox_max_length = outbox_max_length
+        self.celebrity_threshold = celebrity_threshold
+        self.batch_size = batch_size
+        self.rebuild_max_following = rebuild_max_following
+        self.bucket_ms = bucket_seconds * 1000
+        self.cursors = CursorCodec(cursor_secret)
+        self.clock = clock
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _bucket(self, member: str) -> int:
+        expires_at = _split(member)[1]
+        return expires_at // self.bucket_ms if expires_at else FOREVER
+
+    def _write(self, pipe, family: str, entries: Dict[str, int], max_length: int, idle_ttl: Optional[int]) -> None:
+        """Queue ``entries`` (member -> created_at) into ``family``'s buckets, trimmed to ``max_length`` each."""
+        buckets = defaultdict(dict)
+        for member, created_at in entries.items():
+            buckets[self._bucket(member)][member] = created_at
+        for bucket, mapping in buckets.items():
+            key = f"{family}:{bucket}"
+            pipe.zadd(key, mapping)
+            pipe.zremrangebyrank(key, 0, -max_length - 1)
+            if bucket != FOREVER:
+                pipe.pexpireat(key, (bucket + 1) * self.bucket_ms)
+            elif idle_ttl:
+                pipe.expire(key, idle_ttl, nx=True)
+        pipe.zadd(_index(family), {bucket: bucket for bucket in buckets})
+        if idle_ttl:
+            # NX keeps a reader's TTL; an index created here still expires.
+            pipe.expire(_index(family), idle_ttl, nx=True)
+
+    def _live_buckets(self, pipe, family: str) -> None:
+        index = _index(family)
+        current = self._now_ms() // self.bucket_ms
+        pipe.zremrangebyscore(index, "-inf", current - 1)
+        pipe.zrange(index, current, "+inf", byscore=True)
+
+    async def _read_families(self, families: List[str]) -> List[Dict[str, int]]:
+        """Every live entry of each family, as member -> created_at."""
+        pipe = self.redis.pipeline(transaction=False)
+        for family in families:
+            self._live_buckets(pipe, family)
+        indexes = (await pipe.execute())[1::2]
+        pipe = self.redis.pipeline(transaction=False)
+        keys = []
+        for i, buckets in enumerate(indexes):
+            for bucket in buckets:
+                pipe.zrange(f"{families[i]}:{_str(bucket)}", 0, -1, withscores=True)
+                keys.append(i)
+        out: List[Dict[str, int]] = [{} for _ in families]
+        now = self._now_ms()
+        for i, entries in zip(keys, await pipe.execute()):
+            for member, created_at in entries:
+                member = _str(member)
+                expires_at = _split(member)[1]
+                if expires_at is None or expires_at > now:
+                    out[i][member] = int(created_at)
+        return out
+
+    async def _in_batches(self, user_ids: Iterable[str], write) -> int:
+        written = 0
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            write(pipe, user_id)
+            written += 1
+            if written % self.batch_size == 0:
+                await pipe.execute()
+        if written % self.batch_size:
+            await pipe.execute()
+        return written
+
+    async def publish(self, author_id: str, boo_id: str, created_at: int, expires_at: Optional[int] = None) -> int:
+        """Add a new boo to its author's outbox and followers' timelines; returns timelines written."""
+        started = time.perf_counter()
+        if expires_at is not None and expires_at <= self._now_ms():
+            return 0
+        entry = {_member(boo_id, expires_at): created_at}
+        pipe = self.redis.pipeline(transaction=False)
+        self._write(pipe, _outbox(author_id), entry, self.outbox_max_length, None)
+        pipe.zremrangebyscore(_index(_outbox(author_id)), "-inf", self._now_ms() // self.bucket_ms - 1)
+        pipe.sismember(CELEBS, author_id)
+        pipe.smembers(_followers(author_id))
+        *_, celebrity, followers = await pipe.execute()
+        recipients = [author_id]
+        if not celebrity:
+            recipients += [_str(f) for f in followers]
+        written = await self._in_batches(
+            recipients, lambda p, user_id: self._write(p, _timeline(user_id), entry, self.max_length, self.ttl)
+        )
+        fanout_recipients.observe(written)
+        fanout_seconds.observe(time.perf_counter() - started)
+        return written
+
+    async def remove(self, author_id: str, boo_id: str, expires_at: Optional[int] = None) -> None:
+        """Take a deleted boo out of the outbox and the timelines it was fanned out to."""
+        member = _member(boo_id, expires_at)
+        bucket = self._bucket(member)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrem(f"{_outbox(author_id)}:{bucket}", member)
+        pipe.sismember(CELEBS, author_id)
+        pipe.smembers(_followers(author_id))
+        _, celebrity, followers = await pipe.execute()
+        recipients = [author_id]
+        if not celebrity:
+            recipients += [_str(f) for f in followers]
+        await self._in_batches(recipients, lambda p, user_id: p.zrem(f"{_timeline(user_id)}:{bucket}", member))
+
+    async def follow(self, user_id: str, target_id: str) -> None:
+        """Record the edge and backfill the target's live boos into the follower's timeline."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(_followers(target_id), user_id)
+        pipe.sadd(_following(user_id), target_id)
+        pipe.scard(_followers(target_id))
+        pipe.sismember(CELEBS, target_id)
+        _, _, followers, celebrity = await pipe.execute()
+        if celebrity:
+            return
+        if followers >= self.celebrity_threshold:
+            await self.redis.sadd(CELEBS, target_id)
+            return
+        (recent,) = await self._read_families([_outbox(target_id)])
+        if recent:
+            pipe = self.redis.pipeline(transaction=False)
+            self._write(pipe, _timeline(user_id), recent, self.max_length, self.ttl)
+            await pipe.execute()
+
+    async def unfollow(self, user_id: str, target_id: str) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.srem(_followers(target_id), user_id)
+        pipe.srem(_following(user_id), target_id)
+        await pipe.execute()
+        (recent,) = await self._read_families([_outbox(target_id)])
+        pipe = self.redis.pipeline(transaction=False)
+        for member in recent:
+            pipe.zrem(f"{_timeline(user_id)}:{self._bucket(member)}", member)
+        await pipe.execute()
+
+    async def _rebuild(self, user_id: str) -> None:
+        rebuilds_total.inc()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.smembers(_following(user_id))
+        pipe.sinter(_following(user_id), CELEBS)
+        following, celebs = await pipe.execute()
+        celebs = {_str(c) for c in celebs}
+        followees = [f for f in map(_str, following) if f not in celebs][: self.rebuild_max_following]
+        merged: Dict[str, int] = {}
+        for outbox in await self._read_families([_outbox(f) for f in followees + [user_id]]):
+            merged.update(outbox)
+        pipe = self.redis.pipeline(transaction=False)
+        if merged:
+            newest = heapq.nlargest(self.max_length, merged.items(), key=lambda item: (item[1], item[0]))
+            # Merged in rather than replaced, so boos fanned out meanwhile are kept.
+            self._write(pipe, _timeline(user_id), dict(newest), self.max_length, self.ttl)
+        pipe.set(_marker(user_id), 1, ex=self.ttl)
+        await pipe.execute()
+
+    async def _pages_after(
+        self, keys: List[str], cursor: Optional[Tuple[int, str]], limit: int
+    ) -> List[List[Tuple[str, int]]]:
+        """Up to ``limit`` live entries of each key strictly after ``cursor``, newest first, in one round trip."""
+        now = self._now_ms()
+        pages: List[List[Tuple[str, int]]] = [[] for _ in keys]
+        offsets = [0] * len(keys)
+        pending = list(range(len(keys)))
+        top = cursor[0] if cursor else "+inf"
+        while pending:
+            pipe = self.redis.pipeline(transaction=False)
+            for i in pending:
+                pipe.zrange(keys[i], top, "-inf", desc=True, byscore=True, offset=offsets[i], num=limit, withscores=True)
+            unfinished = []
+            for i, batch in zip(pending, await pipe.execute()):
+                for member, score in batch:
+                    member, score = _str(member), int(score)
+                    # Entries sharing the cursor's score come back in descending
+                    # member order; those at or above its member were already served.
+                    if cursor is not None and score == cursor[0] and member >= cursor[1]:
+                        continue
+                    # Only the current bucket can hold entries that have expired.
+                    expires_at = _split(member)[1]
+                    if expires_at is not None and expires_at <= now:
+                        continue
+                    pages[i].append((member, score))
+                offsets[i] += len(batch)
+                if len(batch) == limit and len(pages[i]) < limit:
+                    unfinished.append(i)
+            pending = unfinished
+        return [page[:limit] for page in pages]
+
+    def _decode_cursor(self, cursor: str) -> Tuple[int, str]:
+        position = self.cursors.decode(cursor)
+        if not isinstance(position.score, int) or not isinstance(position.key, str):
+            raise CursorError("invalid cursor")
+        return position.score, position.key
+
+    async def read(self, user_id: str, limit: int, cursor: Optional[str] = None) -> TimelinePage:
+        """A page of ``user_id``'s home timeline, newest first, without expired boos.
+
+        Raises ``CursorError`` (a ``ValueError``) for a cursor this store did not issue.
+        """
+        started = time.perf_counter()
+        after = self._decode_cursor(cursor) if cursor else None
+        timeline = _timeline(user_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.expire(_marker(user_id), self.ttl)
+        pipe.expire(_index(timeline), self.ttl)
+        pipe.expire(f"{timeline}:{FOREVER}", self.ttl)
+        pipe.sinter(_following(user_id), CELEBS)
+        self._live_buckets(pipe, timeline)
+        materialized, _, _, celebs, _, buckets = await pipe.execute()
+        if not materialized:
+            await self._rebuild(user_id)
+            pipe = self.redis.pipeline(transaction=False)
+            self._live_buckets(pipe, timeline)
+            _, buckets = await pipe.execute()
+
+        keys = [f"{timeline}:{_str(b)}" for b in buckets]
+        if celebs:
+            pipe = self.redis.pipeline(transaction=False)
+            outboxes = [_outbox(_str(c)) for c in celebs]
+            for outbox in outboxes:
+                self._live_buckets(pipe, outbox)
+            for outbox, outbox_buckets in zip(outboxes, (await pipe.execute())[1::2]):
+                keys += [f"{outbox}:{_str(b)}" for b in outbox_buckets]
+        pulled_sources.observe(len(celebs))
+        read_buckets.observe(len(keys))
+
+        pages = await self._pages_after(keys, after, limit)
+        merged: List[Tuple[str, int]] = []
+        seen = set()
+        for member, created_at in heapq.merge(*pages, key=lambda e: (e[1], e[0]), reverse=True):
+            if member not in seen:
+                seen.add(member)
+                merged.append((member, created_at))
+                if len(merged) == limit:
+                    break
+
+        next_cursor = None
+        if len(merged) == limit:
+            next_cursor = self.cursors.encode(Cursor(merged[-1][1], merged[-1][0]))
+        read_seconds.observe(time.perf_counter() - started)
+        entries = []
+        for member, created_at in merged:
+            boo_id, expires_at = _split(member)
+            entries.append(TimelineEntry(boo_id, created_at, expires_at))
+        return TimelinePage(entries, next_cursor)
+
+    async def stats(self, user_id: Optional[str] = None) -> dict:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.scard(CELEBS)
+        if user_id is not None:
+            self._live_buckets(pipe, _timeline(user_id))
+            pipe.scard(_followers(user_id))
+            pipe.scard(_following(user_id))
+        values = await pipe.execute()
+        out = {"celebrities": values[0]}
+        if user_id is not None:
+            buckets = values[2]
+            pipe = self.redis.pipeline(transaction=False)
+            for bucket in buckets:
+                pipe.zcard(f"{_timeline(user_id)}:{_str(bucket)}")
+            out.update(
+                timeline_length=sum(await pipe.execute()),
+                timeline_buckets=len(buckets),
+                followers=values[3],
+                following=values[4],
+            )
+        return out
+
+
+def connect(url: str):
+    """``redis.asyncio`` client for ``url``; ``fakeredis://`` gives an in-process stand-in."""
+    if url.startswith("fakeredis://"):
+        from fakeredis import aioredis
+
+        return aioredis.FakeRedis()
+    import redis.asyncio
+
+    return redis.asyncio.from_url(url)
+
+
+def build_store(settings) -> TimelineStore:
+    return TimelineStore(
+        connect(settings.redis_url),
+        max_length=settings.timeline_max_length,
+        ttl=settings.timeline_ttl_seconds,
+        outbox_max_length=settings.outbox_max_length,
+        celebrity_threshold=settings.celebrity_follower_threshold,
+        batch_size=settings.fanout_batch_size,
+        rebuild_max_following=settings.rebuild_max_following,
+        bucket_seconds=settings.bucket_seconds,
+        cursor_secret=settings.cursor_secret,
+    )
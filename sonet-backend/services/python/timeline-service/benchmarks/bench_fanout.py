@@ -0,0 +1,120 @@
+"""Fan-out throughput by pipeline batch size, and feed read latency.
+
+Publishes boos from an author with ``--followers`` followers at several
+``fanout_batch_size`` values (1 is one round trip per follower), then pages
+through a follower's timeline with and without celebrity outboxes to merge.
+
+Finally fills one timeline with boos of random lifetimes, lets
+``--expired-share`` of them expire, and compares page reads with hourly expiry
+buckets against a single bucket filtered at read time.
+
+Against fakeredis this measures client-side cost only; point ``--redis-url``
+at a real Redis to include round trips.
+
+    cd services/python/timeline-service
+    python -m benchmarks.bench_fanout --followers 5000 --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.timeline import TimelineStore, connect
+
+DAY_MS = 86_400_000
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def read_latency(store: TimelineStore, user: str, pages: int):
+    samples, cursor = [], None
+    for _ in range(pages):
+        started = time.perf_counter()
+        page = await store.read(user, 20, cursor)
+        samples.append((time.perf_counter() - started) * 1000)
+        cursor = page.next_cursor
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+async def fanout(redis, followers: int, batch_sizes, boos: int, celebs: int, pages: int) -> None:
+    store = TimelineStore(redis, cursor_secret="bench", celebrity_threshold=followers + 1)
+    pipe = redis.pipeline(transaction=False)
+    pipe.sadd("fr:author", *[f"u{i}" for i in range(followers)])
+    pipe.sadd("fg:u0", "author", *[f"celeb{i}" for i in range(celebs)])
+    if celebs:
+        pipe.sadd("celebs", *[f"celeb{i}" for i in range(celebs)])
+    await pipe.execute()
+    now = int(time.time() * 1000)
+
+    print(f"{'batch':>6} {'ms/boo':>8} {'timelines/s':>12}")
+    clock = 0
+    for batch_size in batch_sizes:
+        store.batch_size = batch_size
+        started = time.perf_counter()
+        for _ in range(boos):
+            clock += 1
+            await store.publish("author", f"b{clock}", clock, now + DAY_MS)
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>6} {elapsed / boos * 1000:>8.1f} {boos * (followers + 1) / elapsed:>12,.0f}")
+
+    for i in range(celebs):
+        for _ in range(store.outbox_max_length):
+            clock += 1
+            await store.publish(f"celeb{i}", f"c{clock}", clock, now + DAY_MS)
+    for label, user in (("timeline only", "u1"), (f"+{celebs} celebrity outboxes", "u0")):
+        p50, p99 = await read_latency(store, user, pages)
+        print(f"read {label}: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+async def expiry(redis, entries: int, expired_share: float, pages: int) -> None:
+    rng = random.Random(7)
+    now = time.time()
+    lifetimes = [rng.randrange(60_000, DAY_MS) for _ in range(entries)]
+    print(f"{entries} boos, {expired_share:.0%} expired, newest first:")
+    for label, bucket_seconds in (("hourly buckets", 3600), ("filter at read", 10**9)):
+        await redis.flushdb()
+        clock = [now]
+        store = TimelineStore(
+            redis, cursor_secret="bench", max_length=entries, bucket_seconds=bucket_seconds, clock=lambda: clock[0]
+        )
+        await store.redis.set("tlm:reader", 1)
+        pipe = redis.pipeline(transaction=False)
+        base = int(now * 1000)
+        for i, lifetime in enumerate(lifetimes):
+            store._write(pipe, "tl:reader", {f"b{i}:{base + lifetime}": i}, entries, None)
+        await pipe.execute()
+        # Later reads see expired_share of the boos past their expiry.
+        clock[0] = now + sorted(lifetimes)[int(expired_share * entries) - 1] / 1000
+        p50, p99 = await read_latency(store, "reader", pages)
+        print(f"  {label:>15}: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+async def run(args) -> None:
+    redis = connect(args.redis_url)
+    await redis.flushdb()
+    await fanout(redis, args.followers, args.batch_size, args.boos, args.celebs, args.pages)
+    await expiry(redis, args.entries, args.expired_share, args.pages)
+    await redis.flushdb()
+    await redis.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="fakeredis://")
+    parser.add_argument("--followers", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--boos", type=int, default=20)
+    parser.add_argument("--celebs", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--expired-share", type=float, default=0.9)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
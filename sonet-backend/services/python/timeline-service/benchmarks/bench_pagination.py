@@ -0,0 +1,107 @@
+"""Feed page latency by depth: keyset cursors against offset paging.
+
+Fills one reader's timeline, and the outboxes of ``--celebs`` celebrities
+they follow, with enough boos for ``--pages`` pages. It walks every page with
+signed cursors, checking that no boo repeats, and records the latency at
+pages 1, 10, 100 and 1000.
+
+The offset baseline reads the same pages the way an offset cursor would have
+to across merged sources. It takes the top ``offset + limit`` of every source,
+merges them and drops all but the last ``limit``.
+
+    cd services/python/timeline-service
+    python -m benchmarks.bench_pagination --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import heapq
+import statistics
+import time
+
+from app.services.timeline import FOREVER, TimelineStore, connect
+
+READER = "reader"
+DEPTHS = (1, 10, 100, 1000)
+
+
+async def fill(store: TimelineStore, sources, per_source: int) -> None:
+    for s, family in enumerate(sources):
+        # Interleaved created_at so every source contributes to every page.
+        entries = {f"{family}-{i}:0": i * len(sources) + s for i in range(per_source)}
+        for start in range(0, per_source, 10_000):
+            pipe = store.redis.pipeline(transaction=False)
+            chunk = dict(list(entries.items())[start : start + 10_000])
+            store._write(pipe, family, chunk, per_source, None)
+            await pipe.execute()
+    await store.redis.set(f"tlm:{READER}", 1)
+
+
+async def offset_page(store: TimelineStore, sources, page: int, limit: int):
+    end = page * limit
+    pipe = store.redis.pipeline(transaction=False)
+    for family in sources:
+        pipe.zrange(f"{family}:{FOREVER}", 0, end - 1, desc=True, withscores=True)
+    merged = heapq.merge(*await pipe.execute(), key=lambda e: (e[1], e[0]), reverse=True)
+    return list(merged)[end - limit : end]
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args) -> None:
+    redis = connect(args.redis_url)
+    await redis.flushdb()
+    celebs = [f"celeb{i}" for i in range(args.celebs)]
+    sources = [f"tl:{READER}"] + [f"ob:{c}" for c in celebs]
+    per_source = -(-args.pages * args.limit // len(sources)) + args.limit
+    store = TimelineStore(redis, cursor_secret="bench", max_length=per_source)
+    if celebs:
+        await redis.sadd("celebs", *celebs)
+        await redis.sadd(f"fg:{READER}", *celebs)
+    await fill(store, sources, per_source)
+
+    cursors, seen, served = [None], set(), 0
+    started = time.perf_counter()
+    for _ in range(args.pages):
+        page = await store.read(READER, args.limit, cursors[-1])
+        served += len(page.entries)
+        seen.update(e.boo_id for e in page.entries)
+        cursors.append(page.next_cursor)
+    if len(seen) != served:
+        raise AssertionError("keyset pages repeated a boo")
+    print(
+        f"{len(sources)} sources x {per_source:,} boos; walked {args.pages} pages of {args.limit}"
+        f" in {time.perf_counter() - started:.1f}s, cursors of {len(cursors[-1] or '')} chars"
+    )
+
+    print(f"{'page':>6} {'keyset ms':>10} {'offset ms':>10}")
+    for depth in DEPTHS:
+        if depth > args.pages:
+            break
+        cursor = cursors[depth - 1]
+        keyset = await timed(lambda: store.read(READER, args.limit, cursor), args.repeat)
+        offset = await timed(lambda: offset_page(store, sources, depth, args.limit), args.repeat)
+        print(f"{depth:>6} {keyset:>10.2f} {offset:>10.2f}")
+    await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="fakeredis://")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--celebs", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
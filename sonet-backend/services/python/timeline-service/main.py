@@ -0,0 +1,42 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api import feed
+from app.core.config import get_settings
+from app.core.metrics import render_latest
+from app.services.timeline import build_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.timelines = build_store(get_settings())
+    yield
+    await app.state.timelines.close()
+
+
+app = FastAPI(title="timeline-service", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(feed.router)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_latest()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8090)
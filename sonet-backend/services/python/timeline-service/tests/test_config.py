@@ -0,0 +1,18 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.core.cursor import DEV_SECRET
+
+
+def test_cursor_secret_defaults_only_in_dev(monkeypatch):
+    monkeypatch.delenv("TIMELINE_CURSOR_SECRET", raising=False)
+    monkeypatch.setenv("ENV", "dev")
+    assert Settings().cursor_secret == DEV_SECRET
+
+    monkeypatch.setenv("ENV", "production")
+    with pytest.raises(ValidationError, match="cursor secret is required"):
+        Settings()
+
+    monkeypatch.setenv("TIMELINE_CURSOR_SECRET", "s3cret")
+    assert Settings().cursor_secret == "s3cret"
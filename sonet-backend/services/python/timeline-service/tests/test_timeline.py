@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+from fakeredis import aioredis
+
+from app.core.cursor import CursorError
+from app.services.timeline import TimelineStore
+
+HOUR_MS = 3_600_000
+
+
+def _hour() -> int:
+    """Start of the next hour; bucket keys get a real PEXPIREAT, so the clock can't be far in the past."""
+    return (int(time.time() * 1000) // HOUR_MS + 1) * HOUR_MS
+
+
+class Clock:
+    def __init__(self, ms: int):
+        self.ms = ms
+
+    def __call__(self) -> float:
+        return self.ms / 1000
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def _store(clock: Clock, **kwargs) -> TimelineStore:
+    kwargs.setdefault("celebrity_threshold", 3)
+    return TimelineStore(aioredis.FakeRedis(), cursor_secret="test-secret", clock=clock, **kwargs)
+
+
+async def _ids(store: TimelineStore, user_id: str, limit: int = 100):
+    return [e.boo_id for e in (await store.read(user_id, limit)).entries]
+
+
+async def _all_pages(store: TimelineStore, user_id: str, limit: int):
+    ids, cursor = [], None
+    while True:
+        page = await store.read(user_id, limit, cursor)
+        ids += [e.boo_id for e in page.entries]
+        if page.next_cursor is None:
+            return ids
+        cursor = page.next_cursor
+
+
+def test_publish_fans_out_to_followers():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock)
+        await store.follow("f1", "author")
+        await store.follow("f2", "author")
+        written = await store.publish("author", "b1", clock.ms, clock.ms + HOUR_MS)
+        assert written == 3
+        assert await store.redis.zcard(f"tl:f1:{(clock.ms + HOUR_MS) // HOUR_MS}") == 1
+        assert await _ids(store, "f1") == ["b1"]
+        assert await _ids(store, "f2") == ["b1"]
+        assert await _ids(store, "author") == ["b1"]
+        assert await _ids(store, "stranger") == []
+
+        await store.remove("author", "b1", clock.ms + HOUR_MS)
+        assert await _ids(store, "f1") == []
+
+    run(scenario())
+
+
+def test_follow_backfills_and_unfollow_removes():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock)
+        await store.publish("author", "b1", clock.ms - 2, None)
+        await store.publish("author", "b2", clock.ms - 1, clock.ms + HOUR_MS)
+        await store.follow("f1", "author")
+        assert await _ids(store, "f1") == ["b2", "b1"]
+        await store.unfollow("f1", "author")
+        assert await _ids(store, "f1") == []
+
+    run(scenario())
+
+
+def test_celebrity_boos_are_pulled_and_merged_on_read():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock, celebrity_threshold=3)
+        for follower in ("f1", "f2", "f3"):
+            await store.follow(follower, "celeb")
+        assert await store.redis.sismember("celebs", "celeb")
+        await store.follow("f1", "friend")
+
+        await store.publish("friend", "friend-1", clock.ms + 1, clock.ms + HOUR_MS)
+        written = await store.publish("celeb", "celeb-1", clock.ms + 2, clock.ms + 2 * HOUR_MS)
+        await store.publish("friend", "friend-2", clock.ms + 3, None)
+        # Only the celebrity's own timeline is written.
+        assert written == 1
+        assert await store.redis.exists(f"tl:f1:{(clock.ms + 2 * HOUR_MS) // HOUR_MS}") == 0
+
+        assert await _ids(store, "f1") == ["friend-2", "celeb-1", "friend-1"]
+        assert await _ids(store, "f2") == ["celeb-1"]
+        assert await _all_pages(store, "f1", 1) == ["friend-2", "celeb-1", "friend-1"]
+
+    run(scenario())
+
+
+def test_expired_buckets_are_skipped():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock)
+        await store.follow("f1", "author")
+        now = clock.ms
+        await store.publish("author", "short", now + 1, now + HOUR_MS // 2)
+        await store.publish("author", "hour", now + 2, now + HOUR_MS + 10)
+        await store.publish("author", "day", now + 3, now + 24 * HOUR_MS)
+        await store.publish("author", "forever", now + 4, None)
+        assert await store.publish("author", "dead", now + 5, now - 1) == 0
+        assert await _ids(store, "f1") == ["forever", "day", "hour", "short"]
+
+        # "short" is filtered inside the current bucket; its bucket key has not gone yet.
+        clock.ms = now + HOUR_MS // 2
+        assert await _ids(store, "f1") == ["forever", "day", "hour"]
+
+        # Two buckets on, the older ones are no longer in the index.
+        clock.ms = now + 2 * HOUR_MS
+        assert await _ids(store, "f1") == ["forever", "day"]
+        buckets = await store.redis.zrange("tl:f1:idx", 0, -1)
+        assert all(int(b) >= clock.ms // HOUR_MS for b in buckets)
+        assert (await store.stats("f1"))["timeline_buckets"] == len(buckets)
+
+        # The outbox skips expired buckets too, so a rebuild does not revive them.
+        await store.redis.delete("tlm:f1")
+        assert await _ids(store, "f1") == ["forever", "day"]
+
+    run(scenario())
+
+
+def test_cursor_pages_have_no_repeats_or_gaps():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock, celebrity_threshold=2)
+        await store.follow("reader", "a")
+        await store.follow("reader", "celeb")
+        await store.follow("other", "celeb")
+        expected = []
+        for i in range(90):
+            # Many boos share a created_at, across expiry buckets and the pulled outbox.
+            author = "celeb" if i % 3 == 0 else "a"
+            expires_at = None if i % 4 == 0 else clock.ms + (1 + i % 5) * HOUR_MS
+            await store.publish(author, f"b{i:02d}", clock.ms + i // 7, expires_at)
+            expected.append((clock.ms + i // 7, f"b{i:02d}:{expires_at or 0}"))
+        expected = [member.split(":")[0] for _, member in sorted(expected, reverse=True)]
+
+        for limit in (1, 4, 7, 90, 100):
+            assert await _all_pages(store, "reader", limit) == expected
+
+        # Boos published between pages do not shift the pages after the cursor.
+        page = await store.read("reader", 10)
+        await store.publish("a", "newer", clock.ms + 1000, None)
+        rest, cursor = [], page.next_cursor
+        while cursor:
+            next_page = await store.read("reader", 10, cursor)
+            rest += [e.boo_id for e in next_page.entries]
+            cursor = next_page.next_cursor
+        assert [e.boo_id for e in page.entries] + rest == expected
+
+    run(scenario())
+
+
+def test_foreign_cursor_is_rejected():
+    async def scenario():
+        clock = Clock(_hour())
+        store = _store(clock)
+        for i in range(3):
+            await store.publish("author", f"b{i}", clock.ms + i, None)
+        cursor = (await store.read("author", 1)).next_cursor
+        other = TimelineStore(store.redis, cursor_secret="another-secret", clock=clock)
+        with pytest.raises(CursorError):
+            await other.read("author", 1, cursor)
+
+    run(scenario())
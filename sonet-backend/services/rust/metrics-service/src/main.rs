@@ -5,7 +5,7 @@ use tracing_subscriber;
 async fn main() -> Result<(), Box<dyn std::error::Error>> {
     tracing_subscriber::fmt::init();
     
-    let addr = "0.0.0.0:50051".parse()?;
+    let addr = "0.0.0.0:50053".parse()?;
     
     tracing::info!("Server listening on {}", addr);
     
@@ -2,25 +2,25 @@ import Vapor
 import Logging
 
 @main
-struct Application {{
-    static func main() async throws {{
+struct Application {
+    static func main() async throws {
         let app = Vapor.Application()
-        defer {{ app.shutdown() }}
+        defer { app.shutdown() }
         
         try configure(app)
         try app.run()
-    }}
-}}
+    }
+}
 
-func configure(_ app: Vapor.Application) throws {{
+func configure(_ app: Vapor.Application) throws {
     app.http.server.configuration.hostname = "0.0.0.0"
-    app.http.server.configuration.port = 8080
+    app.http.server.configuration.port = 8081
     
     try routes(app)
-}}
+}
 
-func routes(_ app: Vapor.Application) throws {{
-    app.get("health") {{ req in
+func routes(_ app: Vapor.Application) throws {
+    app.get("health") { req in
         return ["status": "ok"]
-    }}
-}}
+    }
+}
@@ -0,0 +1,186 @@
+import json
+import os
+import stat
+
+import pytest
+
+from scaffold import KEPT, MANIFEST, UNCHANGED, WRITTEN, Autoscaling, Scaffold, Volume, load_services
+
+
+def _write(root, files, force=False):
+    scaffold = Scaffold(str(root))
+    for path, content, *mode in files:
+        scaffold.create_file(path, content, *mode)
+    return scaffold.write(force=force)
+
+
+def _manifest(root):
+    with open(root / MANIFEST) as f:
+        return json.load(f)
+
+
+def test_write_skips_unchanged_files(tmp_path):
+    report = _write(tmp_path, [("a/b.txt", "one"), ("c.txt", "two")])
+    assert report[WRITTEN] == ["a/b.txt", "c.txt"]
+    assert (tmp_path / "a/b.txt").read_text() == "one\n"
+    assert set(_manifest(tmp_path)) == {"a/b.txt", "c.txt"}
+
+    mtime = os.stat(tmp_path / "a/b.txt").st_mtime_ns
+    report = _write(tmp_path, [("a/b.txt", "one"), ("c.txt", "three")])
+    assert report[UNCHANGED] == ["a/b.txt"]
+    assert report[WRITTEN] == ["c.txt"]
+    assert os.stat(tmp_path / "a/b.txt").st_mtime_ns == mtime
+    assert (tmp_path / "c.txt").read_text() == "three\n"
+
+
+def test_write_keeps_hand_edits_unless_forced(tmp_path):
+    _write(tmp_path, [("edited.txt", "generated")])
+    recorded = _manifest(tmp_path)["edited.txt"]
+    (tmp_path / "edited.txt").write_text("by hand\n")
+    (tmp_path / "untracked.txt").write_text("by hand\n")
+
+    report = _write(tmp_path, [("edited.txt", "regenerated"), ("untracked.txt", "generated")])
+    assert report[KEPT] == ["edited.txt", "untracked.txt"]
+    assert (tmp_path / "edited.txt").read_text() == "by hand\n"
+    assert (tmp_path / "untracked.txt").read_text() == "by hand\n"
+    # A kept file keeps its old hash, so it stays "edited" on the next run.
+    assert _manifest(tmp_path)["edited.txt"] == recorded
+    assert "untracked.txt" not in _manifest(tmp_path)
+
+    report = _write(tmp_path, [("edited.txt", "regenerated"), ("untracked.txt", "generated")], force=True)
+    assert report[WRITTEN] == ["edited.txt", "untracked.txt"]
+    assert (tmp_path / "edited.txt").read_text() == "regenerated\n"
+    assert set(_manifest(tmp_path)) == {"edited.txt", "untracked.txt"}
+
+
+def test_write_updates_mode_of_unchanged_file(tmp_path):
+    _write(tmp_path, [("run.sh", "echo hi")])
+    assert not os.stat(tmp_path / "run.sh").st_mode & stat.S_IXUSR
+
+    report = _write(tmp_path, [("run.sh", "echo hi", 0o755)])
+    assert report[UNCHANGED] == ["run.sh"]
+    assert stat.S_IMODE(os.stat(tmp_path / "run.sh").st_mode) == 0o755
+
+    report = _write(tmp_path, [("run.sh", "echo bye", 0o700)])
+    assert report[WRITTEN] == ["run.sh"]
+    assert stat.S_IMODE(os.stat(tmp_path / "run.sh").st_mode) == 0o700
+
+
+def test_once_files_are_written_only_if_missing(tmp_path):
+    scaffold = Scaffold(str(tmp_path))
+    scaffold.create_file("main.py", "stub", once=True)
+    assert scaffold.write()[WRITTEN] == ["main.py"]
+    (tmp_path / "main.py").write_text("hand-written\n")
+
+    scaffold = Scaffold(str(tmp_path))
+    scaffold.create_file("main.py", "stub", once=True)
+    assert scaffold.write(force=True)[UNCHANGED] == ["main.py"]
+    assert (tmp_path / "main.py").read_text() == "hand-written\n"
+    assert not os.path.exists(tmp_path / MANIFEST)
+
+
+def test_create_file_rejects_conflicting_renders(tmp_path):
+    scaffold = Scaffold(str(tmp_path))
+    scaffold.create_file("a.txt", "one")
+    scaffold.create_file("a.txt", "one\n")
+    with pytest.raises(ValueError, match="rendered twice"):
+        scaffold.create_file("a.txt", "two")
+
+
+def _services(tmp_path, text):
+    path = tmp_path / "services.toml"
+    path.write_text(text)
+    return load_services("demo", str(path))
+
+
+DEFAULTS = """
+[defaults]
+replicas = 2
+
+[defaults.resources]
+cpu_request = "250m"
+memory_request = "256Mi"
+cpu_limit = "500m"
+memory_limit = "512Mi"
+"""
+
+
+def test_load_services_merges_defaults(tmp_path):
+    plain, tuned = _services(
+        tmp_path,
+        DEFAULTS
+        + """
+[[demo.services]]
+name = "plain"
+runtime = "python"
+port = 9000
+
+[[demo.services]]
+name = "tuned"
+runtime = "python"
+port = 9001
+replicas = 3
+resources = { cpu_limit = "2000m" }
+autoscaling = { min_replicas = 2, max_replicas = 6, cpu_utilization = 70 }
+profiles = ["numpy"]
+env = { SNAPSHOT_PATH = "/data", WORKERS = 1 }
+volume = { name = "data", mount_path = "/data", size = "1Gi" }
+""",
+    )
+    assert (plain.replicas, plain.cpu_request, plain.cpu_limit) == (2, "250m", "500m")
+    assert plain.autoscaling is None and plain.volume is None and plain.env == ()
+    assert (tuned.replicas, tuned.cpu_request, tuned.cpu_limit, tuned.memory_limit) == (3, "250m", "2000m", "512Mi")
+    assert tuned.autoscaling == Autoscaling(min_replicas=2, max_replicas=6, cpu_utilization=70)
+    assert tuned.profiles == ("numpy",)
+    assert tuned.env == (("SNAPSHOT_PATH", "/data"), ("WORKERS", "1"))
+    assert tuned.volume == Volume(name="data", mount_path="/data", size="1Gi")
+
+
+@pytest.mark.parametrize(
+    "services, error",
+    [
+        (
+            """
+[[demo.services]]
+name = "a"
+runtime = "python"
+port = 9000
+
+[[demo.services]]
+name = "b"
+runtime = "python"
+port = 9000
+""",
+            "duplicate service ports: \\[9000\\]",
+        ),
+        (
+            """
+[[demo.services]]
+name = "a"
+runtime = "python"
+port = 9000
+replicas = 1
+autoscaling = { min_replicas = 2, max_replicas = 6, cpu_utilization = 70 }
+""",
+            "replicas outside the autoscaling range",
+        ),
+        (
+            """
+[[demo.services]]
+name = "a"
+runtime = "python"
+port = 9000
+replica = 3
+""",
+            "demo service 'a'",
+        ),
+    ],
+)
+def test_load_services_rejects_bad_entries(tmp_path, services, error):
+    with pytest.raises(ValueError, match=error):
+        _services(tmp_path, DEFAULTS + services)
+
+
+def test_checked_in_services_load():
+    for project in ("dahlia-backend", "sonet-backend"):
+        assert load_services(project)